@@ -2,11 +2,14 @@ import argparse
 import csv
 import os
 from constantes import Acciones
+from instrumentacion import agregar_argumentos, desde_args
 from truco_env import TrucoEnv
+from trazas import TraceRecorder
+from matchup_store import MatchupStoreReader, MatchupStoreWriter
 from agents.registry import create_agent, get_agent_registry
 
 
-def _play_game(env, agent_0, agent_1):
+def _play_game(env, agent_0, agent_1, inst=None):
     env.reset()
     done = False
 
@@ -20,10 +23,13 @@ def _play_game(env, agent_0, agent_1):
         if not any(action_mask):
             break
 
-        if player_id == 0:
-            chosen_action = agent_0.choose_action(action_mask, env, player_id)
+        agent = agent_0 if player_id == 0 else agent_1
+        if inst is not None:
+            with inst.seccion("choose_action"):
+                chosen_action = agent.choose_action(action_mask, env, player_id)
+            inst.paso()
         else:
-            chosen_action = agent_1.choose_action(action_mask, env, player_id)
+            chosen_action = agent.choose_action(action_mask, env, player_id)
 
         estado = env.logic.estado
         prev_cartas = list(estado.cartas_jugadas)
@@ -74,20 +80,36 @@ def _play_game(env, agent_0, agent_1):
     }
 
 
-def main(agent_0, agent_1, games, output_name=None, summary_name=None):
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    results_dir = os.path.join(project_root, "resultados")
-    os.makedirs(results_dir, exist_ok=True)
+def _write_summary(summary_path, agent_0_name, agent_1_name, games, totals):
+    if games > 0:
+        avg_points_j0 = totals["points_j0"] / games
+        avg_points_j1 = totals["points_j1"] / games
+        avg_hands_played = totals["hands_played"] / games
+        avg_hands_won_j0 = totals["hands_won_j0"] / games
+        avg_hands_won_j1 = totals["hands_won_j1"] / games
+    else:
+        avg_points_j0 = 0
+        avg_points_j1 = 0
+        avg_hands_played = 0
+        avg_hands_won_j0 = 0
+        avg_hands_won_j1 = 0
 
-    if output_name is None:
-        output_name = f"{agent_0}vs{agent_1}results.csv"
-    if summary_name is None:
-        summary_name = f"{agent_0}vs{agent_1}summary.txt"
-    output_path = os.path.join(results_dir, os.path.basename(output_name))
-    summary_path = os.path.join(results_dir, os.path.basename(summary_name))
-    agent_0_name = agent_0
-    agent_1_name = agent_1
+    with open(summary_path, "w", encoding="utf-8") as summary:
+        summary.write(f"Agente J0: {agent_0_name}\n")
+        summary.write(f"Agente J1: {agent_1_name}\n")
+        summary.write(f"Partidas: {games}\n")
+        summary.write(f"Victorias J0: {totals['wins_j0']}\n")
+        summary.write(f"Victorias J1: {totals['wins_j1']}\n")
+        summary.write(f"Empates: {totals['ties']}\n")
+        summary.write(f"Promedio puntos J0: {avg_points_j0:.2f}\n")
+        summary.write(f"Promedio puntos J1: {avg_points_j1:.2f}\n")
+        summary.write(f"Promedio manos jugadas: {avg_hands_played:.2f}\n")
+        summary.write(f"Promedio manos ganadas J0: {avg_hands_won_j0:.2f}\n")
+        summary.write(f"Promedio manos ganadas J1: {avg_hands_won_j1:.2f}\n")
 
+
+def _run_games_csv(output_path, env, agent_0_inst, agent_1_inst, agent_0_name, agent_1_name, games):
+    inst = env.instrumentacion
     fieldnames = [
         "game",
         "agent_0",
@@ -113,15 +135,11 @@ def main(agent_0, agent_1, games, output_name=None, summary_name=None):
         "hands_won_j1": 0,
     }
 
-    env = TrucoEnv()
-    agent_0_inst = create_agent(agent_0_name)
-    agent_1_inst = create_agent(agent_1_name)
-
     with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         for i in range(1, games + 1):
-            result = _play_game(env, agent_0_inst, agent_1_inst)
+            result = _play_game(env, agent_0_inst, agent_1_inst, inst)
             result["game"] = i
             result["agent_0"] = agent_0_name
             result["agent_1"] = agent_1_name
@@ -137,34 +155,87 @@ def main(agent_0, agent_1, games, output_name=None, summary_name=None):
             totals["hands_played"] += result["hands_played"]
             totals["hands_won_j0"] += result["hands_won_j0"]
             totals["hands_won_j1"] += result["hands_won_j1"]
+    return totals
 
-    print(f"Resultados guardados en {output_path}")
 
-    if games > 0:
-        avg_points_j0 = totals["points_j0"] / games
-        avg_points_j1 = totals["points_j1"] / games
-        avg_hands_played = totals["hands_played"] / games
-        avg_hands_won_j0 = totals["hands_won_j0"] / games
-        avg_hands_won_j1 = totals["hands_won_j1"] / games
+def _run_games_store(store_path, env, agent_0_inst, agent_1_inst, agent_0_name, agent_1_name, games, chunk_size):
+    inst = env.instrumentacion
+    with MatchupStoreWriter(store_path, agent_0_name, agent_1_name, chunk_size=chunk_size) as store:
+        first_chunk = store.next_chunk
+        for i in range(1, games + 1):
+            result = _play_game(env, agent_0_inst, agent_1_inst, inst)
+            result["game"] = i
+            store.append(result)
+    last_chunk = store.next_chunk
+
+    # Los totales salen del propio store (solo los chunks de esta corrida).
+    run_chunks = range(first_chunk, last_chunk)
+    reader = MatchupStoreReader(store_path)
+    return reader.aggregate(chunks=run_chunks), run_chunks
+
+
+def main(
+    agent_0,
+    agent_1,
+    games,
+    output_name=None,
+    summary_name=None,
+    output_format="store",
+    store_name=None,
+    chunk_size=65536,
+    trace_name=None,
+    instrumentacion=None,
+):
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    results_dir = os.path.join(project_root, "resultados")
+    os.makedirs(results_dir, exist_ok=True)
+
+    if summary_name is None:
+        summary_name = f"{agent_0}vs{agent_1}summary.txt"
+    summary_path = os.path.join(results_dir, os.path.basename(summary_name))
+    agent_0_name = agent_0
+    agent_1_name = agent_1
+
+    recorder = None
+    if trace_name is not None:
+        trace_path = os.path.join(results_dir, os.path.basename(trace_name))
+        recorder = TraceRecorder(
+            trace_path, metadata={"agent_0": agent_0_name, "agent_1": agent_1_name}
+        )
+
+    env = TrucoEnv(recorder=recorder, instrumentacion=instrumentacion)
+    agent_0_inst = create_agent(agent_0_name)
+    agent_1_inst = create_agent(agent_1_name)
+
+    if output_format == "csv":
+        if output_name is None:
+            output_name = f"{agent_0}vs{agent_1}results.csv"
+        output_path = os.path.join(results_dir, os.path.basename(output_name))
+        totals = _run_games_csv(
+            output_path, env, agent_0_inst, agent_1_inst, agent_0_name, agent_1_name, games
+        )
+        print(f"Resultados guardados en {output_path}")
     else:
-        avg_points_j0 = 0
-        avg_points_j1 = 0
-        avg_hands_played = 0
-        avg_hands_won_j0 = 0
-        avg_hands_won_j1 = 0
+        if store_name is None:
+            store_name = f"{agent_0}vs{agent_1}results.store"
+        store_path = os.path.join(results_dir, os.path.basename(store_name))
+        totals, run_chunks = _run_games_store(
+            store_path, env, agent_0_inst, agent_1_inst, agent_0_name, agent_1_name, games, chunk_size
+        )
+        print(f"Resultados guardados en {store_path}")
+        if output_name is not None:
+            output_path = os.path.join(results_dir, os.path.basename(output_name))
+            MatchupStoreReader(store_path).export_csv(output_path, chunks=run_chunks)
+            print(f"CSV exportado en {output_path}")
 
-    with open(summary_path, "w", encoding="utf-8") as summary:
-        summary.write(f"Agente J0: {agent_0_name}\n")
-        summary.write(f"Agente J1: {agent_1_name}\n")
-        summary.write(f"Partidas: {games}\n")
-        summary.write(f"Victorias J0: {totals['wins_j0']}\n")
-        summary.write(f"Victorias J1: {totals['wins_j1']}\n")
-        summary.write(f"Empates: {totals['ties']}\n")
-        summary.write(f"Promedio puntos J0: {avg_points_j0:.2f}\n")
-        summary.write(f"Promedio puntos J1: {avg_points_j1:.2f}\n")
-        summary.write(f"Promedio manos jugadas: {avg_hands_played:.2f}\n")
-        summary.write(f"Promedio manos ganadas J0: {avg_hands_won_j0:.2f}\n")
-        summary.write(f"Promedio manos ganadas J1: {avg_hands_won_j1:.2f}\n")
+    if instrumentacion is not None:
+        instrumentacion.cerrar()
+
+    if recorder is not None:
+        recorder.close()
+        print(f"Traza guardada en {recorder.path}")
+
+    _write_summary(summary_path, agent_0_name, agent_1_name, games, totals)
 
     print(f"Resumen guardado en {summary_path}")
 
@@ -191,16 +262,50 @@ if __name__ == "__main__":
         default=100,
         help="Cantidad de partidas a simular.",
     )
+    parser.add_argument(
+        "--format",
+        choices=["store", "csv"],
+        default="store",
+        help="Formato de salida: store columnar (chunks .npz) o CSV por fila.",
+    )
     parser.add_argument(
         "--output-csv",
         default=None,
-        help="Nombre del archivo CSV de salida.",
+        help="Nombre del archivo CSV de salida (con --format store se exporta al final).",
+    )
+    parser.add_argument(
+        "--output-store",
+        default=None,
+        help="Nombre del directorio del store columnar.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=65536,
+        help="Partidas por chunk del store.",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Nombre del archivo de traza binaria por decision (se guarda en `resultados/`). Suma ~5-8%% de tiempo por partida (benchmarks/overhead_trazas.py).",
     )
     parser.add_argument(
         "--output-summary",
         default=None,
         help="Nombre del archivo de resumen.",
     )
+    agregar_argumentos(parser)
     args = parser.parse_args()
 
-    main(args.agent_0, args.agent_1, args.games, args.output_csv, args.output_summary)
+    main(
+        args.agent_0,
+        args.agent_1,
+        args.games,
+        args.output_csv,
+        args.output_summary,
+        args.format,
+        args.output_store,
+        args.chunk_size,
+        args.trace,
+        desde_args(args),
+    )
@@ -0,0 +1,333 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import tempfile
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from offline_dataset import CAMPOS_EXTRA, ShardedDataset, caracteristicas_extra
+
+
+# =============================================================================
+# ABSTRACCION DE ESTADOS PARA Q-LEARNING
+# Un encoder se describe con una spec declarativa:
+#   {"nombre": "actual", "campos": [
+#       {"var": "rank_1"},                              -> valor tal cual
+#       {"var": "mis_puntos", "cortes": [15, 25]},      -> bucket (<=15, <=25, resto)
+#       {"var": "envido_propio", "agrupar": 4},         -> valor // 4
+#       {"var": "max_rival_mesa", "recorte": [0, 9]},   -> clip
+#   ]}
+# Las variables salen de la observacion basica (13 floats) y de las features
+# extra de offline_dataset, asi que la misma spec codifica el dataset entero
+# de forma vectorizada y el estado de un TrucoEnv en vivo (EncoderSpec).
+# Por cada spec se reportan estados distintos y distribucion de visitas en el
+# dataset, memoria estimada de la Q-table y el winrate greedy despues de
+# entrenar train_q_learning_vs_agent con un presupuesto fijo. Los
+# experimentos corren en paralelo, uno por proceso.
+# =============================================================================
+
+_EXTRA = {nombre: i for i, nombre in enumerate(CAMPOS_EXTRA)}
+
+VARIABLES = [
+    "rank_1",               # Ranks propios ordenados (0 = carta ya jugada), como encode_state
+    "rank_2",
+    "rank_3",
+    "mis_puntos",
+    "puntos_rival",
+    "diferencia_puntos",    # mis_puntos - puntos_rival
+    "voy_ganando",
+    "ronda",
+    "nivel_truco",
+    "nivel_envido",
+    "soy_mano",
+] + CAMPOS_EXTRA
+
+_PUNTOS = [{"var": "rank_1"}, {"var": "rank_2"}, {"var": "rank_3"}, {"var": "max_rival_mesa"}]
+_CONTEXTO = [
+    {"var": "voy_ganando"},
+    {"var": "nivel_truco"},
+    {"var": "estado_canto_envido"},
+    {"var": "soy_mano"},
+    {"var": "ronda"},
+]
+
+ENCODERS_PREDEFINIDOS = [
+    # Los campos de QLearningAgent.encode_state. Los puntos van siempre en la
+    # perspectiva del jugador (encode_state los da vuelta para el J1).
+    {
+        "nombre": "actual",
+        "campos": _PUNTOS
+        + [{"var": "mis_puntos", "cortes": [15, 25]}, {"var": "puntos_rival", "cortes": [15, 25]}]
+        + _CONTEXTO,
+    },
+    # Las zonas de _bin_points (0-10, 11-20, 21-29, 30)
+    {
+        "nombre": "zonas_bin_points",
+        "campos": _PUNTOS
+        + [{"var": "mis_puntos", "cortes": [10, 20, 29]}, {"var": "puntos_rival", "cortes": [10, 20, 29]}]
+        + _CONTEXTO,
+    },
+    # Sin puntos de la partida ni ranks exactos: solo fuerza de mano por buckets
+    {
+        "nombre": "compacto",
+        "campos": [
+            {"var": "rank_1", "cortes": [3, 6, 9]},
+            {"var": "rank_2", "cortes": [3, 6, 9]},
+            {"var": "rank_3", "cortes": [3, 6, 9]},
+            {"var": "max_rival_mesa", "cortes": [0, 3, 6, 9]},
+            {"var": "envido_propio", "cortes": [23, 27, 30]},
+        ]
+        + _CONTEXTO,
+    },
+    # actual + envido propio y de quien es el turno de responder
+    {
+        "nombre": "actual_envido",
+        "campos": _PUNTOS
+        + [{"var": "mis_puntos", "cortes": [15, 25]}, {"var": "puntos_rival", "cortes": [15, 25]}]
+        + _CONTEXTO
+        + [
+            {"var": "envido_propio", "cortes": [23, 27, 30]},
+            {"var": "responder_truco"},
+            {"var": "responder_envido"},
+        ],
+    },
+]
+
+
+def variables(obs, extra):
+    """obs (N, 13) y extra (N, len(CAMPOS_EXTRA)) -> {variable: array int64 (N,)}."""
+    obs = np.asarray(obs)
+    extra = np.asarray(extra)
+    ranks = obs[:, 0:3].astype(np.int64)
+    # Ordenados con los ceros al final, igual que _sorted_hand_ranks
+    ordenados = np.sort(np.where(ranks > 0, ranks, 99), axis=1)
+    ordenados[ordenados == 99] = 0
+    mis_puntos = obs[:, 6].astype(np.int64)
+    puntos_rival = obs[:, 7].astype(np.int64)
+    out = {
+        "rank_1": ordenados[:, 0],
+        "rank_2": ordenados[:, 1],
+        "rank_3": ordenados[:, 2],
+        "mis_puntos": mis_puntos,
+        "puntos_rival": puntos_rival,
+        "diferencia_puntos": mis_puntos - puntos_rival,
+        "voy_ganando": (mis_puntos >= puntos_rival).astype(np.int64),
+        "ronda": obs[:, 8].astype(np.int64),
+        "nivel_truco": obs[:, 10].astype(np.int64),
+        "nivel_envido": obs[:, 11].astype(np.int64),
+        "soy_mano": obs[:, 12].astype(np.int64),
+    }
+    for nombre, i in _EXTRA.items():
+        out[nombre] = extra[:, i].astype(np.int64)
+    return out
+
+
+def validar_spec(spec):
+    for campo in spec["campos"]:
+        if campo["var"] not in VARIABLES:
+            raise ValueError(f"{spec['nombre']}: variable desconocida {campo['var']}. Opciones: {VARIABLES}")
+
+
+def codificar(spec, vars_):
+    """Aplica la spec a las variables -> matriz int64 (N, campos)."""
+    columnas = []
+    for campo in spec["campos"]:
+        x = vars_[campo["var"]]
+        if "recorte" in campo:
+            x = np.clip(x, *campo["recorte"])
+        if "agrupar" in campo:
+            x = x // campo["agrupar"]
+        if "cortes" in campo:
+            x = np.digitize(x, campo["cortes"], right=True)
+        columnas.append(x)
+    return np.stack(columnas, axis=1)
+
+
+class EncoderSpec:
+    """encoder(env, player_id) -> tupla de estado, para QLearningAgent(encoder=...)."""
+
+    def __init__(self, spec):
+        validar_spec(spec)
+        self.spec = spec
+
+    def __call__(self, env, player_id=0):
+        obs = env.get_observation(player_id)[None, :]
+        extra = caracteristicas_extra(env.logic, player_id)[None, :]
+        return tuple(codificar(self.spec, variables(obs, extra))[0].tolist())
+
+
+def memoria_dict(estados, pares, n_campos):
+    """
+    Bytes estimados del dict {(estado, accion): q}: por par, la entrada del
+    dict, la tupla (estado, accion) y el float; por estado, su tupla (compartida
+    entre acciones). Los ints chicos de los campos estan cacheados por CPython.
+    """
+    muestra = max(1, min(pares, 1 << 16))
+    entrada = sys.getsizeof(dict.fromkeys(range(muestra))) / muestra
+    por_par = entrada + sys.getsizeof((None, 0)) + sys.getsizeof(0.0)
+    return pares * por_par + estados * sys.getsizeof(tuple(range(n_campos)))
+
+
+def estadisticas(spec, dataset_path, batch_size=65536):
+    """Estados distintos, visitas y memoria estimada sobre el dataset, en una pasada."""
+    unicos, visitas = None, None
+    pares = None
+    filas = 0
+    for batch in ShardedDataset(dataset_path, batch_size=batch_size, shuffle=False, columns=["obs", "extra", "action"]):
+        codigos = codificar(spec, variables(batch["obs"], batch["extra"]))
+        filas += len(codigos)
+        u, c = np.unique(codigos, axis=0, return_counts=True)
+        p = np.unique(np.column_stack([codigos, batch["action"].astype(np.int64)]), axis=0)
+        if unicos is None:
+            unicos, visitas, pares = u, c, p
+            continue
+        # Fusion con lo acumulado: la memoria depende de los estados distintos, no de las filas
+        todos, inv = np.unique(np.concatenate([unicos, u]), axis=0, return_inverse=True)
+        acumuladas = np.zeros(len(todos), dtype=np.int64)
+        np.add.at(acumuladas, inv.reshape(-1), np.concatenate([visitas, c]))
+        unicos, visitas = todos, acumuladas
+        pares = np.unique(np.concatenate([pares, p]), axis=0)
+
+    if unicos is None:
+        raise ValueError(f"Dataset vacio: {dataset_path}")
+    orden = np.sort(visitas)[::-1]
+    prob = visitas / visitas.sum()
+    top = max(1, len(orden) // 10)
+    return {
+        "filas": int(filas),
+        "estados": int(len(unicos)),
+        "pares_estado_accion": int(len(pares)),
+        "visitas": {
+            "p50": float(np.percentile(visitas, 50)),
+            "p90": float(np.percentile(visitas, 90)),
+            "p99": float(np.percentile(visitas, 99)),
+            "max": int(orden[0]),
+            "frac_una_visita": float(np.mean(visitas == 1)),
+            "entropia_norm": float(-(prob * np.log(prob)).sum() / np.log(len(prob))) if len(prob) > 1 else 0.0,
+            "frac_filas_top10pct": float(orden[:top].sum() / filas),
+        },
+        "memoria_dict_mb": memoria_dict(len(unicos), len(pares), unicos.shape[1]) / 2**20,
+        "memoria_densa_mb": len(unicos) * 13 * 9 / 2**20,
+    }
+
+
+def fuerza(spec, episodios, eval_partidas, opponent, seed):
+    """Entrena desde cero contra `opponent` y devuelve el winrate greedy final."""
+    import evaluacion
+    import train_q_learning_vs_agent as entrenador
+
+    # Una sola evaluacion, al final; en el mismo proceso (fuerza ya corre en un worker)
+    evaluador = evaluacion.EvaluacionIncremental(episodios, rivales=[opponent], partidas=eval_partidas, workers=0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        q_table_path = os.path.join(tmp_dir, "q_table.pkl")
+        entrenador.train(
+            episodios,
+            0.1,
+            1.0,
+            0.5,
+            True,
+            opponent,
+            0,
+            encoder=EncoderSpec(spec),
+            evaluador=evaluador,
+            seed=seed,
+            model_path=q_table_path,
+        )
+        with open(q_table_path, "rb") as f:
+            q_table = pickle.load(f)
+    return {
+        "winrate": evaluador.historial[-1]["winrate"],
+        "estados_entrenados": len({state for state, _ in q_table}),
+        "pares_entrenados": len(q_table),
+    }
+
+
+def _experimento(args):
+    spec, dataset_path, episodios, eval_partidas, opponent, seed = args
+    resultado = {"nombre": spec["nombre"], "spec": spec}
+    if dataset_path:
+        resultado.update(estadisticas(spec, dataset_path))
+    if episodios > 0:
+        resultado.update(fuerza(spec, episodios, eval_partidas, opponent, seed))
+        resultado["memoria_entrenada_mb"] = (
+            memoria_dict(resultado["estados_entrenados"], resultado["pares_entrenados"], len(spec["campos"])) / 2**20
+        )
+    return resultado
+
+
+def _frente_pareto(resultados):
+    """Encoders a los que ningun otro gana en memoria y winrate a la vez."""
+    clave = "memoria_entrenada_mb"
+    frente = []
+    for r in resultados:
+        dominado = any(
+            o[clave] <= r[clave] and o["winrate"] >= r["winrate"] and (o[clave] < r[clave] or o["winrate"] > r["winrate"])
+            for o in resultados
+        )
+        if not dominado:
+            frente.append(r["nombre"])
+    return frente
+
+
+def comparar(specs, dataset_path, episodios, eval_partidas, opponent, seed=0, workers=None):
+    for spec in specs:
+        validar_spec(spec)
+    tareas = [(spec, dataset_path, episodios, eval_partidas, opponent, seed) for spec in specs]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tareas)))
+    if workers > 1:
+        ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+        with ctx.Pool(workers) as pool:
+            return pool.map(_experimento, tareas)
+    return [_experimento(t) for t in tareas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara encoders de estado para Q-Learning (memoria vs calidad).")
+    parser.add_argument("--dataset", default=None, help="Dataset offline (offline_dataset.py) con partidas grabadas.")
+    parser.add_argument("--specs", default=None, help="JSON con una lista de specs (por defecto las predefinidas).")
+    parser.add_argument("--solo", nargs="+", default=None, help="Nombres de specs a correr.")
+    parser.add_argument("--episodios", type=int, default=5000, help="Presupuesto de entrenamiento (0 = no entrenar).")
+    parser.add_argument("--eval-partidas", type=int, default=200)
+    parser.add_argument("--opponent", default="rational")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, uno por core).")
+    parser.add_argument("--json", default=None, help="Guarda el reporte en este archivo.")
+    args = parser.parse_args()
+
+    specs = ENCODERS_PREDEFINIDOS
+    if args.specs:
+        with open(args.specs, "r", encoding="utf-8") as f:
+            specs = json.load(f)
+    if args.solo:
+        specs = [s for s in specs if s["nombre"] in args.solo]
+
+    resultados = comparar(specs, args.dataset, args.episodios, args.eval_partidas, args.opponent, args.seed, args.workers)
+    frente = _frente_pareto(resultados) if args.episodios > 0 else []
+    for r in resultados:
+        partes = [f"{r['nombre']:>18}"]
+        if "estados" in r:
+            partes.append(
+                f"estados={r['estados']} pares={r['pares_estado_accion']} "
+                f"una_visita={r['visitas']['frac_una_visita']:.2f} dict~{r['memoria_dict_mb']:.1f}MB"
+            )
+        if "winrate" in r:
+            partes.append(f"winrate={r['winrate']:.3f} pares_entrenados={r['pares_entrenados']} ~{r['memoria_entrenada_mb']:.1f}MB")
+        if r["nombre"] in frente:
+            partes.append("[pareto]")
+        print(" | ".join(partes))
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "resultados": resultados, "pareto": frente}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
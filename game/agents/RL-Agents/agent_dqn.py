@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "dqn_models", "dqn.npz")
+
+# Escala de cada componente de la observacion basica (ranks, puntos, ronda, cantos)
+ESCALA_OBS = np.array([14, 14, 14, 14, 14, 14, 30, 30, 3, 1, 4, 4, 1], dtype=np.float32)
+
+
+def forward_numpy(pesos, obs, dueling):
+    """
+    Forward de la red Q exportada: pesos = [(W, b), ...] de las capas ocultas y
+    despues la cabeza (una capa Q, o valor y ventaja si es dueling).
+    obs (N, 13) -> Q (N, acciones).
+    """
+    h = np.asarray(obs, dtype=np.float32) / ESCALA_OBS
+    ocultas = pesos[:-2] if dueling else pesos[:-1]
+    for W, b in ocultas:
+        h = np.maximum(h @ W + b, 0.0)
+    if not dueling:
+        W, b = pesos[-1]
+        return h @ W + b
+    (Wv, bv), (Wa, ba) = pesos[-2], pesos[-1]
+    ventaja = h @ Wa + ba
+    return (h @ Wv + bv) + ventaja - ventaja.mean(axis=-1, keepdims=True)
+
+
+def argmax_enmascarado(q, mask):
+    """Argmax de Q por fila entre las acciones validas."""
+    return np.where(np.asarray(mask, dtype=bool), q, -np.inf).argmax(axis=-1)
+
+
+def guardar_pesos(path, pesos, dueling):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {"dueling": np.array(dueling)}
+    for i, (W, b) in enumerate(pesos):
+        arrays[f"W{i}"] = W.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def cargar_pesos(path):
+    with np.load(path) as data:
+        n = sum(1 for k in data.files if k.startswith("W"))
+        pesos = [(data[f"W{i}"], data[f"b{i}"]) for i in range(n)]
+        return pesos, bool(data["dueling"])
+
+
+class DQNAgent:
+    """
+    Agente DQN greedy. Solo usa NumPy: el trainer exporta los pesos de la red
+    de torch a un .npz, asi que jugar no necesita torch instalado.
+    """
+
+    def __init__(self, model_path=None, pesos=None, dueling=False):
+        self.model_path = model_path or MODEL_PATH
+        self.pesos = pesos
+        self.dueling = dueling
+        if self.pesos is None:
+            self._load()
+
+    def choose_action(self, action_mask, env=None, player_id=0):
+        valid_actions = [i for i, valid in enumerate(action_mask) if valid]
+        if not valid_actions:
+            return None
+        if env is None or self.pesos is None:
+            return valid_actions[0]
+        q = forward_numpy(self.pesos, env.get_observation(player_id)[None, :], self.dueling)
+        return int(argmax_enmascarado(q, [action_mask])[0])
+
+    def _load(self):
+        if not os.path.exists(self.model_path):
+            return
+        self.pesos, self.dueling = cargar_pesos(self.model_path)
@@ -9,11 +9,14 @@ class QLearningAgent:
     Agente Q-Learning con encoder de estado discreto.
     """
 
-    def __init__(self, q_table_path=None):
+    def __init__(self, q_table_path=None, encoder=None):
         self.q_table_path = q_table_path or os.path.join(
             os.path.dirname(__file__), "q_tables", "q_table.pkl"
         )
         self.q_table = self._load_q_table()
+        # encoder(env, player_id) -> estado; por defecto encode_state
+        if encoder is not None:
+            self.encode_state = encoder
 
     def choose_action(self, action_mask, env=None, player_id=0):
         """
@@ -92,15 +95,6 @@ class QLearningAgent:
             valid.append(0)
         return tuple(valid[:3])
 
-    def _bin_points(self, puntos):
-        if puntos <= 10:
-            return 0
-        if puntos <= 20:
-            return 1
-        if puntos <= 29:
-            return 2
-        return 3
-
     def _load_q_table(self):
         if not os.path.exists(self.q_table_path):
             return {}
@@ -0,0 +1,176 @@
+import os
+import pickle
+
+import numpy as np
+
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "q_linear", "q_linear.pkl")
+
+
+# =============================================================================
+# Q-LEARNING LINEAL CON FEATURES HASHEADAS
+# Q(s, a) = sum_g W[h_g(s), a]: cada grupo g cruza algunas variables de la
+# observacion (ranks ordenados, mesa del rival, ronda, cantos, zonas de
+# puntos) y se hashea a una fila de W. W es un array float32 de tamano fijo
+# (n_features, 13), asi que la memoria no crece con el entrenamiento, y
+# estados parecidos comparten los grupos gruesos (generalizan) mientras el
+# grupo mas fino se comporta casi como la tabla.
+# Todo va en batch: caracteristicas() recibe (N, 13) observaciones y
+# actualizar() aplica N transiciones de una vez.
+# =============================================================================
+
+GRUPOS = [
+    ("bias",),
+    ("r1",),
+    ("r2",),
+    ("r3",),
+    ("r1", "r2", "r3"),
+    ("r1", "max_rival"),
+    ("r1", "ronda"),
+    ("r1", "nivel_truco"),
+    ("r1", "r2", "nivel_truco"),
+    ("max_rival", "ronda"),
+    ("nivel_truco", "nivel_envido", "ronda", "soy_mano"),
+    ("mi_zona", "rival_zona", "voy_ganando"),
+    ("r1", "r2", "r3", "max_rival", "ronda", "nivel_truco", "nivel_envido"),
+]
+
+_PRIMOS = np.array([1000003, 998244353, 10007, 7919, 104729, 15485863, 179424673, 2750159], dtype=np.int64)
+_PRIMOS_PY = [int(p) for p in _PRIMOS]
+
+
+def variables(obs):
+    """obs (N, 13) -> {variable: int64 (N,)}."""
+    obs = np.asarray(obs)
+    ranks = obs[:, 0:3].astype(np.int64)
+    ordenados = np.sort(np.where(ranks > 0, ranks, 99), axis=1)
+    ordenados[ordenados == 99] = 0
+    mis_puntos = obs[:, 6].astype(np.int64)
+    puntos_rival = obs[:, 7].astype(np.int64)
+    return {
+        "bias": np.zeros(len(obs), dtype=np.int64),
+        "r1": ordenados[:, 0],
+        "r2": ordenados[:, 1],
+        "r3": ordenados[:, 2],
+        "max_rival": obs[:, 3:6].astype(np.int64).max(axis=1),
+        "ronda": obs[:, 8].astype(np.int64),
+        "nivel_truco": obs[:, 10].astype(np.int64),
+        "nivel_envido": obs[:, 11].astype(np.int64),
+        "soy_mano": obs[:, 12].astype(np.int64),
+        # Mismas zonas que QLearningAgent.encode_state
+        "mi_zona": np.digitize(mis_puntos, [15, 25], right=True),
+        "rival_zona": np.digitize(puntos_rival, [15, 25], right=True),
+        "voy_ganando": (mis_puntos >= puntos_rival).astype(np.int64),
+    }
+
+
+def caracteristicas(obs, n_features):
+    """Indices activos (N, len(GRUPOS)) de W para un batch de observaciones."""
+    vars_ = variables(obs)
+    idx = np.empty((len(vars_["bias"]), len(GRUPOS)), dtype=np.int64)
+    for g, grupo in enumerate(GRUPOS):
+        h = np.full(len(idx), (g + 1) * _PRIMOS[0], dtype=np.int64)
+        for k, nombre in enumerate(grupo):
+            h = h * 31 + (vars_[nombre] + 1) * _PRIMOS[k + 1]
+        idx[:, g] = np.abs(h) % n_features
+    return idx
+
+
+def _envolver(h):
+    # Aritmetica int64 con overflow, igual que numpy
+    h &= 0xFFFFFFFFFFFFFFFF
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def caracteristicas_una(obs, n_features):
+    """Lo mismo que caracteristicas() para una sola observacion, sin overhead de numpy."""
+    ranks = sorted(int(r) for r in obs[0:3] if int(r) > 0)
+    ranks += [0] * (3 - len(ranks))
+    mis_puntos, puntos_rival = int(obs[6]), int(obs[7])
+    vars_ = {
+        "bias": 0,
+        "r1": ranks[0],
+        "r2": ranks[1],
+        "r3": ranks[2],
+        "max_rival": max(int(r) for r in obs[3:6]),
+        "ronda": int(obs[8]),
+        "nivel_truco": int(obs[10]),
+        "nivel_envido": int(obs[11]),
+        "soy_mano": int(obs[12]),
+        "mi_zona": 0 if mis_puntos <= 15 else 1 if mis_puntos <= 25 else 2,
+        "rival_zona": 0 if puntos_rival <= 15 else 1 if puntos_rival <= 25 else 2,
+        "voy_ganando": int(mis_puntos >= puntos_rival),
+    }
+    idx = []
+    for g, grupo in enumerate(GRUPOS):
+        h = _envolver((g + 1) * _PRIMOS_PY[0])
+        for k, nombre in enumerate(grupo):
+            h = _envolver(h * 31 + (vars_[nombre] + 1) * _PRIMOS_PY[k + 1])
+        idx.append(abs(h) % n_features)
+    return idx
+
+
+class QLinearAgent:
+    """
+    Agente Q-Learning con aproximacion lineal sobre features hasheadas.
+    """
+
+    def __init__(self, model_path=None, n_features=1 << 16, num_actions=13):
+        self.model_path = model_path or MODEL_PATH
+        self.n_features = n_features
+        self.num_actions = num_actions
+        self.W = np.zeros((n_features, num_actions), dtype=np.float32)
+        self._load()
+
+    def choose_action(self, action_mask, env=None, player_id=0):
+        """
+        Seleccion greedy sobre Q(s, .) = suma de las filas activas de W.
+        """
+        valid_actions = [i for i, valid in enumerate(action_mask) if valid]
+        if not valid_actions:
+            return None
+        if env is None:
+            return valid_actions[0]
+        q = self.W[caracteristicas_una(env.get_observation(player_id), self.n_features)].sum(axis=0)
+        return self.greedy(q, action_mask)
+
+    def q_valores(self, idx):
+        """idx (N, grupos) -> Q (N, num_actions)."""
+        return self.W[idx].sum(axis=1)
+
+    def greedy(self, q, action_mask):
+        # Primer maximo entre las validas, igual que QLearningAgent
+        valid = np.flatnonzero(action_mask)
+        return int(valid[np.argmax(q[valid])])
+
+    def actualizar(self, idx, acciones, objetivos, alpha):
+        """
+        Un paso sobre N transiciones: cada peso activo se mueve alpha/grupos por
+        el error medio de las transiciones que lo usan (no la suma: el bias y los
+        grupos gruesos aparecen en casi todo el batch). Devuelve el error
+        cuadratico medio antes del paso.
+        """
+        acciones = np.asarray(acciones, dtype=np.int64)
+        pred = self.W[idx, acciones[:, None]].sum(axis=1)
+        error = np.asarray(objetivos, dtype=np.float32) - pred
+        celdas = (idx * self.num_actions + acciones[:, None]).ravel()
+        unicas, inv = np.unique(celdas, return_inverse=True)
+        suma = np.bincount(inv, weights=np.repeat(error, idx.shape[1]))
+        cuenta = np.bincount(inv)
+        self.W.reshape(-1)[unicas] += ((alpha / idx.shape[1]) * suma / cuenta).astype(np.float32)
+        return float(np.mean(error * error))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        with open(self.model_path, "wb") as f:
+            pickle.dump({"W": self.W, "n_features": self.n_features, "grupos": GRUPOS}, f)
+
+    def _load(self):
+        if not os.path.exists(self.model_path):
+            return
+        with open(self.model_path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("grupos") != GRUPOS:
+            raise ValueError(f"{self.model_path}: el modelo se entreno con otros grupos de features.")
+        self.n_features = payload["n_features"]
+        self.W = payload["W"].astype(np.float32, copy=False)
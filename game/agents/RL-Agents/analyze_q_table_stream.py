@@ -0,0 +1,312 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from constantes import Acciones
+from analyze_q_table import QTABLE_PATH, _action_groups
+from q_table_columnar import (
+    CAMPOS_ESTADO,
+    MANIFEST_NAME,
+    cargar_pickle,
+    iter_chunks_dict,
+    iter_chunks_shard,
+    read_manifest,
+)
+
+
+# =============================================================================
+# ANALISIS EN STREAMING DE LA Q-TABLE
+# Una sola pasada por chunks columnares (shards de q_table_columnar o el dict
+# del pickle recorrido por partes). Cada chunk se reduce con operaciones de
+# NumPy a acumuladores de tamano fijo: resumen, estadisticas por accion,
+# histogramas por grupo de acciones (rango fijo, con conteo de valores fuera
+# de rango), marginales por campo del estado y top-k por accion. Los
+# acumuladores de cada shard se fusionan, asi que los shards se pueden
+# procesar en paralelo. La salida es un JSON para dashboards.
+# =============================================================================
+
+N_ACCIONES = len(Acciones)
+
+
+def _grupo_de_accion():
+    grupos = list(_action_groups())
+    grupo = np.full(N_ACCIONES, len(grupos), dtype=np.int64)
+    for g, (_, acciones) in enumerate(_action_groups().items()):
+        grupo[list(acciones)] = g
+    return grupos, grupo
+
+
+def _pad(a, n):
+    if len(a) >= n:
+        return a
+    return np.concatenate([a, np.zeros(n - len(a), dtype=a.dtype)])
+
+
+def _claves_estado(estado):
+    """Columnas del estado como claves de np.lexsort (la primera columna pesa mas)."""
+    return tuple(estado[:, j] for j in reversed(range(estado.shape[1])))
+
+
+class Acumulador:
+    def __init__(self, bins=50, rango=(-100.0, 100.0), top_k=5):
+        self.bins = bins
+        self.rango = (float(rango[0]), float(rango[1]))
+        self.top_k = top_k
+        self.grupos, self._grupo = _grupo_de_accion()
+        self.filas = 0
+        # Resumen general sobre los valores distintos de cero (igual que analyze_q_table)
+        self.ceros = 0
+        self.suma_nz = 0.0
+        self.min_nz = np.inf
+        self.max_nz = -np.inf
+        # Por accion: conteo, ceros, suma, suma de cuadrados, min, max
+        self.a_count = np.zeros(N_ACCIONES, dtype=np.int64)
+        self.a_ceros = np.zeros(N_ACCIONES, dtype=np.int64)
+        self.a_suma = np.zeros(N_ACCIONES)
+        self.a_suma2 = np.zeros(N_ACCIONES)
+        self.a_min = np.full(N_ACCIONES, np.inf)
+        self.a_max = np.full(N_ACCIONES, -np.inf)
+        # Histograma por grupo: [debajo del rango, bins..., encima del rango]
+        self.hist = np.zeros((len(self.grupos) + 1, bins + 2), dtype=np.int64)
+        # Marginales por campo: conteo, distintos de cero y suma de Q por valor del campo
+        self.m_count = [np.zeros(0, dtype=np.int64) for _ in CAMPOS_ESTADO]
+        self.m_nz = [np.zeros(0, dtype=np.int64) for _ in CAMPOS_ESTADO]
+        self.m_suma = [np.zeros(0) for _ in CAMPOS_ESTADO]
+        # Top-k por accion (a lo sumo top_k filas por accion)
+        self.t_q = np.zeros(0, dtype=np.float32)
+        self.t_accion = np.zeros(0, dtype=np.int8)
+        self.t_estado = np.zeros((0, len(CAMPOS_ESTADO)), dtype=np.int16)
+
+    def procesar(self, chunk):
+        q = chunk["q"].astype(np.float64)
+        accion = chunk["accion"].astype(np.int64)
+        estado = chunk["estado"]
+        if len(q) == 0:
+            return
+        self.filas += len(q)
+
+        nz = q != 0
+        self.ceros += int(len(q) - nz.sum())
+        if nz.any():
+            q_nz = q[nz]
+            self.suma_nz += float(q_nz.sum())
+            self.min_nz = min(self.min_nz, float(q_nz.min()))
+            self.max_nz = max(self.max_nz, float(q_nz.max()))
+
+        self.a_count += np.bincount(accion, minlength=N_ACCIONES)
+        self.a_ceros += np.bincount(accion[~nz], minlength=N_ACCIONES)
+        self.a_suma += np.bincount(accion, weights=q, minlength=N_ACCIONES)
+        self.a_suma2 += np.bincount(accion, weights=q * q, minlength=N_ACCIONES)
+        np.minimum.at(self.a_min, accion, q)
+        np.maximum.at(self.a_max, accion, q)
+
+        lo, hi = self.rango
+        idx = np.floor((q - lo) / (hi - lo) * self.bins).astype(np.int64) + 1
+        idx = np.clip(idx, 0, self.bins + 1)
+        # q == hi cae en el ultimo bin (como np.histogram), no afuera
+        idx[(q == hi)] = self.bins
+        ancho = self.bins + 2
+        self.hist += np.bincount(self._grupo[accion] * ancho + idx, minlength=self.hist.size).reshape(
+            self.hist.shape
+        )
+
+        for j in range(len(CAMPOS_ESTADO)):
+            col = estado[:, j].astype(np.int64)
+            n = int(col.max()) + 1
+            self.m_count[j] = _pad(self.m_count[j], n)
+            self.m_nz[j] = _pad(self.m_nz[j], n)
+            self.m_suma[j] = _pad(self.m_suma[j], n)
+            self.m_count[j][:n] += np.bincount(col, minlength=n)
+            self.m_nz[j][:n] += np.bincount(col[nz], minlength=n)
+            self.m_suma[j][:n] += np.bincount(col, weights=q, minlength=n)
+
+        self._fusionar_top(chunk["q"], chunk["accion"], estado)
+
+    def _fusionar_top(self, q, accion, estado):
+        q = np.concatenate([self.t_q, q])
+        accion = np.concatenate([self.t_accion, accion])
+        estado = np.concatenate([self.t_estado, estado])
+        # Orden por accion, Q descendente y fila de estado (desempate, para que el
+        # resultado no dependa del orden de los chunks); quedan las primeras top_k de cada accion
+        orden = np.lexsort(_claves_estado(estado) + (-q, accion))
+        accion_ord = accion[orden]
+        inicio = np.searchsorted(accion_ord, accion_ord, side="left")
+        keep = orden[np.arange(len(orden)) - inicio < self.top_k]
+        self.t_q, self.t_accion, self.t_estado = q[keep], accion[keep], estado[keep]
+
+    def fusionar(self, otro):
+        self.filas += otro.filas
+        self.ceros += otro.ceros
+        self.suma_nz += otro.suma_nz
+        self.min_nz = min(self.min_nz, otro.min_nz)
+        self.max_nz = max(self.max_nz, otro.max_nz)
+        self.a_count += otro.a_count
+        self.a_ceros += otro.a_ceros
+        self.a_suma += otro.a_suma
+        self.a_suma2 += otro.a_suma2
+        self.a_min = np.minimum(self.a_min, otro.a_min)
+        self.a_max = np.maximum(self.a_max, otro.a_max)
+        self.hist += otro.hist
+        for j in range(len(CAMPOS_ESTADO)):
+            n = max(len(self.m_count[j]), len(otro.m_count[j]))
+            self.m_count[j] = _pad(self.m_count[j], n) + _pad(otro.m_count[j], n)
+            self.m_nz[j] = _pad(self.m_nz[j], n) + _pad(otro.m_nz[j], n)
+            self.m_suma[j] = _pad(self.m_suma[j], n) + _pad(otro.m_suma[j], n)
+        self._fusionar_top(otro.t_q, otro.t_accion, otro.t_estado)
+        return self
+
+    def _top(self, filas):
+        return [
+            {"q": float(self.t_q[i]), "accion": Acciones(int(self.t_accion[i])).name, "estado": self.t_estado[i].tolist()}
+            for i in filas
+        ]
+
+    def reporte(self):
+        nonzero = self.filas - self.ceros
+        por_accion = {}
+        for a in np.flatnonzero(self.a_count):
+            n = int(self.a_count[a])
+            media = self.a_suma[a] / n
+            por_accion[Acciones(int(a)).name] = {
+                "count": n,
+                "zero_count": int(self.a_ceros[a]),
+                "nonzero_count": n - int(self.a_ceros[a]),
+                "min": float(self.a_min[a]),
+                "max": float(self.a_max[a]),
+                "avg": float(media),
+                "std": float(np.sqrt(max(self.a_suma2[a] / n - media * media, 0.0))),
+            }
+
+        por_grupo, histogramas = {}, {}
+        for g, nombre in enumerate(self.grupos):
+            acciones = np.flatnonzero(self._grupo == g)
+            n = int(self.a_count[acciones].sum())
+            ceros = int(self.a_ceros[acciones].sum())
+            por_grupo[nombre] = {
+                "count": n,
+                "zero_count": ceros,
+                "nonzero_count": n - ceros,
+                "min": float(self.a_min[acciones].min()) if n else 0,
+                "max": float(self.a_max[acciones].max()) if n else 0,
+                "avg": float(self.a_suma[acciones].sum() / n) if n else 0,
+            }
+            histogramas[nombre] = {
+                "conteos": self.hist[g, 1:-1].tolist(),
+                "debajo": int(self.hist[g, 0]),
+                "encima": int(self.hist[g, -1]),
+            }
+
+        marginales = {}
+        for j, campo in enumerate(CAMPOS_ESTADO):
+            marginales[campo] = {
+                str(v): {
+                    "count": int(self.m_count[j][v]),
+                    "nonzero_count": int(self.m_nz[j][v]),
+                    "avg": float(self.m_suma[j][v] / self.m_count[j][v]),
+                }
+                for v in np.flatnonzero(self.m_count[j])
+            }
+
+        top = {}
+        for a in np.unique(self.t_accion):
+            # t_* ya esta ordenado por (accion, -q, estado)
+            top[Acciones(int(a)).name] = self._top(np.flatnonzero(self.t_accion == a))
+        top_global = self._top(np.lexsort(_claves_estado(self.t_estado) + (self.t_accion, -self.t_q))[: self.top_k])
+
+        return {
+            "resumen": {
+                "total": self.filas,
+                "zero_count": self.ceros,
+                "nonzero_count": nonzero,
+                "min_nonzero": float(self.min_nz) if nonzero else 0,
+                "max_nonzero": float(self.max_nz) if nonzero else 0,
+                "avg_nonzero": self.suma_nz / nonzero if nonzero else 0,
+            },
+            "por_accion": por_accion,
+            "por_grupo": por_grupo,
+            "histogramas": {
+                "bordes": np.linspace(self.rango[0], self.rango[1], self.bins + 1).tolist(),
+                "grupos": histogramas,
+            },
+            "campos_estado": CAMPOS_ESTADO,
+            "marginales": marginales,
+            "top_por_accion": top,
+            "top_global": top_global,
+        }
+
+
+def _analizar_shard(args):
+    path, shard, chunk_rows, bins, rango, top_k = args
+    acc = Acumulador(bins, rango, top_k)
+    for chunk in iter_chunks_shard(path, shard, chunk_rows):
+        acc.procesar(chunk)
+    return acc
+
+
+def analizar(fuente, workers=1, chunk_rows=262144, bins=50, rango=(-100.0, 100.0), top_k=5):
+    """
+    `fuente` es un directorio de shards (q_table_columnar) o un .pkl. Con shards
+    cada worker procesa shards completos; con un pickle la lectura es secuencial.
+    """
+    if os.path.isdir(fuente):
+        shards = read_manifest(fuente)["shards"]
+        tareas = [(fuente, shard, chunk_rows, bins, rango, top_k) for shard in shards]
+        if workers > 1 and len(tareas) > 1:
+            ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+            with ctx.Pool(min(workers, len(tareas))) as pool:
+                parciales = pool.imap_unordered(_analizar_shard, tareas)
+                acc = Acumulador(bins, rango, top_k)
+                for parcial in parciales:
+                    acc.fusionar(parcial)
+        else:
+            acc = Acumulador(bins, rango, top_k)
+            for tarea in tareas:
+                acc.fusionar(_analizar_shard(tarea))
+    else:
+        acc = Acumulador(bins, rango, top_k)
+        for chunk in iter_chunks_dict(cargar_pickle(fuente), chunk_rows):
+            acc.procesar(chunk)
+    return acc.reporte()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analisis en streaming de la Q-table (salida JSON).")
+    parser.add_argument(
+        "fuente",
+        nargs="?",
+        default=QTABLE_PATH,
+        help=f"Q-table .pkl o directorio de shards con {MANIFEST_NAME} (ver q_table_columnar.py).",
+    )
+    parser.add_argument("--json", default=None, help="Archivo de salida (por defecto stdout).")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos en paralelo (solo con shards).")
+    parser.add_argument("--chunk-rows", type=int, default=262144, help="Filas por chunk en memoria.")
+    parser.add_argument("--bins", type=int, default=50, help="Bins de los histogramas.")
+    parser.add_argument("--rango", type=float, nargs=2, default=(-100.0, 100.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--top-k", type=int, default=5, help="Valores mas altos por accion.")
+    args = parser.parse_args()
+
+    reporte = analizar(args.fuente, args.workers, args.chunk_rows, args.bins, tuple(args.rango), args.top_k)
+    reporte["fuente"] = os.path.abspath(args.fuente)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2)
+        print("Resumen general")
+        for k, v in reporte["resumen"].items():
+            print(f"- {k}: {v}")
+        print(f"Reporte en {args.json}")
+    else:
+        json.dump(reporte, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+RL_DIR = os.path.dirname(os.path.abspath(__file__))
+if RL_DIR not in sys.path:
+    sys.path.insert(0, RL_DIR)
+
+from truco_env import TrucoEnv
+from truco_logic import MODO_TRUSTED
+from agent_matchup import _play_game
+from agents.registry import create_agent
+import checkpoints
+from entrenadores import ENTRENADORES, cargar
+
+
+# =============================================================================
+# BARRIDO DE HIPERPARAMETROS CON PODA (ASHA)
+# Cada trial muestrea una configuracion del espacio de busqueda y corre el
+# train() de un trainer (adaptadores de entrenadores.py) con el presupuesto
+# completo (episodios, manos o pasos) en un proceso del pool. El gancho de poda es un CheckpointManager:
+# en los escalones r, r*eta, r*eta^2, ... < presupuesto el trainer le pasa su
+# estado, se arma el agente greedy, se juega un set fijo de partidas
+# sembradas contra el rival de referencia y el trial sigue solo si queda en
+# el mejor 1/eta de los que ya llegaron a ese escalon (successive halving
+# asincronico: nadie espera a nadie). Si no, guardar() levanta Podado y el
+# trial corta ahi. El tiempo de evaluacion no cuenta para el throughput.
+# =============================================================================
+
+
+class Podado(Exception):
+    """El trial quedo fuera del mejor 1/eta en un escalon."""
+
+
+_Q_TABULAR = {
+    "alpha": {"log": [0.02, 0.5]},
+    "gamma": [0.9, 0.95, 1.0],
+    "epsilon": {"uniforme": [0.1, 0.9]},
+    "update_mode": "mc",
+    "lam": 0.8,
+}
+_PG = {
+    "gamma": [0.9, 0.95, 0.99],
+    "lr_policy": {"log": [1e-4, 1e-2]},
+    "lr_value": {"log": [1e-4, 1e-2]},
+    "clip_eps": [0.1, 0.2, 0.3],
+    "epochs": [1, 2, 4, 8],
+}
+
+ESPACIOS = {
+    # nombre del trainer (ver entrenadores.py): espacio de busqueda por defecto
+    "q_learning": dict(_Q_TABULAR),
+    "q_learning_vs_agent": dict(_Q_TABULAR, opponent="rational"),
+    "q_linear": {
+        "alpha": {"log": [0.02, 0.5]},
+        "gamma": [0.9, 0.95, 1.0],
+        "epsilon": {"uniforme": [0.1, 0.9]},
+        "batch": [128, 512, 2048],
+        "features": 1 << 16,
+        "opponent": "rational",
+    },
+    "dqn": {
+        "lr": {"log": [1e-4, 3e-3]},
+        "gamma": [0.95, 0.99],
+        "epsilon": 1.0,
+        "exploracion": [0.3, 0.5, 0.7],
+        "batch": [64, 256],
+        "n_envs": 16,
+        "aprender_desde": 2_000,
+        "target_cada": [500, 2_000],
+        "dueling": [True, False],
+        "hidden_size": [64, 128],
+        "opponent": "rational",
+    },
+    "policy_gradient": dict(_PG),
+    "policy_gradient_nn": dict(_PG),
+}
+
+
+# -----------------------------------------------------------------------------
+# Espacio de busqueda
+# -----------------------------------------------------------------------------
+
+
+def muestrear(espacio, rng):
+    """
+    Una configuracion del espacio. Cada parametro es un valor fijo, una lista
+    (se elige uno), {"uniforme": [a, b]}, {"log": [a, b]} o {"entero": [a, b]}.
+    """
+    hp = {}
+    for nombre, dominio in espacio.items():
+        if isinstance(dominio, list):
+            hp[nombre] = dominio[rng.randrange(len(dominio))]
+        elif isinstance(dominio, dict):
+            (tipo, (a, b)), = dominio.items()
+            if tipo == "uniforme":
+                hp[nombre] = rng.uniform(a, b)
+            elif tipo == "log":
+                hp[nombre] = math.exp(rng.uniform(math.log(a), math.log(b)))
+            elif tipo == "entero":
+                hp[nombre] = rng.randint(a, b)
+            else:
+                raise ValueError(f"{nombre}: dominio desconocido {tipo!r} (uniforme, log o entero).")
+        else:
+            hp[nombre] = dominio
+    return hp
+
+
+def escalones(minimo, presupuesto, eta):
+    """Unidades en las que se evalua y se decide la poda: minimo * eta^k < presupuesto."""
+    if minimo <= 0 or minimo >= presupuesto:
+        return []
+    n = int(math.log(presupuesto / minimo, eta) + 0.05)
+    return [int(round(minimo * eta ** k)) for k in range(n)]
+
+
+# -----------------------------------------------------------------------------
+# Evaluacion y poda
+# -----------------------------------------------------------------------------
+
+
+def evaluar(agent, rival, partidas, seed=10**6):
+    """
+    Winrate y diferencia de puntos media de `agent` contra `rival` en
+    partidas sembradas, alternando asiento. Siempre las mismas manos.
+    """
+    env = TrucoEnv(modo=MODO_TRUSTED)
+    ganadas = 0
+    diferencia = 0
+    for n in range(partidas):
+        # _play_game hace env.reset() sin seed: sembrar el motor antes deja el reparto fijo
+        env.logic.sembrar(seed + n)
+        asiento = n % 2
+        agentes = (agent, rival) if asiento == 0 else (rival, agent)
+        resultado = _play_game(env, *agentes)
+        puntos = (resultado["points_j0"], resultado["points_j1"])
+        ganadas += resultado["winner"] == f"J{asiento}"
+        diferencia += puntos[asiento] - puntos[1 - asiento]
+    return {"winrate": ganadas / partidas, "dif_puntos": diferencia / partidas}
+
+
+class Coordinador:
+    """Resultados por escalon compartidos entre trials (dict y lock de un Manager si hay pool)."""
+
+    def __init__(self, eta, registro=None, lock=None):
+        self.eta = eta
+        self.registro = {} if registro is None else registro
+        self.lock = threading.Lock() if lock is None else lock
+
+    def reportar(self, escalon, valor):
+        """
+        Anota `valor` (winrate, dif_puntos) en el escalon y dice si el trial
+        sigue: mejor 1/eta de los que llegaron hasta ahora. Con menos de eta
+        resultados alcanza con ser el mejor.
+        """
+        with self.lock:
+            valores = self.registro.get(escalon, []) + [valor]
+            self.registro[escalon] = valores
+        k = max(1, len(valores) // self.eta)
+        return valor >= sorted(valores, reverse=True)[k - 1]
+
+
+class GanchoPoda(checkpoints.CheckpointManager):
+    """
+    CheckpointManager que no escribe nada: en cada escalon evalua el estado
+    que le pasa el trainer y levanta Podado si el trial no promueve.
+    """
+
+    def __init__(self, escalones_, evaluar_estado, coordinador, unidad):
+        super().__init__(None, "barrido", unidad=unidad)
+        self.escalones = escalones_
+        self.evaluar_estado = evaluar_estado
+        self.coordinador = coordinador
+        self.siguiente = 0
+        self.historial = []
+        self.t_eval = 0.0
+
+    def reanudar(self):
+        return None
+
+    def toca(self, unidades):
+        return self.siguiente < len(self.escalones) and unidades >= self.escalones[self.siguiente]
+
+    def guardar(self, estado, unidades, **meta):
+        t0 = time.perf_counter()
+        resultado = self.evaluar_estado(estado)
+        self.t_eval += time.perf_counter() - t0
+        sigue = self.coordinador.reportar(self.siguiente, (resultado["winrate"], resultado["dif_puntos"]))
+        self.historial.append(dict(resultado, unidades=unidades, escalon=self.siguiente))
+        self.siguiente += 1
+        if not sigue:
+            raise Podado(unidades)
+
+    def esperar(self):
+        pass
+
+
+def _trial(tarea):
+    trial_id, entrenador, hp, presupuesto, escalones_, rival, eval_partidas, salida, coordinador = tarea
+    config = ENTRENADORES[entrenador]
+    modulo = cargar(entrenador)
+    checkpoints.sembrar(hp["seed"])
+    rival_agent = create_agent(rival)
+    gancho = GanchoPoda(
+        escalones_,
+        lambda estado: evaluar(config["agente"](modulo, estado), rival_agent, eval_partidas),
+        coordinador,
+        config["unidad"],
+    )
+    resultado = {"trial": trial_id, "hp": hp, "estado": "completo", "unidades": presupuesto}
+    log_path = os.path.join(salida, f"trial_{trial_id:03d}.log")
+    with tempfile.TemporaryDirectory() as tmp_dir, open(log_path, "w", encoding="utf-8") as log:
+        t0 = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(log):
+                config["entrenar"](modulo, tmp_dir, presupuesto, hp, gancho)
+        except Podado as podado:
+            resultado["estado"] = "podado"
+            resultado["unidades"] = podado.args[0]
+        except Exception as exc:
+            resultado["estado"] = "error"
+            resultado["error"] = repr(exc)
+            resultado["unidades"] = gancho.historial[-1]["unidades"] if gancho.historial else 0
+        segundos = time.perf_counter() - t0 - gancho.t_eval
+        if resultado["estado"] == "completo":
+            resultado.update(evaluar(config["final"](tmp_dir), rival_agent, eval_partidas))
+        elif gancho.historial:
+            resultado["winrate"] = gancho.historial[-1]["winrate"]
+            resultado["dif_puntos"] = gancho.historial[-1]["dif_puntos"]
+    resultado["segundos"] = segundos
+    resultado["throughput"] = resultado["unidades"] / segundos if segundos > 0 else None
+    resultado["escalones"] = gancho.historial
+    return resultado
+
+
+def barrer(
+    entrenador,
+    trials,
+    presupuesto,
+    minimo=None,
+    eta=3,
+    espacio=None,
+    rival="rational",
+    eval_partidas=100,
+    seed=0,
+    workers=None,
+    salida=None,
+):
+    """Corre `trials` configuraciones con poda ASHA y devuelve un resultado por trial."""
+    config = ENTRENADORES[entrenador]
+    espacio = dict(ESPACIOS[entrenador], **(espacio or {}))
+    if minimo is None:
+        minimo = max(1, presupuesto // (eta * eta))
+    escalones_ = escalones(minimo, presupuesto, eta)
+    salida = salida or os.path.abspath(
+        os.path.join(GAME_DIR, "..", "resultados", "barridos", f"{entrenador}_{time.strftime('%Y%m%d_%H%M%S')}")
+    )
+    os.makedirs(salida, exist_ok=True)
+
+    rng = random.Random(seed)
+    configs = [dict({"seed": seed + i}, **muestrear(espacio, rng)) for i in range(trials)]
+    print(f"{entrenador}: {trials} trials, presupuesto={presupuesto} {config['unidad']}, escalones={escalones_}, eta={eta}")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, trials))
+    resultados = []
+    if workers > 1:
+        ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+        with ctx.Manager() as manager:
+            coordinador = Coordinador(eta, manager.dict(), manager.Lock())
+            tareas = [
+                (i, entrenador, hp, presupuesto, escalones_, rival, eval_partidas, salida, coordinador)
+                for i, hp in enumerate(configs)
+            ]
+            with ctx.Pool(workers, maxtasksperchild=1) as pool:
+                for r in pool.imap_unordered(_trial, tareas):
+                    _progreso(r, config["unidad"])
+                    resultados.append(r)
+    else:
+        coordinador = Coordinador(eta)
+        for i, hp in enumerate(configs):
+            r = _trial((i, entrenador, hp, presupuesto, escalones_, rival, eval_partidas, salida, coordinador))
+            _progreso(r, config["unidad"])
+            resultados.append(r)
+    return sorted(resultados, key=_orden), salida
+
+
+def _orden(r):
+    # Completos primero, despues los que llegaron mas lejos; dentro de cada grupo, por winrate
+    return (r["estado"] != "completo", -r["unidades"], -r.get("winrate", -1.0), -r.get("dif_puntos", -30.0))
+
+
+def _progreso(r, unidad):
+    winrate = f"{r['winrate']:.3f}" if "winrate" in r else "-"
+    extra = f" ({r['error']})" if "error" in r else ""
+    print(f"  trial {r['trial']:03d} {r['estado']} en {r['unidades']} {unidad} | winrate={winrate}{extra}")
+
+
+def tabla(resultados, unidad):
+    filas = []
+    for r in resultados:
+        hp = " ".join(
+            f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in sorted(r["hp"].items())
+        )
+        filas.append(
+            f"{r['trial']:>5} {r['estado']:>9} {r['unidades']:>9} "
+            f"{(r['throughput'] or 0):>10.1f} {r.get('winrate', float('nan')):>8.3f} "
+            f"{r.get('dif_puntos', float('nan')):>7.2f}  {hp}"
+        )
+    encabezado = f"{'trial':>5} {'estado':>9} {unidad:>9} {unidad[:5] + '/s':>10} {'winrate':>8} {'dif':>7}  hiperparametros"
+    return "\n".join([encabezado, "-" * len(encabezado)] + filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Barrido de hiperparametros en paralelo con poda por successive halving (ASHA)."
+    )
+    parser.add_argument("entrenador", choices=sorted(ENTRENADORES), help="Trainer a barrer.")
+    parser.add_argument("--trials", type=int, default=9, help="Configuraciones a probar.")
+    parser.add_argument(
+        "--presupuesto",
+        type=int,
+        required=True,
+        help="Presupuesto maximo por trial (episodios, manos o pasos segun el trainer).",
+    )
+    parser.add_argument(
+        "--minimo",
+        type=int,
+        default=None,
+        help="Primer escalon de poda (por defecto presupuesto/eta^2).",
+    )
+    parser.add_argument("--eta", type=int, default=3, help="Factor de reduccion: sigue el mejor 1/eta por escalon.")
+    parser.add_argument(
+        "--espacio",
+        default=None,
+        help="JSON {parametro: valor | lista | {uniforme|log|entero: [a, b]}} que pisa el espacio por defecto.",
+    )
+    parser.add_argument("--rival", default="rational", help="Agente de referencia de las evaluaciones.")
+    parser.add_argument("--eval-partidas", type=int, default=100, help="Partidas sembradas por evaluacion.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed del muestreo de configuraciones.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, uno por core).")
+    parser.add_argument("--salida", default=None, help="Directorio de logs por trial y del reporte.")
+    parser.add_argument("--json", default=None, help="Guarda el reporte en este archivo (por defecto en --salida).")
+    args = parser.parse_args()
+
+    espacio = None
+    if args.espacio:
+        with open(args.espacio, "r", encoding="utf-8") as f:
+            espacio = json.load(f)
+
+    resultados, salida = barrer(
+        args.entrenador,
+        args.trials,
+        args.presupuesto,
+        args.minimo,
+        args.eta,
+        espacio,
+        args.rival,
+        args.eval_partidas,
+        args.seed,
+        args.workers,
+        args.salida,
+    )
+    print()
+    print(tabla(resultados, ENTRENADORES[args.entrenador]["unidad"]))
+
+    json_path = args.json or os.path.join(salida, "reporte.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "resultados": resultados}, f, indent=2, default=str)
+    print(f"\nReporte en {json_path} (logs por trial en {salida})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import importlib
+import os
+import sys
+import tempfile
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+RL_DIR = os.path.dirname(os.path.abspath(__file__))
+if RL_DIR not in sys.path:
+    sys.path.insert(0, RL_DIR)
+
+
+# =============================================================================
+# ADAPTADORES DE LOS TRAINERS
+# Una forma comun de correr el train() de cada trainer desde otro script
+# (barrido de hiperparametros, benchmarks): el modelo va al directorio que se
+# pasa (model_path), sin tocar los paths por defecto de los modulos.
+# - entrenar(modulo, directorio, presupuesto, hp, checkpoint=None)
+# - agente(modulo, estado del checkpoint): agente greedy armado del estado
+# - final(directorio): agente con el modelo que dejo entrenar()
+# Los agentes armados desde el estado reciben un path que no existe, para que
+# no carguen ningun modelo del disco antes de pisarles los pesos.
+# =============================================================================
+
+
+_SIN_MODELO = os.path.join(tempfile.gettempdir(), "entrenadores_sin_modelo", "modelo")
+
+
+def cargar(nombre):
+    """Modulo del trainer `nombre` (clave de ENTRENADORES)."""
+    return importlib.import_module(ENTRENADORES[nombre]["modulo"])
+
+
+def _agente_q(modulo, estado):
+    from agent_q_learning import QLearningAgent
+    from q_lambda import TablaQ
+
+    agent = QLearningAgent(q_table_path=_SIN_MODELO)
+    agent.q_table = estado["q_table"] if estado["tabla"] is None else TablaQ.desde_estado(estado["tabla"]).a_dict()
+    return agent
+
+
+def _final_q(directorio):
+    from agent_q_learning import QLearningAgent
+
+    return QLearningAgent(q_table_path=os.path.join(directorio, "q_table.pkl"))
+
+
+def _entrenar_q_learning(modulo, directorio, presupuesto, hp, checkpoint=None):
+    modulo.train(
+        presupuesto, hp["alpha"], hp["gamma"], hp["epsilon"],
+        update_mode=hp["update_mode"], lam=hp["lam"], checkpoint=checkpoint,
+        seed=hp["seed"], model_path=os.path.join(directorio, "q_table.pkl"),
+    )
+
+
+def _entrenar_q_learning_vs_agent(modulo, directorio, presupuesto, hp, checkpoint=None):
+    modulo.train(
+        presupuesto, hp["alpha"], hp["gamma"], hp["epsilon"], True, hp["opponent"], 0,
+        update_mode=hp["update_mode"], lam=hp["lam"], checkpoint=checkpoint,
+        seed=hp["seed"], model_path=os.path.join(directorio, "q_table.pkl"),
+    )
+
+
+def _entrenar_q_linear(modulo, directorio, presupuesto, hp, checkpoint=None):
+    modulo.train(
+        presupuesto, hp["alpha"], hp["gamma"], hp["epsilon"], True, hp["opponent"], 0,
+        n_features=hp["features"], batch=hp["batch"], checkpoint=checkpoint,
+        seed=hp["seed"], model_path=os.path.join(directorio, "q_linear.pkl"),
+    )
+
+
+def _agente_q_linear(modulo, estado):
+    agent = modulo.QLinearAgent(model_path=_SIN_MODELO, n_features=estado["W"].shape[0])
+    agent.W = estado["W"]
+    return agent
+
+
+def _final_q_linear(directorio):
+    from agent_q_linear import QLinearAgent
+
+    return QLinearAgent(model_path=os.path.join(directorio, "q_linear.pkl"))
+
+
+def _entrenar_dqn(modulo, directorio, presupuesto, hp, checkpoint=None):
+    modulo.train(
+        presupuesto, hp["lr"], hp["gamma"], hp["epsilon"], True, hp["opponent"],
+        n_envs=hp["n_envs"], exploracion=hp["exploracion"], batch=hp["batch"],
+        aprender_desde=min(hp["aprender_desde"], presupuesto // 2), target_cada=hp["target_cada"],
+        dueling=hp["dueling"], hidden_size=hp["hidden_size"], seed=hp["seed"], checkpoint=checkpoint,
+        model_path=os.path.join(directorio, "dqn.npz"),
+    )
+
+
+def _agente_dqn(modulo, estado):
+    red = modulo.RedQ(hidden_size=estado["hidden_size"], dueling=estado["dueling"])
+    red.load_state_dict(estado["red"])
+    return modulo.DQNAgent(pesos=red.exportar(), dueling=estado["dueling"])
+
+
+def _final_dqn(directorio):
+    from agent_dqn import DQNAgent
+
+    return DQNAgent(model_path=os.path.join(directorio, "dqn.npz"))
+
+
+def _entrenar_policy_gradient(modulo, directorio, presupuesto, hp, checkpoint=None):
+    modulo.train(
+        presupuesto, hp["gamma"], hp["lr_policy"], hp["lr_value"], hp["clip_eps"], hp["epochs"], True,
+        checkpoint=checkpoint, seed=hp["seed"], model_path=os.path.join(directorio, "policy.pkl"),
+    )
+
+
+def _agente_policy_gradient(modulo, estado):
+    agent = modulo.PolicyGradientAgent(model_path=_SIN_MODELO)
+    agent.Wp, agent.bp, agent.Wv, agent.bv = estado["pesos"]
+    return agent
+
+
+def _final_policy_gradient(directorio):
+    from agent_policy_gradient import PolicyGradientAgent
+
+    return PolicyGradientAgent(model_path=os.path.join(directorio, "policy.pkl"))
+
+
+def _entrenar_policy_gradient_nn(modulo, directorio, presupuesto, hp, checkpoint=None):
+    modulo.train(
+        presupuesto, hp["gamma"], hp["lr_policy"], hp["lr_value"], hp["clip_eps"], hp["epochs"], True,
+        checkpoint=checkpoint, seed=hp["seed"], model_path=os.path.join(directorio, "policy_nn.pt"),
+    )
+
+
+def _agente_policy_gradient_nn(modulo, estado):
+    agent = modulo.PolicyGradientNNAgent(model_path=_SIN_MODELO)
+    agent.model.load_state_dict(estado["model"])
+    return agent
+
+
+def _final_policy_gradient_nn(directorio):
+    from agent_policiy_gradient_nn import PolicyGradientNNAgent
+
+    return PolicyGradientNNAgent(model_path=os.path.join(directorio, "policy_nn.pt"))
+
+
+ENTRENADORES = {
+    # nombre: modulo del trainer, unidad y adaptadores
+    "q_learning": {
+        "modulo": "train_q_learning",
+        "unidad": "episodios",
+        "entrenar": _entrenar_q_learning,
+        "agente": _agente_q,
+        "final": _final_q,
+    },
+    "q_learning_vs_agent": {
+        "modulo": "train_q_learning_vs_agent",
+        "unidad": "episodios",
+        "entrenar": _entrenar_q_learning_vs_agent,
+        "agente": _agente_q,
+        "final": _final_q,
+    },
+    "q_linear": {
+        "modulo": "train_q_linear",
+        "unidad": "episodios",
+        "entrenar": _entrenar_q_linear,
+        "agente": _agente_q_linear,
+        "final": _final_q_linear,
+    },
+    "dqn": {
+        "modulo": "train_dqn",
+        "unidad": "pasos",
+        "entrenar": _entrenar_dqn,
+        "agente": _agente_dqn,
+        "final": _final_dqn,
+    },
+    "policy_gradient": {
+        "modulo": "train_policy_gradient",
+        "unidad": "manos",
+        "entrenar": _entrenar_policy_gradient,
+        "agente": _agente_policy_gradient,
+        "final": _final_policy_gradient,
+    },
+    "policy_gradient_nn": {
+        "modulo": "train_policy_gradient_nn",
+        "unidad": "manos",
+        "entrenar": _entrenar_policy_gradient_nn,
+        "agente": _agente_policy_gradient_nn,
+        "final": _final_policy_gradient_nn,
+    },
+}
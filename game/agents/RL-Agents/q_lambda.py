@@ -0,0 +1,150 @@
+import random
+
+import numpy as np
+
+
+# =============================================================================
+# Q(lambda) DE WATKINS SOBRE UNA TABLA DENSA
+# - TablaQ: indice estado -> fila y una matriz (filas, 13) de Q que crece por
+#   duplicacion. Se guarda con el mismo formato de dict que el resto de los
+#   trainers ({(estado, accion): q}), solo con los pares visitados.
+# - TrayectoriaLambda: decisiones de un jugador dentro de una mano (fila,
+#   accion, mascara, si fue greedy) y la recompensa acumulada despues de cada
+#   una. Al cerrar la mano el backup completo es una sola operacion:
+#       delta_t = r_t + gamma * max_a Q(s_{t+1}, a) - Q(s_t, a_t)
+#       Q(s_t, a_t) += alpha * sum_j W[t, j] * delta_j
+#   con W[t, j] = (gamma * lambda)^(j - t) para t <= j < c(t), donde c(t) es
+#   la primera accion exploratoria despues de t (corte de trazas de Watkins).
+#   Con lambda=1 y todo greedy es el retorno Monte Carlo; con lambda=0, el
+#   Q-learning de un paso.
+# =============================================================================
+
+
+UPDATE_MODOS = ("mc", "lambda")
+
+
+def recompensa_paso(reward, terminado, estado):
+    """
+    Reward de TrucoEnv (perspectiva J0) en la escala del modo mc: sin el +-100
+    de fin de partida y dividido por 30 (rondas +-0.5, envido y truco en puntos).
+    """
+    if terminado:
+        reward -= 100 if estado.puntos_jugador >= 30 else -100
+    return reward / 30.0
+
+
+class TablaQ:
+    def __init__(self, n_acciones=13, capacidad=4096):
+        self.n_acciones = n_acciones
+        self.indice = {}
+        self.q = np.zeros((capacidad, n_acciones), dtype=np.float64)
+        self.visto = np.zeros((capacidad, n_acciones), dtype=bool)
+
+    @classmethod
+    def desde_dict(cls, q_table, n_acciones=13):
+        tabla = cls(n_acciones)
+        for (state, action), value in q_table.items():
+            f = tabla.fila(state)
+            tabla.q[f, action] = value
+            tabla.visto[f, action] = True
+        return tabla
+
+    def estado(self):
+        """Arrays e indice tal cual, para checkpoints.snapshot()."""
+        return {"indice": self.indice, "q": self.q, "visto": self.visto}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        tabla = cls(estado["q"].shape[1], capacidad=1)
+        tabla.indice, tabla.q, tabla.visto = estado["indice"], estado["q"], estado["visto"]
+        return tabla
+
+    def fila(self, state):
+        f = self.indice.get(state)
+        if f is None:
+            f = len(self.indice)
+            if f >= len(self.q):
+                self.q = np.concatenate([self.q, np.zeros_like(self.q)])
+                self.visto = np.concatenate([self.visto, np.zeros_like(self.visto)])
+            self.indice[state] = f
+        return f
+
+    def n_pares(self):
+        return int(self.visto[: len(self.indice)].sum())
+
+    def a_dict(self):
+        estados = list(self.indice)
+        filas, acciones = np.nonzero(self.visto[: len(estados)])
+        return {
+            (estados[f], a): float(self.q[f, a])
+            for f, a in zip(filas.tolist(), acciones.tolist())
+        }
+
+    def greedy(self, f, action_mask):
+        # Primer maximo entre las validas, igual que _epsilon_greedy sobre el dict
+        valid = np.flatnonzero(action_mask)
+        if valid.size == 0:
+            return None
+        return int(valid[np.argmax(self.q[f, valid])])
+
+    def elegir(self, f, action_mask, epsilon):
+        """(accion, fue_greedy) con epsilon-greedy."""
+        best = self.greedy(f, action_mask)
+        if best is None:
+            return None, True
+        if random.random() < epsilon:
+            action = random.choice([i for i, valid in enumerate(action_mask) if valid])
+            return action, action == best
+        return best, True
+
+
+class TrayectoriaLambda:
+    def __init__(self):
+        self.limpiar()
+
+    def limpiar(self):
+        self.filas = []
+        self.acciones = []
+        self.mascaras = []
+        self.greedy = []
+        self.recompensas = []
+
+    def __len__(self):
+        return len(self.filas)
+
+    def agregar(self, fila, accion, mascara, greedy):
+        self.filas.append(fila)
+        self.acciones.append(accion)
+        self.mascaras.append(mascara)
+        self.greedy.append(greedy)
+        self.recompensas.append(0.0)
+
+    def recompensa(self, r):
+        """Suma r a la ultima decision (recompensa entre esta decision y la siguiente)."""
+        if self.filas:
+            self.recompensas[-1] += r
+
+    def backup(self, tabla, alpha, gamma, lam):
+        T = len(self.filas)
+        if T == 0:
+            return
+        f = np.array(self.filas)
+        a = np.array(self.acciones)
+        r = np.array(self.recompensas)
+
+        siguiente = np.zeros(T)
+        if T > 1:
+            mascaras = np.array(self.mascaras[1:], dtype=bool)
+            siguiente[:-1] = np.where(mascaras, tabla.q[f[1:]], -np.inf).max(axis=1)
+        delta = r + gamma * siguiente - tabla.q[f, a]
+
+        # c(t): primera accion exploratoria con indice > t (T si no hay)
+        pasos = np.arange(T)
+        exploratoria = np.where(~np.array(self.greedy), pasos, T)
+        corte = np.append(np.minimum.accumulate(exploratoria[::-1])[::-1][1:], T)
+        dist = pasos[None, :] - pasos[:, None]
+        W = np.where((dist >= 0) & (pasos[None, :] < corte[:, None]), (gamma * lam) ** np.maximum(dist, 0), 0.0)
+
+        np.add.at(tabla.q, (f, a), alpha * (W @ delta))
+        tabla.visto[f, a] = True
+        self.limpiar()
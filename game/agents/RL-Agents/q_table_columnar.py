@@ -0,0 +1,170 @@
+import argparse
+import itertools
+import json
+import os
+import pickle
+
+import numpy as np
+
+
+# =============================================================================
+# Q-TABLE COLUMNAR
+# La Q-table de los trainers es un dict {(estado, accion): q} pickleado, donde
+# estado es la tupla de QLearningAgent.encode_state. Para analizarla sin
+# cargarla entera se exporta a un directorio de shards memory-mappeables
+# (mismo esquema que offline_dataset):
+#   manifest.json              -> campos del estado y filas por shard
+#   shard_000000/estado.npy    -> int16 (filas, len(CAMPOS_ESTADO)), estado aplanado
+#   shard_000000/accion.npy    -> int8 (filas,)
+#   shard_000000/q.npy         -> float32 (filas,)
+# =============================================================================
+
+CAMPOS_ESTADO = [
+    "rank_1",           # Ranks propios ordenados (0 = carta ya jugada)
+    "rank_2",
+    "rank_3",
+    "max_rival_mesa",
+    "mi_zona",
+    "rival_zona",
+    "voy_ganando",
+    "nivel_truco",
+    "estado_envido",
+    "soy_mano",
+    "ronda",
+]
+
+MANIFEST_NAME = "manifest.json"
+
+
+def aplanar_estado(state):
+    """Tupla de encode_state -> tupla plana de ints (orden de CAMPOS_ESTADO)."""
+    ranks = state[0]
+    return (ranks[0], ranks[1], ranks[2]) + tuple(state[1:])
+
+
+def reconstruir_estado(fila):
+    """Inversa de aplanar_estado."""
+    fila = [int(v) for v in fila]
+    return (tuple(fila[0:3]),) + tuple(fila[3:])
+
+
+def cargar_pickle(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe: {path}")
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def iter_chunks_dict(q_table, chunk_rows=262144):
+    """Recorre un dict en chunks columnares sin armar listas del tamano de la tabla."""
+    n_campos = len(CAMPOS_ESTADO)
+    estados = np.empty((chunk_rows, n_campos), dtype=np.int16)
+    acciones = np.empty(chunk_rows, dtype=np.int8)
+    q = np.empty(chunk_rows, dtype=np.float32)
+    items = iter(q_table.items())
+    while True:
+        n = 0
+        for (state, action), value in itertools.islice(items, chunk_rows):
+            estados[n] = aplanar_estado(state)
+            acciones[n] = action
+            q[n] = value
+            n += 1
+        if n == 0:
+            return
+        yield {"estado": estados[:n], "accion": acciones[:n], "q": q[:n]}
+        if n < chunk_rows:
+            return
+
+
+class TablaDensa:
+    """
+    Q-table densa: una fila por estado y una columna por accion.
+    `estados` (S, len(CAMPOS_ESTADO)) int16 ordenado lexicograficamente,
+    `q` (S, n_acciones) float32 y `visto` (S, n_acciones) bool con los pares
+    presentes en el dict (los ausentes valen 0, como en _get_q).
+    """
+
+    def __init__(self, estados, q, visto):
+        self.estados = estados
+        self.q = q
+        self.visto = visto
+
+    @classmethod
+    def desde_dict(cls, q_table, n_acciones=13, chunk_rows=262144):
+        # iter_chunks_dict reutiliza sus buffers: cada chunk se copia antes de seguir
+        chunks = [{name: col.copy() for name, col in c.items()} for c in iter_chunks_dict(q_table, chunk_rows)]
+        if not chunks:
+            return cls(
+                np.zeros((0, len(CAMPOS_ESTADO)), dtype=np.int16),
+                np.zeros((0, n_acciones), dtype=np.float32),
+                np.zeros((0, n_acciones), dtype=bool),
+            )
+        estados = np.concatenate([c["estado"] for c in chunks])
+        acciones = np.concatenate([c["accion"] for c in chunks])
+        valores = np.concatenate([c["q"] for c in chunks])
+        unicos, fila = np.unique(estados, axis=0, return_inverse=True)
+        fila = fila.reshape(-1)
+        q = np.zeros((len(unicos), n_acciones), dtype=np.float32)
+        visto = np.zeros((len(unicos), n_acciones), dtype=bool)
+        q[fila, acciones] = valores
+        visto[fila, acciones] = True
+        return cls(unicos, q, visto)
+
+    def __len__(self):
+        return len(self.estados)
+
+    def a_dict(self):
+        filas, acciones = np.nonzero(self.visto)
+        return {
+            (reconstruir_estado(self.estados[f]), int(a)): float(self.q[f, a])
+            for f, a in zip(filas.tolist(), acciones.tolist())
+        }
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def exportar(q_table, path, shard_rows=1 << 20):
+    """Escribe la Q-table (dict) como shards columnares en `path`."""
+    os.makedirs(path, exist_ok=True)
+    manifest = {"campos_estado": CAMPOS_ESTADO, "shards": []}
+    for i, chunk in enumerate(iter_chunks_dict(q_table, shard_rows)):
+        shard_dir = os.path.join(path, f"shard_{i:06d}")
+        os.makedirs(shard_dir, exist_ok=True)
+        for name, col in chunk.items():
+            np.save(os.path.join(shard_dir, f"{name}.npy"), col)
+        manifest["shards"].append({"dir": os.path.basename(shard_dir), "rows": int(len(chunk["q"]))})
+    tmp_path = os.path.join(path, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+    return manifest
+
+
+def abrir_shard(path, shard):
+    shard_dir = os.path.join(path, shard["dir"])
+    return {
+        name: np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode="r")
+        for name in ("estado", "accion", "q")
+    }
+
+
+def iter_chunks_shard(path, shard, chunk_rows=262144):
+    """Chunks de un shard leidos del mmap (solo `chunk_rows` filas en memoria)."""
+    data = abrir_shard(path, shard)
+    for start in range(0, shard["rows"], chunk_rows):
+        yield {name: np.asarray(col[start : start + chunk_rows]) for name, col in data.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta una Q-table pickleada a shards columnares.")
+    parser.add_argument("q_table", help="Q-table .pkl")
+    parser.add_argument("salida", help="Directorio de shards")
+    parser.add_argument("--shard-rows", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    manifest = exportar(cargar_pickle(args.q_table), args.salida, args.shard_rows)
+    filas = sum(s["rows"] for s in manifest["shards"])
+    print(f"Exportadas {filas} filas en {len(manifest['shards'])} shards -> {args.salida}")
@@ -0,0 +1,240 @@
+import argparse
+import glob
+import json
+import os
+import pickle
+import re
+import sys
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from checkpoints import DIR_CHECKPOINTS, escribir_atomico
+from q_table_columnar import TablaDensa, cargar_pickle
+
+
+# =============================================================================
+# CONVERGENCIA DE LA Q-TABLE
+# - Checkpoints versionados: q_table_ep<episodio>.pkl en un directorio, mas
+#   convergencia.jsonl con el diff contra el checkpoint anterior.
+# - diff() compara dos tablas densas (TablaDensa) alineando sus estados con
+#   un solo np.unique: estados nuevos, pares nuevos, cambio L-inf/L2 de los Q
+#   y tasa de desacuerdo de la politica greedy sobre los estados visitados
+#   (los que ya estaban en el checkpoint anterior).
+# - SeguimientoConvergencia lo usan los trainers para cortar solos cuando el
+#   desacuerdo queda por debajo de un umbral varios checkpoints seguidos.
+#   Los checkpoints versionados son la historia de la tabla (no rotan); para
+#   --resume, su estado (episodio del ultimo versionado y racha) viaja en el
+#   checkpoint de reanudacion de checkpoints.CheckpointManager.
+# =============================================================================
+
+LOG_NAME = "convergencia.jsonl"
+_PATRON_CHECKPOINT = re.compile(r"q_table_ep(\d+)\.pkl$")
+
+
+def _alinear(a, b):
+    """Lleva las dos tablas al mismo conjunto de filas (union de estados)."""
+    unicos, inv = np.unique(np.concatenate([a.estados, b.estados]), axis=0, return_inverse=True)
+    inv = inv.reshape(-1)
+    ia, ib = inv[: len(a)], inv[len(a):]
+    n_acciones = a.q.shape[1]
+    qa = np.zeros((len(unicos), n_acciones), dtype=np.float32)
+    qb = np.zeros_like(qa)
+    va = np.zeros((len(unicos), n_acciones), dtype=bool)
+    vb = np.zeros_like(va)
+    qa[ia], va[ia] = a.q, a.visto
+    qb[ib], vb[ib] = b.q, b.visto
+    en_a = np.zeros(len(unicos), dtype=bool)
+    en_b = np.zeros(len(unicos), dtype=bool)
+    en_a[ia] = True
+    en_b[ib] = True
+    return qa, qb, va, vb, en_a, en_b
+
+
+def _greedy(q, candidatas):
+    # Misma regla que el agente: el primer maximo entre las acciones conocidas
+    return np.where(candidatas, q, -np.inf).argmax(axis=1)
+
+
+def diff(a, b):
+    """Cambios de `a` (checkpoint anterior) a `b` (posterior)."""
+    qa, qb, va, vb, en_a, en_b = _alinear(a, b)
+    pares = va | vb
+    delta = (qb - qa)[pares].astype(np.float64)
+
+    # Politica greedy en los estados visitados de b, sobre las acciones vistas en cualquiera.
+    # `desacuerdo` se mide en los estados que ya estaban en a: en los nuevos la
+    # politica de a es la del Q por defecto y cambia casi siempre.
+    filas = en_b
+    candidatas = pares[filas]
+    desacuerdo = _greedy(qa[filas], candidatas) != _greedy(qb[filas], candidatas)
+    comunes = en_a[filas]
+
+    return {
+        "estados_a": int(en_a.sum()),
+        "estados_b": int(en_b.sum()),
+        "estados_nuevos": int((en_b & ~en_a).sum()),
+        "estados_perdidos": int((en_a & ~en_b).sum()),
+        "pares_nuevos": int((vb & ~va).sum()),
+        "linf": float(np.abs(delta).max()) if delta.size else 0.0,
+        "l2": float(np.sqrt(np.sum(delta * delta))),
+        "rms": float(np.sqrt(np.mean(delta * delta))) if delta.size else 0.0,
+        "desacuerdo": float(desacuerdo[comunes].mean()) if comunes.any() else 1.0,
+        "desacuerdo_todos": float(desacuerdo.mean()) if desacuerdo.size else 0.0,
+    }
+
+
+def checkpoint_path(directorio, episodio):
+    return os.path.join(directorio, f"q_table_ep{episodio:09d}.pkl")
+
+
+def guardar_checkpoint(q_table, directorio, episodio):
+    os.makedirs(directorio, exist_ok=True)
+    path = checkpoint_path(directorio, episodio)
+    escribir_atomico(path, lambda f: pickle.dump(q_table, f, protocol=pickle.HIGHEST_PROTOCOL))
+    return path
+
+
+def listar_checkpoints(directorio):
+    """[(episodio, path)] ordenados por episodio."""
+    out = []
+    for path in glob.glob(os.path.join(directorio, "q_table_ep*.pkl")):
+        match = _PATRON_CHECKPOINT.search(path)
+        if match:
+            out.append((int(match.group(1)), path))
+    return sorted(out)
+
+
+class SeguimientoConvergencia:
+    """
+    Cada `cada` episodios guarda un checkpoint, lo compara con el anterior y
+    avisa cuando el desacuerdo greedy estuvo por debajo de `umbral` en
+    `paciencia` diffs seguidos (umbral None: nunca corta).
+    """
+
+    def __init__(self, directorio, cada, umbral=None, paciencia=3):
+        self.directorio = directorio
+        self.cada = cada
+        self.umbral = umbral
+        self.paciencia = paciencia
+        self.previa = None
+        self.episodio_previa = None
+        self.racha = 0
+
+    def toca(self, episodio):
+        return episodio % self.cada == 0
+
+    def registrar(self, q_table, episodio):
+        guardar_checkpoint(q_table, self.directorio, episodio)
+        densa = TablaDensa.desde_dict(q_table)
+        previa, self.previa = self.previa, densa
+        self.episodio_previa = episodio
+        if previa is None:
+            return False
+        cambios = diff(previa, densa)
+        cambios["episodio"] = episodio
+        with open(os.path.join(self.directorio, LOG_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(cambios) + "\n")
+        print(
+            f"Checkpoint {episodio} | estados={cambios['estados_b']} (+{cambios['estados_nuevos']}) "
+            f"| linf={cambios['linf']:.4f} l2={cambios['l2']:.4f} | desacuerdo={cambios['desacuerdo']:.4f}"
+        )
+        if self.umbral is None:
+            return False
+        self.racha = self.racha + 1 if cambios["desacuerdo"] < self.umbral else 0
+        return self.racha >= self.paciencia
+
+    def estado(self):
+        """Para el checkpoint de reanudacion (la tabla previa se relee de su checkpoint versionado)."""
+        return {"episodio_previa": self.episodio_previa, "racha": self.racha}
+
+    def restaurar(self, estado):
+        self.racha = estado["racha"]
+        self.episodio_previa = estado["episodio_previa"]
+        self.previa = None
+        if self.episodio_previa is None:
+            return
+        path = checkpoint_path(self.directorio, self.episodio_previa)
+        if os.path.exists(path):
+            self.previa = TablaDensa.desde_dict(cargar_pickle(path))
+        else:
+            print(f"Aviso: no esta {path}; el primer diff despues de reanudar se pierde.")
+            self.racha = 0
+
+
+def agregar_argumentos(parser):
+    group = parser.add_argument_group("checkpoints y convergencia")
+    group.add_argument(
+        "--checkpoint-cada",
+        type=int,
+        default=0,
+        help="Episodios entre checkpoints versionados (0 = desactivado).",
+    )
+    group.add_argument(
+        "--checkpoint-dir",
+        default=os.path.join(DIR_CHECKPOINTS, "convergencia"),
+        help="Directorio de checkpoints y convergencia.jsonl (por defecto junto a los de --guardar-dir).",
+    )
+    group.add_argument(
+        "--stop-desacuerdo",
+        type=float,
+        default=None,
+        help="Corta cuando el desacuerdo greedy entre checkpoints queda por debajo de este valor.",
+    )
+    group.add_argument(
+        "--stop-paciencia",
+        type=int,
+        default=3,
+        help="Checkpoints seguidos por debajo de --stop-desacuerdo para cortar.",
+    )
+
+
+def desde_args(args):
+    if args.checkpoint_cada <= 0:
+        return None
+    return SeguimientoConvergencia(args.checkpoint_dir, args.checkpoint_cada, args.stop_desacuerdo, args.stop_paciencia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff y convergencia entre checkpoints de Q-table.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_diff = sub.add_parser("diff", help="Compara dos Q-tables.")
+    p_diff.add_argument("anterior")
+    p_diff.add_argument("posterior")
+    p_curva = sub.add_parser("curva", help="Diff entre checkpoints consecutivos de un directorio.")
+    p_curva.add_argument("directorio")
+    p_curva.add_argument("--json", default=None, help="Guarda la curva en este archivo.")
+    args = parser.parse_args()
+
+    if args.comando == "diff":
+        cambios = diff(
+            TablaDensa.desde_dict(cargar_pickle(args.anterior)),
+            TablaDensa.desde_dict(cargar_pickle(args.posterior)),
+        )
+        for k, v in cambios.items():
+            print(f"- {k}: {v}")
+        return
+
+    curva = []
+    previa = None
+    for episodio, path in listar_checkpoints(args.directorio):
+        densa = TablaDensa.desde_dict(cargar_pickle(path))
+        if previa is not None:
+            cambios = diff(previa, densa)
+            cambios["episodio"] = episodio
+            curva.append(cambios)
+            print(
+                f"{episodio}: estados={cambios['estados_b']} (+{cambios['estados_nuevos']}) "
+                f"linf={cambios['linf']:.4f} l2={cambios['l2']:.4f} desacuerdo={cambios['desacuerdo']:.4f}"
+            )
+        previa = densa
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(curva, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
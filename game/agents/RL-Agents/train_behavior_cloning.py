@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from offline_dataset import ShardedDataset
+from agent_policiy_gradient_nn import PolicyGradientNNAgent
+
+# Modelo propio: por defecto no pisa pg_models/policy_nn.pt del trainer de policy gradient
+BC_PATH = os.path.join(os.path.dirname(__file__), "pg_models", "policy_nn_bc.pt")
+# Los retornos del dataset van en puntos (con +-100 al cerrar la partida); el critic
+# se ajusta en la escala de final_reward de los trainers: puntos / 30 recortado a [-1, 1]
+ESCALA_RETORNO = 30.0
+
+
+def _bc_step(model, optimizer_policy, optimizer_value, batch, device, value_coef):
+    obs = torch.as_tensor(batch["obs"], dtype=torch.float32, device=device)
+    mask = torch.as_tensor(batch["mask"], dtype=torch.bool, device=device)
+    actions = torch.as_tensor(batch["action"], dtype=torch.long, device=device)
+    returns = torch.as_tensor(batch["ret"], dtype=torch.float32, device=device)
+    returns = torch.clamp(returns / ESCALA_RETORNO, -1.0, 1.0)
+
+    logits, values = model(obs)
+    masked_logits = torch.where(mask, logits, torch.tensor(-1e9, device=device))
+    policy_loss = torch.nn.functional.cross_entropy(masked_logits, actions)
+    value_loss = torch.mean((values - returns) ** 2)
+
+    optimizer_policy.zero_grad()
+    policy_loss.backward()
+    optimizer_policy.step()
+
+    if value_coef > 0:
+        optimizer_value.zero_grad()
+        (value_coef * value_loss).backward()
+        optimizer_value.step()
+
+    with torch.no_grad():
+        accuracy = (masked_logits.argmax(dim=-1) == actions).float().mean()
+    return float(policy_loss.item()), float(value_loss.item()), float(accuracy.item())
+
+
+def train(
+    dataset_path,
+    teachers,
+    epochs,
+    batch_size,
+    lr,
+    value_coef,
+    output,
+    reset_model,
+    seed,
+):
+    if seed is not None:
+        torch.manual_seed(seed)
+    agent = PolicyGradientNNAgent(model_path=output or BC_PATH)
+    model = agent.model
+    device = agent.device
+
+    if reset_model:
+        for module in model.modules():
+            if hasattr(module, "reset_parameters"):
+                module.reset_parameters()
+
+    optimizer_policy = torch.optim.Adam(model.actor.parameters(), lr=lr)
+    optimizer_value = torch.optim.Adam(model.critic.parameters(), lr=lr)
+
+    dataset = ShardedDataset(
+        dataset_path,
+        batch_size=batch_size,
+        shuffle=True,
+        seed=seed,
+        columns=["obs", "mask", "action", "ret"],
+        agents=teachers,
+    )
+    if not dataset.manifest["shards"]:
+        raise FileNotFoundError(f"Dataset vacio o inexistente: {dataset_path}")
+
+    try:
+        for epoch in range(1, epochs + 1):
+            totals = np.zeros(3)
+            n_batches = 0
+            for batch in dataset:
+                totals += _bc_step(model, optimizer_policy, optimizer_value, batch, device, value_coef)
+                n_batches += 1
+            if n_batches:
+                policy_loss, value_loss, accuracy = totals / n_batches
+                print(
+                    f"Epoch {epoch}/{epochs} | policy_loss={policy_loss:.4f} "
+                    f"| value_loss={value_loss:.4f} | accuracy={accuracy:.4f}"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.save()
+        print(f"Modelo guardado en {agent.model_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Behavior cloning: destila las decisiones de un dataset offline en la red de policy gradient."
+    )
+    parser.add_argument("--dataset", required=True, help="Directorio creado por game/offline_dataset.py.")
+    parser.add_argument(
+        "--teacher",
+        nargs="*",
+        default=["rational"],
+        help="Agentes a imitar (segun el manifest). Sin valores usa todas las decisiones.",
+    )
+    parser.add_argument("--epochs", type=int, default=5, help="Pasadas completas por el dataset.")
+    parser.add_argument("--batch-size", type=int, default=512, help="Tamano de minibatch.")
+    parser.add_argument("--lr", type=float, default=1e-3, help="Learning rate.")
+    parser.add_argument(
+        "--value-coef",
+        type=float,
+        default=1.0,
+        help="Peso del ajuste del critic a los retornos de la mano (0 lo desactiva).",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Ruta del modelo (por defecto pg_models/policy_nn_bc.pt, separado del de policy_gradient_nn).",
+    )
+    parser.add_argument(
+        "--reset-model",
+        action="store_true",
+        help="Reinicia el modelo antes de entrenar.",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    train(
+        args.dataset,
+        args.teacher or None,
+        args.epochs,
+        args.batch_size,
+        args.lr,
+        args.value_coef,
+        args.output,
+        args.reset_model,
+        args.seed,
+    )
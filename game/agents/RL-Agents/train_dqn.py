@@ -0,0 +1,474 @@
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from truco_env import TrucoEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
+import checkpoints
+import curriculum
+import evaluacion
+import agent_dqn
+from agent_dqn import ESCALA_OBS, DQNAgent, guardar_pesos
+from agents.registry import create_agent, get_agent_registry
+
+
+# =============================================================================
+# DQN / DOUBLE DQN / DUELING CONTRA UN AGENTE FIJO
+# - EntornosVectorizados: `n_envs` TrucoEnv en el mismo proceso, el learner
+#   es siempre J0 y el oponente juega solo hasta que vuelve a ser su turno.
+#   La red decide para todos los entornos en un solo forward.
+# - ReplayBuffer: arrays preasignados (capacidad fija) y escritura circular.
+# - Las acciones invalidas se enmascaran al elegir (epsilon-greedy solo entre
+#   validas) y en el max del target con la mascara del estado siguiente.
+# - Recompensa por transicion: diferencia de puntos ganados entre la decision
+#   y la siguiente decision propia (o el fin de la partida), dividida por 30.
+# - Los pesos se exportan a agent_dqn (.npz, forward en NumPy); el estado de
+#   torch (red, target y optimizador) queda en un .pt con el mismo nombre
+#   para seguir entrenando.
+# =============================================================================
+
+
+class RedQ(nn.Module):
+    def __init__(self, num_obs=13, num_actions=13, hidden_size=128, dueling=False):
+        super().__init__()
+        self.dueling = dueling
+        self.register_buffer("escala", torch.tensor(ESCALA_OBS))
+        self.cuerpo = nn.Sequential(
+            nn.Linear(num_obs, hidden_size),
+            nn.ReLU(),
+            nn.Linear(hidden_size, hidden_size),
+            nn.ReLU(),
+        )
+        if dueling:
+            self.valor = nn.Linear(hidden_size, 1)
+            self.ventaja = nn.Linear(hidden_size, num_actions)
+        else:
+            self.q = nn.Linear(hidden_size, num_actions)
+
+    def forward(self, obs):
+        h = self.cuerpo(obs / self.escala)
+        if not self.dueling:
+            return self.q(h)
+        ventaja = self.ventaja(h)
+        return self.valor(h) + ventaja - ventaja.mean(dim=-1, keepdim=True)
+
+    def exportar(self):
+        """Pesos en el formato de agent_dqn.forward_numpy (W como entrada x salida)."""
+        capas = [m for m in self.cuerpo if isinstance(m, nn.Linear)]
+        capas += [self.valor, self.ventaja] if self.dueling else [self.q]
+        return [
+            (c.weight.detach().cpu().numpy().T.copy(), c.bias.detach().cpu().numpy().copy())
+            for c in capas
+        ]
+
+
+class ReplayBuffer:
+    def __init__(self, capacidad, num_obs=13, num_actions=13):
+        self.capacidad = capacidad
+        self.obs = np.zeros((capacidad, num_obs), dtype=np.float32)
+        self.acciones = np.zeros(capacidad, dtype=np.int64)
+        self.recompensas = np.zeros(capacidad, dtype=np.float32)
+        self.obs_sig = np.zeros((capacidad, num_obs), dtype=np.float32)
+        self.mask_sig = np.zeros((capacidad, num_actions), dtype=bool)
+        self.terminal = np.zeros(capacidad, dtype=bool)
+        self.pos = 0
+        self.tamano = 0
+
+    def estado(self):
+        return {k: getattr(self, k) for k in ("obs", "acciones", "recompensas", "obs_sig", "mask_sig", "terminal", "pos", "tamano")}
+
+    def restaurar(self, estado):
+        if len(estado["obs"]) != self.capacidad:
+            raise ValueError(f"El checkpoint tiene un buffer de {len(estado['obs'])}, no de {self.capacidad}.")
+        for k, v in estado.items():
+            setattr(self, k, v)
+
+    def agregar(self, obs, acciones, recompensas, obs_sig, mask_sig, terminal):
+        """Agrega un batch de transiciones (una por entorno)."""
+        n = len(acciones)
+        idx = (self.pos + np.arange(n)) % self.capacidad
+        self.obs[idx] = obs
+        self.acciones[idx] = acciones
+        self.recompensas[idx] = recompensas
+        self.obs_sig[idx] = obs_sig
+        self.mask_sig[idx] = mask_sig
+        self.terminal[idx] = terminal
+        self.pos = (self.pos + n) % self.capacidad
+        self.tamano = min(self.tamano + n, self.capacidad)
+
+    def muestrear(self, batch, rng):
+        idx = rng.integers(0, self.tamano, size=batch)
+        return (
+            torch.from_numpy(self.obs[idx]),
+            torch.from_numpy(self.acciones[idx]),
+            torch.from_numpy(self.recompensas[idx]),
+            torch.from_numpy(self.obs_sig[idx]),
+            torch.from_numpy(self.mask_sig[idx]),
+            torch.from_numpy(self.terminal[idx]),
+        )
+
+
+class EntornosVectorizados:
+    """
+    `n_envs` partidas contra `opponent`, siempre paradas en un turno de J0.
+    Con `curriculo`, cada partida nueva sortea su rival y al terminar le
+    reporta el resultado.
+    """
+
+    def __init__(self, n_envs, opponent, seed=0, instrumentacion=None, curriculo=None):
+        self.envs = [TrucoEnv(instrumentacion=instrumentacion, modo=MODO_TRUSTED) for _ in range(n_envs)]
+        self.opponent = opponent
+        self.curriculo = curriculo
+        self.rivales = [(None, opponent)] * n_envs
+        self.inst = instrumentacion or Instrumentacion(enabled=False)
+        self.obs = np.zeros((n_envs, 13), dtype=np.float32)
+        self.masks = np.zeros((n_envs, 13), dtype=bool)
+        self.partidas = 0
+        self.ganadas = 0
+        self._seed = seed
+        for i in range(n_envs):
+            self._nueva_partida(i)
+
+    def estado(self):
+        """Partidas en curso (los motores tienen RNG sembrado propio) y contadores."""
+        return {
+            "motores": [env.logic for env in self.envs],
+            "obs": self.obs,
+            "masks": self.masks,
+            "partidas": self.partidas,
+            "ganadas": self.ganadas,
+            "seed": self._seed,
+            "rivales": None if self.curriculo is None else [self.curriculo.referencia(*r) for r in self.rivales],
+        }
+
+    def restaurar(self, estado):
+        for env, logic in zip(self.envs, estado["motores"]):
+            env.logic = logic
+        self.obs[:] = estado["obs"]
+        self.masks[:] = estado["masks"]
+        self.partidas = estado["partidas"]
+        self.ganadas = estado["ganadas"]
+        self._seed = estado["seed"]
+        if self.curriculo is not None and estado.get("rivales") is not None:
+            self.rivales = [self.curriculo.resolver(r) for r in estado["rivales"]]
+
+    def _puntos(self, i):
+        estado = self.envs[i].logic.estado
+        return estado.puntos_jugador - estado.puntos_oponente
+
+    def _nueva_partida(self, i):
+        env = self.envs[i]
+        if self.curriculo is not None:
+            self.rivales[i] = self.curriculo.oponente()
+        env.reset(seed=self._seed)
+        self._seed += 1
+        # Si J1 es mano, juega hasta que le toque a J0
+        terminado = self._jugar_rival(i)
+        if terminado:
+            self._terminar(i)
+            self._nueva_partida(i)
+            return
+        self.obs[i] = env.get_observation(0)
+        self.masks[i] = env.get_action_mask(0)
+
+    def _jugar_rival(self, i):
+        env = self.envs[i]
+        while env.get_current_player() != 0:
+            player_id = env.get_current_player()
+            mask = env.get_action_mask(player_id)
+            if not any(mask):
+                return True
+            with self.inst.seccion("opponent_choose_action"):
+                action = self.rivales[i][1].choose_action(mask, env, player_id)
+            _, terminado = env.aplicar(action, player_id)
+            if terminado:
+                return True
+        return not any(env.get_action_mask(0))
+
+    def _terminar(self, i):
+        self.partidas += 1
+        gano = self._puntos(i) > 0
+        self.ganadas += gano
+        if self.curriculo is not None:
+            self.curriculo.registrar(float(gano), self.rivales[i][0])
+
+    def step(self, acciones):
+        """
+        Aplica una accion de J0 por entorno. Devuelve (recompensas, terminal,
+        obs_sig, mask_sig) de la transicion; los entornos terminados se reinician
+        y self.obs/self.masks quedan en la primera decision de la partida nueva.
+        """
+        n = len(self.envs)
+        recompensas = np.zeros(n, dtype=np.float32)
+        terminal = np.zeros(n, dtype=bool)
+        obs_sig = np.zeros_like(self.obs)
+        mask_sig = np.zeros_like(self.masks)
+        for i, env in enumerate(self.envs):
+            antes = self._puntos(i)
+            _, terminado = env.aplicar(int(acciones[i]), 0)
+            self.inst.paso()
+            if not terminado:
+                terminado = self._jugar_rival(i)
+            recompensas[i] = (self._puntos(i) - antes) / 30.0
+            if terminado:
+                terminal[i] = True
+                self._terminar(i)
+                self._nueva_partida(i)
+                continue
+            obs_sig[i] = env.get_observation(0)
+            mask_sig[i] = env.get_action_mask(0)
+            self.obs[i] = obs_sig[i]
+            self.masks[i] = mask_sig[i]
+        return recompensas, terminal, obs_sig, mask_sig
+
+
+def _paso_gradiente(red, target, opt, batch, gamma, double):
+    obs, acciones, recompensas, obs_sig, mask_sig, terminal = batch
+    q = red(obs).gather(1, acciones[:, None]).squeeze(1)
+    with torch.no_grad():
+        q_sig_target = target(obs_sig)
+        if double:
+            # La red online elige (entre validas) y el target evalua
+            q_sig_online = red(obs_sig).masked_fill(~mask_sig, float("-inf"))
+            mejor = q_sig_online.argmax(dim=1, keepdim=True)
+            q_sig = q_sig_target.gather(1, mejor).squeeze(1)
+        else:
+            q_sig = q_sig_target.masked_fill(~mask_sig, float("-inf")).max(dim=1).values
+        q_sig = torch.where(terminal, torch.zeros_like(q_sig), q_sig)
+        objetivo = recompensas + gamma * q_sig
+    loss = nn.functional.smooth_l1_loss(q, objetivo)
+    opt.zero_grad()
+    loss.backward()
+    nn.utils.clip_grad_norm_(red.parameters(), 10.0)
+    opt.step()
+    return float(loss.item())
+
+
+def train(
+    pasos,
+    lr,
+    gamma,
+    epsilon,
+    reset,
+    opponent_name,
+    instrumentacion=None,
+    n_envs=16,
+    epsilon_final=0.05,
+    exploracion=0.5,
+    buffer=100_000,
+    batch=256,
+    aprender_desde=2_000,
+    entrenar_cada=4,
+    target_cada=2_000,
+    double=True,
+    dueling=True,
+    hidden_size=128,
+    seed=0,
+    checkpoint=None,
+    curriculo=None,
+    evaluador=None,
+    model_path=None,
+):
+    """
+    `pasos`: decisiones de J0 sumando todos los entornos. `model_path`: el .npz
+    del agente; red y optimizador van al .pt con el mismo nombre.
+    """
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    model_path = model_path or agent_dqn.MODEL_PATH
+    torch_path = os.path.splitext(model_path)[0] + ".pt"
+
+    red = RedQ(hidden_size=hidden_size, dueling=dueling)
+    target = RedQ(hidden_size=hidden_size, dueling=dueling)
+    opt = torch.optim.Adam(red.parameters(), lr=lr)
+    if not reset and os.path.exists(torch_path):
+        estado = torch.load(torch_path)
+        if estado["dueling"] == dueling and estado["hidden_size"] == hidden_size:
+            red.load_state_dict(estado["red"])
+            opt.load_state_dict(estado["opt"])
+        else:
+            print("El modelo guardado tiene otra arquitectura: se entrena desde cero.")
+    target.load_state_dict(red.state_dict())
+
+    opponent = create_agent(opponent_name)
+    if curriculo is not None:
+        curriculo.congelar = lambda: DQNAgent(pesos=red.exportar(), dueling=dueling)
+    envs = EntornosVectorizados(n_envs, opponent, seed=seed, instrumentacion=instrumentacion, curriculo=curriculo)
+    replay = ReplayBuffer(buffer)
+
+    hecho = 0
+    ultimo_sync = 0
+    ultimo_log = 0
+    loss = None
+    n_updates = 0
+
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        if (previo["dueling"], previo["hidden_size"]) != (dueling, hidden_size):
+            raise ValueError("El checkpoint es de otra arquitectura (--no-dueling/--hidden-size).")
+        red.load_state_dict(previo["red"])
+        target.load_state_dict(previo["target"])
+        opt.load_state_dict(previo["opt"])
+        replay.restaurar(previo["replay"])
+        if curriculo is not None and previo.get("curriculo") is not None:
+            curriculo.restaurar(previo["curriculo"])
+        envs.restaurar(previo["envs"])
+        hecho, ultimo_sync, ultimo_log, loss, n_updates = previo["contadores"]
+        if previo["pasos"] != pasos:
+            print(f"Aviso: el checkpoint era de {previo['pasos']} pasos; el decaimiento de epsilon cambia.")
+        checkpoints.restaurar_rng(previo["rng"], rng)
+    if checkpoint is not None:
+        checkpoint.iniciar(hecho)
+
+
+    try:
+        while hecho < pasos:
+            frac = min(1.0, hecho / max(1.0, exploracion * pasos))
+            eps = epsilon + frac * (epsilon_final - epsilon)
+
+            with inst.seccion("choose_action"):
+                with torch.no_grad():
+                    q = red(torch.from_numpy(envs.obs)).masked_fill(~torch.from_numpy(envs.masks), float("-inf"))
+                acciones = q.argmax(dim=1).numpy()
+                explorar = rng.random(n_envs) < eps
+                for i in np.flatnonzero(explorar):
+                    acciones[i] = rng.choice(np.flatnonzero(envs.masks[i]))
+            obs = envs.obs.copy()
+            recompensas, terminal, obs_sig, mask_sig = envs.step(acciones)
+            replay.agregar(obs, acciones, recompensas, obs_sig, mask_sig, terminal)
+            hecho += n_envs
+
+            if replay.tamano >= aprender_desde:
+                # Un update cada `entrenar_cada` transiciones
+                with inst.seccion("learner_update"):
+                    while n_updates * entrenar_cada < hecho - aprender_desde:
+                        loss = _paso_gradiente(red, target, opt, replay.muestrear(batch, rng), gamma, double)
+                        n_updates += 1
+                if hecho - ultimo_sync >= target_cada:
+                    target.load_state_dict(red.state_dict())
+                    ultimo_sync = hecho
+
+            if hecho - ultimo_log >= 10_000 or hecho >= pasos:
+                ultimo_log = hecho
+                loss_txt = f"{loss:.4f}" if loss is not None else "-"
+                winrate_train = envs.ganadas / envs.partidas if envs.partidas else 0.0
+                extra = f" | {curriculo.resumen()}" if curriculo is not None else ""
+                print(
+                    f"Pasos {hecho}/{pasos} | partidas={envs.partidas} | epsilon={eps:.3f} "
+                    f"| loss={loss_txt} | winrate entrenando={winrate_train:.3f}{extra}"
+                )
+            if evaluador is not None and evaluador.toca(hecho):
+                evaluador.lanzar(
+                    DQNAgent(pesos=red.exportar(), dueling=dueling), hecho, partidas_entrenamiento=envs.partidas, loss=loss
+                )
+            if checkpoint is not None and checkpoint.toca(hecho):
+                with inst.seccion("checkpoint_io"):
+                    checkpoint.guardar(
+                        {
+                            "pasos": pasos,
+                            "dueling": dueling,
+                            "hidden_size": hidden_size,
+                            "red": red.state_dict(),
+                            "target": target.state_dict(),
+                            "opt": opt.state_dict(),
+                            "replay": replay.estado(),
+                            "envs": envs.estado(),
+                            "contadores": (hecho, ultimo_sync, ultimo_log, loss, n_updates),
+                            "rng": checkpoints.estado_rng(rng),
+                            "curriculo": None if curriculo is None else curriculo.estado(),
+                        },
+                        hecho,
+                        epsilon=eps,
+                        seed=seed,
+                        opponent=opponent_name,
+                        partidas=envs.partidas,
+                    )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with inst.seccion("checkpoint_io"):
+            if checkpoint is not None:
+                checkpoint.cerrar()
+            if evaluador is not None:
+                evaluador.cerrar()
+            os.makedirs(os.path.dirname(torch_path), exist_ok=True)
+            torch.save(
+                {"red": red.state_dict(), "opt": opt.state_dict(), "dueling": dueling, "hidden_size": hidden_size},
+                torch_path,
+            )
+            guardar_pesos(model_path, red.exportar(), dueling)
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
+
+
+if __name__ == "__main__":
+    registry = get_agent_registry()
+    opponent_choices = sorted(name for name in registry.keys() if name != "dqn")
+
+    parser = argparse.ArgumentParser(description="Entrena un agente DQN contra un agente fijo.")
+    parser.add_argument("--pasos", type=int, default=500_000, help="Decisiones del agente (todos los entornos).")
+    parser.add_argument("--lr", type=float, default=5e-4, help="Learning rate.")
+    parser.add_argument("--gamma", type=float, default=0.99, help="Discount factor.")
+    parser.add_argument("--epsilon", type=float, default=1.0, help="Epsilon inicial.")
+    parser.add_argument("--epsilon-final", type=float, default=0.05, help="Epsilon al final de la exploracion.")
+    parser.add_argument(
+        "--exploracion",
+        type=float,
+        default=0.5,
+        help="Fraccion de los pasos en la que epsilon baja linealmente.",
+    )
+    parser.add_argument("--reset", action="store_true", help="Ignora el modelo guardado.")
+    parser.add_argument("--opponent", choices=opponent_choices, default="rational", help="Agente oponente.")
+    parser.add_argument("--n-envs", type=int, default=16, help="Partidas en paralelo (un forward para todas).")
+    parser.add_argument("--buffer", type=int, default=100_000, help="Capacidad del replay buffer.")
+    parser.add_argument("--batch", type=int, default=256, help="Transiciones por update.")
+    parser.add_argument("--aprender-desde", type=int, default=2_000, help="Transiciones antes del primer update.")
+    parser.add_argument("--entrenar-cada", type=int, default=4, help="Transiciones por update.")
+    parser.add_argument("--target-cada", type=int, default=2_000, help="Pasos entre copias a la red target.")
+    parser.add_argument("--no-double", action="store_true", help="Target de DQN clasico (max del target).")
+    parser.add_argument("--no-dueling", action="store_true", help="Cabeza Q simple en lugar de valor + ventaja.")
+    parser.add_argument("--hidden-size", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    checkpoints.agregar_argumentos(parser)
+    curriculum.agregar_argumentos(parser)
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    train(
+        args.pasos,
+        args.lr,
+        args.gamma,
+        args.epsilon,
+        args.reset,
+        args.opponent,
+        desde_args(args),
+        args.n_envs,
+        args.epsilon_final,
+        args.exploracion,
+        args.buffer,
+        args.batch,
+        args.aprender_desde,
+        args.entrenar_cada,
+        args.target_cada,
+        not args.no_double,
+        not args.no_dueling,
+        args.hidden_size,
+        args.seed,
+        checkpoints.desde_args(args, "dqn", unidad="pasos"),
+        curriculum.desde_args(args, seed=args.seed),
+        evaluacion.desde_args(args, unidad="pasos"),
+    )
@@ -1,4 +1,5 @@
 import argparse
+import copy
 import os
 import sys
 import numpy as np
@@ -8,7 +9,11 @@ if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
 from constantes import Acciones
-from truco_env import TrucoEnv
+from truco_multiagente import TrucoAECEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
+import checkpoints
+import evaluacion
 from agent_policy_gradient import PolicyGradientAgent
 
 
@@ -110,9 +115,18 @@ def train(
     clip_eps,
     epochs,
     reset_model,
+    instrumentacion=None,
+    checkpoint=None,
+    evaluador=None,
+    seed=None,
+    model_path=None,
 ):
-    env = TrucoEnv()
-    agent = PolicyGradientAgent()
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    # Las acciones salen siempre de la mascara: el motor no necesita revalidarlas
+    env = TrucoAECEnv(instrumentacion=instrumentacion, modo=MODO_TRUSTED)
+    if seed is not None:
+        checkpoints.sembrar(seed, env.logic)
+    agent = PolicyGradientAgent(model_path=model_path)
     if reset_model:
         agent.Wp[:] = 0.0
         agent.bp[:] = 0.0
@@ -120,35 +134,54 @@ def train(
         agent.bv = 0.0
 
     hands_done = 0
-    done = False
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        hands_done = previo["hands_done"]
+        agent.Wp, agent.bp, agent.Wv, agent.bv = previo["pesos"]
+        checkpoints.restaurar_rng(previo["rng"])
+        checkpoints.restaurar_motor(env.logic, previo["motor"])
+    if checkpoint is not None:
+        checkpoint.iniciar(hands_done)
     env.reset()
     hand_steps = []
 
     while hands_done < hands:
-        if done:
+        player_id = env.agent_selection
+        if env.terminations[player_id]:
+            # Fin de partida: la ultima mano ya se entreno al cerrarse.
+            # Los checkpoints van aca, entre partidas, para reanudar sin estado a medias.
+            if checkpoint is not None and checkpoint.toca(hands_done):
+                with inst.seccion("checkpoint_io"):
+                    checkpoint.guardar(
+                        {
+                            "hands_done": hands_done,
+                            "pesos": (agent.Wp, agent.bp, agent.Wv, agent.bv),
+                            "rng": checkpoints.estado_rng(),
+                            "motor": checkpoints.estado_motor(env.logic),
+                        },
+                        hands_done,
+                        seed=seed,
+                    )
+            if evaluador is not None and evaluador.toca(hands_done):
+                copia = copy.copy(agent)
+                copia.Wp, copia.bp, copia.Wv = agent.Wp.copy(), agent.bp.copy(), agent.Wv.copy()
+                evaluador.lanzar(copia, hands_done)
             env.reset()
-            done = False
-
-        player_id = env.get_current_player()
-        action_mask = env.get_action_mask(player_id)
-        if not any(action_mask):
-            done = True
-            if hand_steps:
-                _train_on_hand(agent, hand_steps, lr_policy, lr_value, gamma, clip_eps, epochs)
-                hand_steps = []
-                hands_done += 1
             continue
 
-        obs = env.get_observation(player_id)
-        _, value, probs = agent.predict(obs, action_mask)
-        action = int(np.random.choice(len(probs), p=probs))
-        logp = float(np.log(max(probs[action], 1e-12)))
+        action_mask = env.action_mask(player_id)
+        with inst.seccion("choose_action"):
+            obs = env.observe(player_id)
+            _, value, probs = agent.predict(obs, action_mask)
+            action = int(np.random.choice(len(probs), p=probs))
+            logp = float(np.log(max(probs[action], 1e-12)))
 
         prev_cartas = list(env.logic.estado.cartas_jugadas)
         prev_turno_responder_truco = env.logic.estado.turno_responder_truco
 
-        _, reward, done, _, _ = env.step(action, player_id)
-        step_reward = reward if player_id == 0 else -reward
+        env.step(action)
+        inst.paso()
+        done = env.terminations[player_id]
         hand_steps.append(
             {
                 "obs": obs,
@@ -156,16 +189,24 @@ def train(
                 "action": action,
                 "logp": logp,
                 "value": value,
-                "reward": step_reward,
+                "reward": env.rewards[player_id],
             }
         )
 
         if _is_hand_end(prev_cartas, prev_turno_responder_truco, action, env) or done:
-            _train_on_hand(agent, hand_steps, lr_policy, lr_value, gamma, clip_eps, epochs)
+            with inst.seccion("learner_update"):
+                _train_on_hand(agent, hand_steps, lr_policy, lr_value, gamma, clip_eps, epochs)
             hand_steps = []
             hands_done += 1
 
-    agent.save()
+    with inst.seccion("checkpoint_io"):
+        if checkpoint is not None:
+            checkpoint.cerrar()
+        if evaluador is not None:
+            evaluador.cerrar()
+        agent.save()
+    if instrumentacion is not None:
+        instrumentacion.cerrar()
 
 
 if __name__ == "__main__":
@@ -183,6 +224,15 @@ if __name__ == "__main__":
         action="store_true",
         help="Reinicia el modelo antes de entrenar.",
     )
+    checkpoints.agregar_argumentos(parser)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Semilla de random/numpy/torch y del motor (por defecto sin sembrar).",
+    )
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
     args = parser.parse_args()
 
     train(
@@ -193,4 +243,8 @@ if __name__ == "__main__":
         args.clip_eps,
         args.epochs,
         args.reset_model,
+        desde_args(args),
+        checkpoints.desde_args(args, "policy_gradient", unidad="manos"),
+        evaluacion.desde_args(args, unidad="manos"),
+        seed=args.seed,
     )
@@ -1,6 +1,8 @@
 import argparse
+import copy
 import os
 import sys
+
 import torch
 
 GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -8,7 +10,11 @@ if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
 from constantes import Acciones
-from truco_env import TrucoEnv
+from truco_multiagente import TrucoAECEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
+import checkpoints
+import evaluacion
 from agent_policiy_gradient_nn import PolicyGradientNNAgent
 
 
@@ -40,9 +46,18 @@ def train(
     clip_eps,
     epochs,
     reset_model,
+    instrumentacion=None,
+    checkpoint=None,
+    evaluador=None,
+    seed=None,
+    model_path=None,
 ):
-    env = TrucoEnv()
-    agent = PolicyGradientNNAgent()
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    # Las acciones salen siempre de la mascara: el motor no necesita revalidarlas
+    env = TrucoAECEnv(instrumentacion=instrumentacion, modo=MODO_TRUSTED)
+    if seed is not None:
+        checkpoints.sembrar(seed, env.logic)
+    agent = PolicyGradientNNAgent(model_path=model_path)
     model = agent.model
     device = agent.device
 
@@ -55,48 +70,61 @@ def train(
     optimizer_value = torch.optim.Adam(model.critic.parameters(), lr=lr_value)
 
     hands_done = 0
-    done = False
+    steps_done = 0
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        hands_done, steps_done = previo["hands_done"], previo["steps_done"]
+        model.load_state_dict(previo["model"])
+        optimizer_policy.load_state_dict(previo["opt_policy"])
+        optimizer_value.load_state_dict(previo["opt_value"])
+        checkpoints.restaurar_rng(previo["rng"])
+        checkpoints.restaurar_motor(env.logic, previo["motor"])
+    if checkpoint is not None:
+        checkpoint.iniciar(hands_done)
     env.reset()
     hand_steps = []
 
     try:
         while hands_done < hands:
-            if done:
+            player_id = env.agent_selection
+            if env.terminations[player_id]:
+                # Fin de partida: la ultima mano ya se entreno al cerrarse.
+                # Los checkpoints van aca, entre partidas, para reanudar sin estado a medias.
+                if checkpoint is not None and checkpoint.toca(hands_done):
+                    with inst.seccion("checkpoint_io"):
+                        checkpoint.guardar(
+                            {
+                                "hands_done": hands_done,
+                                "steps_done": steps_done,
+                                "model": model.state_dict(),
+                                "opt_policy": optimizer_policy.state_dict(),
+                                "opt_value": optimizer_value.state_dict(),
+                                "rng": checkpoints.estado_rng(),
+                                "motor": checkpoints.estado_motor(env.logic),
+                            },
+                            hands_done,
+                            seed=seed,
+                        )
                 env.reset()
-                done = False
-
-            player_id = env.get_current_player()
-            action_mask = env.get_action_mask(player_id)
-            if not any(action_mask):
-                done = True
-                if hand_steps:
-                    _train_on_hand(
-                        hand_steps,
-                        model,
-                        optimizer_policy,
-                        optimizer_value,
-                        gamma,
-                        clip_eps,
-                        epochs,
-                        device,
-                    )
-                    hand_steps = []
-                    hands_done += 1
                 continue
 
-            obs = torch.tensor(env.get_observation(player_id), dtype=torch.float32, device=device)
-            mask = torch.tensor(action_mask, dtype=torch.bool, device=device)
-            with torch.no_grad():
-                _, value, probs = agent.predict(obs, mask)
-                action_dist = torch.distributions.Categorical(probs)
-                action = int(action_dist.sample().item())
-                logp = float(action_dist.log_prob(torch.tensor(action, device=device)).item())
+            action_mask = env.action_mask(player_id)
+            with inst.seccion("choose_action"):
+                obs = torch.tensor(env.observe(player_id), dtype=torch.float32, device=device)
+                mask = torch.tensor(action_mask, dtype=torch.bool, device=device)
+                with torch.no_grad():
+                    _, value, probs = agent.predict(obs, mask)
+                    action_dist = torch.distributions.Categorical(probs)
+                    action = int(action_dist.sample().item())
+                    logp = float(action_dist.log_prob(torch.tensor(action, device=device)).item())
 
             prev_cartas = list(env.logic.estado.cartas_jugadas)
             prev_turno_responder_truco = env.logic.estado.turno_responder_truco
 
-            _, reward, done, _, _ = env.step(action, player_id)
-            step_reward = reward if player_id == 0 else -reward
+            env.step(action)
+            inst.paso()
+            steps_done += 1
+            done = env.terminations[player_id]
             hand_steps.append(
                 {
                     "obs": obs.detach(),
@@ -104,25 +132,35 @@ def train(
                     "action": action,
                     "logp": logp,
                     "value": float(value.item()),
-                    "reward": step_reward,
+                    "reward": env.rewards[player_id],
                 }
             )
 
             if _is_hand_end(prev_cartas, prev_turno_responder_truco, action, env) or done:
-                _train_on_hand(
-                    hand_steps,
-                    model,
-                    optimizer_policy,
-                    optimizer_value,
-                    gamma,
-                    clip_eps,
-                    epochs,
-                    device,
-                )
+                with inst.seccion("learner_update"):
+                    _train_on_hand(
+                        hand_steps,
+                        model,
+                        optimizer_policy,
+                        optimizer_value,
+                        gamma,
+                        clip_eps,
+                        epochs,
+                        device,
+                    )
                 hand_steps = []
                 hands_done += 1
+                if evaluador is not None and evaluador.toca(hands_done):
+                    evaluador.lanzar(copy.deepcopy(agent), hands_done, pasos=steps_done)
     finally:
-        agent.save()
+        with inst.seccion("checkpoint_io"):
+            if checkpoint is not None:
+                checkpoint.cerrar()
+            if evaluador is not None:
+                evaluador.cerrar()
+            agent.save()
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
 
 
 def _train_on_hand(
@@ -143,7 +181,36 @@ def _train_on_hand(
     rewards = torch.tensor([s["reward"] for s in hand_steps], dtype=torch.float32, device=device)
 
     returns = _compute_returns(rewards, gamma).to(device)
-    advantages = returns - values
+    _ppo_update(
+        model,
+        optimizer_policy,
+        optimizer_value,
+        obs_batch,
+        mask_batch,
+        actions,
+        old_logp,
+        returns,
+        returns - values,
+        clip_eps,
+        epochs,
+    )
+
+
+def _ppo_update(
+    model,
+    optimizer_policy,
+    optimizer_value,
+    obs_batch,
+    mask_batch,
+    actions,
+    old_logp,
+    returns,
+    advantages,
+    clip_eps,
+    epochs,
+):
+    """Update PPO clipeado (actor) + MSE de retornos (critico) sobre un lote ya armado."""
+    device = obs_batch.device
     if advantages.numel() > 1:
         advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
 
@@ -184,6 +251,15 @@ if __name__ == "__main__":
         action="store_true",
         help="Reinicia el modelo antes de entrenar.",
     )
+    checkpoints.agregar_argumentos(parser)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Semilla de random/numpy/torch y del motor (por defecto sin sembrar).",
+    )
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
     args = parser.parse_args()
 
     train(
@@ -194,4 +270,8 @@ if __name__ == "__main__":
         args.clip_eps,
         args.epochs,
         args.reset_model,
+        desde_args(args),
+        checkpoints.desde_args(args, "policy_gradient_nn", unidad="manos"),
+        evaluacion.desde_args(args, unidad="manos"),
+        seed=args.seed,
     )
@@ -0,0 +1,317 @@
+import argparse
+import copy
+import multiprocessing as mp
+import os
+import queue
+import sys
+
+import numpy as np
+import torch
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from truco_multiagente import TrucoAECEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
+import checkpoints
+import evaluacion
+from agent_policiy_gradient_nn import PolicyGradientNN, PolicyGradientNNAgent
+from train_policy_gradient_nn import _compute_returns, _is_hand_end, _ppo_update
+
+
+# =============================================================================
+# POLICY GRADIENT NN ASINCRONICO (actores / learner)
+# - N procesos actores juegan self-play con una copia de los pesos que puede
+#   estar atrasada y mandan cada mano terminada a una cola compartida, con el
+#   logp de la politica que la genero y la version de pesos que usaron.
+# - El learner (proceso principal) consume lotes de manos sin frenar a los
+#   actores y hace el mismo update PPO que el entrenamiento sincronico. El
+#   ratio de PPO corrige contra la politica de comportamiento; las manos con
+#   mas de --max-staleness versiones de atraso se descartan.
+# - Cada --broadcast-cada updates los pesos se publican en un modelo en
+#   memoria compartida y se incrementa la version; los actores la releen al
+#   terminar cada mano.
+# - Checkpoints (--guardar-cada, en manos) justo despues de un update, sin
+#   lote a medias: modelo, optimizadores y contadores del learner. El estado
+#   de los actores no se guarda; al reanudar arrancan con seed + manos ya
+#   entrenadas, asi que no repiten las partidas del tramo anterior.
+# - Evaluacion (--evaluacion-cada, en manos) tambien justo despues de un
+#   update, con el atraso medio y las manos descartadas desde la anterior.
+# =============================================================================
+
+
+def _actor(idx, publicado, version, lock, cola, parar, seed):
+    # Un hilo por proceso: con varios actores torch no debe pelear por los cores
+    torch.set_num_threads(1)
+    torch.manual_seed(seed + idx)
+    env = TrucoAECEnv(modo=MODO_TRUSTED)
+    env.reset(seed=seed + idx)
+    model = PolicyGradientNN()
+    version_local = -1
+    mano = []
+
+    def sincronizar():
+        nonlocal version_local
+        if version.value != version_local:
+            with lock:
+                model.load_state_dict(publicado.state_dict())
+                version_local = version.value
+
+    sincronizar()
+    while not parar.is_set():
+        player_id = env.agent_selection
+        if env.terminations[player_id]:
+            env.reset()
+            continue
+
+        action_mask = env.action_mask(player_id)
+        obs = torch.tensor(env.observe(player_id), dtype=torch.float32)
+        mask = torch.tensor(action_mask, dtype=torch.bool)
+        with torch.no_grad():
+            logits, _ = model(obs)
+            probs = torch.softmax(torch.where(mask, logits, torch.tensor(-1e9)), dim=-1)
+            dist = torch.distributions.Categorical(probs)
+            action = int(dist.sample().item())
+            logp = float(dist.log_prob(torch.tensor(action)).item())
+
+        prev_cartas = list(env.logic.estado.cartas_jugadas)
+        prev_turno_responder_truco = env.logic.estado.turno_responder_truco
+        env.step(action)
+        mano.append((obs.numpy(), action_mask, action, logp, env.rewards[player_id]))
+
+        if _is_hand_end(prev_cartas, prev_turno_responder_truco, action, env) or env.terminations[player_id]:
+            obs_m, mask_m, acciones, logps, rewards = zip(*mano)
+            trayectoria = {
+                "obs": np.stack(obs_m),
+                "mask": np.array(mask_m, dtype=bool),
+                "actions": np.array(acciones, dtype=np.int64),
+                "logp": np.array(logps, dtype=np.float32),
+                "rewards": np.array(rewards, dtype=np.float32),
+                "version": version_local,
+            }
+            mano = []
+            # put con timeout: si el learner ya termino, el actor no queda colgado
+            while not parar.is_set():
+                try:
+                    cola.put(trayectoria, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            sincronizar()
+    cola.cancel_join_thread()
+
+
+def _publicar(model, publicado, version, lock):
+    with lock:
+        publicado.load_state_dict(model.state_dict())
+        version.value += 1
+
+
+def _update_lote(lote, model, optimizer_policy, optimizer_value, gamma, clip_eps, epochs):
+    obs = torch.from_numpy(np.concatenate([m["obs"] for m in lote]))
+    mask = torch.from_numpy(np.concatenate([m["mask"] for m in lote]))
+    actions = torch.from_numpy(np.concatenate([m["actions"] for m in lote]))
+    old_logp = torch.from_numpy(np.concatenate([m["logp"] for m in lote]))
+    # Retornos por mano (igual que el sincronico); la baseline es el critico actual
+    returns = torch.cat([_compute_returns(m["rewards"].tolist(), gamma) for m in lote])
+    with torch.no_grad():
+        _, values = model(obs)
+    _ppo_update(
+        model,
+        optimizer_policy,
+        optimizer_value,
+        obs,
+        mask,
+        actions,
+        old_logp,
+        returns,
+        returns - values,
+        clip_eps,
+        epochs,
+    )
+
+
+def train(
+    hands,
+    actores,
+    batch_manos,
+    max_staleness,
+    broadcast_cada,
+    gamma,
+    lr_policy,
+    lr_value,
+    clip_eps,
+    epochs,
+    reset_model,
+    seed=0,
+    instrumentacion=None,
+    checkpoint=None,
+    model_path=None,
+    evaluador=None,
+):
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    checkpoints.sembrar(seed)
+    agent = PolicyGradientNNAgent(model_path=model_path)
+    model = agent.model
+    if reset_model:
+        for module in model.modules():
+            if hasattr(module, "reset_parameters"):
+                module.reset_parameters()
+
+    optimizer_policy = torch.optim.Adam(model.actor.parameters(), lr=lr_policy)
+    optimizer_value = torch.optim.Adam(model.critic.parameters(), lr=lr_value)
+
+    hands_done = 0
+    steps_done = 0
+    descartadas = 0
+    updates = 0
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        hands_done = previo["hands_done"]
+        steps_done = previo["steps_done"]
+        descartadas = previo["descartadas"]
+        updates = previo["updates"]
+        model.load_state_dict(previo["model"])
+        optimizer_policy.load_state_dict(previo["opt_policy"])
+        optimizer_value.load_state_dict(previo["opt_value"])
+        checkpoints.restaurar_rng(previo["rng"])
+    if checkpoint is not None:
+        checkpoint.iniciar(hands_done)
+    seed_actores = seed + hands_done
+
+    ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    # Copia publicada de los pesos: el learner nunca entrena sobre la memoria que leen los actores
+    publicado = PolicyGradientNN()
+    publicado.load_state_dict(model.state_dict())
+    publicado.share_memory()
+    version = ctx.Value("l", 0, lock=False)
+    lock = ctx.Lock()
+    cola = ctx.Queue(maxsize=max(4 * batch_manos, 16))
+    parar = ctx.Event()
+    procesos = [
+        ctx.Process(target=_actor, args=(i, publicado, version, lock, cola, parar, seed_actores), daemon=True)
+        for i in range(actores)
+    ]
+    for proceso in procesos:
+        proceso.start()
+
+    staleness = []
+    lote = []
+
+    try:
+        while hands_done < hands:
+            with inst.seccion("cola_espera"):
+                mano = cola.get()
+            steps_done += len(mano["actions"])
+            inst.paso(len(mano["actions"]))
+            atraso = version.value - mano["version"]
+            if atraso > max_staleness:
+                descartadas += 1
+                continue
+            staleness.append(atraso)
+            lote.append(mano)
+            hands_done += 1
+
+            if len(lote) >= batch_manos or hands_done >= hands:
+                with inst.seccion("learner_update"):
+                    _update_lote(lote, model, optimizer_policy, optimizer_value, gamma, clip_eps, epochs)
+                lote = []
+                updates += 1
+                if updates % broadcast_cada == 0:
+                    _publicar(model, publicado, version, lock)
+                if checkpoint is not None and checkpoint.toca(hands_done):
+                    with inst.seccion("checkpoint_io"):
+                        checkpoint.guardar(
+                            {
+                                "hands_done": hands_done,
+                                "steps_done": steps_done,
+                                "descartadas": descartadas,
+                                "updates": updates,
+                                "model": model.state_dict(),
+                                "opt_policy": optimizer_policy.state_dict(),
+                                "opt_value": optimizer_value.state_dict(),
+                                "rng": checkpoints.estado_rng(),
+                            },
+                            hands_done,
+                            seed=seed,
+                            actores=actores,
+                        )
+                if evaluador is not None and evaluador.toca(hands_done):
+                    evaluador.lanzar(
+                        copy.deepcopy(agent),
+                        hands_done,
+                        pasos=steps_done,
+                        staleness_media=float(np.mean(staleness)) if staleness else 0.0,
+                        descartadas=descartadas,
+                    )
+                    staleness = []
+    finally:
+        parar.set()
+        # Vaciar la cola para que ningun actor quede bloqueado en el put
+        while any(p.is_alive() for p in procesos):
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for proceso in procesos:
+            proceso.join()
+        with inst.seccion("checkpoint_io"):
+            if checkpoint is not None:
+                checkpoint.cerrar()
+            if evaluador is not None:
+                evaluador.cerrar()
+            agent.save()
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
+    print(f"Manos entrenadas: {hands_done} | descartadas por atraso: {descartadas} | updates: {updates}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Policy gradient con red neuronal, actores en paralelo y un learner asincronico."
+    )
+    parser.add_argument("--hands", type=int, default=1000, help="Manos a entrenar (sin contar descartadas).")
+    parser.add_argument("--actores", type=int, default=2, help="Procesos actores.")
+    parser.add_argument("--batch-manos", type=int, default=8, help="Manos por update del learner.")
+    parser.add_argument(
+        "--max-staleness",
+        type=int,
+        default=4,
+        help="Versiones de atraso toleradas en una mano antes de descartarla.",
+    )
+    parser.add_argument("--broadcast-cada", type=int, default=1, help="Updates entre publicaciones de pesos.")
+    parser.add_argument("--gamma", type=float, default=0.95, help="Discount factor.")
+    parser.add_argument("--lr-policy", type=float, default=3e-4, help="LR politica.")
+    parser.add_argument("--lr-value", type=float, default=1e-3, help="LR valor.")
+    parser.add_argument("--clip-eps", type=float, default=0.2, help="Clip PPO.")
+    parser.add_argument("--epochs", type=int, default=4, help="Epochs por lote.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reset-model",
+        action="store_true",
+        help="Reinicia el modelo antes de entrenar.",
+    )
+    checkpoints.agregar_argumentos(parser)
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    train(
+        args.hands,
+        args.actores,
+        args.batch_manos,
+        args.max_staleness,
+        args.broadcast_cada,
+        args.gamma,
+        args.lr_policy,
+        args.lr_value,
+        args.clip_eps,
+        args.epochs,
+        args.reset_model,
+        args.seed,
+        desde_args(args),
+        checkpoints.desde_args(args, "policy_gradient_nn_async", unidad="manos"),
+        evaluador=evaluacion.desde_args(args, unidad="manos"),
+    )
@@ -1,4 +1,5 @@
 import argparse
+import copy
 import math
 import os
 import pickle
@@ -10,8 +11,14 @@ if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
 from truco_env import TrucoEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
 from constantes import Acciones
+import checkpoints
+import evaluacion
 from agent_q_learning import QLearningAgent
+import q_table_convergencia as convergencia
+from q_lambda import UPDATE_MODOS, TablaQ, TrayectoriaLambda, recompensa_paso
 
 
 QTABLE_PATH = os.path.join(os.path.dirname(__file__), "q_tables", "q_table.pkl")
@@ -24,9 +31,9 @@ def _load_q_table():
         return pickle.load(f)
 
 
-def _save_q_table(q_table):
-    os.makedirs(os.path.dirname(QTABLE_PATH), exist_ok=True)
-    with open(QTABLE_PATH, "wb") as f:
+def _save_q_table(q_table, path=QTABLE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
         pickle.dump(q_table, f)
 
 
@@ -72,12 +79,55 @@ def _update_hand(q_table, hand_steps, final_reward, alpha, gamma):
         G *= gamma
 
 
-def train(episodes, alpha, gamma, epsilon):
-    env = TrucoEnv()
-    agent = QLearningAgent(q_table_path=QTABLE_PATH)
+def _congelar(agent, tabla):
+    """Copia greedy fija del agente, para evaluarla mientras se sigue entrenando."""
+    copia = copy.copy(agent)
+    copia.q_table = dict(agent.q_table) if tabla is None else tabla.a_dict()
+    return copia
+
+
+def train(
+    episodes,
+    alpha,
+    gamma,
+    epsilon,
+    instrumentacion=None,
+    seguimiento=None,
+    update_mode="mc",
+    lam=0.8,
+    checkpoint=None,
+    evaluador=None,
+    seed=None,
+    model_path=None,
+):
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    # Las acciones salen siempre de la mascara: el motor no necesita revalidarlas
+    env = TrucoEnv(instrumentacion=instrumentacion, modo=MODO_TRUSTED)
+    if seed is not None:
+        checkpoints.sembrar(seed, env.logic)
+    agent = QLearningAgent(q_table_path=model_path or QTABLE_PATH)
+    # Modo lambda: tabla densa y una trayectoria por jugador dentro de la mano
+    tabla = TablaQ.desde_dict(agent.q_table) if update_mode == "lambda" else None
+    trayectorias = (TrayectoriaLambda(), TrayectoriaLambda())
+
+    inicio = 0
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        inicio = previo["episodio"]
+        agent.q_table = previo["q_table"]
+        if tabla is not None:
+            tabla = TablaQ.desde_estado(previo["tabla"])
+        if previo["episodes"] != episodes:
+            print(f"Aviso: el checkpoint era de {previo['episodes']} episodios; el decaimiento de epsilon cambia.")
+        checkpoints.restaurar_rng(previo["rng"])
+        checkpoints.restaurar_motor(env.logic, previo["motor"])
+        if seguimiento is not None and previo.get("convergencia") is not None:
+            seguimiento.restaurar(previo["convergencia"])
+    if checkpoint is not None:
+        checkpoint.iniciar(inicio)
 
     try:
-        for episode_idx in range(episodes):
+        for episode_idx in range(inicio, episodes):
             env.reset()
             done = False
             hand_steps = []
@@ -97,17 +147,27 @@ def train(episodes, alpha, gamma, epsilon):
                 if not any(action_mask):
                     break
 
-                state = agent.encode_state(env, player_id)
-                action = _epsilon_greedy(agent.q_table, state, action_mask, current_epsilon)
+                with inst.seccion("choose_action"):
+                    state = agent.encode_state(env, player_id)
+                    if tabla is None:
+                        action = _epsilon_greedy(agent.q_table, state, action_mask, current_epsilon)
+                    else:
+                        fila = tabla.fila(state)
+                        action, greedy = tabla.elegir(fila, action_mask, current_epsilon)
                 if action is None:
                     break
 
                 _, reward, done, _, _ = env.step(action, player_id)
-                hand_steps.append((state, action, player_id))
-
-                if reward <= -5:
-                    _update_hand(agent.q_table, [hand_steps.pop()], -1.0, alpha, gamma)
-                    continue
+                inst.paso()
+                if tabla is None:
+                    hand_steps.append((state, action, player_id))
+                else:
+                    trayectorias[player_id].agregar(fila, action, action_mask, greedy)
+                    r = recompensa_paso(reward, done, env.logic.estado)
+                    trayectorias[0].recompensa(r)
+                    trayectorias[1].recompensa(-r)
+                    if action == Acciones.IR_AL_MAZO.value:
+                        trayectorias[player_id].recompensa(-0.1)
 
                 current_es_mano = env.logic.estado.es_mano
                 hand_end = done or (current_es_mano != prev_es_mano)
@@ -123,7 +183,12 @@ def train(episodes, alpha, gamma, epsilon):
                     elif final_reward < -1.0:
                         final_reward = -1.0
 
-                    _update_hand(agent.q_table, hand_steps, final_reward, alpha, gamma)
+                    with inst.seccion("learner_update"):
+                        if tabla is None:
+                            _update_hand(agent.q_table, hand_steps, final_reward, alpha, gamma)
+                        else:
+                            for trayectoria in trayectorias:
+                                trayectoria.backup(tabla, alpha, gamma, lam)
                     hand_steps = []
                     hand_start_points = (
                         env.logic.estado.puntos_jugador,
@@ -131,15 +196,53 @@ def train(episodes, alpha, gamma, epsilon):
                     )
                     prev_es_mano = current_es_mano
 
-            _update_hand(agent.q_table, hand_steps, 0.0, alpha, gamma)
+            if tabla is None:
+                _update_hand(agent.q_table, hand_steps, 0.0, alpha, gamma)
+            else:
+                for trayectoria in trayectorias:
+                    trayectoria.backup(tabla, alpha, gamma, lam)
             if t % 1000 == 0 or t == episodes:
-                print(
-                    f"Episodio {t}/{episodes} | epsilon={current_epsilon:.4f} | Q-size={len(agent.q_table)}"
-                )
+                q_size = len(agent.q_table) if tabla is None else tabla.n_pares()
+                print(f"Episodio {t}/{episodes} | epsilon={current_epsilon:.4f} | Q-size={q_size}")
+            if evaluador is not None and evaluador.toca(t):
+                q_size = len(agent.q_table) if tabla is None else tabla.n_pares()
+                evaluador.lanzar(_congelar(agent, tabla), t, q_size=q_size)
+            if seguimiento is not None and seguimiento.toca(t):
+                with inst.seccion("checkpoint_io"):
+                    convergio = seguimiento.registrar(agent.q_table if tabla is None else tabla.a_dict(), t)
+                if convergio:
+                    print(
+                        f"Convergencia en el episodio {t}: desacuerdo < {seguimiento.umbral} "
+                        f"en {seguimiento.paciencia} checkpoints seguidos."
+                    )
+                    break
+            if checkpoint is not None and checkpoint.toca(t):
+                with inst.seccion("checkpoint_io"):
+                    checkpoint.guardar(
+                        {
+                            "episodio": t,
+                            "episodes": episodes,
+                            "q_table": agent.q_table if tabla is None else {},
+                            "tabla": None if tabla is None else tabla.estado(),
+                            "rng": checkpoints.estado_rng(),
+                            "motor": checkpoints.estado_motor(env.logic),
+                            "convergencia": None if seguimiento is None else seguimiento.estado(),
+                        },
+                        t,
+                        epsilon=current_epsilon,
+                        seed=seed,
+                    )
     except KeyboardInterrupt:
         pass
     finally:
-        _save_q_table(agent.q_table)
+        with inst.seccion("checkpoint_io"):
+            if checkpoint is not None:
+                checkpoint.cerrar()
+            if evaluador is not None:
+                evaluador.cerrar()
+            _save_q_table(agent.q_table if tabla is None else tabla.a_dict(), agent.q_table_path)
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
 
 
 if __name__ == "__main__":
@@ -148,6 +251,35 @@ if __name__ == "__main__":
     parser.add_argument("--alpha", type=float, default=0.1, help="Learning rate.")
     parser.add_argument("--gamma", type=float, default=1, help="Discount factor.")
     parser.add_argument("--epsilon", type=float, default=0.5, help="Epsilon para exploracion.")
+    parser.add_argument(
+        "--update-mode",
+        choices=UPDATE_MODOS,
+        default="mc",
+        help="mc: retorno final de la mano; lambda: Q(lambda) de Watkins con las recompensas por paso.",
+    )
+    parser.add_argument("--lam", type=float, default=0.8, help="Lambda de las trazas (modo lambda).")
+    convergencia.agregar_argumentos(parser)
+    checkpoints.agregar_argumentos(parser)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Semilla de random/numpy/torch y del motor (por defecto sin sembrar).",
+    )
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
     args = parser.parse_args()
 
-    train(args.episodes, args.alpha, args.gamma, args.epsilon)
+    train(
+        args.episodes,
+        args.alpha,
+        args.gamma,
+        args.epsilon,
+        desde_args(args),
+        convergencia.desde_args(args),
+        args.update_mode,
+        args.lam,
+        checkpoints.desde_args(args, "q_learning"),
+        evaluacion.desde_args(args),
+        seed=args.seed,
+    )
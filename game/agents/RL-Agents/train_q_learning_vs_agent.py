@@ -1,4 +1,5 @@
 import argparse
+import copy
 import math
 import os
 import pickle
@@ -10,17 +11,24 @@ if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
 from truco_env import TrucoEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
 from constantes import Acciones
+import checkpoints
+import curriculum
+import evaluacion
 from agent_q_learning import QLearningAgent
+import q_table_convergencia as convergencia
+from q_lambda import UPDATE_MODOS, TablaQ, TrayectoriaLambda, recompensa_paso
 from agents.registry import create_agent, get_agent_registry
 
 
 QTABLE_PATH = os.path.join(os.path.dirname(__file__), "q_tables", "q_table.pkl")
 
 
-def _save_q_table(q_table):
-    os.makedirs(os.path.dirname(QTABLE_PATH), exist_ok=True)
-    with open(QTABLE_PATH, "wb") as f:
+def _save_q_table(q_table, path=QTABLE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
         pickle.dump(q_table, f)
 
 
@@ -59,6 +67,13 @@ def _update_hand(q_table, hand_steps, final_reward, alpha, gamma):
         G *= gamma
 
 
+def _congelar(agent, tabla):
+    """Copia greedy fija del agente (snapshots del curriculum y evaluacion en segundo plano)."""
+    copia = copy.copy(agent)
+    copia.q_table = dict(agent.q_table) if tabla is None else tabla.a_dict()
+    return copia
+
+
 def train(
     episodes,
     alpha,
@@ -67,16 +82,56 @@ def train(
     reset_q_table,
     opponent_name,
     q_player,
+    instrumentacion=None,
+    seguimiento=None,
+    update_mode="mc",
+    lam=0.8,
+    encoder=None,
+    checkpoint=None,
+    curriculo=None,
+    evaluador=None,
+    seed=None,
+    model_path=None,
 ):
-    env = TrucoEnv()
-    agent = QLearningAgent(q_table_path=QTABLE_PATH)
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    # Las acciones salen siempre de la mascara: el motor no necesita revalidarlas
+    env = TrucoEnv(instrumentacion=instrumentacion, modo=MODO_TRUSTED)
+    if seed is not None:
+        checkpoints.sembrar(seed, env.logic)
+    agent = QLearningAgent(q_table_path=model_path or QTABLE_PATH, encoder=encoder)
     if reset_q_table:
         agent.q_table = {}
+    tabla = TablaQ.desde_dict(agent.q_table) if update_mode == "lambda" else None
+    trayectoria = TrayectoriaLambda()
+    signo = 1.0 if q_player == 0 else -1.0
+
+    rival = create_agent(opponent_name)
+    if curriculo is not None:
+        curriculo.congelar = lambda: _congelar(agent, tabla)
+
+    inicio = 0
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        inicio = previo["episodio"]
+        agent.q_table = previo["q_table"]
+        if tabla is not None:
+            tabla = TablaQ.desde_estado(previo["tabla"])
+        if previo["episodes"] != episodes:
+            print(f"Aviso: el checkpoint era de {previo['episodes']} episodios; el decaimiento de epsilon cambia.")
+        checkpoints.restaurar_rng(previo["rng"])
+        checkpoints.restaurar_motor(env.logic, previo["motor"])
+        if seguimiento is not None and previo.get("convergencia") is not None:
+            seguimiento.restaurar(previo["convergencia"])
+        if curriculo is not None and previo.get("curriculo") is not None:
+            curriculo.restaurar(previo["curriculo"])
+    if checkpoint is not None:
+        checkpoint.iniciar(inicio)
 
-    opponent = create_agent(opponent_name)
 
     try:
-        for episode_idx in range(episodes):
+        for episode_idx in range(inicio, episodes):
+            if curriculo is not None:
+                rival_nombre, rival = curriculo.oponente()
             env.reset()
             done = False
             hand_steps = []
@@ -97,24 +152,33 @@ def train(
                     break
 
                 if player_id == q_player:
-                    state = agent.encode_state(env, player_id)
-                    action = _epsilon_greedy(
-                        agent.q_table, state, action_mask, current_epsilon
-                    )
+                    with inst.seccion("choose_action"):
+                        state = agent.encode_state(env, player_id)
+                        if tabla is None:
+                            action = _epsilon_greedy(
+                                agent.q_table, state, action_mask, current_epsilon
+                            )
+                        else:
+                            fila = tabla.fila(state)
+                            action, greedy = tabla.elegir(fila, action_mask, current_epsilon)
                     if action is None:
                         break
                 else:
-                    action = opponent.choose_action(action_mask, env, player_id)
+                    with inst.seccion("opponent_choose_action"):
+                        action = rival.choose_action(action_mask, env, player_id)
 
                 _, reward, done, _, _ = env.step(action, player_id)
+                inst.paso()
 
-                if player_id == q_player:
+                if tabla is not None:
+                    if player_id == q_player:
+                        trayectoria.agregar(fila, action, action_mask, greedy)
+                        if action == Acciones.IR_AL_MAZO.value:
+                            trayectoria.recompensa(-0.1)
+                    trayectoria.recompensa(signo * recompensa_paso(reward, done, env.logic.estado))
+                elif player_id == q_player:
                     hand_steps.append((state, action))
 
-                if player_id == q_player and reward <= -5:
-                    _update_hand(agent.q_table, [hand_steps.pop()], -1.0, alpha, gamma)
-                    continue
-
                 current_es_mano = env.logic.estado.es_mano
                 hand_end = done or (current_es_mano != prev_es_mano)
                 if hand_end:
@@ -132,7 +196,11 @@ def train(
                     elif final_reward < -1.0:
                         final_reward = -1.0
 
-                    _update_hand(agent.q_table, hand_steps, final_reward, alpha, gamma)
+                    with inst.seccion("learner_update"):
+                        if tabla is None:
+                            _update_hand(agent.q_table, hand_steps, final_reward, alpha, gamma)
+                        else:
+                            trayectoria.backup(tabla, alpha, gamma, lam)
                     hand_steps = []
                     hand_start_points = (
                         env.logic.estado.puntos_jugador,
@@ -140,15 +208,58 @@ def train(
                     )
                     prev_es_mano = current_es_mano
 
-            _update_hand(agent.q_table, hand_steps, 0.0, alpha, gamma)
+            if tabla is None:
+                _update_hand(agent.q_table, hand_steps, 0.0, alpha, gamma)
+            else:
+                trayectoria.backup(tabla, alpha, gamma, lam)
+            q_size = len(agent.q_table) if tabla is None else tabla.n_pares()
+            if curriculo is not None:
+                puntos = (env.logic.estado.puntos_jugador, env.logic.estado.puntos_oponente)
+                mios, suyos = puntos[q_player], puntos[1 - q_player]
+                curriculo.registrar(1.0 if mios > suyos else 0.5 if mios == suyos else 0.0, rival_nombre)
             if t % 1000 == 0 or t == episodes:
-                print(
-                    f"Episodio {t}/{episodes} | epsilon={current_epsilon:.4f} | Q-size={len(agent.q_table)}"
-                )
+                extra = f" | {curriculo.resumen()}" if curriculo is not None else ""
+                print(f"Episodio {t}/{episodes} | epsilon={current_epsilon:.4f} | Q-size={q_size}{extra}")
+            if evaluador is not None and evaluador.toca(t):
+                evaluador.lanzar(_congelar(agent, tabla), t, q_size=q_size)
+            if seguimiento is not None and seguimiento.toca(t):
+                with inst.seccion("checkpoint_io"):
+                    convergio = seguimiento.registrar(agent.q_table if tabla is None else tabla.a_dict(), t)
+                if convergio:
+                    print(
+                        f"Convergencia en el episodio {t}: desacuerdo < {seguimiento.umbral} "
+                        f"en {seguimiento.paciencia} checkpoints seguidos."
+                    )
+                    break
+            if checkpoint is not None and checkpoint.toca(t):
+                with inst.seccion("checkpoint_io"):
+                    checkpoint.guardar(
+                        {
+                            "episodio": t,
+                            "episodes": episodes,
+                            "q_table": agent.q_table if tabla is None else {},
+                            "tabla": None if tabla is None else tabla.estado(),
+                            "rng": checkpoints.estado_rng(),
+                            "motor": checkpoints.estado_motor(env.logic),
+                            "convergencia": None if seguimiento is None else seguimiento.estado(),
+                            "curriculo": None if curriculo is None else curriculo.estado(),
+                        },
+                        t,
+                        epsilon=current_epsilon,
+                        seed=seed,
+                        opponent=opponent_name,
+                    )
     except KeyboardInterrupt:
         pass
     finally:
-        _save_q_table(agent.q_table)
+        with inst.seccion("checkpoint_io"):
+            if checkpoint is not None:
+                checkpoint.cerrar()
+            if evaluador is not None:
+                evaluador.cerrar()
+            _save_q_table(agent.q_table if tabla is None else tabla.a_dict(), agent.q_table_path)
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
 
 
 if __name__ == "__main__":
@@ -180,6 +291,24 @@ if __name__ == "__main__":
         default=0,
         help="Posicion del agente Q-Learning (0 o 1).",
     )
+    parser.add_argument(
+        "--update-mode",
+        choices=UPDATE_MODOS,
+        default="mc",
+        help="mc: retorno final de la mano; lambda: Q(lambda) de Watkins con las recompensas por paso.",
+    )
+    parser.add_argument("--lam", type=float, default=0.8, help="Lambda de las trazas (modo lambda).")
+    convergencia.agregar_argumentos(parser)
+    checkpoints.agregar_argumentos(parser)
+    curriculum.agregar_argumentos(parser)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Semilla de random/numpy/torch y del motor (por defecto sin sembrar).",
+    )
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
     args = parser.parse_args()
 
     train(
@@ -190,4 +319,12 @@ if __name__ == "__main__":
         args.reset_q_table,
         args.opponent,
         args.q_player,
+        desde_args(args),
+        convergencia.desde_args(args),
+        args.update_mode,
+        args.lam,
+        checkpoint=checkpoints.desde_args(args, "q_learning_vs_agent"),
+        curriculo=curriculum.desde_args(args, seed=args.seed),
+        evaluador=evaluacion.desde_args(args),
+        seed=args.seed,
     )
@@ -0,0 +1,287 @@
+import argparse
+import copy
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from truco_env import TrucoEnv
+from truco_logic import MODO_TRUSTED
+from instrumentacion import Instrumentacion, agregar_argumentos, desde_args
+from constantes import Acciones
+import checkpoints
+import curriculum
+import evaluacion
+from agent_q_linear import QLinearAgent, caracteristicas
+from agents.registry import create_agent, get_agent_registry
+
+
+# =============================================================================
+# ENTRENAMIENTO DEL AGENTE Q LINEAL
+# Mismo esquema y flags que train_q_learning_vs_agent (modo mc): retorno
+# final de la mano descontado con gamma hacia atras, epsilon-greedy con
+# decaimiento coseno. La diferencia es el update: las observaciones de cada
+# mano se acumulan en un buffer y cada `--batch` transiciones se calculan
+# las features y se aplica un solo paso de gradiente vectorizado.
+# `--opponent self` entrena en self-play (las decisiones de los dos jugadores
+# van al buffer, cada una con el retorno desde su perspectiva).
+# =============================================================================
+
+class BufferTransiciones:
+    def __init__(self):
+        self.obs = []
+        self.acciones = []
+        self.objetivos = []
+
+    def __len__(self):
+        return len(self.acciones)
+
+    def agregar_mano(self, pasos, final_reward, gamma):
+        """pasos: [(obs, accion, signo)] de la mano; signo da vuelta el retorno para el otro jugador."""
+        G = float(final_reward)
+        for obs, accion, signo in reversed(pasos):
+            self.obs.append(obs)
+            self.acciones.append(accion)
+            self.objetivos.append(signo * G)
+            G *= gamma
+
+    def aplicar(self, agent, alpha):
+        if not self.acciones:
+            return None
+        idx = caracteristicas(np.array(self.obs, dtype=np.float32), agent.n_features)
+        mse = agent.actualizar(idx, np.array(self.acciones), np.array(self.objetivos, dtype=np.float32), alpha)
+        self.__init__()
+        return mse
+
+
+def _elegir(agent, env, player_id, action_mask, epsilon):
+    if random.random() < epsilon:
+        return random.choice([i for i, valid in enumerate(action_mask) if valid])
+    return agent.choose_action(action_mask, env, player_id)
+
+
+def _congelar(agent):
+    """Copia greedy fija del agente (snapshots del curriculum y evaluacion en segundo plano)."""
+    copia = copy.copy(agent)
+    copia.W = agent.W.copy()
+    return copia
+
+
+def train(
+    episodes,
+    alpha,
+    gamma,
+    epsilon,
+    reset,
+    opponent_name,
+    q_player,
+    instrumentacion=None,
+    n_features=1 << 16,
+    batch=512,
+    checkpoint=None,
+    curriculo=None,
+    evaluador=None,
+    seed=None,
+    model_path=None,
+):
+    inst = instrumentacion or Instrumentacion(enabled=False)
+    env = TrucoEnv(instrumentacion=instrumentacion, modo=MODO_TRUSTED)
+    if seed is not None:
+        checkpoints.sembrar(seed, env.logic)
+    agent = QLinearAgent(model_path=model_path, n_features=n_features)
+    if reset:
+        agent.n_features = n_features
+        agent.W = np.zeros((n_features, agent.num_actions), dtype=np.float32)
+    self_play = opponent_name == "self"
+    if self_play and curriculo is not None:
+        raise ValueError("--curriculum no se combina con --opponent self.")
+    opponent = None if self_play else create_agent(opponent_name)
+    if curriculo is not None:
+        curriculo.congelar = lambda: _congelar(agent)
+    buffer = BufferTransiciones()
+    mse = None
+
+    inicio = 0
+    previo = checkpoint.reanudar() if checkpoint is not None else None
+    if previo is not None:
+        inicio = previo["episodio"]
+        agent.W, agent.n_features = previo["W"], previo["W"].shape[0]
+        buffer.obs, buffer.acciones, buffer.objetivos = previo["buffer"]
+        mse = previo["mse"]
+        if previo["episodes"] != episodes:
+            print(f"Aviso: el checkpoint era de {previo['episodes']} episodios; el decaimiento de epsilon cambia.")
+        checkpoints.restaurar_rng(previo["rng"])
+        checkpoints.restaurar_motor(env.logic, previo["motor"])
+        if curriculo is not None and previo.get("curriculo") is not None:
+            curriculo.restaurar(previo["curriculo"])
+    if checkpoint is not None:
+        checkpoint.iniciar(inicio)
+
+
+    try:
+        for episode_idx in range(inicio, episodes):
+            if curriculo is not None:
+                rival_nombre, opponent = curriculo.oponente()
+            env.reset()
+            done = False
+            hand_steps = []
+            prev_es_mano = env.logic.estado.es_mano
+            hand_start_points = (
+                env.logic.estado.puntos_jugador,
+                env.logic.estado.puntos_oponente,
+            )
+            t = episode_idx + 1
+            current_epsilon = max(0.0, epsilon * math.cos((t * math.pi) / (2 * episodes)))
+
+            while not done:
+                player_id = env.get_current_player()
+                action_mask = env.get_action_mask(player_id)
+                if not any(action_mask):
+                    break
+
+                aprende = self_play or player_id == q_player
+                if aprende:
+                    with inst.seccion("choose_action"):
+                        obs = env.get_observation(player_id)
+                        action = _elegir(agent, env, player_id, action_mask, current_epsilon)
+                else:
+                    with inst.seccion("opponent_choose_action"):
+                        action = opponent.choose_action(action_mask, env, player_id)
+
+                _, _, done, _, _ = env.step(action, player_id)
+                inst.paso()
+                if aprende:
+                    # Retorno desde la perspectiva de q_player; el otro asiento lo ve con signo opuesto
+                    hand_steps.append((obs, action, 1.0 if player_id == q_player else -1.0))
+
+                current_es_mano = env.logic.estado.es_mano
+                if done or current_es_mano != prev_es_mano:
+                    delta_j0 = env.logic.estado.puntos_jugador - hand_start_points[0]
+                    delta_j1 = env.logic.estado.puntos_oponente - hand_start_points[1]
+                    points_diff = delta_j0 - delta_j1 if q_player == 0 else delta_j1 - delta_j0
+                    final_reward = points_diff / 30.0
+                    if aprende and action == Acciones.IR_AL_MAZO.value:
+                        final_reward -= 0.1 if player_id == q_player else -0.1
+                    final_reward = min(1.0, max(-1.0, final_reward))
+                    buffer.agregar_mano(hand_steps, final_reward, gamma)
+                    hand_steps = []
+                    hand_start_points = (
+                        env.logic.estado.puntos_jugador,
+                        env.logic.estado.puntos_oponente,
+                    )
+                    prev_es_mano = current_es_mano
+
+                    if len(buffer) >= batch:
+                        with inst.seccion("learner_update"):
+                            mse = buffer.aplicar(agent, alpha)
+
+            buffer.agregar_mano(hand_steps, 0.0, gamma)
+            if curriculo is not None:
+                puntos = (env.logic.estado.puntos_jugador, env.logic.estado.puntos_oponente)
+                mios, suyos = puntos[q_player], puntos[1 - q_player]
+                curriculo.registrar(1.0 if mios > suyos else 0.5 if mios == suyos else 0.0, rival_nombre)
+            if t % 1000 == 0 or t == episodes:
+                mse_txt = f"{mse:.4f}" if mse is not None else "-"
+                extra = f" | {curriculo.resumen()}" if curriculo is not None else ""
+                print(f"Episodio {t}/{episodes} | epsilon={current_epsilon:.4f} | mse={mse_txt}{extra}")
+            if evaluador is not None and evaluador.toca(t):
+                evaluador.lanzar(_congelar(agent), t, mse=mse)
+            if checkpoint is not None and checkpoint.toca(t):
+                with inst.seccion("checkpoint_io"):
+                    checkpoint.guardar(
+                        {
+                            "episodio": t,
+                            "episodes": episodes,
+                            "W": agent.W,
+                            "buffer": (buffer.obs, buffer.acciones, buffer.objetivos),
+                            "mse": mse,
+                            "rng": checkpoints.estado_rng(),
+                            "motor": checkpoints.estado_motor(env.logic),
+                            "curriculo": None if curriculo is None else curriculo.estado(),
+                        },
+                        t,
+                        epsilon=current_epsilon,
+                        seed=seed,
+                        opponent=opponent_name,
+                    )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with inst.seccion("learner_update"):
+            buffer.aplicar(agent, alpha)
+        with inst.seccion("checkpoint_io"):
+            if checkpoint is not None:
+                checkpoint.cerrar()
+            if evaluador is not None:
+                evaluador.cerrar()
+            agent.save()
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
+
+
+if __name__ == "__main__":
+    registry = get_agent_registry()
+    opponent_choices = ["self"] + sorted(name for name in registry.keys() if name != "q_linear")
+
+    parser = argparse.ArgumentParser(
+        description="Entrena el agente Q-Learning lineal (features hasheadas, updates en batch)."
+    )
+    parser.add_argument("--episodes", type=int, default=100, help="Cantidad de episodios.")
+    parser.add_argument("--alpha", type=float, default=0.1, help="Learning rate.")
+    parser.add_argument("--gamma", type=float, default=1, help="Discount factor.")
+    parser.add_argument("--epsilon", type=float, default=0.5, help="Epsilon para exploracion.")
+    parser.add_argument("--reset", action="store_true", help="Reinicia los pesos antes de entrenar.")
+    parser.add_argument(
+        "--opponent",
+        choices=opponent_choices,
+        default="rational",
+        help="Agente oponente (self = self-play).",
+    )
+    parser.add_argument(
+        "--q-player",
+        type=int,
+        choices=[0, 1],
+        default=0,
+        help="Posicion del agente (0 o 1).",
+    )
+    parser.add_argument(
+        "--features",
+        type=int,
+        default=1 << 16,
+        help="Filas de la tabla de pesos (memoria fija: features x 13 x 4 bytes).",
+    )
+    parser.add_argument("--batch", type=int, default=512, help="Transiciones por update.")
+    checkpoints.agregar_argumentos(parser)
+    curriculum.agregar_argumentos(parser)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Semilla de random/numpy/torch y del motor (por defecto sin sembrar).",
+    )
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    train(
+        args.episodes,
+        args.alpha,
+        args.gamma,
+        args.epsilon,
+        args.reset,
+        args.opponent,
+        args.q_player,
+        desde_args(args),
+        args.features,
+        args.batch,
+        checkpoints.desde_args(args, "q_linear"),
+        curriculum.desde_args(args, seed=args.seed),
+        evaluacion.desde_args(args),
+        seed=args.seed,
+    )
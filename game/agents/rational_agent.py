@@ -2,6 +2,37 @@ from constantes import Acciones
 
 
 class RationalAgent:
+    def __init__(
+        self,
+        usar_equity=False,
+        umbral_fuerte=0.7,
+        umbral_debil=0.3,
+        usar_envido=False,
+        umbral_canto_envido=0.6,
+        umbral_subida_envido=0.8,
+    ):
+        # Con usar_equity la fuerza de la mano sale de la tabla de equity
+        # (game/equity.py) en lugar de mirar rankings sueltos.
+        self.usar_equity = usar_equity
+        self.umbral_fuerte = umbral_fuerte
+        self.umbral_debil = umbral_debil
+        self._tabla = None
+        if usar_equity:
+            from equity import cargar_tabla
+
+            self._tabla = cargar_tabla()
+
+        # Con usar_envido los cantos y respuestas de envido salen del oraculo
+        # (game/envido.py) en lugar de los umbrales fijos de tanto.
+        self.usar_envido = usar_envido
+        self.umbral_canto_envido = umbral_canto_envido
+        self.umbral_subida_envido = umbral_subida_envido
+        self._envido = None
+        if usar_envido:
+            from envido import cargar_tabla as cargar_tabla_envido
+
+            self._envido = cargar_tabla_envido()
+
     def choose_action(self, action_mask, env=None, player_id=0):
         valid_actions = [i for i, valid in enumerate(action_mask) if valid]
         if not valid_actions:
@@ -20,7 +51,12 @@ class RationalAgent:
             if action_mask[Acciones.QUIERO.value]:
                 return Acciones.QUIERO.value
 
-        if estado.turno_responder_envido:
+        if self.usar_envido:
+            envido_action = self._decidir_envido(estado, env, player_id)
+            if envido_action is not None:
+                return envido_action
+
+        elif estado.turno_responder_envido:
             raise_action = self._mejor_subida_envido(action_mask)
             if envido_points == 33 and is_mano and raise_action is not None:
                 return raise_action
@@ -31,7 +67,7 @@ class RationalAgent:
             if action_mask[Acciones.NO_QUIERO.value]:
                 return Acciones.NO_QUIERO.value
 
-        if not estado.turno_responder_envido:
+        if not self.usar_envido and not estado.turno_responder_envido:
             if envido_points > 30 and action_mask[Acciones.REAL_ENVIDO.value]:
                 return Acciones.REAL_ENVIDO.value
             if envido_points > 27 and action_mask[Acciones.ENVIDO.value]:
@@ -59,6 +95,26 @@ class RationalAgent:
         jugadas = [c[0] for c in estado.cartas_jugadas if c[1] == player_id]
         return env.logic.calcular_puntos_envido(mano + jugadas)
 
+    def _decidir_envido(self, estado, env, player_id):
+        valores = self._envido.puntos_esperados(env.logic, player_id)
+        if not valores:
+            return None
+        prob = self._envido.probabilidad_jugador(env.logic, player_id)
+        if estado.turno_responder_envido:
+            candidatas = [Acciones.QUIERO.value, Acciones.NO_QUIERO.value]
+            if prob >= self.umbral_subida_envido:
+                candidatas += [Acciones.ENVIDO_ENVIDO.value, Acciones.REAL_ENVIDO.value, Acciones.FALTA_ENVIDO.value]
+        elif prob >= self.umbral_subida_envido:
+            candidatas = [Acciones.ENVIDO.value, Acciones.REAL_ENVIDO.value]
+        elif prob >= self.umbral_canto_envido:
+            candidatas = [Acciones.ENVIDO.value]
+        else:
+            return None
+        candidatas = [accion for accion in candidatas if accion in valores]
+        if not candidatas:
+            return None
+        return max(candidatas, key=valores.get)
+
     def _mejor_subida_envido(self, action_mask):
         if action_mask[Acciones.FALTA_ENVIDO.value]:
             return Acciones.FALTA_ENVIDO.value
@@ -122,6 +178,8 @@ class RationalAgent:
         mano = estado.mano_jugador if player_id == 0 else estado.mano_oponente
         if not mano:
             return False
+        if self.usar_equity:
+            return self._tabla.equity_jugador(env.logic, player_id) >= self.umbral_fuerte
         return any(env.logic.obtener_ranking(carta) <= 2 for carta in mano)
 
     def _todas_cartas_debiles(self, env, player_id):
@@ -129,4 +187,6 @@ class RationalAgent:
         mano = estado.mano_jugador if player_id == 0 else estado.mano_oponente
         if not mano:
             return True
+        if self.usar_equity:
+            return self._tabla.equity_jugador(env.logic, player_id) < self.umbral_debil
         return all(env.logic.obtener_ranking(carta) >= 10 for carta in mano)
@@ -15,6 +15,26 @@ def _load_q_learning_agent():
     spec.loader.exec_module(module)
     return module.QLearningAgent
 
+def _load_q_linear_agent():
+    base_dir = os.path.dirname(__file__)
+    agent_path = os.path.join(base_dir, "RL-Agents", "agent_q_linear.py")
+    spec = importlib.util.spec_from_file_location("agent_q_linear", agent_path)
+    if spec is None or spec.loader is None:
+        raise ImportError("No se pudo cargar agent_q_linear.py.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.QLinearAgent
+
+def _load_dqn_agent():
+    base_dir = os.path.dirname(__file__)
+    agent_path = os.path.join(base_dir, "RL-Agents", "agent_dqn.py")
+    spec = importlib.util.spec_from_file_location("agent_dqn", agent_path)
+    if spec is None or spec.loader is None:
+        raise ImportError("No se pudo cargar agent_dqn.py.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DQNAgent
+
 def _load_policy_gradient_agent():
     base_dir = os.path.dirname(__file__)
     agent_path = os.path.join(base_dir, "RL-Agents", "agent_policy_gradient.py")
@@ -62,7 +82,10 @@ def get_agent_registry():
     return {
         "random": RandomAgent,
         "rational": RationalAgent,
+        "rational_equity": lambda: RationalAgent(usar_equity=True, usar_envido=True),
         "q_learning": _load_q_learning_agent(),
+        "q_linear": _load_q_linear_agent(),
+        "dqn": _load_dqn_agent(),
         "policy_gradient": _load_policy_gradient_agent(),
         "policy_gradient_nn": _load_policy_gradient_nn_agent(),
         "sb3": _load_sb3_agent(),
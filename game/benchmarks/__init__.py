@@ -0,0 +1 @@
+"""Benchmarks reproducibles del motor, el entorno, los agentes y los entrenadores."""
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from benchmarks.escenarios import ESCENARIOS
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(GAME_DIR, ".."))
+HISTORY_PATH = os.path.join(PROJECT_ROOT, "resultados", "benchmarks_history.json")
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _mejor(a, b):
+    """Se queda con la mejor repeticion de cada metrica (reduce el ruido de la maquina)."""
+    if a is None:
+        return b
+    if a["mejor"] == "mayor":
+        return a if a["valor"] >= b["valor"] else b
+    return a if a["valor"] <= b["valor"] else b
+
+
+def run(escenarios, seed, escala, repeticiones, agentes=None, entrenadores=None):
+    resultados = {}
+    for nombre in escenarios:
+        fn = ESCENARIOS[nombre]
+        kwargs = {}
+        if nombre in ("partidas", "latencia") and agentes:
+            kwargs["agentes"] = agentes
+        if nombre == "entrenadores" and entrenadores:
+            kwargs["entrenadores"] = entrenadores
+        mejores = {}
+        for _ in range(repeticiones):
+            for metrica, valor in fn(seed, escala, **kwargs).items():
+                mejores[metrica] = _mejor(mejores.get(metrica), valor)
+        for metrica, valor in mejores.items():
+            resultados[f"{nombre}.{metrica}"] = valor
+            print(f"{nombre}.{metrica}: {valor['valor']:.2f} {valor['unidad']}")
+    return resultados
+
+
+def compare(baseline, current, threshold):
+    """Devuelve la lista de regresiones (metrica, base, actual, cambio relativo)."""
+    regresiones = []
+    for metrica, actual in current["resultados"].items():
+        base = baseline["resultados"].get(metrica)
+        if base is None or base["valor"] == 0:
+            continue
+        cambio = (actual["valor"] - base["valor"]) / base["valor"]
+        peor = -cambio if actual["mejor"] == "mayor" else cambio
+        marca = "REGRESION" if peor > threshold else ""
+        print(
+            f"{metrica:<55} {base['valor']:>12.2f} -> {actual['valor']:>12.2f} "
+            f"{actual['unidad']:<12} {cambio:+.1%} {marca}"
+        )
+        if peor > threshold:
+            regresiones.append((metrica, base["valor"], actual["valor"], cambio))
+    return regresiones
+
+
+def _cmd_run(args):
+    escenarios = args.escenarios or list(ESCENARIOS.keys())
+    t0 = time.time()
+    resultados = run(
+        escenarios,
+        args.seed,
+        args.escala,
+        args.repeticiones,
+        agentes=args.agents,
+        entrenadores=args.entrenadores,
+    )
+    entrada = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "etiqueta": args.etiqueta,
+        "python": platform.python_version(),
+        "maquina": platform.node(),
+        "seed": args.seed,
+        "escala": args.escala,
+        "repeticiones": args.repeticiones,
+        "duracion_s": round(time.time() - t0, 2),
+        "resultados": resultados,
+    }
+    history = load_history(args.history)
+    history.append(entrada)
+    save_history(args.history, history)
+    print(f"Resultados agregados a {args.history} (corrida #{len(history) - 1})")
+
+
+def _cmd_compare(args):
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Se necesitan al menos dos corridas en el historial.")
+        return 0
+    baseline = history[args.baseline]
+    current = history[args.current]
+    print(f"Base:   {baseline['fecha']} commit={baseline.get('commit')} {baseline.get('etiqueta') or ''}")
+    print(f"Actual: {current['fecha']} commit={current.get('commit')} {current.get('etiqueta') or ''}")
+    regresiones = compare(baseline, current, args.threshold)
+    if regresiones:
+        print(f"{len(regresiones)} regresion(es) mayores a {args.threshold:.0%}.")
+        return 1
+    print("Sin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del motor, entorno, agentes y entrenadores.")
+    parser.add_argument("--history", default=HISTORY_PATH, help="Archivo JSON con el historial de corridas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Corre los escenarios y agrega el resultado al historial.")
+    p_run.add_argument(
+        "--escenarios",
+        nargs="*",
+        choices=sorted(ESCENARIOS.keys()),
+        default=None,
+        help="Escenarios a correr (por defecto todos).",
+    )
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--escala", type=float, default=1.0, help="Multiplicador del tamano de cada escenario.")
+    p_run.add_argument("--repeticiones", type=int, default=3, help="Se guarda la mejor repeticion.")
+    p_run.add_argument("--agents", nargs="*", default=None, help="Agentes del registry a incluir.")
+    p_run.add_argument("--entrenadores", nargs="*", default=None, help="Entrenadores a incluir.")
+    p_run.add_argument("--etiqueta", default=None, help="Texto libre para identificar la corrida.")
+    p_run.set_defaults(func=_cmd_run)
+
+    p_cmp = sub.add_parser("compare", help="Compara dos corridas del historial y marca regresiones.")
+    p_cmp.add_argument("--baseline", type=int, default=-2, help="Indice de la corrida base.")
+    p_cmp.add_argument("--current", type=int, default=-1, help="Indice de la corrida a evaluar.")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento relativo tolerado.")
+    p_cmp.set_defaults(func=_cmd_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args) or 0)
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from benchmarks.escenarios import RL_DIR
+
+if RL_DIR not in sys.path:
+    sys.path.insert(0, RL_DIR)
+import evaluacion
+import train_q_learning_vs_agent
+
+
+# =============================================================================
+# EFICIENCIA DE MUESTRAS: Q-LEARNING MC vs Q(lambda)
+# Entrena train_q_learning_vs_agent desde cero contra `--opponent` con cada
+# modo de update (Q-table en un directorio temporal), evalua la politica
+# greedy (evaluacion.EvaluacionIncremental, en el mismo proceso) cada
+# `--eval-cada` episodios y reporta cuantos episodios hicieron falta para
+# llegar al winrate `--objetivo`, promediando sobre `--seeds`.
+# =============================================================================
+
+
+def _correr(modo, lam, args, seed):
+    evaluador = evaluacion.EvaluacionIncremental(
+        args.eval_cada, rivales=[args.opponent], partidas=args.eval_partidas, workers=0
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        train_q_learning_vs_agent.train(
+            args.episodes,
+            args.alpha,
+            args.gamma,
+            args.epsilon,
+            True,
+            args.opponent,
+            0,
+            update_mode=modo,
+            lam=lam,
+            evaluador=evaluador,
+            seed=seed,
+            model_path=os.path.join(tmp_dir, "q_table.pkl"),
+        )
+    return [
+        {"episodio": fila["unidades"], "segundos": fila["segundos_entrenamiento"], "winrate": fila["winrate"]}
+        for fila in evaluador.historial
+    ]
+
+
+def _episodios_hasta(curva, objetivo):
+    for punto in curva:
+        if punto["winrate"] >= objetivo:
+            return punto["episodio"]
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Episodios hasta un winrate objetivo: mc vs Q(lambda).")
+    parser.add_argument("--episodes", type=int, default=20000)
+    parser.add_argument("--eval-cada", type=int, default=2000)
+    parser.add_argument("--eval-partidas", type=int, default=200)
+    parser.add_argument("--objetivo", type=float, default=0.3, help="Winrate objetivo contra el oponente.")
+    parser.add_argument("--opponent", default="rational")
+    parser.add_argument("--lams", type=float, nargs="+", default=[0.0, 0.8], help="Lambdas a probar.")
+    parser.add_argument("--alpha", type=float, default=0.1)
+    parser.add_argument("--gamma", type=float, default=1.0)
+    parser.add_argument("--epsilon", type=float, default=0.5)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--json", default=None, help="Guarda las curvas en este archivo.")
+    args = parser.parse_args()
+
+    variantes = [("mc", None)] + [("lambda", lam) for lam in args.lams]
+    resultados = {}
+    for modo, lam in variantes:
+        nombre = modo if lam is None else f"lambda={lam}"
+        corridas = [_correr(modo, lam if lam is not None else 0.0, args, seed) for seed in args.seeds]
+        hasta = [_episodios_hasta(curva, args.objetivo) for curva in corridas]
+        finales = [curva[-1]["winrate"] for curva in corridas if curva]
+        resultados[nombre] = {"episodios_hasta_objetivo": hasta, "curvas": corridas}
+        alcanzados = [h for h in hasta if h is not None]
+        resumen = f"{np.mean(alcanzados):.0f}" if alcanzados else "no alcanzado"
+        print(
+            f"{nombre:>12}: episodios hasta {args.objetivo:.2f} = {resumen} "
+            f"({len(alcanzados)}/{len(hasta)} seeds) | winrate final={np.mean(finales):.3f}"
+        )
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "resultados": resultados}, f, indent=2)
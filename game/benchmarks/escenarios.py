@@ -0,0 +1,287 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+RL_DIR = os.path.join(GAME_DIR, "agents", "RL-Agents")
+
+from truco_env import OBS_RICA, TrucoEnv
+from truco_logic import MODO_NORMAL, MODO_TRUSTED
+import checkpoints
+
+
+# =============================================================================
+# ESCENARIOS
+# Cada escenario recibe (seed, escala) y devuelve {metrica: resultado}, donde
+# resultado = {"valor": float, "unidad": str, "mejor": "mayor" | "menor"}.
+# `escala` multiplica el tamano de trabajo (1.0 = corrida normal).
+# =============================================================================
+
+
+def _metrica(valor, unidad, mejor):
+    return {"valor": float(valor), "unidad": unidad, "mejor": mejor}
+
+
+def _grabar_partidas(seed, games):
+    """Juega partidas random vs random sembradas y devuelve las acciones de cada una."""
+    env = TrucoEnv()
+    rng = random.Random(seed)
+    partidas = []
+    for g in range(games):
+        env.reset(seed=seed + g)
+        acciones = []
+        done = False
+        while not done:
+            player_id = env.get_current_player()
+            mask = env.get_action_mask(player_id)
+            valid = [i for i, ok in enumerate(mask) if ok]
+            if not valid:
+                break
+            action = rng.choice(valid)
+            acciones.append((action, player_id))
+            _, _, done, _, _ = env.step(action, player_id)
+        partidas.append(acciones)
+    return partidas
+
+
+def escenario_motor(seed, escala):
+    """aplicar_accion puro, mascaras y _estado_a_observacion sobre partidas grabadas."""
+    games = max(1, int(300 * escala))
+    partidas = _grabar_partidas(seed, games)
+    env = TrucoEnv()
+    logic = env.logic
+
+    # 1. aplicar_accion solamente (mismas partidas, mismos repartos)
+    steps = 0
+    t_total = 0.0
+    for g, acciones in enumerate(partidas):
+        env.reset(seed=seed + g)
+        t0 = time.perf_counter()
+        for action, player_id in acciones:
+            logic.aplicar_accion(action, player_id)
+        t_total += time.perf_counter() - t0
+        steps += len(acciones)
+
+    # 1b. Lo mismo con el motor en modo trusted (sin revalidar legalidad)
+    logic.modo = MODO_TRUSTED
+    t_trusted = 0.0
+    for g, acciones in enumerate(partidas):
+        env.reset(seed=seed + g)
+        t0 = time.perf_counter()
+        for action, player_id in acciones:
+            logic.aplicar_accion(action, player_id)
+        t_trusted += time.perf_counter() - t0
+    logic.modo = MODO_NORMAL
+
+    # 2. get_action_mask, get_action_bits y _estado_a_observacion (basica y rica) en cada estado
+    env_rico = TrucoEnv(obs_mode=OBS_RICA)
+    env_rico.logic = logic
+    t_mask = 0.0
+    t_bits = 0.0
+    t_obs = 0.0
+    t_obs_rica = 0.0
+    for g, acciones in enumerate(partidas):
+        env.reset(seed=seed + g)
+        for action, player_id in acciones:
+            t0 = time.perf_counter()
+            logic.get_action_mask(player_id)
+            t1 = time.perf_counter()
+            logic.get_action_bits(player_id)
+            t2 = time.perf_counter()
+            env._estado_a_observacion(player_id)
+            t3 = time.perf_counter()
+            env_rico._estado_a_observacion(player_id)
+            t4 = time.perf_counter()
+            t_mask += t1 - t0
+            t_bits += t2 - t1
+            t_obs += t3 - t2
+            t_obs_rica += t4 - t3
+            logic.aplicar_accion(action, player_id)
+
+    return {
+        "aplicar_accion": _metrica(steps / t_total, "steps/s", "mayor"),
+        "aplicar_accion_trusted": _metrica(steps / t_trusted, "steps/s", "mayor"),
+        "get_action_mask": _metrica(t_mask / steps * 1e6, "us/llamada", "menor"),
+        "get_action_bits": _metrica(t_bits / steps * 1e6, "us/llamada", "menor"),
+        "estado_a_observacion": _metrica(t_obs / steps * 1e6, "us/llamada", "menor"),
+        "estado_a_observacion_rich": _metrica(t_obs_rica / steps * 1e6, "us/llamada", "menor"),
+    }
+
+
+def _crear_agentes(nombres):
+    from agents.registry import get_agent_registry
+
+    registry = get_agent_registry()
+    agentes = {}
+    omitidos = {}
+    for nombre in nombres or sorted(registry.keys()):
+        try:
+            agentes[nombre] = registry[nombre]()
+        except Exception as exc:  # dependencias opcionales (torch, sb3, modelos)
+            omitidos[nombre] = f"{type(exc).__name__}: {exc}"
+    return agentes, omitidos
+
+
+def _jugar(env, agentes, seed, latencias=None):
+    env.reset(seed=seed)
+    done = False
+    steps = 0
+    while not done:
+        player_id = env.get_current_player()
+        mask = env.get_action_mask(player_id)
+        if not any(mask):
+            break
+        agente = agentes[player_id]
+        t0 = time.perf_counter()
+        action = agente.choose_action(mask, env, player_id)
+        if latencias is not None:
+            latencias[player_id].append(time.perf_counter() - t0)
+        _, _, done, _, _ = env.step(action, player_id)
+        steps += 1
+    return steps
+
+
+def escenario_partidas(seed, escala, agentes=None):
+    """Partidas completas por segundo para cada par de agentes del registry."""
+    games = max(1, int(20 * escala))
+    instancias, omitidos = _crear_agentes(agentes)
+    env = TrucoEnv()
+    resultados = {}
+    for a0, agente_0 in instancias.items():
+        for a1, agente_1 in instancias.items():
+            checkpoints.sembrar(seed)
+            t0 = time.perf_counter()
+            for g in range(games):
+                _jugar(env, (agente_0, agente_1), seed + g)
+            elapsed = time.perf_counter() - t0
+            resultados[f"{a0}_vs_{a1}"] = _metrica(games / elapsed, "partidas/s", "mayor")
+    for nombre, motivo in omitidos.items():
+        print(f"[bench] agente omitido {nombre}: {motivo}")
+    return resultados
+
+
+def escenario_latencia(seed, escala, agentes=None):
+    """Latencia de decision (p50/p99) de cada agente jugando contra random."""
+    from agents.random_agent import RandomAgent
+
+    games = max(1, int(30 * escala))
+    instancias, omitidos = _crear_agentes(agentes)
+    env = TrucoEnv()
+    rival = RandomAgent()
+    resultados = {}
+    for nombre, agente in instancias.items():
+        checkpoints.sembrar(seed)
+        latencias = ([], [])
+        for g in range(games):
+            # Alterna el asiento para cubrir decisiones como mano y como pie
+            seats = (agente, rival) if g % 2 == 0 else (rival, agente)
+            lat_partida = ([], [])
+            _jugar(env, seats, seed + g, lat_partida)
+            latencias[0].extend(lat_partida[0 if g % 2 == 0 else 1])
+        valores = np.array(latencias[0]) * 1e6
+        if valores.size == 0:
+            continue
+        resultados[f"{nombre}_p50"] = _metrica(np.percentile(valores, 50), "us", "menor")
+        resultados[f"{nombre}_p99"] = _metrica(np.percentile(valores, 99), "us", "menor")
+    for nombre, motivo in omitidos.items():
+        print(f"[bench] agente omitido {nombre}: {motivo}")
+    return resultados
+
+
+def _entrenadores():
+    if RL_DIR not in sys.path:
+        sys.path.insert(0, RL_DIR)
+    import entrenadores
+
+    return entrenadores
+
+
+_Q = {"alpha": 0.1, "gamma": 1.0, "epsilon": 0.5, "update_mode": "mc", "lam": 0.8}
+_PG = {"gamma": 0.95, "lr_value": 1e-3, "clip_eps": 0.2, "epochs": 4}
+
+ENTRENADORES = {
+    # nombre: (trainer de entrenadores.py, hiperparametros, unidades de trabajo base, unidad)
+    "train_q_learning": ("q_learning", _Q, 200, "episodios/s"),
+    "train_q_learning_vs_agent": ("q_learning_vs_agent", dict(_Q, opponent="rational"), 200, "episodios/s"),
+    "train_q_linear": (
+        "q_linear",
+        {"alpha": 0.1, "gamma": 1.0, "epsilon": 0.5, "features": 1 << 16, "batch": 512, "opponent": "rational"},
+        200,
+        "episodios/s",
+    ),
+    "train_dqn": (
+        "dqn",
+        {
+            "lr": 5e-4,
+            "gamma": 0.99,
+            "epsilon": 1.0,
+            "exploracion": 0.5,
+            "batch": 256,
+            "n_envs": 16,
+            "aprender_desde": 2_000,
+            "target_cada": 2_000,
+            "dueling": True,
+            "hidden_size": 128,
+            "opponent": "rational",
+        },
+        10_000,
+        "pasos/s",
+    ),
+    "train_policy_gradient": ("policy_gradient", dict(_PG, lr_policy=1e-3), 300, "manos/s"),
+    "train_policy_gradient_nn": ("policy_gradient_nn", dict(_PG, lr_policy=3e-4), 300, "manos/s"),
+}
+
+
+def escenario_entrenadores(seed, escala, entrenadores=None):
+    """Throughput de cada script de entrenamiento (modelos en un directorio temporal)."""
+    from agents.registry import get_agent_registry
+
+    adaptadores = _entrenadores()
+    get_agent_registry()  # importa los agentes (y torch) fuera de la medicion
+    resultados = {}
+    for nombre, (trainer, hp, base, unidad) in ENTRENADORES.items():
+        if entrenadores and nombre not in entrenadores:
+            continue
+        trabajo = max(1, int(base * escala))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            try:
+                modulo = adaptadores.cargar(trainer)
+                t0 = time.perf_counter()
+                adaptadores.ENTRENADORES[trainer]["entrenar"](modulo, tmp_dir, trabajo, dict(hp, seed=seed))
+                elapsed = time.perf_counter() - t0
+            except ImportError as exc:
+                print(f"[bench] entrenador omitido {nombre}: {exc}")
+                continue
+        resultados[nombre] = _metrica(trabajo / elapsed, unidad, "mayor")
+    return resultados
+
+
+def escenario_kernel(seed, escala):
+    """Playouts/s del kernel de vueltas desde el inicio de una mano (rival sorteado)."""
+    from kernel_playout import NUMBA_DISPONIBLE, playouts
+
+    n = max(1, int(1_000_000 * escala)) if NUMBA_DISPONIBLE else max(1, int(20_000 * escala))
+    env = TrucoEnv()
+    env.reset(seed=seed)
+    playouts(env.logic, 10, seed=seed)  # compilacion fuera de la medicion
+    t0 = time.perf_counter()
+    playouts(env.logic, n, rival=1, seed=seed)
+    elapsed = time.perf_counter() - t0
+    # Con y sin numba son metricas distintas (no tiene sentido compararlas entre si)
+    nombre = "playouts" if NUMBA_DISPONIBLE else "playouts_python"
+    return {nombre: _metrica(n / elapsed, "playouts/s", "mayor")}
+
+
+ESCENARIOS = {
+    "motor": escenario_motor,
+    "kernel": escenario_kernel,
+    "partidas": escenario_partidas,
+    "latencia": escenario_latencia,
+    "entrenadores": escenario_entrenadores,
+}
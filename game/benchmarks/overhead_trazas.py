@@ -0,0 +1,65 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from agent_matchup import _play_game
+from agents.registry import create_agent
+from trazas import TraceRecorder
+from truco_env import TrucoEnv
+
+
+# =============================================================================
+# OVERHEAD DEL GRABADOR DE TRAZAS
+# Juega las mismas partidas sembradas con y sin TraceRecorder, intercaladas por
+# bloques (alternando cual va primero) para que el ruido de la maquina afecte
+# a las dos variantes por igual. El tiempo con traza incluye el volcado final.
+# Objetivo: menos de 5%. Medido en 1 vCPU (6000 partidas): +5-6% random vs
+# random y +6-8% rational vs rational, asi que en el peor caso no se cumple.
+# =============================================================================
+
+
+def _bloque(env, agente_0, agente_1, inicio, n):
+    random.seed(inicio)
+    np.random.seed(inicio)
+    t0 = time.perf_counter()
+    for i in range(inicio, inicio + n):
+        env.logic.sembrar(i)
+        _play_game(env, agente_0, agente_1)
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overhead de TraceRecorder sobre partidas sembradas.")
+    parser.add_argument("--partidas", type=int, default=3000)
+    parser.add_argument("--bloque", type=int, default=50, help="Partidas por bloque intercalado.")
+    parser.add_argument("--agents", nargs=2, default=["random", "random"])
+    args = parser.parse_args()
+
+    agente_0, agente_1 = (create_agent(nombre) for nombre in args.agents)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recorder = TraceRecorder(os.path.join(tmp_dir, "overhead.trtrace"))
+        envs = {"sin traza": TrucoEnv(), "con traza": TrucoEnv(recorder=recorder)}
+        tiempos = {nombre: [] for nombre in envs}
+        for k, inicio in enumerate(range(0, args.partidas, args.bloque)):
+            n = min(args.bloque, args.partidas - inicio)
+            orden = list(envs) if k % 2 == 0 else list(reversed(envs))
+            for nombre in orden:
+                tiempos[nombre].append(_bloque(envs[nombre], agente_0, agente_1, inicio, n))
+        t0 = time.perf_counter()
+        recorder.close()
+        tiempos["con traza"][-1] += time.perf_counter() - t0
+
+    base = np.array(tiempos["sin traza"])
+    traza = np.array(tiempos["con traza"])
+    print(f"{args.agents[0]} vs {args.agents[1]}, {args.partidas} partidas")
+    print(f"  sin traza: {base.sum():.2f}s | con traza: {traza.sum():.2f}s")
+    print(f"  overhead total: {traza.sum() / base.sum() - 1:+.1%} | mediana por bloque: {np.median(traza / base - 1):+.1%}")
@@ -0,0 +1,78 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from constantes import CARTAS
+from envido import TABLA_PATH, TablaEnvido
+from truco_logic import TrucoGameLogic
+
+
+# =============================================================================
+# VERIFICACION DEL ORACULO DE ENVIDO
+# Para manos y cartas reveladas al azar enumera todas las manos rivales sobre
+# cartas reales (las que contienen lo revelado) y resuelve cada envido con
+# TrucoGameLogic.calcular_puntos_envido; la tabla tiene que dar lo mismo.
+# =============================================================================
+
+
+def _fuerza_bruta(logic, mias, reveladas, es_mano):
+    mi_tanto = logic.calcular_puntos_envido(list(mias))
+    restantes = [c for c in CARTAS if c not in mias and c not in reveladas]
+    ganadas = 0
+    total = 0
+    for resto in itertools.combinations(restantes, 3 - len(reveladas)):
+        su_tanto = logic.calcular_puntos_envido(list(reveladas) + list(resto))
+        ganadas += mi_tanto > su_tanto or (mi_tanto == su_tanto and es_mano)
+        total += 1
+    return ganadas / total
+
+
+def verificar(tabla, casos, seed):
+    rng = random.Random(seed)
+    logic = TrucoGameLogic()
+    for n in range(casos):
+        cartas = rng.sample(CARTAS, 3 + rng.randint(0, 2))
+        mias, reveladas = cartas[:3], cartas[3:]
+        es_mano = rng.random() < 0.5
+        esperado = _fuerza_bruta(logic, mias, reveladas, es_mano)
+        obtenido = tabla.probabilidad(mias, reveladas, es_mano)
+        if abs(esperado - obtenido) > 1e-12:
+            raise AssertionError(
+                f"Caso {n}: mias={mias} reveladas={reveladas} es_mano={es_mano} "
+                f"fuerza_bruta={esperado:.6f} tabla={obtenido:.6f}"
+            )
+
+
+def medir(tabla, consultas, seed):
+    rng = random.Random(seed)
+    casos = []
+    for _ in range(1000):
+        cartas = rng.sample(CARTAS, 3 + rng.randint(0, 1))
+        casos.append((cartas[:3], cartas[3:], rng.random() < 0.5))
+    t0 = time.perf_counter()
+    for i in range(consultas):
+        mias, reveladas, es_mano = casos[i % len(casos)]
+        tabla.probabilidad(mias, reveladas, es_mano)
+    return (time.perf_counter() - t0) / consultas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica el oraculo de envido contra fuerza bruta.")
+    parser.add_argument("--tabla", default=TABLA_PATH)
+    parser.add_argument("--casos", type=int, default=2000)
+    parser.add_argument("--consultas", type=int, default=200_000, help="Consultas para medir latencia.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tabla = TablaEnvido.cargar(args.tabla)
+    t0 = time.perf_counter()
+    verificar(tabla, args.casos, args.seed)
+    print(f"OK: {args.casos} casos iguales a la fuerza bruta ({time.perf_counter() - t0:.1f}s).")
+    print(f"{medir(tabla, args.consultas, args.seed) * 1e6:.2f} us por consulta.")
@@ -0,0 +1,99 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from constantes import CARTAS, MAZO_DATOS
+from equity import PERMUTACIONES, TABLA_PATH, TablaEquity
+from kernel_playout import _ganador_mano, playouts
+from truco_logic import TrucoGameLogic
+
+
+# =============================================================================
+# VERIFICACION DE LA TABLA DE EQUITY
+# 1. Fuerza bruta sobre cartas reales: todas las manos rivales (que contengan
+#    lo revelado) x las 36 combinaciones de orden de juego, resolviendo cada
+#    mano con las reglas del kernel de playouts.
+# 2. Monte Carlo con el kernel desde el inicio de una mano real.
+# Solo aplica a tablas construidas con politicas uniformes.
+# =============================================================================
+
+
+def _ranking(carta):
+    return MAZO_DATOS[carta]["ranking"]
+
+
+def _fuerza_bruta(mano, reveladas, es_mano):
+    restantes = [c for c in CARTAS if c not in mano and c not in reveladas]
+    mias = sorted(_ranking(c) for c in mano)
+    resultados = np.zeros(3, dtype=np.int64)
+    ganadas = 0
+    casos = 0
+    for resto in itertools.combinations(restantes, 3 - len(reveladas)):
+        rival = sorted(_ranking(c) for c in list(reveladas) + list(resto))
+        for sigma in PERMUTACIONES:
+            for tau in PERMUTACIONES:
+                ganador = -1
+                for k in range(3):
+                    a, b = mias[sigma[k]], rival[tau[k]]
+                    resultados[k] = 0 if a < b else (1 if b < a else 2)
+                    ganador = _ganador_mano(resultados, k + 1, es_mano)
+                    if ganador != -1:
+                        break
+                ganadas += ganador == 0
+                casos += 1
+    return ganadas / casos
+
+
+def verificar(tabla, casos, seed, tolerancia=2e-3):
+    rng = random.Random(seed)
+    for n in range(casos):
+        cartas = rng.sample(CARTAS, 3 + rng.randint(0, 2))
+        mano, reveladas = cartas[:3], cartas[3:]
+        es_mano = rng.random() < 0.5
+        esperado = _fuerza_bruta(mano, reveladas, es_mano)
+        obtenido = tabla.equity([_ranking(c) for c in mano], [_ranking(c) for c in reveladas], es_mano)
+        if abs(esperado - obtenido) > tolerancia:
+            raise AssertionError(
+                f"Caso {n}: mano={mano} reveladas={reveladas} es_mano={es_mano} "
+                f"fuerza_bruta={esperado:.4f} tabla={obtenido:.4f}"
+            )
+
+
+def verificar_playouts(tabla, casos, seed, n_playouts=200_000):
+    logic = TrucoGameLogic(rng=random.Random(seed))
+    for _ in range(casos):
+        logic.reset_partida()
+        estado = logic.estado
+        # Evaluacion desde J0 con las cartas de J1 sorteadas
+        resultados = playouts(logic, n_playouts, rival=1, seed=seed)
+        mc = float((resultados > 0).mean())
+        esperado = tabla.equity_jugador(logic, 0)
+        sigma = max(np.sqrt(esperado * (1 - esperado) / n_playouts), 1e-4)
+        if abs(mc - esperado) > 5 * sigma + 2e-3:
+            raise AssertionError(
+                f"Mano {estado.mano_jugador} (es_mano={estado.es_mano}): "
+                f"playouts={mc:.4f} tabla={esperado:.4f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica la tabla de equity contra fuerza bruta y playouts.")
+    parser.add_argument("--tabla", default=TABLA_PATH)
+    parser.add_argument("--casos", type=int, default=200)
+    parser.add_argument("--casos-playouts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tabla = TablaEquity.cargar(args.tabla)
+    verificar(tabla, args.casos, args.seed)
+    print(f"OK: {args.casos} casos iguales a la fuerza bruta.")
+    verificar_playouts(tabla, args.casos_playouts, args.seed)
+    print(f"OK: {args.casos_playouts} manos consistentes con kernel_playout.")
@@ -0,0 +1,102 @@
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from constantes import Acciones
+from kernel_playout import NUMBA_DISPONIBLE, _resolver_con_elecciones, playouts
+from truco_logic import TrucoGameLogic
+
+
+# =============================================================================
+# PARIDAD DEL KERNEL DE PLAYOUTS
+# Lleva el motor a estados al azar (con cantos y vueltas ya jugadas), elige una
+# secuencia de cartas al azar y la juega tanto en TrucoGameLogic como en el
+# kernel: los puntos netos de J0 al terminar la mano tienen que coincidir.
+# =============================================================================
+
+_CARTAS = (Acciones.JUGAR_CARTA_1.value, Acciones.JUGAR_CARTA_2.value, Acciones.JUGAR_CARTA_3.value)
+
+
+def _estado_al_azar(logic, rng):
+    """Avanza con acciones legales al azar hasta un estado donde se puedan jugar cartas."""
+    pasos = rng.randrange(0, 12)
+    while True:
+        player_id = logic._jugador_esperado
+        bits = logic.get_action_bits(player_id)
+        puede_jugar = bits & 0b111
+        if pasos <= 0 and puede_jugar:
+            return
+        validas = [i for i in range(len(Acciones)) if bits >> i & 1]
+        _, terminado, _ = logic.aplicar_accion(rng.choice(validas), player_id)
+        if terminado:
+            logic.reset_partida()
+        pasos -= 1
+
+
+def _jugar_en_motor(logic, rng):
+    """Juega cartas al azar hasta terminar la mano; devuelve (elecciones, puntos netos J0)."""
+    estado = logic.estado
+    mano_inicial = logic.numero_mano
+    puntos = (estado.puntos_jugador, estado.puntos_oponente)
+    elecciones = []
+    while True:
+        player_id = logic._jugador_esperado
+        mano = estado.mano_jugador if player_id == 0 else estado.mano_oponente
+        idx = rng.randrange(len(mano))
+        elecciones.append(idx)
+        _, terminado, _ = logic.aplicar_accion(_CARTAS[idx], player_id)
+        if terminado or logic.numero_mano != mano_inicial:
+            break
+    # nueva_mano no toca los puntos: la diferencia es lo que se llevo la mano
+    delta = (estado.puntos_jugador - puntos[0]) - (estado.puntos_oponente - puntos[1])
+    return elecciones, delta
+
+
+def verificar(casos, seed):
+    rng = random.Random(seed)
+    logic = TrucoGameLogic(rng=random.Random(seed))
+    logic.reset_partida()
+    for n in range(casos):
+        _estado_al_azar(logic, rng)
+        simulado = copy.deepcopy(logic)
+        elecciones, esperado = _jugar_en_motor(simulado, rng)
+        obtenido = _resolver_con_elecciones(logic, elecciones)
+        if obtenido != esperado:
+            raise AssertionError(
+                f"Caso {n}: motor={esperado} kernel={obtenido} elecciones={elecciones}\n"
+                f"{vars(logic.estado)}"
+            )
+        # Seguir desde el estado simulado para variar puntos y mano
+        logic = simulado
+        if max(logic.estado.puntos_jugador, logic.estado.puntos_oponente) >= 30:
+            logic.reset_partida()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara el kernel de playouts contra TrucoGameLogic sobre manos al azar."
+    )
+    parser.add_argument("--casos", type=int, default=100_000, help="Cantidad de manos a comparar.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--playouts", type=int, default=1_000_000, help="Playouts para medir velocidad.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    verificar(args.casos, args.seed)
+    print(f"OK: {args.casos} manos sin diferencias ({time.perf_counter() - t0:.1f}s).")
+
+    logic = TrucoGameLogic(rng=random.Random(args.seed))
+    logic.reset_partida()
+    playouts(logic, 10, seed=args.seed)  # compila (numba) antes de medir
+    t0 = time.perf_counter()
+    playouts(logic, args.playouts, rival=1, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+    motor = "numba" if NUMBA_DISPONIBLE else "python"
+    print(f"{args.playouts / elapsed:,.0f} playouts/s ({motor}).")
@@ -0,0 +1,69 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from constantes import Acciones
+from trazas import mask_to_bits
+from truco_logic import TrucoGameLogic
+
+
+# =============================================================================
+# PARIDAD DE LA MASCARA
+# Recorre estados al azar y compara la mascara cacheada (get_action_bits /
+# get_action_mask) contra la version original calculada desde cero, para
+# ambos jugadores. Con probabilidad --p-ilegal se aplica una accion cualquiera
+# (legal o no) para cubrir tambien los caminos que devuelven -5.
+# =============================================================================
+
+
+def verificar(estados, seed, p_ilegal):
+    rng = random.Random(seed)
+    logic = TrucoGameLogic(rng=random.Random(seed))
+    logic.reset_partida()
+    n_acciones = len(Acciones)
+    for n in range(estados):
+        for player_id in (0, 1):
+            referencia = logic._get_action_mask_referencia(player_id)
+            bits = logic.get_action_bits(player_id)
+            if bits != mask_to_bits(referencia) or logic.get_action_mask(player_id) != referencia:
+                raise AssertionError(
+                    f"Estado {n}, jugador {player_id}: bits={bits:013b} "
+                    f"referencia={mask_to_bits(referencia):013b}\n{vars(logic.estado)}"
+                )
+
+        player_id = logic._jugador_esperado
+        bits = logic.get_action_bits(player_id)
+        validas = [i for i in range(n_acciones) if bits >> i & 1]
+        if not validas or rng.random() < p_ilegal:
+            action = rng.randrange(n_acciones)
+            player_id = rng.randrange(2)
+        else:
+            action = rng.choice(validas)
+        _, terminado, _ = logic.aplicar_accion(action, player_id)
+        if terminado:
+            logic.reset_partida()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara la mascara de bits del motor contra la mascara original sobre estados al azar."
+    )
+    parser.add_argument("--estados", type=int, default=1_000_000, help="Cantidad de estados a verificar.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--p-ilegal",
+        type=float,
+        default=0.1,
+        help="Probabilidad de aplicar una accion arbitraria (posiblemente ilegal).",
+    )
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    verificar(args.estados, args.seed, args.p_ilegal)
+    print(f"OK: {args.estados} estados sin diferencias ({time.perf_counter() - t0:.1f}s).")
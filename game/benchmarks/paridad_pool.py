@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from sb3.sb3_env import TrucoSB3Env
+from sb3.sb3_pool import PoliticaResidente
+from truco_env import OBS_MODES, TrucoEnv
+
+
+# =============================================================================
+# VERIFICACION DEL ACTOR RESIDENTE DEL POOL
+# Juega partidas al azar y en cada estado compara la accion de
+# PoliticaResidente (numpy, por lotes) con model.predict(deterministic=True)
+# de MaskablePPO, desde la perspectiva de J1 (la del oponente del pool).
+# =============================================================================
+
+
+def _estados(obs_mode, n, seed):
+    rng = random.Random(seed)
+    env = TrucoEnv(obs_mode=obs_mode)
+    obs, mascaras = [], []
+    env.reset(seed=seed)
+    while len(obs) < n:
+        pid = env.get_current_player()
+        mask = env.get_action_mask(pid)
+        if not any(mask):
+            env.reset()
+            continue
+        obs.append(env.get_observation(pid))
+        mascaras.append(mask)
+        _, _, terminado, _, _ = env.step(rng.choice([i for i, m in enumerate(mask) if m]), pid)
+        if terminado:
+            env.reset()
+    return np.stack(obs), np.array(mascaras, dtype=bool)
+
+
+def verificar(model, obs, mascaras):
+    politica = PoliticaResidente.desde_policy(model.policy)
+    acciones = politica.actuar(obs, mascaras)
+    for i in range(len(obs)):
+        esperado, _ = model.predict(obs[i], action_masks=mascaras[i], deterministic=True)
+        if int(esperado) != int(acciones[i]):
+            raise AssertionError(f"Estado {i}: predict={int(esperado)} residente={int(acciones[i])}")
+    return politica
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el actor residente del pool contra MaskablePPO.predict.")
+    parser.add_argument("--modelo", default=None, help="Checkpoint .zip (por defecto una politica nueva al azar).")
+    parser.add_argument("--obs-mode", choices=OBS_MODES, default="basic")
+    parser.add_argument("--estados", type=int, default=2000)
+    parser.add_argument("--lote", type=int, default=8, help="Tamano de lote para medir latencia.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from sb3_contrib import MaskablePPO
+
+    if args.modelo:
+        model = MaskablePPO.load(args.modelo, device="cpu")
+    else:
+        model = MaskablePPO("MlpPolicy", TrucoSB3Env(obs_mode=args.obs_mode), seed=args.seed, device="cpu")
+    obs, mascaras = _estados(args.obs_mode, args.estados, args.seed)
+    politica = verificar(model, obs, mascaras)
+    print(f"OK: {len(obs)} estados con la misma accion que predict.")
+
+    t0 = time.perf_counter()
+    for i in range(len(obs)):
+        model.predict(obs[i], action_masks=mascaras[i], deterministic=True)
+    t_predict = (time.perf_counter() - t0) / len(obs)
+    t0 = time.perf_counter()
+    for i in range(0, len(obs), args.lote):
+        politica.actuar(obs[i:i + args.lote], mascaras[i:i + args.lote])
+    t_lote = (time.perf_counter() - t0) / len(obs)
+    print(f"predict: {t_predict * 1e6:.1f} us/decision | residente (lote {args.lote}): {t_lote * 1e6:.1f} us/decision")
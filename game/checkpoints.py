@@ -0,0 +1,280 @@
+import copy
+import glob
+import json
+import os
+import pickle
+import random
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+# =============================================================================
+# CHECKPOINTS DE REANUDACION
+# CheckpointManager guarda el estado completo de un entrenamiento (modelo,
+# contadores, RNG, optimizador...) cada `cada` unidades (episodios, manos o
+# pasos) y/o cada `cada_segundos`, sin frenar el loop:
+# - guardar() toma una instantanea en el hilo del trainer (snapshot(): copia
+#   superficial de dicts, copia de arrays y tensores; las claves y floats de la
+#   Q-table son inmutables, asi que no hace falta copiarlos) y la serializa en
+#   un hilo de fondo. Si el guardado anterior no termino, espera a ese.
+# - Escritura atomica: archivo temporal en el mismo directorio, fsync y
+#   os.replace. Un crash a mitad de camino deja el checkpoint anterior intacto.
+# - Rotacion: quedan los ultimos `mantener`, cada uno con un .json de metadata
+#   (unidades, epsilon, seed, throughput, fecha).
+# - ultimo() devuelve el estado del checkpoint mas nuevo para --resume.
+# - sembrar() fija todas las semillas al arrancar; el seed va en la metadata.
+# - DIR_CHECKPOINTS (game/resultados/checkpoints) no depende del directorio
+#   desde donde se lanza el trainer; los checkpoints versionados de
+#   q_table_convergencia van por defecto a su subdirectorio convergencia/.
+# =============================================================================
+
+DIR_CHECKPOINTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados", "checkpoints")
+
+
+def snapshot(obj):
+    """Copia de `obj` que no cambia aunque el trainer siga modificando el original."""
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()} if _tiene_mutables(obj) else dict(obj)
+    if isinstance(obj, list):
+        return [snapshot(v) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(snapshot(v) for v in obj)
+    if isinstance(obj, np.ndarray):
+        return obj.copy()
+    if isinstance(obj, (int, float, str, bytes, bool, type(None), np.generic)):
+        return obj
+    torch = sys.modules.get("torch")
+    if torch is not None and isinstance(obj, torch.Tensor):
+        return obj.detach().clone()
+    return copy.deepcopy(obj)
+
+
+_INMUTABLES = (int, float, bool, str, type(None))
+
+
+def _tiene_mutables(d):
+    # Una Q-table ({(estado, accion): float}) se copia con un dict() en C;
+    # set(map(type, ...)) tambien corre en C, sin un loop de Python por entrada
+    return not set(map(type, d.values())) <= set(_INMUTABLES)
+
+
+def sembrar(seed, logic=None):
+    """Siembra random, numpy y torch (si esta cargado) y, si se pasa, el motor de juego."""
+    random.seed(seed)
+    np.random.seed(seed)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.manual_seed(seed)
+    if logic is not None:
+        logic.sembrar(seed)
+
+
+def estado_rng(generador=None):
+    """RNG globales (random, numpy, torch si esta cargado) y opcionalmente un np.random.Generator."""
+    estado = {"random": random.getstate(), "numpy": np.random.get_state()}
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        estado["torch"] = torch.get_rng_state()
+    if generador is not None:
+        estado["generador"] = generador.bit_generator.state
+    return estado
+
+
+def restaurar_rng(estado, generador=None):
+    random.setstate(estado["random"])
+    np.random.set_state(estado["numpy"])
+    torch = sys.modules.get("torch")
+    if torch is not None and "torch" in estado:
+        torch.set_rng_state(estado["torch"])
+    if generador is not None and "generador" in estado:
+        generador.bit_generator.state = estado["generador"]
+
+
+def estado_motor(logic):
+    """
+    Lo que TrucoGameLogic arrastra de una partida a la siguiente: el orden del
+    mazo (nueva_mano mezcla mazo_base en el lugar), quien es mano y el RNG
+    propio si se sembro.
+    """
+    return {
+        "mazo_base": list(logic.mazo_base),
+        "es_mano": logic.estado.es_mano,
+        "rng": None if logic.rng is random else logic.rng.getstate(),
+    }
+
+
+def restaurar_motor(logic, estado):
+    logic.mazo_base = list(estado["mazo_base"])
+    logic.estado.es_mano = estado["es_mano"]
+    if estado["rng"] is not None:
+        logic.rng = random.Random()
+        logic.rng.setstate(estado["rng"])
+
+
+def escribir_atomico(path, escribir):
+    """Escribe `path` con escribir(f) en un temporal del mismo directorio, fsync y os.replace."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        escribir(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointManager:
+    def __init__(self, directorio, nombre, cada=0, cada_segundos=0.0, mantener=3, resume=False, unidad="episodios"):
+        self.directorio = directorio
+        self.nombre = nombre
+        self.cada = cada
+        self.cada_segundos = cada_segundos
+        self.mantener = max(1, mantener)
+        self.resume = resume
+        self.unidad = unidad
+        # Nombre exacto: "q_learning" no debe tomar los de "q_learning_vs_agent"
+        self._patron = re.compile(rf"^{re.escape(nombre)}_(\d{{12}})\.ckpt$")
+        self._hilo = None
+        self._error = None
+        self._ultimas = 0
+        self._t_ultimo = time.perf_counter()
+        self._t0 = self._t_ultimo
+        self._unidades_inicio = 0
+
+    def iniciar(self, unidades):
+        """Marca el punto de partida (0 o lo que se reanudo) para medir throughput."""
+        self._ultimas = unidades
+        self._unidades_inicio = unidades
+        self._t0 = self._t_ultimo = time.perf_counter()
+
+    def toca(self, unidades):
+        if self.cada > 0 and unidades - self._ultimas >= self.cada:
+            return True
+        return self.cada_segundos > 0 and time.perf_counter() - self._t_ultimo >= self.cada_segundos
+
+    def guardar(self, estado, unidades, **meta):
+        """Instantanea de `estado` ahora; la escritura sigue en un hilo de fondo."""
+        self.esperar()
+        ahora = time.perf_counter()
+        datos = {"estado": snapshot(estado), "meta": self._meta(unidades, ahora, meta)}
+        self._ultimas = unidades
+        self._t_ultimo = ahora
+        self._hilo = threading.Thread(target=self._escribir, args=(datos, unidades), daemon=True)
+        self._hilo.start()
+
+    def _meta(self, unidades, ahora, extra):
+        segundos = ahora - self._t0
+        meta = {
+            "nombre": self.nombre,
+            "unidad": self.unidad,
+            "unidades": unidades,
+            "throughput": (unidades - self._unidades_inicio) / segundos if segundos > 0 else None,
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        meta.update(extra)
+        return meta
+
+    def _escribir(self, datos, unidades):
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            path = os.path.join(self.directorio, f"{self.nombre}_{unidades:012d}.ckpt")
+            escribir_atomico(path, lambda f: pickle.dump(datos, f, protocol=pickle.HIGHEST_PROTOCOL))
+            meta = json.dumps(datos["meta"], indent=2, default=str).encode("utf-8")
+            escribir_atomico(path[: -len(".ckpt")] + ".json", lambda f: f.write(meta))
+            self._rotar()
+        except Exception as exc:  # se reporta en el proximo guardar()/cerrar()
+            self._error = exc
+
+    def _rotar(self):
+        for _, path in self.listar()[: -self.mantener]:
+            for p in (path, path[: -len(".ckpt")] + ".json"):
+                if os.path.exists(p):
+                    os.remove(p)
+
+    def listar(self):
+        """[(unidades, path)] de los checkpoints de este trainer, del mas viejo al mas nuevo."""
+        out = []
+        for path in glob.glob(os.path.join(glob.escape(self.directorio), f"{glob.escape(self.nombre)}_*.ckpt")):
+            match = self._patron.match(os.path.basename(path))
+            if match:
+                out.append((int(match.group(1)), path))
+        return sorted(out)
+
+    def ultimo(self):
+        """{"estado", "meta"} del checkpoint mas nuevo, o None."""
+        checkpoints = self.listar()
+        if not checkpoints:
+            return None
+        path = checkpoints[-1][1]
+        with open(path, "rb") as f:
+            datos = pickle.load(f)
+        if datos["meta"].get("nombre") != self.nombre:
+            raise ValueError(f"{path} es un checkpoint de {datos['meta'].get('nombre')!r}, no de {self.nombre!r}")
+        return datos
+
+    def reanudar(self):
+        """Estado a restaurar si se pidio --resume y hay checkpoint (None si no)."""
+        if not self.resume:
+            return None
+        datos = self.ultimo()
+        if datos is None:
+            print(f"--resume: no hay checkpoints de {self.nombre} en {self.directorio}, se empieza de cero.")
+            return None
+        meta = datos["meta"]
+        print(f"Reanudando {self.nombre} desde {meta['unidades']} {meta['unidad']} ({meta['fecha']}).")
+        return datos["estado"]
+
+    def esperar(self):
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Fallo al guardar el checkpoint de {self.nombre}") from error
+
+    def cerrar(self):
+        self.esperar()
+
+
+def agregar_argumentos(parser):
+    group = parser.add_argument_group("checkpoints de reanudacion")
+    group.add_argument(
+        "--guardar-cada",
+        type=int,
+        default=0,
+        help="Unidades de entrenamiento (episodios, manos o pasos) entre checkpoints (0 = no).",
+    )
+    group.add_argument(
+        "--guardar-cada-seg",
+        type=float,
+        default=0.0,
+        help="Segundos entre checkpoints (0 = no).",
+    )
+    group.add_argument(
+        "--guardar-dir",
+        default=DIR_CHECKPOINTS,
+        help="Directorio de los checkpoints de reanudacion (por defecto game/resultados/checkpoints).",
+    )
+    group.add_argument("--guardar-mantener", type=int, default=3, help="Checkpoints que se conservan.")
+    group.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reanuda desde el ultimo checkpoint (modelo, contadores, RNG y epsilon).",
+    )
+
+
+def desde_args(args, nombre, unidad="episodios"):
+    """CheckpointManager segun los flags de agregar_argumentos (None si no se pidio nada)."""
+    if args.guardar_cada <= 0 and args.guardar_cada_seg <= 0 and not args.resume:
+        return None
+    return CheckpointManager(
+        args.guardar_dir,
+        nombre,
+        cada=args.guardar_cada,
+        cada_segundos=args.guardar_cada_seg,
+        mantener=args.guardar_mantener,
+        resume=args.resume,
+        unidad=unidad,
+    )
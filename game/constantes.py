@@ -74,6 +74,13 @@ MAZO_DATOS = {
     (12, COPA):   {"ranking": 8, "valor_envido": 0},
 }
 
+# =============================================================================
+# IDS DE CARTAS
+# Codificacion entera 0-39 (orden de MAZO_DATOS) para formatos binarios y tablas.
+# =============================================================================
+CARTAS = list(MAZO_DATOS.keys())
+CARTA_A_ID = {carta: i for i, carta in enumerate(CARTAS)}
+
 # =============================================================================
 # ESTADOS DEL ENVIDO
 # =============================================================================
@@ -0,0 +1,225 @@
+import random
+from collections import deque
+
+from agents.registry import create_agent
+
+
+# =============================================================================
+# CURRICULUM DE OPONENTES
+# Una secuencia de etapas, cada una con un oponente o una mezcla con pesos:
+#     "random>rational>rational+snapshots*2>rational_equity"
+# `snapshots` son copias congeladas del aprendiz (las arma el trainer con
+# `congelar()`): se toma una al entrar a la etapa y otra cada
+# `snapshot_cada` partidas, quedan las ultimas `max_snapshots`.
+# El winrate se mide sobre las mismas partidas de entrenamiento (sin partidas
+# de evaluacion aparte): una ventana movil de `ventana` resultados con suma
+# acumulada, O(1) por partida. Cuando la ventana esta llena y el winrate
+# llega a `umbral`, se pasa a la etapa siguiente; la ultima no termina.
+# =============================================================================
+
+SNAPSHOTS = "snapshots"
+
+
+def parsear(spec):
+    """"a>b+c*2" -> [[("a", 1.0)], [("b", 1.0), ("c", 2.0)]]."""
+    etapas = []
+    for texto in spec.split(">"):
+        etapa = []
+        for parte in texto.split("+"):
+            nombre, _, peso = parte.strip().partition("*")
+            if not nombre:
+                raise ValueError(f"Etapa vacia en el curriculum: {spec!r}")
+            etapa.append((nombre, float(peso) if peso else 1.0))
+        etapas.append(etapa)
+    return etapas
+
+
+class Curriculum:
+    def __init__(self, etapas, umbral=0.6, ventana=200, snapshot_cada=1000, max_snapshots=5, seed=None):
+        self.etapas = parsear(etapas) if isinstance(etapas, str) else etapas
+        self.umbral = umbral
+        self.ventana = ventana
+        self.snapshot_cada = snapshot_cada
+        self.max_snapshots = max(1, max_snapshots)
+        self.rng = random.Random(seed)
+        # congelar() -> agente con una copia fija de la politica actual; lo pone el trainer
+        self.congelar = None
+        self.etapa = 0
+        self.partidas = 0
+        self.partidas_etapa = 0
+        self.historial = []
+        self.snapshots = []
+        self._n_snapshots = 0
+        self._resultados = deque()
+        self._suma = 0.0
+        self._agentes = {}
+        self._por_oponente = {}
+        for etapa in self.etapas:
+            for nombre, _ in etapa:
+                if nombre != SNAPSHOTS:
+                    self._agentes[nombre] = create_agent(nombre)
+
+    def descripcion(self, etapa=None):
+        etapa = self.etapas[self.etapa if etapa is None else etapa]
+        return "+".join(nombre if peso == 1.0 else f"{nombre}*{peso:g}" for nombre, peso in etapa)
+
+    def winrate(self):
+        return self._suma / len(self._resultados) if self._resultados else 0.0
+
+    def referencia(self, nombre, agente):
+        """
+        Como guardar en un checkpoint al rival de una partida en curso: los
+        scripteados por nombre, los snapshots enteros (pueden haber salido ya
+        de la lista).
+        """
+        return nombre, None if nombre in self._agentes else agente
+
+    def resolver(self, referencia):
+        nombre, agente = referencia
+        return nombre, self._agentes[nombre] if agente is None else agente
+
+    def _en_etapa(self, nombre):
+        nombres = [n for n, _ in self.etapas[self.etapa]]
+        return nombre in nombres or (SNAPSHOTS in nombres and nombre.startswith("snapshot_"))
+
+    def oponente(self):
+        """(nombre, agente) para la proxima partida, sorteado segun la etapa actual."""
+        etapa = self.etapas[self.etapa]
+        nombre = self.rng.choices([n for n, _ in etapa], weights=[p for _, p in etapa])[0]
+        if nombre != SNAPSHOTS:
+            return nombre, self._agentes[nombre]
+        if not self.snapshots:
+            self.tomar_snapshot()
+        return self.snapshots[self.rng.randrange(len(self.snapshots))]
+
+    def tomar_snapshot(self):
+        if self.congelar is None:
+            raise ValueError("El curriculum usa snapshots pero el trainer no definio congelar().")
+        self._n_snapshots += 1
+        self.snapshots.append((f"snapshot_{self._n_snapshots}", self.congelar()))
+        del self.snapshots[: -self.max_snapshots]
+
+    def registrar(self, resultado, nombre=None):
+        """
+        Resultado de una partida de entrenamiento para el aprendiz (1 gana,
+        0.5 empata, 0 pierde). Devuelve True si se paso de etapa.
+        """
+        self.partidas += 1
+        self.partidas_etapa += 1
+        if nombre is not None and not self._en_etapa(nombre):
+            # Partida que arranco antes de pasar de etapa (entornos vectorizados)
+            return False
+        self._resultados.append(resultado)
+        self._suma += resultado
+        if len(self._resultados) > self.ventana:
+            self._suma -= self._resultados.popleft()
+        if nombre is not None:
+            clave = SNAPSHOTS if nombre.startswith("snapshot_") else nombre
+            puntos, partidas = self._por_oponente.get(clave, (0.0, 0))
+            self._por_oponente[clave] = (puntos + resultado, partidas + 1)
+
+        usa_snapshots = any(n == SNAPSHOTS for n, _ in self.etapas[self.etapa])
+        if usa_snapshots and self.snapshot_cada > 0 and self.partidas_etapa % self.snapshot_cada == 0:
+            self.tomar_snapshot()
+        if (
+            self.etapa + 1 < len(self.etapas)
+            and len(self._resultados) >= self.ventana
+            and self.winrate() >= self.umbral
+        ):
+            self.avanzar()
+            return True
+        return False
+
+    def avanzar(self):
+        winrate = self.winrate()
+        self.historial.append(
+            {"etapa": self.descripcion(), "partidas": self.partidas_etapa, "winrate": winrate}
+        )
+        self.etapa += 1
+        self.partidas_etapa = 0
+        self._resultados.clear()
+        self._suma = 0.0
+        self._por_oponente = {}
+        print(
+            f"Curriculum: etapa {self.etapa + 1}/{len(self.etapas)} ({self.descripcion()}) "
+            f"tras {self.historial[-1]['partidas']} partidas con winrate {winrate:.3f}"
+        )
+        if any(n == SNAPSHOTS for n, _ in self.etapas[self.etapa]):
+            self.tomar_snapshot()
+
+    def resumen(self):
+        partes = [f"etapa {self.etapa + 1}/{len(self.etapas)} ({self.descripcion()})", f"winrate={self.winrate():.3f}"]
+        if len(self._por_oponente) > 1:
+            partes.append(
+                " ".join(f"{n}={p / k:.2f}" for n, (p, k) in sorted(self._por_oponente.items()) if k)
+            )
+        return " | ".join(partes)
+
+    def estado(self):
+        """Todo lo necesario para reanudar (incluye los snapshots y el RNG de sorteo)."""
+        return {
+            "etapa": self.etapa,
+            "partidas": self.partidas,
+            "partidas_etapa": self.partidas_etapa,
+            "historial": list(self.historial),
+            "snapshots": list(self.snapshots),
+            "n_snapshots": self._n_snapshots,
+            "resultados": list(self._resultados),
+            "por_oponente": dict(self._por_oponente),
+            "rng": self.rng.getstate(),
+        }
+
+    def restaurar(self, estado):
+        self.etapa = estado["etapa"]
+        self.partidas = estado["partidas"]
+        self.partidas_etapa = estado["partidas_etapa"]
+        self.historial = list(estado["historial"])
+        self.snapshots = list(estado["snapshots"])
+        self._n_snapshots = estado["n_snapshots"]
+        self._resultados = deque(estado["resultados"])
+        self._suma = float(sum(self._resultados))
+        self._por_oponente = dict(estado["por_oponente"])
+        self.rng.setstate(estado["rng"])
+
+
+def agregar_argumentos(parser):
+    group = parser.add_argument_group("curriculum de oponentes")
+    group.add_argument(
+        "--curriculum",
+        default=None,
+        help='Etapas de oponentes, p.ej. "random>rational>rational+snapshots>rational_equity" '
+        "(nombre*peso para mezclas). Reemplaza a --opponent durante el entrenamiento.",
+    )
+    group.add_argument(
+        "--curriculum-umbral",
+        type=float,
+        default=0.6,
+        help="Winrate de entrenamiento para pasar de etapa.",
+    )
+    group.add_argument(
+        "--curriculum-ventana",
+        type=int,
+        default=200,
+        help="Partidas de la ventana movil del winrate.",
+    )
+    group.add_argument(
+        "--curriculum-snapshot-cada",
+        type=int,
+        default=1000,
+        help="Partidas entre snapshots del aprendiz en etapas con snapshots (0 = solo al entrar).",
+    )
+    group.add_argument("--curriculum-max-snapshots", type=int, default=5, help="Snapshots que se conservan.")
+
+
+def desde_args(args, seed=None):
+    """Curriculum segun los flags de agregar_argumentos (None si no se pidio)."""
+    if not args.curriculum:
+        return None
+    return Curriculum(
+        args.curriculum,
+        umbral=args.curriculum_umbral,
+        ventana=args.curriculum_ventana,
+        snapshot_cada=args.curriculum_snapshot_cada,
+        max_snapshots=args.curriculum_max_snapshots,
+        seed=seed,
+    )
@@ -0,0 +1,259 @@
+import argparse
+import itertools
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from constantes import (
+    CARTA_A_ID,
+    CARTAS,
+    ESTADO_ENVIDO,
+    ESTADO_ENVIDO_ENVIDO,
+    MAZO_DATOS,
+    Acciones,
+)
+from truco_logic import TrucoGameLogic
+
+
+# =============================================================================
+# ORACULO DE ENVIDO
+# Probabilidad de ganar el envido con mis 3 cartas contra una mano rival
+# uniforme entre las cartas que no veo, que contiene las cartas que el rival ya
+# jugo (0, 1 o 2). Se calcula exacta por enumeracion con las reglas de
+# TrucoGameLogic.calcular_puntos_envido (empate = gana el mano).
+#
+# El envido no depende de los palos concretos ni de cual figura es cual, asi
+# que cada consulta se reduce a una clave canonica: por palo, que valores 1-7
+# y cuantas figuras tengo yo y mostro el rival, con los 4 palos ordenados
+# (empaquetada en un entero para la consulta).
+# La tabla guarda, por clave, cuantas manos rivales tienen menos tanto que yo,
+# cuantas igual y el total (conteos exactos, uint16).
+# =============================================================================
+
+TABLA_PATH = os.path.join(os.path.dirname(__file__), "tablas", "envido.npz")
+
+N_TANTOS = 34  # 0..33
+
+# Incremento de la firma de cada palo: bits 0-6 valores 1-7 mios, bits 7-8
+# cantidad de figuras mias, bits 9-15 y 16-17 lo mismo para las reveladas.
+_INC_MIA = {}
+_INC_REVELADA = {}
+for _carta, _datos in MAZO_DATOS.items():
+    _v = _datos["valor_envido"]
+    _INC_MIA[_carta] = (_carta[1], (1 << (_v - 1)) if _v else (1 << 7))
+    _INC_REVELADA[_carta] = (_carta[1], (1 << (9 + _v - 1)) if _v else (1 << 16))
+
+
+_BITS_FIRMA = 18
+_MASCARA_FIRMA = (1 << _BITS_FIRMA) - 1
+
+
+def clave_canonica(mias, reveladas=()):
+    """Firmas de los 4 palos ordenadas y empaquetadas en un solo entero."""
+    firma = [0, 0, 0, 0]
+    for carta in mias:
+        palo, inc = _INC_MIA[carta]
+        firma[palo] += inc
+    for carta in reveladas:
+        palo, inc = _INC_REVELADA[carta]
+        firma[palo] += inc
+    a, b, c, d = sorted(firma)
+    return a | b << _BITS_FIRMA | c << 2 * _BITS_FIRMA | d << 3 * _BITS_FIRMA
+
+
+def _empaquetar(firmas):
+    return sum(int(f) << i * _BITS_FIRMA for i, f in enumerate(firmas))
+
+
+def _desempaquetar(clave):
+    return [clave >> i * _BITS_FIRMA & _MASCARA_FIRMA for i in range(4)]
+
+
+_LOGIC = TrucoGameLogic()
+
+
+@lru_cache(maxsize=None)
+def tanto(cartas):
+    """Tanto de envido de una tupla de cartas (calcular_puntos_envido, cacheado)."""
+    return _LOGIC.calcular_puntos_envido(list(cartas))
+
+
+def _manos_y_tantos():
+    """Todas las manos de 3 cartas (ids), su mascara de 40 bits y su tanto."""
+    manos = np.array(list(itertools.combinations(range(len(CARTAS)), 3)), dtype=np.int64)
+    mascaras = (np.uint64(1) << manos.astype(np.uint64)).sum(axis=1, dtype=np.uint64)
+    tantos = np.array(
+        [tanto(tuple(CARTAS[i] for i in mano)) for mano in manos], dtype=np.int64
+    )
+    return manos, mascaras, tantos
+
+
+def _conteos(mias_ids, reveladas_ids, mascaras, tantos, mi_tanto):
+    ocupadas = np.uint64(sum(1 << i for i in mias_ids))
+    requeridas = np.uint64(sum(1 << i for i in reveladas_ids))
+    validas = ((mascaras & ocupadas) == 0) & ((mascaras & requeridas) == requeridas)
+    hist = np.bincount(tantos[validas], minlength=N_TANTOS)
+    return int(hist[:mi_tanto].sum()), int(hist[mi_tanto]), int(hist.sum())
+
+
+def construir_tabla():
+    """Enumera un representante por clave canonica y cuenta las manos rivales."""
+    manos, mascaras, tantos = _manos_y_tantos()
+    representantes = {}
+    vistas = set()
+    for fila, mano in enumerate(manos):
+        mias = [CARTAS[i] for i in mano]
+        base = clave_canonica(mias)
+        if base in vistas:
+            continue
+        vistas.add(base)
+        restantes = [i for i in range(len(CARTAS)) if i not in mano]
+        for n in range(3):
+            for reveladas in itertools.combinations(restantes, n):
+                clave = clave_canonica(mias, [CARTAS[i] for i in reveladas])
+                if clave not in representantes:
+                    representantes[clave] = (tuple(mano), reveladas, int(tantos[fila]))
+
+    claves = np.array([_desempaquetar(c) for c in representantes], dtype=np.int64)
+    conteos = np.array(
+        [_conteos(m, r, mascaras, tantos, t) for m, r, t in representantes.values()], dtype=np.uint16
+    )
+    return claves, conteos
+
+
+def _total_tras_canto(accion, estado_canto, falta):
+    """Puntos en juego despues de cantar `accion` (igual que _aplicar_canto_envido)."""
+    if accion == Acciones.ENVIDO.value:
+        return 2
+    if accion == Acciones.ENVIDO_ENVIDO.value:
+        return 4
+    if accion == Acciones.REAL_ENVIDO.value:
+        if estado_canto == ESTADO_ENVIDO:
+            return 5
+        if estado_canto == ESTADO_ENVIDO_ENVIDO:
+            return 7
+        return 3
+    return falta
+
+
+_CANTOS = (
+    Acciones.ENVIDO.value,
+    Acciones.ENVIDO_ENVIDO.value,
+    Acciones.REAL_ENVIDO.value,
+    Acciones.FALTA_ENVIDO.value,
+)
+_BITS_CANTOS = sum(1 << a for a in _CANTOS)
+_BITS_RESPUESTAS = 1 << Acciones.QUIERO.value | 1 << Acciones.NO_QUIERO.value
+
+
+class TablaEnvido:
+    def __init__(self, claves, conteos):
+        self.claves = claves
+        self.conteos = conteos
+        total = conteos[:, 2].astype(np.float64)
+        # P(gano) siendo pie (solo gano con mas tanto) y siendo mano (tambien empatando)
+        prob = np.stack([conteos[:, 0] / total, (conteos[:, 0] + conteos[:, 1]) / total], axis=1)
+        self._prob = {_empaquetar(c): tuple(p) for c, p in zip(claves.tolist(), prob.tolist())}
+
+    @classmethod
+    def cargar(cls, path=TABLA_PATH):
+        with np.load(path) as data:
+            return cls(data["claves"], data["conteos"])
+
+    def guardar(self, path=TABLA_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, claves=self.claves, conteos=self.conteos)
+
+    def probabilidad(self, mias, reveladas=(), es_mano=True):
+        """P(ganar el envido) con las 3 cartas `mias` si el rival ya mostro `reveladas`."""
+        try:
+            prob = self._prob[clave_canonica(mias, reveladas)]
+        except KeyError:
+            raise ValueError(f"Combinacion imposible: mias={list(mias)} reveladas={list(reveladas)}") from None
+        return prob[1 if es_mano else 0]
+
+    def probabilidad_jugador(self, logic, player_id):
+        """P(ganar el envido) de `player_id` segun lo que el rival ya jugo."""
+        estado = logic.estado
+        reveladas = [c for c, j in estado.cartas_jugadas if j != player_id]
+        es_mano = estado.es_mano if player_id == 0 else not estado.es_mano
+        if len(reveladas) == 3:
+            # Con la mano rival completa a la vista el resultado ya esta decidido
+            mio = tanto(logic.reparto[player_id])
+            suyo = tanto(tuple(reveladas))
+            return 1.0 if mio > suyo or (mio == suyo and es_mano) else 0.0
+        return self.probabilidad(logic.reparto[player_id], reveladas, es_mano)
+
+    def puntos_esperados(self, logic, player_id):
+        """
+        Puntos esperados (netos para `player_id`) de cada accion de envido legal.
+        QUIERO y NO_QUIERO son exactos; para un canto se supone que el rival
+        lo quiere (si no lo quiere se cobra lo que ya estaba en juego).
+        """
+        estado = logic.estado
+        bits = logic.get_action_bits(player_id)
+        relevantes = _BITS_CANTOS | (_BITS_RESPUESTAS if estado.turno_responder_envido else 0)
+        if not bits & relevantes:
+            return {}
+        p = self.probabilidad_jugador(logic, player_id)
+        mios, suyos = (
+            (estado.puntos_jugador, estado.puntos_oponente)
+            if player_id == 0
+            else (estado.puntos_oponente, estado.puntos_jugador)
+        )
+
+        def aceptado(total):
+            return p * min(total, 30 - mios) - (1 - p) * min(total, 30 - suyos)
+
+        valores = {}
+        for accion in _CANTOS:
+            if bits >> accion & 1:
+                valores[accion] = aceptado(
+                    _total_tras_canto(accion, estado.estado_canto_envido, logic._calcular_falta_envido())
+                )
+        if estado.turno_responder_envido:
+            if bits >> Acciones.QUIERO.value & 1:
+                valores[Acciones.QUIERO.value] = aceptado(estado.envido_total)
+            if bits >> Acciones.NO_QUIERO.value & 1:
+                valores[Acciones.NO_QUIERO.value] = -min(max(1, estado.envido_total_anterior), 30 - suyos)
+        return valores
+
+
+@lru_cache(maxsize=None)
+def cargar_tabla(path=TABLA_PATH):
+    """Tabla compartida (se lee del disco una sola vez por proceso)."""
+    return TablaEnvido.cargar(path)
+
+
+def _parse_carta(texto):
+    numero, palo = texto.split(":")
+    return int(numero), int(palo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Oraculo de envido (probabilidad exacta de ganar el envido).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("construir", help="Enumera todas las claves canonicas y guarda la tabla.")
+    p_build.add_argument("--output", default=TABLA_PATH)
+
+    p_query = sub.add_parser("consultar", help="Probabilidad para cartas dadas como numero:palo (palo 0-3).")
+    p_query.add_argument("--tabla", default=TABLA_PATH)
+    p_query.add_argument("--cartas", nargs=3, required=True, help="Ej: 7:0 6:0 12:2")
+    p_query.add_argument("--reveladas", nargs="*", default=[], help="Cartas que jugo el rival.")
+    p_query.add_argument("--pie", action="store_true", help="Soy pie (por defecto mano).")
+    args = parser.parse_args()
+
+    if args.command == "construir":
+        claves, conteos = construir_tabla()
+        TablaEnvido(claves, conteos).guardar(args.output)
+        print(f"Tabla con {len(claves)} claves guardada en {args.output} ({os.path.getsize(args.output)} bytes).")
+    else:
+        tabla = cargar_tabla(args.tabla)
+        mias = [_parse_carta(c) for c in args.cartas]
+        reveladas = [_parse_carta(c) for c in args.reveladas]
+        for carta in mias + reveladas:
+            if carta not in CARTA_A_ID:
+                parser.error(f"Carta inexistente: {carta[0]}:{carta[1]}")
+        print(f"{tabla.probabilidad(mias, reveladas, not args.pie):.4f}")
@@ -0,0 +1,226 @@
+import argparse
+import itertools
+import json
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from constantes import MAZO_DATOS
+
+
+# =============================================================================
+# EQUITY DE MANO
+# Probabilidad de ganar las vueltas (la parte de cartas de la mano) con mis 3
+# cartas contra una mano rival uniforme entre las cartas que quedan, calculada
+# exacta por enumeracion. Solo importan los rankings: la tabla se indexa por el
+# multiconjunto de rankings de la mano (cubre las 9880 manos de 3 cartas).
+#
+# Variantes condicionales: el rival ya mostro 1 o 2 cartas (su mano las
+# contiene). El orden en que cada jugador tira sus cartas sigue una politica
+# fija sobre las 6 permutaciones de la mano ordenada de mas fuerte a mas debil
+# ("uniforme" por defecto = tirar al azar, igual que kernel_playout sin pesos).
+#
+# tabla[mano, reveladas, es_mano] (float16, NaN si la combinacion es imposible).
+# =============================================================================
+
+TABLA_PATH = os.path.join(os.path.dirname(__file__), "tablas", "equity.npz")
+
+N_RANKINGS = max(datos["ranking"] for datos in MAZO_DATOS.values())
+CANTIDAD_POR_RANKING = np.zeros(N_RANKINGS, dtype=np.int64)
+for _datos in MAZO_DATOS.values():
+    CANTIDAD_POR_RANKING[_datos["ranking"] - 1] += 1
+
+PERMUTACIONES = list(itertools.permutations(range(3)))
+POLITICAS = {
+    "uniforme": np.full(len(PERMUTACIONES), 1.0 / len(PERMUTACIONES)),
+    "fuerte_primero": np.array([1.0 if p == (0, 1, 2) else 0.0 for p in PERMUTACIONES]),
+    "debil_primero": np.array([1.0 if p == (2, 1, 0) else 0.0 for p in PERMUTACIONES]),
+}
+
+# Multiconjuntos de rankings posibles (ordenados de mas fuerte a mas debil)
+TRIPLES = np.array(
+    [
+        t
+        for t in itertools.combinations_with_replacement(range(1, N_RANKINGS + 1), 3)
+        if all(t.count(r) <= CANTIDAD_POR_RANKING[r - 1] for r in set(t))
+    ],
+    dtype=np.int64,
+)
+
+# Cartas reveladas por el rival: ninguna, 1 ranking o un par ordenado
+REVELADAS = [()] + [(r,) for r in range(1, N_RANKINGS + 1)] + list(
+    itertools.combinations_with_replacement(range(1, N_RANKINGS + 1), 2)
+)
+
+_IDX_MANO = {tuple(int(r) for r in t): i for i, t in enumerate(TRIPLES)}
+_IDX_REVELADAS = {r: i for i, r in enumerate(REVELADAS)}
+_RANKING = {carta: datos["ranking"] for carta, datos in MAZO_DATOS.items()}
+
+_COMB = np.array([[math.comb(n, k) for k in range(4)] for n in range(5)], dtype=np.float64)
+
+
+def _conteos(multiconjuntos):
+    out = np.zeros((len(multiconjuntos), N_RANKINGS), dtype=np.int64)
+    for i, m in enumerate(multiconjuntos):
+        for r in m:
+            out[i, r - 1] += 1
+    return out
+
+
+def _resultado_vuelta(a, b):
+    """0 si gana mi carta, 1 si gana la del rival, 2 parda (ranking menor = mas fuerte)."""
+    return np.where(a < b, 0, np.where(b < a, 1, 2))
+
+
+def _ganador_vectorizado(r1, r2, r3, es_mano):
+    """Ganador de la mano (0 yo, 1 rival) segun TrucoGameLogic._ganador_mano_completa."""
+    jugador_mano = 0 if es_mano else 1
+
+    # Tras dos vueltas (la tercera no se juega si ya hay ganador)
+    gj2 = (r1 == 0).astype(np.int64) + (r2 == 0)
+    go2 = (r1 == 1).astype(np.int64) + (r2 == 1)
+    emp2 = 2 - gj2 - go2
+    ultima2 = np.where(r2 != 2, r2, r1)
+    g2 = np.where(((gj2 == 1) | (go2 == 1)) & (emp2 == 1), ultima2, -1)
+    g2 = np.where(gj2 >= 2, 0, np.where(go2 >= 2, 1, g2))
+
+    gj3 = gj2 + (r3 == 0)
+    go3 = go2 + (r3 == 1)
+    emp3 = 3 - gj3 - go3
+    primera = np.where(r1 != 2, r1, np.where(r2 != 2, r2, r3))
+    g3 = np.where(
+        gj3 > go3, 0, np.where(go3 > gj3, 1, np.where(emp3 == 3, jugador_mano, primera))
+    )
+    return np.where(g2 != -1, g2, g3)
+
+
+def _matriz_victorias(politica_propia, politica_rival):
+    """P(gano las vueltas) para cada par (mi triple, triple rival) y es_mano: (T, T, 2)."""
+    n = len(TRIPLES)
+    victorias = np.zeros((n, n, 2), dtype=np.float64)
+    for i, sigma in enumerate(PERMUTACIONES):
+        if politica_propia[i] == 0:
+            continue
+        for j, tau in enumerate(PERMUTACIONES):
+            peso = politica_propia[i] * politica_rival[j]
+            if peso == 0:
+                continue
+            r = [
+                _resultado_vuelta(TRIPLES[:, sigma[k]][:, None], TRIPLES[:, tau[k]][None, :])
+                for k in range(3)
+            ]
+            for m, es_mano in enumerate((False, True)):
+                victorias[:, :, m] += peso * (_ganador_vectorizado(*r, es_mano) == 0)
+    return victorias
+
+
+def construir_tabla(politica_propia="uniforme", politica_rival="uniforme"):
+    victorias = _matriz_victorias(POLITICAS[politica_propia], POLITICAS[politica_rival])
+    mias = _conteos(TRIPLES)
+    rivales = mias
+    tabla = np.full((len(TRIPLES), len(REVELADAS), 2), np.nan, dtype=np.float64)
+    disponibles = CANTIDAD_POR_RANKING[None, None, :] - mias[:, None, :]
+    for k, reveladas in enumerate(REVELADAS):
+        rev = _conteos([reveladas])[0]
+        # Manos rivales que contienen lo revelado: combinaciones de las cartas restantes
+        n = disponibles - rev
+        faltan = rivales[None, :, :] - rev
+        valido = (n >= 0) & (faltan >= 0) & (faltan <= n)
+        formas = np.where(valido, _COMB[np.clip(n, 0, 4), np.clip(faltan, 0, 3)], 0.0).prod(axis=-1)
+        total = formas.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for m in range(2):
+                tabla[:, k, m] = (formas * victorias[:, :, m]).sum(axis=1) / total
+    return tabla
+
+
+class TablaEquity:
+    def __init__(self, tabla, metadata=None):
+        self.tabla = tabla
+        self.metadata = metadata or {}
+
+    @classmethod
+    def cargar(cls, path=TABLA_PATH):
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            return cls(data["tabla"], metadata)
+
+    def guardar(self, path=TABLA_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            tabla=self.tabla.astype(np.float16),
+            metadata=np.array(json.dumps(self.metadata)),
+        )
+
+    def equity(self, rankings_mano, rankings_reveladas=(), es_mano=True):
+        """P(ganar las vueltas) para una mano dada por sus 3 rankings."""
+        idx_mano = _IDX_MANO[tuple(sorted(rankings_mano))]
+        idx_rev = _IDX_REVELADAS[tuple(sorted(rankings_reveladas))]
+        return self.tabla.item(idx_mano, idx_rev, 1 if es_mano else 0)
+
+    def equity_jugador(self, logic, player_id):
+        """Equity de la mano repartida a `player_id` segun lo que el rival ya mostro."""
+        estado = logic.estado
+        mano = [_RANKING[c] for c in logic.reparto[player_id]]
+        reveladas = [_RANKING[c] for c, j in estado.cartas_jugadas if j != player_id]
+        es_mano = estado.es_mano if player_id == 0 else not estado.es_mano
+        if len(reveladas) == 3:
+            return _equity_rival_conocido(
+                tuple(sorted(mano)),
+                tuple(sorted(reveladas)),
+                es_mano,
+                self.metadata.get("politica_propia", "uniforme"),
+                self.metadata.get("politica_rival", "uniforme"),
+            )
+        return self.equity(mano, reveladas, es_mano)
+
+
+_PERMUTACIONES_ARR = np.array(PERMUTACIONES, dtype=np.int64)
+
+
+@lru_cache(maxsize=4096)
+def _equity_rival_conocido(mano, rival, es_mano, politica_propia, politica_rival):
+    """Con las 3 cartas del rival a la vista basta con promediar las permutaciones."""
+    mias = np.array(mano, dtype=np.int64)[_PERMUTACIONES_ARR][:, None, :]
+    suyas = np.array(rival, dtype=np.int64)[_PERMUTACIONES_ARR][None, :, :]
+    r = _resultado_vuelta(mias, suyas)
+    gano = _ganador_vectorizado(r[..., 0], r[..., 1], r[..., 2], es_mano) == 0
+    pesos = POLITICAS[politica_propia][:, None] * POLITICAS[politica_rival][None, :]
+    return float((pesos * gano).sum())
+
+
+@lru_cache(maxsize=None)
+def cargar_tabla(path=TABLA_PATH):
+    """Tabla compartida (se lee del disco una sola vez por proceso)."""
+    return TablaEquity.cargar(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabla de equity de manos (probabilidad de ganar las vueltas).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("construir", help="Calcula la tabla por enumeracion y la guarda.")
+    p_build.add_argument("--output", default=TABLA_PATH)
+    p_build.add_argument("--politica-propia", choices=sorted(POLITICAS), default="uniforme")
+    p_build.add_argument("--politica-rival", choices=sorted(POLITICAS), default="uniforme")
+
+    p_query = sub.add_parser("consultar", help="Equity de una mano dada por rankings (1 = mas fuerte).")
+    p_query.add_argument("--tabla", default=TABLA_PATH)
+    p_query.add_argument("--rankings", type=int, nargs=3, required=True)
+    p_query.add_argument("--reveladas", type=int, nargs="*", default=[], help="Rankings que mostro el rival.")
+    p_query.add_argument("--pie", action="store_true", help="Soy pie (por defecto mano).")
+    args = parser.parse_args()
+
+    if args.command == "construir":
+        tabla = construir_tabla(args.politica_propia, args.politica_rival)
+        TablaEquity(
+            tabla,
+            {"politica_propia": args.politica_propia, "politica_rival": args.politica_rival},
+        ).guardar(args.output)
+        print(f"Tabla {tabla.shape} guardada en {args.output} ({os.path.getsize(args.output)} bytes).")
+    else:
+        tabla = TablaEquity.cargar(args.tabla)
+        print(f"{tabla.equity(args.rankings, args.reveladas, not args.pie):.4f}")
@@ -0,0 +1,322 @@
+import csv
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+
+import numpy as np
+
+import checkpoints
+from truco_env import TrucoEnv
+from truco_logic import MODO_TRUSTED
+
+
+# =============================================================================
+# EVALUACION INCREMENTAL DURANTE EL ENTRENAMIENTO
+# Cada `cada` unidades el trainer pasa una copia congelada del aprendiz y
+# EvaluacionIncremental la manda a un pool de procesos (apply_async): el
+# entrenamiento no se frena y los resultados se recogen en las siguientes
+# llamadas (o en cerrar()).
+# - Set fijo: `partidas` repartos sembrados (seed + n) por rival de
+#   referencia, el aprendiz alterna asiento (n par: J0).
+# - Memo de las jugadas del rival: en un reparto fijo, la decision del rival
+#   depende solo de las acciones anteriores, asi que se guarda por
+#   (n, acciones hasta ahi). Si el aprendiz repite el camino, el rival no se
+#   recalcula. El memo de cada evaluacion es el de las decisiones usadas en
+#   esa evaluacion, asi que no crece con el entrenamiento. Antes de cada
+#   decision no memoizada se siembran random/np.random con (n, paso): un rival
+#   con azar juega igual con memo o sin memo. Los RNG globales se restauran
+#   al terminar cada set (el entrenamiento sigue con su propio stream).
+# - Si al lanzar la evaluacion anterior sigue corriendo, la nueva se saltea;
+#   la ultima salteada se corre en cerrar(), despues de la que estaba en
+#   curso, asi que la curva siempre termina en el ultimo punto pedido.
+# - Reporte: winrate con intervalo de Wilson y puntos por mano (diferencia
+#   del aprendiz) con intervalo normal, al 95%. Cada fila lleva tambien los
+#   segundos de entrenamiento hasta el lanzamiento (desde el primer toca(),
+#   sin el tiempo de evaluacion en este proceso) y las columnas extra que
+#   pase el trainer (tamano de la tabla, pasos, loss...).
+# Es la unica forma de medir la curva de aprendizaje de los trainers.
+# =============================================================================
+
+Z_95 = 1.96
+
+# Rivales creados una vez por proceso del pool
+_RIVALES = {}
+
+
+def _rival(nombre):
+    if nombre not in _RIVALES:
+        from agents.registry import create_agent
+
+        _RIVALES[nombre] = create_agent(nombre)
+    return _RIVALES[nombre]
+
+
+def intervalo_wilson(exitos, n, z=Z_95):
+    if n == 0:
+        return 0.0, 1.0
+    p = exitos / n
+    denom = 1 + z * z / n
+    centro = (p + z * z / (2 * n)) / denom
+    radio = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    # En p = 0 o 1 el redondeo puede dejar el extremo apenas fuera de [0, 1]
+    return max(0.0, centro - radio), min(1.0, centro + radio)
+
+
+def _sembrar_decision(semilla, paso):
+    s = (semilla * 1009 + paso) % 2**32
+    random.seed(s)
+    np.random.seed(s)
+
+
+def jugar_set(aprendiz, rival_nombre, indices, seed, memos):
+    """
+    Juega los repartos `indices` del set fijo. memos[i] es el memo
+    {acciones previas: accion del rival} del reparto indices[i]. Devuelve
+    (resultados, deltas por mano, memos usados, aciertos, decisiones del rival).
+    Deja los RNG globales como estaban: con workers=0 el set se juega en el
+    proceso que entrena y la siembra por decision no debe pisar su stream.
+    """
+    estado = checkpoints.estado_rng()
+    try:
+        return _jugar_set(aprendiz, rival_nombre, indices, seed, memos)
+    finally:
+        checkpoints.restaurar_rng(estado)
+
+
+def _jugar_set(aprendiz, rival_nombre, indices, seed, memos):
+    rival = _rival(rival_nombre)
+    env = TrucoEnv(modo=MODO_TRUSTED)
+    resultados = []
+    deltas = []
+    usados = []
+    aciertos = 0
+    decisiones = 0
+    for n, memo in zip(indices, memos):
+        semilla = seed + n
+        asiento = n % 2
+        env.reset(seed=semilla)
+        estado = env.logic.estado
+        acciones = ()
+        usado = {}
+        prev_es_mano = estado.es_mano
+        inicio_mano = (estado.puntos_jugador, estado.puntos_oponente)
+        terminado = False
+        while not terminado:
+            player_id = env.get_current_player()
+            mask = env.get_action_mask(player_id)
+            if not any(mask):
+                break
+            if player_id == asiento:
+                action = int(aprendiz.choose_action(mask, env, player_id))
+            else:
+                decisiones += 1
+                action = memo.get(acciones)
+                if action is None:
+                    _sembrar_decision(semilla, len(acciones))
+                    action = int(rival.choose_action(mask, env, player_id))
+                else:
+                    aciertos += 1
+                usado[acciones] = action
+            _, terminado = env.aplicar(action, player_id)
+            acciones += (action,)
+            if terminado or estado.es_mano != prev_es_mano:
+                puntos = (estado.puntos_jugador, estado.puntos_oponente)
+                d = (puntos[0] - inicio_mano[0]) - (puntos[1] - inicio_mano[1])
+                deltas.append(d if asiento == 0 else -d)
+                inicio_mano = puntos
+                prev_es_mano = estado.es_mano
+        puntos = (estado.puntos_jugador, estado.puntos_oponente)
+        mios, suyos = puntos[asiento], puntos[1 - asiento]
+        resultados.append(1.0 if mios > suyos else 0.5 if mios == suyos else 0.0)
+        usados.append(usado)
+    return resultados, deltas, usados, aciertos, decisiones
+
+
+def _tarea(args):
+    return jugar_set(*args)
+
+
+class EvaluacionIncremental:
+    def __init__(self, cada, rivales=("rational",), partidas=200, seed=10**6, workers=1, csv_path=None, unidad="episodios"):
+        self.cada = cada
+        self.rivales = list(rivales)
+        self.partidas = partidas
+        self.seed = seed
+        self.workers = max(0, workers)
+        self.csv_path = csv_path
+        self.unidad = unidad
+        self.memos = {nombre: [{} for _ in range(partidas)] for nombre in self.rivales}
+        self.historial = []
+        self.salteadas = 0
+        self._pool = None
+        self._pendiente = None
+        # Ultimo pedido salteado (aprendiz, unidades, extra): se corre en cerrar()
+        self._saltada = None
+        self._ultimas = 0
+        self._t0 = None
+        self._t_eval = 0.0
+
+    def _bloques(self):
+        # Un bloque de repartos por worker y por rival
+        n = max(1, self.workers)
+        return [list(range(i, self.partidas, n)) for i in range(n)]
+
+    def toca(self, unidades):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        self.recoger()
+        return self.cada > 0 and unidades - self._ultimas >= self.cada
+
+    def lanzar(self, aprendiz, unidades, **extra):
+        """
+        Evalua `aprendiz` (una copia que el trainer ya no modifica) sin esperar
+        el resultado. `extra`: columnas adicionales para la fila de cada rival.
+        """
+        t0 = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = t0
+        entrenamiento = t0 - self._t0 - self._t_eval
+        try:
+            self._lanzar(aprendiz, unidades, dict(extra, segundos_entrenamiento=entrenamiento))
+        finally:
+            self._t_eval += time.perf_counter() - t0
+        self.recoger()
+
+    def _lanzar(self, aprendiz, unidades, extra):
+        self._ultimas = unidades
+        if self._pendiente is not None:
+            # La anterior sigue corriendo: no se encolan evaluaciones, solo se
+            # guarda la ultima para que la curva no pierda el punto final
+            self.salteadas += 1
+            self._saltada = (aprendiz, unidades, extra)
+            print(f"Evaluacion {unidades}: salteada, la anterior sigue en curso.")
+            return
+        self._saltada = None
+        tareas = []
+        for nombre in self.rivales:
+            for indices in self._bloques():
+                memos = [self.memos[nombre][n] for n in indices]
+                tareas.append((nombre, indices, (aprendiz, nombre, indices, self.seed, memos)))
+        t0 = time.perf_counter()
+        if self.workers == 0:
+            hechas = [(nombre, indices, _tarea(args)) for nombre, indices, args in tareas]
+            self._pendiente = (unidades, t0, extra, hechas)
+        else:
+            if self._pool is None:
+                ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+                self._pool = ctx.Pool(self.workers)
+            asincronas = [(nombre, indices, self._pool.apply_async(_tarea, (args,))) for nombre, indices, args in tareas]
+            self._pendiente = (unidades, t0, extra, asincronas)
+
+    def recoger(self, esperar=False):
+        """Registra la evaluacion en curso si ya termino (o la espera, con esperar=True)."""
+        if self._pendiente is None:
+            return
+        unidades, t0, extra, tareas = self._pendiente
+        if self.workers > 0:
+            if not esperar and not all(r.ready() for _, _, r in tareas):
+                return
+            tareas = [(nombre, indices, r.get()) for nombre, indices, r in tareas]
+        self._pendiente = None
+        t1 = time.perf_counter()
+        segundos = t1 - t0
+
+        por_rival = {}
+        for nombre, indices, (resultados, deltas, usados, aciertos, decisiones) in tareas:
+            for n, usado in zip(indices, usados):
+                self.memos[nombre][n] = usado
+            acum = por_rival.setdefault(nombre, {"resultados": [], "deltas": [], "aciertos": 0, "decisiones": 0})
+            acum["resultados"] += resultados
+            acum["deltas"] += deltas
+            acum["aciertos"] += aciertos
+            acum["decisiones"] += decisiones
+        for nombre in self.rivales:
+            self._registrar(unidades, nombre, por_rival[nombre], segundos, extra)
+        self._t_eval += time.perf_counter() - t1
+
+    def _registrar(self, unidades, nombre, acum, segundos, extra):
+        resultados = np.array(acum["resultados"])
+        deltas = np.array(acum["deltas"], dtype=np.float64)
+        bajo, alto = intervalo_wilson(resultados.sum(), len(resultados))
+        media = float(deltas.mean()) if len(deltas) else 0.0
+        radio = Z_95 * float(deltas.std(ddof=1)) / math.sqrt(len(deltas)) if len(deltas) > 1 else 0.0
+        fila = {
+            "unidades": unidades,
+            "rival": nombre,
+            "partidas": len(resultados),
+            "winrate": float(resultados.mean()),
+            "winrate_bajo": bajo,
+            "winrate_alto": alto,
+            "puntos_mano": media,
+            "puntos_mano_ic": radio,
+            "manos": len(deltas),
+            "memo": acum["aciertos"] / acum["decisiones"] if acum["decisiones"] else 0.0,
+            "segundos": segundos,
+        }
+        fila.update(extra)
+        self.historial.append(fila)
+        print(
+            f"Eval {self.unidad} {unidades} vs {nombre} | winrate={fila['winrate']:.3f} "
+            f"[{bajo:.3f}, {alto:.3f}] | puntos/mano={media:+.3f} +-{radio:.3f} "
+            f"| memo {fila['memo']:.0%} | {segundos:.1f}s"
+        )
+        if self.csv_path:
+            nuevo = not os.path.exists(self.csv_path)
+            os.makedirs(os.path.dirname(os.path.abspath(self.csv_path)), exist_ok=True)
+            with open(self.csv_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(fila))
+                if nuevo:
+                    writer.writeheader()
+                writer.writerow(fila)
+
+    def cerrar(self):
+        self.recoger(esperar=True)
+        if self._saltada is not None:
+            aprendiz, unidades, extra = self._saltada
+            print(f"Evaluacion {unidades}: se corre al cerrar.")
+            self._lanzar(aprendiz, unidades, extra)
+            self.recoger(esperar=True)
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def agregar_argumentos(parser):
+    group = parser.add_argument_group("evaluacion incremental")
+    group.add_argument(
+        "--evaluacion-cada",
+        type=int,
+        default=0,
+        help="Unidades de entrenamiento entre evaluaciones en segundo plano (0 = no).",
+    )
+    group.add_argument(
+        "--evaluacion-rivales",
+        nargs="+",
+        default=["rational"],
+        help="Agentes de referencia del set fijo.",
+    )
+    group.add_argument("--evaluacion-partidas", type=int, default=200, help="Repartos sembrados por rival.")
+    group.add_argument(
+        "--evaluacion-workers",
+        type=int,
+        default=1,
+        help="Procesos del pool de evaluacion (0 = en el mismo proceso, frena el entrenamiento).",
+    )
+    group.add_argument("--evaluacion-csv", default=None, help="CSV con una fila por evaluacion y rival.")
+
+
+def desde_args(args, unidad="episodios"):
+    """EvaluacionIncremental segun los flags de agregar_argumentos (None si no se pidio)."""
+    if args.evaluacion_cada <= 0:
+        return None
+    return EvaluacionIncremental(
+        args.evaluacion_cada,
+        rivales=args.evaluacion_rivales,
+        partidas=args.evaluacion_partidas,
+        workers=args.evaluacion_workers,
+        csv_path=args.evaluacion_csv,
+        unidad=unidad,
+    )
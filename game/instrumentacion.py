@@ -0,0 +1,172 @@
+import cProfile
+import io
+import pstats
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+
+# =============================================================================
+# INSTRUMENTACION
+# Contadores de tiempo por seccion (aplicar_accion, get_action_mask,
+# _estado_a_observacion, choose_action, learner_update, checkpoint_io, ...).
+# Desactivada, `seccion()` devuelve siempre el mismo contexto nulo y `paso()`
+# solo incrementa un contador; TrucoEnv ni siquiera entra a esas llamadas si no
+# tiene instrumentacion asignada.
+# Las secciones pueden anidarse (ej: choose_action incluye la observacion que
+# pide el agente), por eso los porcentajes del reporte no necesariamente suman 100.
+# =============================================================================
+
+_NULO = nullcontext()
+
+
+class _Seccion:
+    __slots__ = ("_inst", "_nombre", "_t0")
+
+    def __init__(self, inst, nombre):
+        self._inst = inst
+        self._nombre = nombre
+        self._t0 = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        inst = self._inst
+        inst.totales[self._nombre] += time.perf_counter() - self._t0
+        inst.llamadas[self._nombre] += 1
+        return False
+
+
+class Instrumentacion:
+    def __init__(
+        self,
+        enabled=True,
+        report_every=10.0,
+        cprofile_steps=None,
+        cprofile_out=None,
+        unidad="steps",
+    ):
+        self.enabled = enabled
+        self.report_every = report_every
+        self.unidad = unidad
+        self.totales = defaultdict(float)
+        self.llamadas = defaultdict(int)
+        self.pasos = 0
+        self._t_inicio = time.perf_counter()
+        self._t_reporte = self._t_inicio
+        self._pasos_reporte = 0
+
+        # Ventana de cProfile: (paso_inicio, paso_fin)
+        self._cprofile_steps = cprofile_steps
+        self._cprofile_out = cprofile_out
+        self._profiler = None
+
+    def seccion(self, nombre):
+        if not self.enabled:
+            return _NULO
+        return _Seccion(self, nombre)
+
+    def paso(self, n=1):
+        self.pasos += n
+        if self._cprofile_steps is not None:
+            self._actualizar_cprofile()
+        # Chequear el reloj cada 256 pasos mantiene barato el camino comun
+        if self.enabled and self.report_every and (self.pasos & 0xFF) == 0:
+            ahora = time.perf_counter()
+            if ahora - self._t_reporte >= self.report_every:
+                print(self.reporte(ahora))
+                self._t_reporte = ahora
+                self._pasos_reporte = self.pasos
+
+    def _actualizar_cprofile(self):
+        inicio, fin = self._cprofile_steps
+        if self._profiler is None and inicio <= self.pasos < fin:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self._profiler is not None and self.pasos >= fin:
+            self._profiler.disable()
+            self._volcar_cprofile()
+            self._profiler = None
+            self._cprofile_steps = None
+
+    def _volcar_cprofile(self):
+        if self._cprofile_out:
+            self._profiler.dump_stats(self._cprofile_out)
+            print(f"[perf] cProfile guardado en {self._cprofile_out}")
+        buffer = io.StringIO()
+        pstats.Stats(self._profiler, stream=buffer).sort_stats("cumulative").print_stats(20)
+        print(buffer.getvalue())
+
+    def reporte(self, ahora=None):
+        ahora = ahora or time.perf_counter()
+        total = ahora - self._t_inicio
+        ventana = ahora - self._t_reporte
+        ritmo = (self.pasos - self._pasos_reporte) / ventana if ventana > 0 else 0.0
+        lineas = [
+            f"[perf] {self.pasos} {self.unidad} en {total:.1f}s | "
+            f"{ritmo:.0f} {self.unidad}/s (ultimos {ventana:.1f}s) | "
+            f"{self.pasos / total if total > 0 else 0.0:.0f} {self.unidad}/s promedio"
+        ]
+        medido = 0.0
+        for nombre, segundos in sorted(self.totales.items(), key=lambda item: -item[1]):
+            llamadas = self.llamadas[nombre]
+            medido += segundos
+            lineas.append(
+                f"  {nombre:<24} {segundos:9.2f}s {segundos / total:6.1%} "
+                f"{llamadas:>10} llamadas {segundos / max(1, llamadas) * 1e6:9.1f} us/llamada"
+            )
+        if self.totales:
+            lineas.append(f"  {'(sin medir)':<24} {max(0.0, total - medido):9.2f}s")
+        return "\n".join(lineas)
+
+    def cerrar(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._volcar_cprofile()
+            self._profiler = None
+        if self.enabled:
+            print(self.reporte())
+
+
+def agregar_argumentos(parser):
+    group = parser.add_argument_group("instrumentacion")
+    group.add_argument(
+        "--profile",
+        action="store_true",
+        help="Activa contadores de tiempo por seccion y reportes periodicos.",
+    )
+    group.add_argument(
+        "--profile-every",
+        type=float,
+        default=10.0,
+        help="Segundos entre reportes de --profile.",
+    )
+    group.add_argument(
+        "--cprofile-steps",
+        default=None,
+        help="Ventana de pasos a perfilar con cProfile, ej: 1000:5000.",
+    )
+    group.add_argument(
+        "--cprofile-out",
+        default=None,
+        help="Archivo .pstats donde volcar la ventana de cProfile.",
+    )
+
+
+def desde_args(args, unidad="steps"):
+    """Crea una Instrumentacion segun los flags de agregar_argumentos (None si no se pidio nada)."""
+    cprofile_steps = None
+    if args.cprofile_steps:
+        inicio, fin = args.cprofile_steps.split(":", 1)
+        cprofile_steps = (int(inicio), int(fin))
+    if not args.profile and cprofile_steps is None:
+        return None
+    return Instrumentacion(
+        enabled=args.profile,
+        report_every=args.profile_every,
+        cprofile_steps=cprofile_steps,
+        cprofile_out=args.cprofile_out,
+        unidad=unidad,
+    )
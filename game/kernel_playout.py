@@ -0,0 +1,259 @@
+import numpy as np
+
+from constantes import CARTA_A_ID, CARTAS, MAZO_DATOS
+
+try:
+    from numba import njit
+
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+
+    def njit(*args, **kwargs):
+        """Sin numba las funciones del kernel corren como Python puro."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+# =============================================================================
+# KERNEL DE PLAYOUTS
+# Simula el resto de la parte de cartas de una mano (las vueltas) con una
+# codificacion entera: cartas = ids 0-39 (orden de CARTAS), manos = int64[2, 3]
+# con la cantidad de cartas de cada jugador aparte. Los cantos no se simulan:
+# el valor del truco queda fijo en el que tenga el estado al empezar.
+# Las reglas de las vueltas replican TrucoGameLogic (aplicar_accion y
+# _ganador_mano_completa); benchmarks/paridad_kernel.py lo verifica.
+# Con numba instalado el kernel se compila (njit); sin numba corre igual en
+# Python puro, mucho mas lento.
+# =============================================================================
+
+RANKING = np.array([MAZO_DATOS[c]["ranking"] for c in CARTAS], dtype=np.int64)
+N_RANKINGS = int(RANKING.max()) + 1
+
+# Pesos uniformes: cada carta de la mano con la misma probabilidad
+PESOS_UNIFORMES = np.ones((2, N_RANKINGS), dtype=np.float64)
+
+
+@njit(cache=True)
+def _ganador_mano(resultados, n_resultados, es_mano):
+    """Igual que TrucoGameLogic._ganador_mano_completa; -1 si la mano sigue."""
+    ganadas_j = 0
+    ganadas_o = 0
+    empatadas = 0
+    primera = -1
+    ultima = -1
+    for i in range(n_resultados):
+        r = resultados[i]
+        if r == 0:
+            ganadas_j += 1
+        elif r == 1:
+            ganadas_o += 1
+        else:
+            empatadas += 1
+        if r != 2:
+            ultima = r
+            if primera == -1:
+                primera = r
+    jugador_mano = 0 if es_mano else 1
+
+    if ganadas_j >= 2:
+        return 0
+    if ganadas_o >= 2:
+        return 1
+    if n_resultados == 2:
+        if (ganadas_j == 1 or ganadas_o == 1) and empatadas == 1:
+            return ultima
+        return -1
+    if n_resultados >= 3:
+        if ganadas_j > ganadas_o:
+            return 0
+        if ganadas_o > ganadas_j:
+            return 1
+        if empatadas == 3:
+            return jugador_mano
+        if ganadas_j == 1 and ganadas_o == 1 and empatadas == 1 and primera != -1:
+            return primera
+        if ultima != -1:
+            return ultima
+        return jugador_mano
+    return -1
+
+
+@njit(cache=True)
+def _elegir_indice(manos, n_cartas, jugador, pesos, rng):
+    """Indice de la carta a jugar, con probabilidad proporcional a pesos[jugador, ranking]."""
+    n = n_cartas[jugador]
+    total = 0.0
+    for i in range(n):
+        total += pesos[jugador, RANKING[manos[jugador, i]]]
+    u = rng.random() * total
+    acumulado = 0.0
+    for i in range(n - 1):
+        acumulado += pesos[jugador, RANKING[manos[jugador, i]]]
+        if u < acumulado:
+            return i
+    return n - 1
+
+
+@njit(cache=True)
+def _jugar_vueltas(manos, n_cartas, turno, mesa_carta, mesa_jugador, resultados, n_resultados, es_mano,
+                   pesos, elecciones, rng):
+    """
+    Juega cartas hasta que se decide la mano y devuelve el ganador (0 o 1).
+    Si `elecciones` no esta vacio, la k-esima carta jugada es elecciones[k]
+    (indice dentro de la mano, como JUGAR_CARTA_1..3); si no, se sortea con `pesos`.
+    Modifica manos, n_cartas y resultados.
+    """
+    k = 0
+    jugador_mano = 0 if es_mano else 1
+    while True:
+        jugador = turno
+        if k < elecciones.shape[0]:
+            idx = elecciones[k]
+        else:
+            idx = _elegir_indice(manos, n_cartas, jugador, pesos, rng)
+        k += 1
+
+        # pop(idx) con corrimiento, igual que la lista del motor
+        carta = manos[jugador, idx]
+        n = n_cartas[jugador]
+        for i in range(idx, n - 1):
+            manos[jugador, i] = manos[jugador, i + 1]
+        n_cartas[jugador] = n - 1
+
+        if mesa_jugador == -1:
+            mesa_carta = carta
+            mesa_jugador = jugador
+            turno = 1 - jugador
+            continue
+
+        rank_primera = RANKING[mesa_carta]
+        rank_segunda = RANKING[carta]
+        if rank_primera < rank_segunda:
+            ganador = mesa_jugador
+        elif rank_segunda < rank_primera:
+            ganador = jugador
+        else:
+            ganador = 2
+        resultados[n_resultados] = ganador
+        n_resultados += 1
+        turno = jugador_mano if ganador == 2 else ganador
+        mesa_jugador = -1
+
+        ganador_mano = _ganador_mano(resultados, n_resultados, es_mano)
+        if ganador_mano != -1:
+            return ganador_mano
+
+
+@njit(cache=True)
+def _playouts(manos, n_cartas, turno, mesa_carta, mesa_jugador, resultados, n_resultados, es_mano,
+              valor, tope_0, tope_1, pesos, n, rival, desconocidas, rng, out):
+    m = np.empty((2, 3), dtype=np.int64)
+    nc = np.empty(2, dtype=np.int64)
+    res = np.empty(3, dtype=np.int64)
+    pool = desconocidas.copy()
+    n_pool = pool.shape[0]
+    sin_elecciones = np.empty(0, dtype=np.int64)
+    puntos_0 = min(valor, tope_0)
+    puntos_1 = min(valor, tope_1)
+    for p in range(n):
+        m[:, :] = manos
+        nc[:] = n_cartas
+        res[:] = resultados
+        if rival >= 0:
+            # Cartas del rival sorteadas sin reposicion entre las que no se ven
+            for j in range(nc[rival]):
+                t = j + rng.integers(0, n_pool - j)
+                aux = pool[j]
+                pool[j] = pool[t]
+                pool[t] = aux
+                m[rival, j] = pool[j]
+        ganador = _jugar_vueltas(
+            m, nc, turno, mesa_carta, mesa_jugador, res, n_resultados, es_mano, pesos, sin_elecciones, rng
+        )
+        out[p] = puntos_0 if ganador == 0 else -puntos_1
+
+
+def estado_kernel(logic):
+    """Codifica el estado de las vueltas de `logic` para el kernel."""
+    estado = logic.estado
+    manos = np.zeros((2, 3), dtype=np.int64)
+    n_cartas = np.zeros(2, dtype=np.int64)
+    for jugador, mano in enumerate((estado.mano_jugador, estado.mano_oponente)):
+        n_cartas[jugador] = len(mano)
+        for i, carta in enumerate(mano):
+            manos[jugador, i] = CARTA_A_ID[carta]
+    mesa_carta, mesa_jugador = 0, -1
+    if len(estado.cartas_jugadas) % 2 == 1:
+        carta, jugador = estado.cartas_jugadas[-1]
+        mesa_carta, mesa_jugador = CARTA_A_ID[carta], jugador
+    resultados = np.zeros(3, dtype=np.int64)
+    resultados[: len(estado.resultados_ronda)] = estado.resultados_ronda
+    return {
+        "manos": manos,
+        "n_cartas": n_cartas,
+        "turno": estado.turno_actual,
+        "mesa_carta": mesa_carta,
+        "mesa_jugador": mesa_jugador,
+        "resultados": resultados,
+        "n_resultados": len(estado.resultados_ronda),
+        "es_mano": bool(estado.es_mano),
+        "valor": logic._valor_truco_puntaje(),
+        "tope_0": 30 - estado.puntos_jugador,
+        "tope_1": 30 - estado.puntos_oponente,
+    }
+
+
+def _cartas_desconocidas(logic, rival):
+    """Cartas que el otro jugador no ve: todo menos su mano y lo jugado en la mesa."""
+    estado = logic.estado
+    propia = estado.mano_oponente if rival == 0 else estado.mano_jugador
+    vistas = {CARTA_A_ID[c] for c in propia}
+    vistas.update(CARTA_A_ID[c] for c, _ in estado.cartas_jugadas)
+    return np.array([i for i in range(len(CARTAS)) if i not in vistas], dtype=np.int64)
+
+
+def playouts(logic, n, pesos=None, rival=None, seed=None):
+    """
+    Corre `n` playouts del resto de la mano desde el estado de `logic`.
+    Devuelve un array int16 con los puntos netos de cada playout para J0
+    (+valor si gana J0, -valor si gana J1, recortado a lo que falta para 30).
+
+    pesos: array (2, N_RANKINGS); cada jugador elige carta con probabilidad
+        proporcional a pesos[jugador, ranking] (por defecto uniforme).
+    rival: si se indica, las cartas de ese jugador se sortean en cada playout
+        entre las que el otro no ve (evaluacion desde la perspectiva del otro).
+    seed: semilla de un np.random.default_rng propio de la llamada (no toca
+        el RNG global de numpy, con o sin numba).
+    """
+    estado = logic.estado
+    if estado.turno_responder_envido or estado.turno_responder_truco:
+        raise ValueError("Hay un canto pendiente de respuesta: no se pueden jugar cartas.")
+    s = estado_kernel(logic)
+    if pesos is None:
+        pesos = PESOS_UNIFORMES
+    pesos = np.ascontiguousarray(pesos, dtype=np.float64)
+    if rival is None:
+        rival = -1
+        desconocidas = np.empty(0, dtype=np.int64)
+    else:
+        desconocidas = _cartas_desconocidas(logic, rival)
+    out = np.empty(n, dtype=np.int16)
+    _playouts(
+        s["manos"], s["n_cartas"], s["turno"], s["mesa_carta"], s["mesa_jugador"],
+        s["resultados"], s["n_resultados"], s["es_mano"], s["valor"], s["tope_0"], s["tope_1"],
+        pesos, n, rival, desconocidas, np.random.default_rng(seed), out,
+    )
+    return out
+
+
+def _resolver_con_elecciones(logic, elecciones):
+    """Juega la secuencia de indices `elecciones` en el kernel (usado por la prueba de paridad)."""
+    s = estado_kernel(logic)
+    ganador = _jugar_vueltas(
+        s["manos"], s["n_cartas"], s["turno"], s["mesa_carta"], s["mesa_jugador"],
+        s["resultados"], s["n_resultados"], s["es_mano"], PESOS_UNIFORMES,
+        np.asarray(elecciones, dtype=np.int64), np.random.default_rng(0),
+    )
+    return min(s["valor"], s["tope_0"]) if ganador == 0 else -min(s["valor"], s["tope_1"])
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+
+# =============================================================================
+# FORMATO DEL STORE
+# Un store es un directorio con chunks append-only:
+#   index.jsonl          -> una linea JSON por chunk (archivo, filas, agentes, rango de partidas)
+#   chunk_000000.npz     -> columnas NumPy de ese chunk (sin comprimir, carga rapida)
+# Cada chunk se escribe en un archivo temporal y se renombra, asi un corte a mitad
+# de la corrida nunca deja un chunk a medias referenciado en el indice.
+# =============================================================================
+
+COLUMNAS = {
+    "game": np.int64,
+    "winner": np.int8,        # 0=J0, 1=J1, 2=Empate
+    "points_j0": np.int16,
+    "points_j1": np.int16,
+    "hands_played": np.int16,
+    "hands_won_j0": np.int16,
+    "hands_won_j1": np.int16,
+}
+
+GANADOR_A_CODIGO = {"J0": 0, "J1": 1, "Empate": 2}
+CODIGO_A_GANADOR = {v: k for k, v in GANADOR_A_CODIGO.items()}
+
+INDEX_NAME = "index.jsonl"
+
+
+def _chunk_name(chunk_idx):
+    return f"chunk_{chunk_idx:06d}.npz"
+
+
+class MatchupStoreWriter:
+    """
+    Acumula resultados de partidas en buffers columnares y los vuelca en chunks.
+    """
+
+    def __init__(self, path, agent_0, agent_1, chunk_size=65536):
+        self.path = path
+        self.agent_0 = agent_0
+        self.agent_1 = agent_1
+        self.chunk_size = max(1, int(chunk_size))
+        os.makedirs(self.path, exist_ok=True)
+
+        self._buffers = {
+            name: np.empty(self.chunk_size, dtype=dtype) for name, dtype in COLUMNAS.items()
+        }
+        self._rows = 0
+        self.next_chunk = len(read_index(self.path))
+
+    def append(self, result):
+        i = self._rows
+        buffers = self._buffers
+        buffers["game"][i] = result["game"]
+        buffers["winner"][i] = GANADOR_A_CODIGO[result["winner"]]
+        buffers["points_j0"][i] = result["points_j0"]
+        buffers["points_j1"][i] = result["points_j1"]
+        buffers["hands_played"][i] = result["hands_played"]
+        buffers["hands_won_j0"][i] = result["hands_won_j0"]
+        buffers["hands_won_j1"][i] = result["hands_won_j1"]
+        self._rows += 1
+        if self._rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows == 0:
+            return
+        n = self._rows
+        chunk_file = _chunk_name(self.next_chunk)
+        chunk_path = os.path.join(self.path, chunk_file)
+        tmp_path = chunk_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **{name: buf[:n] for name, buf in self._buffers.items()})
+        os.replace(tmp_path, chunk_path)
+
+        entry = {
+            "chunk": self.next_chunk,
+            "file": chunk_file,
+            "rows": n,
+            "agent_0": self.agent_0,
+            "agent_1": self.agent_1,
+            "game_min": int(self._buffers["game"][0]),
+            "game_max": int(self._buffers["game"][n - 1]),
+        }
+        with open(os.path.join(self.path, INDEX_NAME), "a", encoding="utf-8") as index:
+            index.write(json.dumps(entry) + "\n")
+
+        self.next_chunk += 1
+        self._rows = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_index(path):
+    index_path = os.path.join(path, INDEX_NAME)
+    if not os.path.exists(index_path):
+        return []
+    entries = []
+    with open(index_path, "r", encoding="utf-8") as index:
+        for line in index:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+class MatchupStoreReader:
+    """
+    Lee un store chunk por chunk; nunca carga mas de un chunk en memoria.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = read_index(path)
+
+    def select(self, chunks=None, agent_0=None, agent_1=None):
+        entries = self.index
+        if chunks is not None:
+            wanted = set(chunks)
+            entries = [e for e in entries if e["chunk"] in wanted]
+        if agent_0 is not None:
+            entries = [e for e in entries if e["agent_0"] == agent_0]
+        if agent_1 is not None:
+            entries = [e for e in entries if e["agent_1"] == agent_1]
+        return entries
+
+    def iter_chunks(self, chunks=None, agent_0=None, agent_1=None):
+        for entry in self.select(chunks, agent_0, agent_1):
+            with np.load(os.path.join(self.path, entry["file"])) as data:
+                yield entry, {name: data[name] for name in COLUMNAS}
+
+    def aggregate(self, chunks=None, agent_0=None, agent_1=None):
+        totals = {
+            "games": 0,
+            "wins_j0": 0,
+            "wins_j1": 0,
+            "ties": 0,
+            "points_j0": 0,
+            "points_j1": 0,
+            "hands_played": 0,
+            "hands_won_j0": 0,
+            "hands_won_j1": 0,
+        }
+        for _, cols in self.iter_chunks(chunks, agent_0, agent_1):
+            winners = np.bincount(cols["winner"], minlength=3)
+            totals["games"] += int(cols["game"].size)
+            totals["wins_j0"] += int(winners[0])
+            totals["wins_j1"] += int(winners[1])
+            totals["ties"] += int(winners[2])
+            for name in ["points_j0", "points_j1", "hands_played", "hands_won_j0", "hands_won_j1"]:
+                totals[name] += int(cols[name].sum(dtype=np.int64))
+        return totals
+
+    def export_csv(self, csv_path, chunks=None, agent_0=None, agent_1=None):
+        fieldnames = [
+            "game",
+            "agent_0",
+            "agent_1",
+            "winner",
+            "points_j0",
+            "points_j1",
+            "points_lost_j0",
+            "points_lost_j1",
+            "hands_played",
+            "hands_won_j0",
+            "hands_won_j1",
+        ]
+        with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(fieldnames)
+            for entry, cols in self.iter_chunks(chunks, agent_0, agent_1):
+                winners = [CODIGO_A_GANADOR[int(w)] for w in cols["winner"]]
+                rows = zip(
+                    cols["game"].tolist(),
+                    winners,
+                    cols["points_j0"].tolist(),
+                    cols["points_j1"].tolist(),
+                    cols["hands_played"].tolist(),
+                    cols["hands_won_j0"].tolist(),
+                    cols["hands_won_j1"].tolist(),
+                )
+                for game, winner, p0, p1, hands, won0, won1 in rows:
+                    writer.writerow(
+                        [game, entry["agent_0"], entry["agent_1"], winner, p0, p1, p1, p0, hands, won0, won1]
+                    )
+
+
+def _parse_chunks(spec):
+    if spec is None:
+        return None
+    chunks = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            chunks.extend(range(int(start), int(end) + 1))
+        else:
+            chunks.append(int(part))
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Agrega o exporta resultados de un store columnar de matchups."
+    )
+    parser.add_argument("store", help="Directorio del store (ej: resultados/randomvsrationalresults.store).")
+    parser.add_argument(
+        "--chunks",
+        default=None,
+        help="Subconjunto de chunks, ej: 0-3,7 (por defecto todos).",
+    )
+    parser.add_argument("--agent-0", default=None, help="Filtra chunks por agente J0.")
+    parser.add_argument("--agent-1", default=None, help="Filtra chunks por agente J1.")
+    parser.add_argument("--export-csv", default=None, help="Exporta las filas seleccionadas a CSV.")
+    args = parser.parse_args()
+
+    reader = MatchupStoreReader(args.store)
+    chunks = _parse_chunks(args.chunks)
+    totals = reader.aggregate(chunks, args.agent_0, args.agent_1)
+    games = totals["games"]
+    print(f"Chunks: {len(reader.select(chunks, args.agent_0, args.agent_1))}")
+    for key, value in totals.items():
+        print(f"- {key}: {value}")
+    if games > 0:
+        print(f"- winrate_j0: {totals['wins_j0'] / games:.4f}")
+        print(f"- winrate_j1: {totals['wins_j1'] / games:.4f}")
+        print(f"- avg_points_j0: {totals['points_j0'] / games:.2f}")
+        print(f"- avg_points_j1: {totals['points_j1'] / games:.2f}")
+        print(f"- avg_hands_played: {totals['hands_played'] / games:.2f}")
+    if args.export_csv:
+        reader.export_csv(args.export_csv, chunks, args.agent_0, args.agent_1)
+        print(f"CSV exportado en {args.export_csv}")
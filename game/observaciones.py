@@ -0,0 +1,224 @@
+import itertools
+from functools import lru_cache
+
+import numpy as np
+from gymnasium import spaces
+
+from constantes import CARTA_A_ID, CARTAS, MAZO_DATOS
+from envido import cargar_tabla as cargar_tabla_envido
+from envido import tanto
+from equity import cargar_tabla as cargar_tabla_equity
+
+
+# =============================================================================
+# OBSERVACION RICA (obs_mode="rich")
+# Vector binario/one-hot desde la perspectiva de `player_id` (yo = player_id):
+# [0-41]    Mis cartas en mano: 3 slots x ranking one-hot (14), mismo orden
+#           que JUGAR_CARTA_1..3
+# [42-81]   Cartas que jugue (id 0-39)
+# [82-121]  Cartas que jugo el rival (id 0-39)
+# [122-135] Carta del rival en mesa esperando respuesta (ranking one-hot)
+# [136-144] Resultado de cada vuelta: gane / perdi / parda
+# [145-147] Ronda actual one-hot
+# [148-153] Estado del canto de envido one-hot (NO_CANTADO..CERRADO)
+# [154-155] Envido cantado por: yo / rival
+# [156-162] Envido en juego: 0, 2, 3, 4, 5, 7 u otro (falta)
+# [163-167] Estado del canto de truco one-hot (NO_CANTADO..CERRADO)
+# [168-171] Nivel de truco aceptado one-hot
+# [172-173] Truco cantado por: yo / rival
+# [174-175] Truco aceptado por: yo / rival
+# [176-180] Responder envido, responder truco, es mi turno, soy mano, envido finalizado
+# [181-186] Zona de mis puntos (de a 5: 0-4, ..., 25-29 y 30)
+# [187-192] Zona de puntos del rival
+# [193-197] Escalares en [0, 1]: mis puntos / 30, puntos rival / 30,
+#           equity de la mano, P(ganar el envido) (0 si el envido ya no
+#           se puede jugar), mi tanto / 33
+# Todo sale de tablas de indices por carta y de las tablas de equity/envido
+# (precalculadas por mano y cacheadas por reparto); el vector se arma sobre
+# un buffer preasignado.
+# =============================================================================
+
+N_RANKINGS = 14
+N_CARTAS = len(CARTAS)
+
+OFF_MANO = 0
+OFF_MIS_JUGADAS = OFF_MANO + 3 * N_RANKINGS
+OFF_JUGADAS_RIVAL = OFF_MIS_JUGADAS + N_CARTAS
+OFF_MESA = OFF_JUGADAS_RIVAL + N_CARTAS
+OFF_RESULTADOS = OFF_MESA + N_RANKINGS
+OFF_RONDA = OFF_RESULTADOS + 9
+OFF_CANTO_ENVIDO = OFF_RONDA + 3
+OFF_ENVIDO_CANTADO_POR = OFF_CANTO_ENVIDO + 6
+OFF_ENVIDO_TOTAL = OFF_ENVIDO_CANTADO_POR + 2
+OFF_CANTO_TRUCO = OFF_ENVIDO_TOTAL + 7
+OFF_NIVEL_TRUCO = OFF_CANTO_TRUCO + 5
+OFF_TRUCO_CANTADO_POR = OFF_NIVEL_TRUCO + 4
+OFF_TRUCO_ACEPTADO_POR = OFF_TRUCO_CANTADO_POR + 2
+OFF_FLAGS = OFF_TRUCO_ACEPTADO_POR + 2
+OFF_ZONA_MIA = OFF_FLAGS + 5
+OFF_ZONA_RIVAL = OFF_ZONA_MIA + 6
+OFF_ESCALARES = OFF_ZONA_RIVAL + 6
+OBS_RICA_DIM = OFF_ESCALARES + 5
+
+# Indices precalculados por carta
+_IDX_MANO = [
+    {c: OFF_MANO + slot * N_RANKINGS + MAZO_DATOS[c]["ranking"] - 1 for c in CARTAS} for slot in range(3)
+]
+_IDX_MIS_JUGADAS = {c: OFF_MIS_JUGADAS + CARTA_A_ID[c] for c in CARTAS}
+_IDX_JUGADAS_RIVAL = {c: OFF_JUGADAS_RIVAL + CARTA_A_ID[c] for c in CARTAS}
+_IDX_MESA = {c: OFF_MESA + MAZO_DATOS[c]["ranking"] - 1 for c in CARTAS}
+
+# Resultado de vuelta (0 gana J0, 1 gana J1, 2 parda) visto por cada jugador
+_IDX_RESULTADO = tuple(
+    [[OFF_RESULTADOS + 3 * v + orden[r] for r in range(3)] for v in range(3)]
+    for orden in ((0, 1, 2), (1, 0, 2))
+)
+_IDX_ENVIDO_TOTAL = {t: OFF_ENVIDO_TOTAL + i for i, t in enumerate((0, 2, 3, 4, 5, 7))}
+_IDX_ENVIDO_TOTAL_OTRO = OFF_ENVIDO_TOTAL + 6
+_IDX_RONDA = [OFF_RONDA + min(max(r, 1), 3) - 1 for r in range(5)]
+_IDX_ZONA_MIA = [OFF_ZONA_MIA + min(p // 5, 5) for p in range(31)]
+_IDX_ZONA_RIVAL = [OFF_ZONA_RIVAL + min(p // 5, 5) for p in range(31)]
+
+_BIT_CARTA = {c: 1 << CARTA_A_ID[c] for c in CARTAS}
+
+
+@lru_cache(maxsize=None)
+def _oraculos_sin_reveladas():
+    """
+    Escalares de cada una de las 9880 manos antes de que el rival muestre
+    cartas, indexados por la mascara de 40 bits de la mano:
+    (equity pie, equity mano, P(envido) pie, P(envido) mano, tanto / 33).
+    """
+    equity = cargar_tabla_equity()
+    envido = cargar_tabla_envido()
+    valores = {}
+    for mano in itertools.combinations(CARTAS, 3):
+        rankings = [MAZO_DATOS[c]["ranking"] for c in mano]
+        valores[sum(_BIT_CARTA[c] for c in mano)] = (
+            equity.equity(rankings, (), False),
+            equity.equity(rankings, (), True),
+            envido.probabilidad(mano, (), False),
+            envido.probabilidad(mano, (), True),
+            tanto(mano) / 33.0,
+        )
+    return valores
+
+
+def observation_space_rico():
+    return spaces.Box(low=0.0, high=1.0, shape=(OBS_RICA_DIM,), dtype=np.float32)
+
+
+class CodificadorRico:
+    def __init__(self):
+        # Buffer float32 preasignado; se escribe por memoryview (asignaciones
+        # de Python puro, sin pasar por numpy elemento a elemento)
+        self._obs = np.zeros(OBS_RICA_DIM, dtype=np.float32)
+        self._buf = memoryview(self._obs)
+        self._ceros = memoryview(np.zeros(OBS_RICA_DIM, dtype=np.float32))
+        self._equity = cargar_tabla_equity()
+        self._envido = cargar_tabla_envido()
+        self._sin_reveladas = _oraculos_sin_reveladas()
+        # Escalares de los oraculos por jugador: solo cambian con el reparto,
+        # cuando el rival juega una carta o cuando se cierra el envido
+        self._cache_reparto = [None, None]
+        self._cache_clave = [-1, -1]
+        self._cache_valores = [(0.0, 0.0, 0.0), (0.0, 0.0, 0.0)]
+
+    def _escalares_oraculos(self, logic, player_id, n_reveladas, envido_abierto, clave):
+        reparto = logic.reparto
+        mano = reparto[player_id]
+        if not mano:
+            valores = (0.0, 0.0, 0.0)
+        else:
+            es_mano = logic.estado.es_mano == (player_id == 0)
+            if self._cache_reparto[player_id] is reparto and self._cache_clave[player_id] >> 1 == n_reveladas:
+                # Solo cambio el estado del envido: equity y tanto siguen valiendo
+                equity, _, mi_tanto = self._cache_valores[player_id]
+                env_pie = env_mano = None
+            else:
+                eq_pie, eq_mano, env_pie, env_mano, mi_tanto = self._sin_reveladas[
+                    _BIT_CARTA[mano[0]] | _BIT_CARTA[mano[1]] | _BIT_CARTA[mano[2]]
+                ]
+                if n_reveladas:
+                    equity = self._equity.equity_jugador(logic, player_id)
+                else:
+                    equity = eq_mano if es_mano else eq_pie
+            # P(envido) solo mientras el envido se puede cantar o responder
+            if not envido_abierto:
+                prob_envido = 0.0
+            elif n_reveladas or env_pie is None:
+                prob_envido = self._envido.probabilidad_jugador(logic, player_id)
+            else:
+                prob_envido = env_mano if es_mano else env_pie
+            valores = (equity, prob_envido, mi_tanto)
+        self._cache_reparto[player_id] = reparto
+        self._cache_clave[player_id] = clave
+        self._cache_valores[player_id] = valores
+        return valores
+
+    def codificar(self, logic, player_id, jugador_actual):
+        estado = logic.estado
+        buf = self._buf
+        buf[:] = self._ceros
+
+        mano = estado.mano_jugador if player_id == 0 else estado.mano_oponente
+        for slot, carta in enumerate(mano):
+            buf[_IDX_MANO[slot][carta]] = 1
+
+        jugadas = estado.cartas_jugadas
+        n_reveladas = 0
+        for carta, jugador in jugadas:
+            if jugador == player_id:
+                buf[_IDX_MIS_JUGADAS[carta]] = 1
+            else:
+                buf[_IDX_JUGADAS_RIVAL[carta]] = 1
+                n_reveladas += 1
+        if len(jugadas) % 2 == 1 and jugadas[-1][1] != player_id:
+            buf[_IDX_MESA[jugadas[-1][0]]] = 1
+
+        idx_resultado = _IDX_RESULTADO[player_id]
+        for vuelta, resultado in enumerate(estado.resultados_ronda):
+            buf[idx_resultado[vuelta][resultado]] = 1
+        buf[_IDX_RONDA[estado.numero_ronda]] = 1
+
+        buf[OFF_CANTO_ENVIDO + estado.estado_canto_envido] = 1
+        if estado.jugador_que_canto_envido is not None:
+            buf[OFF_ENVIDO_CANTADO_POR + (estado.jugador_que_canto_envido != player_id)] = 1
+        buf[_IDX_ENVIDO_TOTAL.get(estado.envido_total, _IDX_ENVIDO_TOTAL_OTRO)] = 1
+
+        buf[OFF_CANTO_TRUCO + estado.estado_canto_truco] = 1
+        buf[OFF_NIVEL_TRUCO + estado.nivel_truco] = 1
+        if estado.jugador_que_canto_truco is not None:
+            buf[OFF_TRUCO_CANTADO_POR + (estado.jugador_que_canto_truco != player_id)] = 1
+        if estado.jugador_que_acepto_truco is not None:
+            buf[OFF_TRUCO_ACEPTADO_POR + (estado.jugador_que_acepto_truco != player_id)] = 1
+
+        buf[OFF_FLAGS] = estado.turno_responder_envido
+        buf[OFF_FLAGS + 1] = estado.turno_responder_truco
+        buf[OFF_FLAGS + 2] = jugador_actual == player_id
+        buf[OFF_FLAGS + 3] = estado.es_mano == (player_id == 0)
+        buf[OFF_FLAGS + 4] = estado.envido_finalizado
+
+        if player_id == 0:
+            mios, suyos = estado.puntos_jugador, estado.puntos_oponente
+        else:
+            mios, suyos = estado.puntos_oponente, estado.puntos_jugador
+        buf[_IDX_ZONA_MIA[mios]] = 1
+        buf[_IDX_ZONA_RIVAL[suyos]] = 1
+
+        envido_abierto = estado.turno_responder_envido or (
+            estado.numero_ronda == 1 and not estado.envido_finalizado
+        )
+        clave = 2 * n_reveladas + envido_abierto
+        if self._cache_reparto[player_id] is logic.reparto and self._cache_clave[player_id] == clave:
+            equity, prob_envido, mi_tanto = self._cache_valores[player_id]
+        else:
+            equity, prob_envido, mi_tanto = self._escalares_oraculos(
+                logic, player_id, n_reveladas, envido_abierto, clave
+            )
+        buf[OFF_ESCALARES] = mios / 30.0
+        buf[OFF_ESCALARES + 1] = suyos / 30.0
+        buf[OFF_ESCALARES + 2] = equity
+        buf[OFF_ESCALARES + 3] = prob_envido
+        buf[OFF_ESCALARES + 4] = mi_tanto
+        return self._obs.copy()
@@ -0,0 +1,356 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from constantes import Acciones
+from truco_env import TrucoEnv
+from trazas import bits_to_mask, iter_replay, load_trace, split_games
+
+
+# =============================================================================
+# DATASET OFFLINE
+# Directorio con shards memory-mappeables, uno por subdirectorio:
+#   manifest.json                  -> columnas, campos extra, agentes y filas por shard
+#   shard_000000/<columna>.npy     -> un .npy por columna (np.load(..., mmap_mode="r"))
+# Una fila = una decision de un jugador, con la observacion de TrucoEnv (13 floats),
+# features extra del estado, mascara, accion, retorno de la mano y resultado de la mano.
+# =============================================================================
+
+CAMPOS_EXTRA = [
+    "envido_propio",          # Tanto del jugador (mano + cartas jugadas)
+    "max_rival_mesa",         # Peor ranking (numero mas alto) jugado por el rival, 0 si nada
+    "rondas_ganadas_propias",
+    "rondas_ganadas_rival",
+    "rondas_empatadas",
+    "resultado_ronda_1",      # -1 sin jugar, 0 propia, 1 rival, 2 parda
+    "resultado_ronda_2",
+    "resultado_ronda_3",
+    "estado_canto_envido",
+    "estado_canto_truco",
+    "envido_total",
+    "responder_truco",
+    "responder_envido",
+    "canto_truco_propio",     # 1 si el ultimo canto de truco fue propio
+    "acepto_truco_propio",    # 1 si el jugador acepto el truco vigente
+    "canto_envido_propio",
+    "envido_finalizado",
+    "cartas_en_mano",
+]
+
+COLUMNAS = {
+    "obs": (np.float32, (13,)),
+    "extra": (np.int16, (len(CAMPOS_EXTRA),)),
+    "mask": (np.bool_, (len(Acciones),)),
+    "action": (np.int8, ()),
+    "player": (np.int8, ()),
+    "agent": (np.int8, ()),
+    "game": (np.int64, ()),
+    "ret": (np.float32, ()),
+    "hand_outcome": (np.int8, ()),
+}
+
+MANIFEST_NAME = "manifest.json"
+
+
+def caracteristicas_extra(logic, player_id, out=None):
+    """Completa `out` (int16, len(CAMPOS_EXTRA)) con features del estado para `player_id`."""
+    if out is None:
+        out = np.zeros(len(CAMPOS_EXTRA), dtype=np.int16)
+    estado = logic.estado
+    rival_id = 1 - player_id
+    mano = estado.mano_jugador if player_id == 0 else estado.mano_oponente
+    jugadas_propias = [c for c, j in estado.cartas_jugadas if j == player_id]
+    rival_ranks = [logic.obtener_ranking(c) for c, j in estado.cartas_jugadas if j == rival_id]
+
+    out[0] = logic.calcular_puntos_envido(list(mano) + jugadas_propias)
+    out[1] = max(rival_ranks) if rival_ranks else 0
+    if player_id == 0:
+        out[2] = estado.rondas_ganadas_jugador
+        out[3] = estado.rondas_ganadas_oponente
+    else:
+        out[2] = estado.rondas_ganadas_oponente
+        out[3] = estado.rondas_ganadas_jugador
+    out[4] = estado.rondas_empatadas
+    for i in range(3):
+        if i < len(estado.resultados_ronda):
+            resultado = estado.resultados_ronda[i]
+            out[5 + i] = resultado if resultado == 2 else (0 if resultado == player_id else 1)
+        else:
+            out[5 + i] = -1
+    out[8] = estado.estado_canto_envido
+    out[9] = estado.estado_canto_truco
+    out[10] = estado.envido_total
+    out[11] = 1 if estado.turno_responder_truco else 0
+    out[12] = 1 if estado.turno_responder_envido else 0
+    out[13] = 1 if estado.jugador_que_canto_truco == player_id else 0
+    out[14] = 1 if estado.jugador_que_acepto_truco == player_id else 0
+    out[15] = 1 if estado.jugador_que_canto_envido == player_id else 0
+    out[16] = 1 if estado.envido_finalizado else 0
+    out[17] = len(mano)
+    return out
+
+
+def _shard_dir(path, shard_idx):
+    return os.path.join(path, f"shard_{shard_idx:06d}")
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {"campos_extra": CAMPOS_EXTRA, "agents": [], "shards": []}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class DatasetWriter:
+    """
+    Buffers preasignados por columna; al cerrar cada mano se vuelca un shard si ya
+    tiene `shard_size` filas (asi las filas de una mano nunca quedan partidas).
+    """
+
+    def __init__(self, path, shard_size=262144):
+        self.path = path
+        self.shard_size = max(1, int(shard_size))
+        os.makedirs(path, exist_ok=True)
+        self.manifest = read_manifest(path)
+        capacity = self.shard_size + 1024
+        self._buffers = {
+            name: np.zeros((capacity,) + shape, dtype=dtype)
+            for name, (dtype, shape) in COLUMNAS.items()
+        }
+        self._rows = 0
+
+    def agent_id(self, name):
+        agents = self.manifest["agents"]
+        if name not in agents:
+            agents.append(name)
+        return agents.index(name)
+
+    def next_row(self):
+        if self._rows >= len(self._buffers["action"]):
+            raise RuntimeError("Buffer de shard lleno: llamar a maybe_flush entre manos.")
+        row = self._rows
+        self._rows += 1
+        return row
+
+    def column(self, name):
+        return self._buffers[name]
+
+    def maybe_flush(self):
+        if self._rows >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows == 0:
+            return
+        shard_idx = len(self.manifest["shards"])
+        shard_dir = _shard_dir(self.path, shard_idx)
+        os.makedirs(shard_dir, exist_ok=True)
+        for name, buf in self._buffers.items():
+            np.save(os.path.join(shard_dir, f"{name}.npy"), buf[: self._rows])
+        self.manifest["shards"].append({"dir": os.path.basename(shard_dir), "rows": self._rows})
+        self._write_manifest()
+        self._rows = 0
+
+    def _write_manifest(self):
+        tmp_path = os.path.join(self.path, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_NAME))
+
+    def close(self):
+        self.flush()
+        self._write_manifest()
+
+
+def _cerrar_mano(writer, filas, rewards, inicio_puntos, logic):
+    """
+    Asigna a cada fila de la mano su retorno (suma de rewards desde su decision
+    hasta el fin de la mano, en su perspectiva) y el resultado en puntos de la mano.
+    """
+    if filas:
+        ret = writer.column("ret")
+        hand_outcome = writer.column("hand_outcome")
+        player = writer.column("player")
+        delta_j0 = (logic.estado.puntos_jugador - inicio_puntos[0]) - (
+            logic.estado.puntos_oponente - inicio_puntos[1]
+        )
+        to_go = np.cumsum(np.asarray(rewards, dtype=np.float64)[::-1])[::-1]
+        for fila, pos in filas:
+            sign = 1.0 if player[fila] == 0 else -1.0
+            ret[fila] = sign * to_go[pos]
+            hand_outcome[fila] = int(sign * delta_j0)
+    writer.maybe_flush()
+
+
+def build_from_trace(trace_path, writer, agents=None):
+    """
+    Reproduce una traza y agrega sus decisiones al dataset.
+    `agents`: si se indica, solo se guardan decisiones de esos agentes (segun el header).
+    """
+    header, records = load_trace(trace_path)
+    seat_agents = [header.get("agent_0", "desconocido"), header.get("agent_1", "desconocido")]
+    seat_ids = [writer.agent_id(name) for name in seat_agents]
+    keep_seat = [agents is None or name in agents for name in seat_agents]
+
+    env = TrucoEnv()
+    obs_col = writer.column("obs")
+    extra_col = writer.column("extra")
+    mask_col = writer.column("mask")
+    action_col = writer.column("action")
+    player_col = writer.column("player")
+    agent_col = writer.column("agent")
+    game_col = writer.column("game")
+    rows_added = 0
+
+    for game_id, game_records in split_games(records):
+        current_hand = None
+        filas = []
+        rewards = []
+        inicio_puntos = (0, 0)
+        for rec, logic in iter_replay(game_records, logic=env.logic, check=False):
+            hand = int(rec["hand"])
+            if hand != current_hand:
+                _cerrar_mano(writer, filas, rewards, inicio_puntos, logic)
+                filas, rewards = [], []
+                inicio_puntos = (logic.estado.puntos_jugador, logic.estado.puntos_oponente)
+                current_hand = hand
+            # Los rewards de ambos jugadores cuentan para el retorno de la mano
+            rewards.append(float(rec["reward"]))
+            player_id = int(rec["player"])
+            if not keep_seat[player_id]:
+                continue
+            row = writer.next_row()
+            obs_col[row] = env._estado_a_observacion(player_id)
+            caracteristicas_extra(logic, player_id, extra_col[row])
+            mask_col[row] = bits_to_mask(int(rec["mask"]))
+            action_col[row] = int(rec["action"])
+            player_col[row] = player_id
+            agent_col[row] = seat_ids[player_id]
+            game_col[row] = game_id
+            filas.append((row, len(rewards) - 1))
+            rows_added += 1
+        _cerrar_mano(writer, filas, rewards, inicio_puntos, env.logic)
+    return rows_added
+
+
+class ShardedDataset:
+    """
+    Lector estilo DataLoader: itera minibatches mezclados sin cargar todos los shards.
+    Mantiene abiertos (mmap) `shards_in_memory` shards a la vez, mezcla el orden de
+    shards y las filas dentro de ese grupo, y lee solo las filas de cada batch.
+    """
+
+    def __init__(
+        self,
+        path,
+        batch_size=256,
+        shuffle=True,
+        seed=None,
+        columns=None,
+        shards_in_memory=2,
+        agents=None,
+        drop_last=False,
+    ):
+        self.path = path
+        self.manifest = read_manifest(path)
+        self.batch_size = int(batch_size)
+        self.shuffle = shuffle
+        self.columns = list(columns or COLUMNAS.keys())
+        self.shards_in_memory = max(1, int(shards_in_memory))
+        self.drop_last = drop_last
+        self._rng = np.random.default_rng(seed)
+        self._agent_ids = None
+        if agents is not None:
+            self._agent_ids = [
+                i for i, name in enumerate(self.manifest["agents"]) if name in set(agents)
+            ]
+
+    def __len__(self):
+        rows = sum(shard["rows"] for shard in self.manifest["shards"])
+        if self.drop_last:
+            return rows // self.batch_size
+        return (rows + self.batch_size - 1) // self.batch_size
+
+    def _open_shard(self, shard):
+        shard_dir = os.path.join(self.path, shard["dir"])
+        return {
+            name: np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode="r")
+            for name in set(self.columns) | {"agent"}
+        }
+
+    def __iter__(self):
+        shards = list(self.manifest["shards"])
+        if self.shuffle:
+            order = self._rng.permutation(len(shards))
+            shards = [shards[i] for i in order]
+
+        for g in range(0, len(shards), self.shards_in_memory):
+            group = [self._open_shard(shard) for shard in shards[g : g + self.shards_in_memory]]
+            # Indice global (shard, fila) del grupo
+            shard_idx = np.concatenate(
+                [np.full(len(data["agent"]), i, dtype=np.int32) for i, data in enumerate(group)]
+            )
+            row_idx = np.concatenate([np.arange(len(data["agent"])) for data in group])
+            if self._agent_ids is not None:
+                agent = np.concatenate([np.asarray(data["agent"]) for data in group])
+                keep = np.isin(agent, self._agent_ids)
+                shard_idx, row_idx = shard_idx[keep], row_idx[keep]
+            if self.shuffle:
+                perm = self._rng.permutation(len(row_idx))
+                shard_idx, row_idx = shard_idx[perm], row_idx[perm]
+
+            for start in range(0, len(row_idx), self.batch_size):
+                b_shard = shard_idx[start : start + self.batch_size]
+                b_row = row_idx[start : start + self.batch_size]
+                if self.drop_last and len(b_row) < self.batch_size:
+                    break
+                batch = {}
+                for name in self.columns:
+                    parts = []
+                    for i, data in enumerate(group):
+                        sel = b_row[b_shard == i]
+                        if sel.size:
+                            # Filas ordenadas para leer el mmap de forma secuencial
+                            parts.append(data[name][np.sort(sel)])
+                    batch[name] = np.concatenate(parts)
+                yield batch
+
+
+def _find_traces(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.endswith(".trtrace"):
+                    paths.append(os.path.join(item, name))
+        else:
+            paths.append(item)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Construye un dataset offline sharded a partir de trazas de partidas."
+    )
+    parser.add_argument("traces", nargs="+", help="Archivos .trtrace o directorios que los contengan.")
+    parser.add_argument("--output", required=True, help="Directorio del dataset (se agregan shards).")
+    parser.add_argument("--shard-size", type=int, default=262144, help="Filas por shard.")
+    parser.add_argument(
+        "--agents",
+        nargs="*",
+        default=None,
+        help="Solo guarda decisiones de estos agentes (segun el header de cada traza).",
+    )
+    args = parser.parse_args()
+
+    writer = DatasetWriter(args.output, shard_size=args.shard_size)
+    total = 0
+    for trace_path in _find_traces(args.traces):
+        rows = build_from_trace(trace_path, writer, agents=args.agents)
+        total += rows
+        print(f"{trace_path}: {rows} decisiones")
+    writer.close()
+    print(f"Dataset guardado en {args.output} ({total} filas nuevas, {len(writer.manifest['shards'])} shards)")
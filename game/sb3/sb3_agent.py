@@ -8,6 +8,7 @@ GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
+from observaciones import OBS_RICA_DIM, CodificadorRico
 from truco_env import TrucoEnv
 
 
@@ -18,6 +19,10 @@ class SB3Agent:
         self.model_path = model_path
         self.use_maskable = use_maskable
         self.model = self._load_model()
+        # Modelos entrenados con obs_mode="rich" necesitan la observacion rica
+        self._codificador = None
+        if self.model.observation_space.shape == (OBS_RICA_DIM,):
+            self._codificador = CodificadorRico()
 
     def _load_model(self):
         if self.use_maskable:
@@ -34,9 +39,36 @@ class SB3Agent:
     def choose_action(self, action_mask, env: Optional[TrucoEnv] = None, player_id: int = 0):
         if env is None:
             raise ValueError("env is required to build the observation")
-        obs = env.get_observation(player_id)
+        if self._codificador is not None:
+            obs = self._codificador.codificar(env.logic, player_id, env.get_current_player())
+        else:
+            obs = env.get_observation(player_id)
         if self.use_maskable:
             action, _ = self.model.predict(obs, action_masks=np.array(action_mask, dtype=bool), deterministic=True)
         else:
             action, _ = self.model.predict(obs, deterministic=True)
         return int(action)
+
+
+class SB3ResidenteAgent:
+    """
+    Copia congelada del actor de un modelo en entrenamiento (PoliticaResidente
+    de sb3_pool): se puede mandar al pool de evaluacion sin guardar el modelo.
+    """
+
+    def __init__(self, politica):
+        self.politica = politica
+        self._codificador = None
+
+    def choose_action(self, action_mask, env: Optional[TrucoEnv] = None, player_id: int = 0):
+        if env is None:
+            raise ValueError("env is required to build the observation")
+        if self.politica.obs_dim == OBS_RICA_DIM:
+            # El codificador se arma en el proceso que juega (no se puede picklear)
+            if self._codificador is None:
+                self._codificador = CodificadorRico()
+            obs = self._codificador.codificar(env.logic, player_id, env.get_current_player())
+        else:
+            obs = env.get_observation(player_id)
+        mascara = np.array([action_mask], dtype=bool)
+        return int(self.politica.actuar(np.asarray(obs, dtype=np.float32)[None, :], mascara)[0])
@@ -9,7 +9,7 @@ GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
-from truco_env import TrucoEnv
+from truco_env import OBS_BASICA, TrucoEnv
 from agents.random_agent import RandomAgent
 from agents.rational_agent import RationalAgent
 
@@ -19,9 +19,10 @@ class TrucoSB3Env(gym.Env):
 
     metadata = {"render_modes": ["human", "ansi"], "render_fps": 1}
 
-    def __init__(self, opponent: str | object = "random"):
+    def __init__(self, opponent: str | object = "random", instrumentacion=None, obs_mode: str = OBS_BASICA):
         super().__init__()
-        self._env = TrucoEnv()
+        self._env = TrucoEnv(instrumentacion=instrumentacion, obs_mode=obs_mode)
+        self._inst = instrumentacion
         self.action_space = self._env.action_space
         self.observation_space = self._env.observation_space
         self._opponent = self._make_opponent(opponent)
@@ -38,6 +39,14 @@ class TrucoSB3Env(gym.Env):
     def set_opponent(self, opponent: str | object):
         self._opponent = self._make_opponent(opponent)
 
+    def set_opponent_snapshot(self, path: str):
+        """Oponente desde un checkpoint de SB3 (RandomAgent si todavia no existe)."""
+        from sb3.sb3_agent import SB3Agent
+
+        if not os.path.isfile(path) and os.path.isfile(f"{path}.zip"):
+            path = f"{path}.zip"
+        self._opponent = SB3Agent(path) if os.path.isfile(path) else RandomAgent()
+
     def reset(self, seed: Optional[int] = None, options=None):
         super().reset(seed=seed)
         obs, info = self._env.reset(seed=seed)
@@ -45,12 +54,23 @@ class TrucoSB3Env(gym.Env):
         return obs, info
 
     def step(self, action: int):
-        obs, reward, terminated, truncated, info = self._env.step(action, player_id=0)
-        if terminated or truncated:
-            return obs, reward, terminated, truncated, info
-        obs, opp_reward, done, info = self._auto_play_until_player(obs, info)
-        terminated = terminated or done
-        return obs, reward + opp_reward, terminated, truncated, info
+        # La observacion se arma una sola vez, cuando vuelve a ser el turno de J0
+        reward, terminated = self._env.aplicar(action, 0)
+        if terminated:
+            return self._env.get_observation(0), reward, terminated, False, {"resultado": self.resultado()}
+        obs, opp_reward, done, info = self._auto_play_until_player(None, {})
+        if done:
+            info["resultado"] = self.resultado()
+        return obs, reward + opp_reward, done, False, info
+
+    def resultado(self):
+        """Resultado de la partida para J0: 1 gana, 0 pierde, 0.5 empate."""
+        estado = self._env.logic.estado
+        if estado.puntos_jugador > estado.puntos_oponente:
+            return 1.0
+        if estado.puntos_jugador < estado.puntos_oponente:
+            return 0.0
+        return 0.5
 
     def _auto_play_until_player(self, obs, info):
         done = False
@@ -61,7 +81,11 @@ class TrucoSB3Env(gym.Env):
             if not any(mask):
                 done = True
                 break
-            action = self._opponent.choose_action(mask, self._env, player_id)
+            if self._inst is not None:
+                with self._inst.seccion("opponent_choose_action"):
+                    action = self._opponent.choose_action(mask, self._env, player_id)
+            else:
+                action = self._opponent.choose_action(mask, self._env, player_id)
             obs, reward, terminated, truncated, _ = self._env.step(action, player_id)
             total_reward += reward
             if terminated or truncated:
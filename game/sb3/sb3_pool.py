@@ -0,0 +1,303 @@
+import glob
+import os
+import random
+import sys
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if GAME_DIR not in sys.path:
+    sys.path.insert(0, GAME_DIR)
+
+from sb3.sb3_env import TrucoSB3Env
+from truco_env import OBS_BASICA
+
+
+# =============================================================================
+# POOL DE OPONENTES (self-play estilo liga)
+# - Checkpoints anteriores del aprendiz con los pesos del actor residentes en
+#   memoria (numpy), mas agentes scripteados del registry.
+# - Cada partida sortea su oponente con pesos PFSP (prioritized fictitious
+#   self-play) segun el winrate del aprendiz contra cada uno.
+# - TrucoPoolVecEnv juega las jugadas del oponente de todos los entornos por
+#   lotes: una sola pasada del actor por checkpoint y por vuelta de jugadas.
+# El aprendiz siempre es J0.
+# =============================================================================
+
+PFSP_MODOS = ("hard", "variance", "uniforme")
+
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _identidad(x):
+    return x
+
+
+# Funciones de modulo (no lambdas): la politica se puede mandar a otro proceso
+_ACTIVACIONES = {
+    "Tanh": np.tanh,
+    "ReLU": _relu,
+    "Identity": _identidad,
+}
+
+
+class PoliticaResidente:
+    """Actor de una MlpPolicy de SB3 copiado a numpy (argmax enmascarado por lote)."""
+
+    def __init__(self, capas, obs_dim):
+        # capas: lista de (W, b, activacion) con W de forma (entrada, salida)
+        self.capas = capas
+        self.obs_dim = obs_dim
+
+    @classmethod
+    def desde_policy(cls, policy):
+        from torch import nn
+
+        if type(policy.pi_features_extractor).__name__ != "FlattenExtractor":
+            raise ValueError("Solo se soportan politicas MlpPolicy (FlattenExtractor).")
+        modulos = list(policy.mlp_extractor.policy_net) + [policy.action_net]
+        capas = []
+        for modulo in modulos:
+            if isinstance(modulo, nn.Linear):
+                W = modulo.weight.detach().cpu().numpy().T.astype(np.float32)
+                b = modulo.bias.detach().cpu().numpy().astype(np.float32)
+                capas.append([W, b, None])
+            else:
+                nombre = type(modulo).__name__
+                if nombre not in _ACTIVACIONES or not capas:
+                    raise ValueError(f"Capa no soportada en la politica: {nombre}")
+                capas[-1][2] = _ACTIVACIONES[nombre]
+        return cls([tuple(c) for c in capas], policy.observation_space.shape[0])
+
+    @classmethod
+    def cargar(cls, path):
+        """Lee un .zip de MaskablePPO una sola vez y se queda con el actor."""
+        from sb3_contrib import MaskablePPO
+
+        modelo = MaskablePPO.load(path, device="cpu")
+        return cls.desde_policy(modelo.policy)
+
+    def actuar(self, obs, mascaras):
+        """obs (B, obs_dim) y mascaras (B, 13) bool -> acciones (B,) deterministicas."""
+        x = obs
+        for W, b, activacion in self.capas:
+            x = x @ W + b
+            if activacion is not None:
+                x = activacion(x)
+        x = np.where(mascaras, x, -np.inf)
+        return x.argmax(axis=1)
+
+
+class EntradaPool:
+    def __init__(self, nombre, agente=None, politica=None, fijo=False):
+        self.nombre = nombre
+        self.agente = agente
+        self.politica = politica
+        self.fijo = fijo
+        # Resultados del aprendiz contra este oponente (1 gana, 0.5 empata, 0 pierde)
+        self.puntos = 0.0
+        self.partidas = 0
+
+    def winrate(self):
+        """Winrate del aprendiz con un prior de una partida empatada."""
+        return (self.puntos + 0.5) / (self.partidas + 1)
+
+    def elegir(self, truco_envs, player_id):
+        """Acciones del oponente para un lote de TrucoEnv donde le toca jugar."""
+        if self.politica is None:
+            return [
+                self.agente.choose_action(env.get_action_mask(player_id), env, player_id) for env in truco_envs
+            ]
+        obs = np.stack([env.get_observation(player_id) for env in truco_envs])
+        mascaras = np.array([env.get_action_mask(player_id) for env in truco_envs], dtype=bool)
+        return self.politica.actuar(obs, mascaras).tolist()
+
+
+class PoolOponentes:
+    def __init__(self, max_checkpoints=8, pfsp="hard", exponente=2.0, seed=None):
+        if pfsp not in PFSP_MODOS:
+            raise ValueError(f"Ponderacion PFSP desconocida: {pfsp}. Opciones: {PFSP_MODOS}")
+        self.max_checkpoints = max_checkpoints
+        self.pfsp = pfsp
+        self.exponente = exponente
+        self.rng = random.Random(seed)
+        self.entradas = []
+
+    def agregar_script(self, nombre):
+        from agents.registry import create_agent
+
+        self.entradas.append(EntradaPool(nombre, agente=create_agent(nombre), fijo=True))
+
+    def agregar_checkpoint(self, nombre, politica):
+        self.entradas.append(EntradaPool(nombre, politica=politica))
+        checkpoints = [e for e in self.entradas if not e.fijo]
+        if len(checkpoints) > self.max_checkpoints:
+            # Se descarta el checkpoint mas viejo; los scripteados quedan siempre
+            self.entradas.remove(checkpoints[0])
+
+    def cargar_directorio(self, directorio, obs_dim):
+        """Suma los checkpoints .zip del directorio (los mas nuevos, hasta max_checkpoints)."""
+        paths = sorted(glob.glob(os.path.join(directorio, "*.zip")), key=os.path.getmtime)
+        for path in paths[-self.max_checkpoints:]:
+            politica = PoliticaResidente.cargar(path)
+            if politica.obs_dim != obs_dim:
+                print(f"Pool: se ignora {path} (observacion de {politica.obs_dim}, se esperaba {obs_dim}).")
+                continue
+            self.agregar_checkpoint(os.path.splitext(os.path.basename(path))[0], politica)
+
+    def pesos(self):
+        if self.pfsp == "uniforme":
+            pesos = [1.0 for _ in self.entradas]
+        elif self.pfsp == "variance":
+            pesos = [e.winrate() * (1.0 - e.winrate()) for e in self.entradas]
+        else:
+            # "hard": prioriza los oponentes contra los que el aprendiz pierde
+            pesos = [(1.0 - e.winrate()) ** self.exponente for e in self.entradas]
+        total = sum(pesos)
+        if total <= 0:
+            return [1.0 / len(self.entradas)] * len(self.entradas)
+        return [p / total for p in pesos]
+
+    def muestrear(self):
+        if not self.entradas:
+            raise ValueError("El pool de oponentes esta vacio.")
+        return self.rng.choices(self.entradas, weights=self.pesos())[0]
+
+    def registrar(self, entrada, resultado):
+        entrada.puntos += resultado
+        entrada.partidas += 1
+
+    def resumen(self):
+        return ", ".join(
+            f"{e.nombre}: wr={e.winrate():.2f} p={p:.2f} n={e.partidas}" for e, p in zip(self.entradas, self.pesos())
+        )
+
+
+class TrucoPoolVecEnv(DummyVecEnv):
+    """
+    N entornos en el mismo proceso contra oponentes del pool. El aprendiz juega
+    en todos a la vez y despues las jugadas pendientes del oponente se deciden
+    por lotes, agrupadas por oponente, hasta que en todos vuelve a tocarle a J0.
+    """
+
+    def __init__(self, pool, n_envs=1, instrumentacion=None, obs_mode=OBS_BASICA):
+        super().__init__(
+            [
+                (lambda: TrucoSB3Env(opponent="random", instrumentacion=instrumentacion, obs_mode=obs_mode))
+                for _ in range(n_envs)
+            ]
+        )
+        self.pool = pool
+        self.inst = instrumentacion
+        self._truco = [env._env for env in self.envs]
+        self.oponentes = [None] * n_envs
+
+    def _reiniciar(self, indices, seeds=None):
+        for i in indices:
+            self.oponentes[i] = self.pool.muestrear()
+            self._truco[i].reset(seed=None if seeds is None else seeds[i])
+        # Si el oponente arranca, sus primeras jugadas no suman recompensa (igual que TrucoSB3Env.reset)
+        self._jugar_oponentes(indices, [False] * self.num_envs, np.zeros(self.num_envs, dtype=np.float32))
+
+    def _jugar_oponentes(self, indices, terminado, recompensas):
+        pendientes = [i for i in indices if not terminado[i]]
+        while pendientes:
+            lotes = {}
+            for i in pendientes:
+                truco = self._truco[i]
+                if truco.get_current_player() == 0:
+                    continue
+                if not truco.logic.get_action_bits(1):
+                    terminado[i] = True
+                    continue
+                lotes.setdefault(self.oponentes[i], []).append(i)
+            pendientes = []
+            for entrada, lote in lotes.items():
+                truco_envs = [self._truco[i] for i in lote]
+                if self.inst is not None:
+                    with self.inst.seccion("opponent_choose_action"):
+                        acciones = entrada.elegir(truco_envs, 1)
+                else:
+                    acciones = entrada.elegir(truco_envs, 1)
+                for i, truco, accion in zip(lote, truco_envs, acciones):
+                    reward, fin = truco.aplicar(int(accion), 1)
+                    recompensas[i] += reward
+                    if fin:
+                        terminado[i] = True
+                    else:
+                        pendientes.append(i)
+
+    def reset(self):
+        self._reiniciar(range(self.num_envs), self._seeds)
+        for i, truco in enumerate(self._truco):
+            self._save_obs(i, truco.get_observation(0))
+            self.reset_infos[i] = {}
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs_from_buf()
+
+    def step_wait(self):
+        n = self.num_envs
+        terminado = [False] * n
+        recompensas = np.zeros(n, dtype=np.float32)
+        for i, truco in enumerate(self._truco):
+            reward, terminado[i] = truco.aplicar(int(self.actions[i]), 0)
+            recompensas[i] = reward
+        self._jugar_oponentes(range(n), terminado, recompensas)
+
+        terminados = []
+        for i, truco in enumerate(self._truco):
+            self.buf_infos[i] = {"TimeLimit.truncated": False}
+            if terminado[i]:
+                resultado = self.envs[i].resultado()
+                self.pool.registrar(self.oponentes[i], resultado)
+                self.buf_infos[i]["terminal_observation"] = truco.get_observation(0)
+                self.buf_infos[i]["resultado"] = resultado
+                self.buf_infos[i]["oponente"] = self.oponentes[i].nombre
+                terminados.append(i)
+        if terminados:
+            self._reiniciar(terminados)
+        for i, truco in enumerate(self._truco):
+            self._save_obs(i, truco.get_observation(0))
+        self.buf_rews[:] = recompensas
+        self.buf_dones[:] = terminado
+        return self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones), [dict(i) for i in self.buf_infos]
+
+
+class PoolSelfPlayCallback(BaseCallback):
+    """Suma un checkpoint del aprendiz al pool cuando su winrate reciente llega al objetivo."""
+
+    def __init__(self, pool, directorio, window_size, target_winrate, verbose=0):
+        super().__init__(verbose)
+        self.pool = pool
+        self.directorio = directorio
+        self.window_size = window_size
+        self.target_winrate = target_winrate
+        self.resultados = []
+        self.n_snapshots = 0
+
+    def _on_step(self) -> bool:
+        for info in self.locals.get("infos", ()):
+            if "resultado" in info:
+                self.resultados.append(info["resultado"])
+        if len(self.resultados) < self.window_size:
+            return True
+        ventana = self.resultados[-self.window_size:]
+        self.resultados = ventana
+        winrate = float(np.mean(ventana))
+        if winrate >= self.target_winrate:
+            nombre = f"pool_{self.num_timesteps}"
+            if self.directorio:
+                os.makedirs(self.directorio, exist_ok=True)
+                self.model.save(os.path.join(self.directorio, nombre))
+            # Los pesos se copian en memoria: el pool nunca relee el .zip
+            self.pool.agregar_checkpoint(nombre, PoliticaResidente.desde_policy(self.model.policy))
+            print(f"Pool: agregado {nombre} (winrate={winrate:.2f}, ventana={self.window_size}).")
+            print(f"Pool: {self.pool.resumen()}")
+            self.resultados = []
+        return True
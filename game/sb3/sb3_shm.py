@@ -0,0 +1,298 @@
+import ctypes
+import multiprocessing as mp
+import os
+import traceback
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv
+
+
+# =============================================================================
+# VECENV CON MEMORIA COMPARTIDA
+# Cada worker corre una porcion de los entornos. Observaciones, mascaras,
+# recompensas, dones y acciones viven en buffers compartidos (RawArray vistos
+# como arrays de NumPy): un step solo escribe las acciones, despierta a los
+# workers con un semaforo y espera el semaforo de vuelta. No viaja nada por
+# pipes ni se picklea nada en el camino caliente.
+# El pipe de cada worker queda para comandos raros (env_method, get_attr...)
+# y para los errores: si un entorno tira una excepcion, el worker marca su
+# flag en memoria compartida, manda el traceback por el pipe y el proceso
+# principal la relanza. Un worker muerto se detecta al esperar su semaforo.
+# Los entornos tienen que exponer action_masks() (como TrucoSB3Env) y poner
+# info["resultado"] al terminar la partida si se quiere leer el resultado.
+# =============================================================================
+
+_CMD_STEP = 0
+_CMD_RESET = 1
+_CMD_RPC = 2
+_CMD_CLOSE = 3
+
+
+def _vista(raw, dtype, forma):
+    return np.frombuffer(raw, dtype=dtype).reshape(forma)
+
+
+class _Buffers:
+    """Buffers compartidos entre el proceso principal y los workers."""
+
+    def __init__(self, n_envs, obs_dim, n_acciones, n_workers):
+        self.forma = (n_envs, obs_dim, n_acciones)
+        self.raw = {
+            "obs": mp.RawArray(ctypes.c_float, n_envs * obs_dim),
+            "obs_final": mp.RawArray(ctypes.c_float, n_envs * obs_dim),
+            "mascaras": mp.RawArray(ctypes.c_bool, n_envs * n_acciones),
+            "recompensas": mp.RawArray(ctypes.c_float, n_envs),
+            "dones": mp.RawArray(ctypes.c_bool, n_envs),
+            "truncados": mp.RawArray(ctypes.c_bool, n_envs),
+            "resultados": mp.RawArray(ctypes.c_double, n_envs),
+            "acciones": mp.RawArray(ctypes.c_int64, n_envs),
+            "semillas": mp.RawArray(ctypes.c_int64, n_envs),
+            "con_semilla": mp.RawArray(ctypes.c_bool, n_envs),
+            "comandos": mp.RawArray(ctypes.c_int, n_workers),
+            "errores": mp.RawArray(ctypes.c_bool, n_workers),
+        }
+        self._vistas()
+
+    def _vistas(self):
+        n, d, a = self.forma
+        r = self.raw
+        self.obs = _vista(r["obs"], np.float32, (n, d))
+        self.obs_final = _vista(r["obs_final"], np.float32, (n, d))
+        self.mascaras = _vista(r["mascaras"], np.bool_, (n, a))
+        self.recompensas = _vista(r["recompensas"], np.float32, (n,))
+        self.dones = _vista(r["dones"], np.bool_, (n,))
+        self.truncados = _vista(r["truncados"], np.bool_, (n,))
+        self.resultados = _vista(r["resultados"], np.float64, (n,))
+        self.acciones = _vista(r["acciones"], np.int64, (n,))
+        self.semillas = _vista(r["semillas"], np.int64, (n,))
+        self.con_semilla = _vista(r["con_semilla"], np.bool_, (n,))
+        self.comandos = _vista(r["comandos"], np.int32, (-1,))
+        self.errores = _vista(r["errores"], np.bool_, (-1,))
+
+    def __getstate__(self):
+        return {"forma": self.forma, "raw": self.raw}
+
+    def __setstate__(self, estado):
+        self.forma = estado["forma"]
+        self.raw = estado["raw"]
+        self._vistas()
+
+
+def _rpc(envs, mensaje):
+    tipo, locales, nombre, args, kwargs = mensaje
+    objetivos = [envs[k] for k in locales]
+    if tipo == "env_method":
+        return [getattr(env, nombre)(*args, **kwargs) for env in objetivos]
+    if tipo == "get_attr":
+        return [getattr(env, nombre) for env in objetivos]
+    if tipo == "has_attr":
+        return [hasattr(env, nombre) for env in objetivos]
+    if tipo == "set_attr":
+        for env in objetivos:
+            setattr(env, nombre, args[0])
+        return [None] * len(objetivos)
+    raise ValueError(f"Comando desconocido: {tipo}")
+
+
+def _worker(w, indices, env_fns, buffers, orden, listo, conn):
+    envs = [fn() for fn in env_fns.var]
+    b = buffers
+    nan = float("nan")
+
+    def publicar(i, env, obs):
+        b.obs[i] = obs
+        b.mascaras[i] = env.action_masks()
+
+    try:
+        while True:
+            orden.acquire()
+            cmd = b.comandos[w]
+            if cmd == _CMD_CLOSE:
+                break
+            try:
+                if cmd == _CMD_STEP:
+                    for env, i in zip(envs, indices):
+                        obs, reward, terminated, truncated, info = env.step(int(b.acciones[i]))
+                        done = terminated or truncated
+                        b.recompensas[i] = reward
+                        b.dones[i] = done
+                        if done:
+                            b.obs_final[i] = obs
+                            b.truncados[i] = truncated and not terminated
+                            b.resultados[i] = info.get("resultado", nan)
+                            obs, _ = env.reset()
+                        publicar(i, env, obs)
+                elif cmd == _CMD_RESET:
+                    for env, i in zip(envs, indices):
+                        seed = int(b.semillas[i]) if b.con_semilla[i] else None
+                        obs, _ = env.reset(seed=seed)
+                        publicar(i, env, obs)
+                elif cmd == _CMD_RPC:
+                    conn.send((True, _rpc(envs, conn.recv())))
+            except Exception:
+                # El worker sigue vivo (close funciona); el principal relanza el error
+                if cmd == _CMD_RPC:
+                    conn.send((False, traceback.format_exc()))
+                else:
+                    b.errores[w] = True
+                    conn.send(traceback.format_exc())
+            listo.release()
+    finally:
+        for env in envs:
+            env.close()
+    # Solo un close ordenado llega aca: si el worker muere, el principal lo ve con is_alive()
+    listo.release()
+
+
+class ShmVecEnv(VecEnv):
+    def __init__(self, env_fns, n_workers=None, start_method=None):
+        n_envs = len(env_fns)
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, n_envs))
+
+        # Espacios desde una instancia descartable en el proceso principal
+        muestra = env_fns[0]()
+        observation_space, action_space = muestra.observation_space, muestra.action_space
+        muestra.close()
+
+        obs_dim = int(np.prod(observation_space.shape))
+        self._buffers = _Buffers(n_envs, obs_dim, int(action_space.n), n_workers)
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+        # Reparto intercalado de entornos entre workers
+        self._indices = [list(range(n_envs))[w::n_workers] for w in range(n_workers)]
+        self._worker_de = {}
+        self._orden, self._listo, self._conns, self._procesos = [], [], [], []
+        for w, indices in enumerate(self._indices):
+            for local, i in enumerate(indices):
+                self._worker_de[i] = (w, local)
+            orden, listo = ctx.Semaphore(0), ctx.Semaphore(0)
+            padre, hijo = ctx.Pipe()
+            proceso = ctx.Process(
+                target=_worker,
+                args=(w, indices, CloudpickleWrapper([env_fns[i] for i in indices]), self._buffers, orden, listo, hijo),
+                daemon=True,
+            )
+            proceso.start()
+            hijo.close()
+            self._orden.append(orden)
+            self._listo.append(listo)
+            self._conns.append(padre)
+            self._procesos.append(proceso)
+        self.closed = False
+        # Despues de arrancar los workers: VecEnv.__init__ ya les consulta atributos
+        super().__init__(n_envs, observation_space, action_space)
+
+    def _ordenar(self, cmd, workers=None):
+        workers = range(len(self._procesos)) if workers is None else workers
+        for w in workers:
+            self._buffers.comandos[w] = cmd
+            self._orden[w].release()
+        return workers
+
+    def _vivo(self, w):
+        proceso = self._procesos[w]
+        if not proceso.is_alive():
+            raise RuntimeError(f"ShmVecEnv: el worker {w} termino (exitcode {proceso.exitcode}).")
+
+    def _esperar(self, workers):
+        errores = []
+        for w in workers:
+            while not self._listo[w].acquire(timeout=0.5):
+                self._vivo(w)
+            if self._buffers.errores[w]:
+                self._buffers.errores[w] = False
+                errores.append(f"worker {w}:\n{self._conns[w].recv()}")
+        if errores:
+            raise RuntimeError("ShmVecEnv: error en un entorno\n" + "\n".join(errores))
+
+    def _recibir(self, w):
+        conn = self._conns[w]
+        while not conn.poll(0.5):
+            self._vivo(w)
+        return conn.recv()
+
+    def reset(self):
+        b = self._buffers
+        for i, seed in enumerate(self._seeds):
+            b.con_semilla[i] = seed is not None
+            b.semillas[i] = 0 if seed is None else seed
+        self._esperar(self._ordenar(_CMD_RESET))
+        self._reset_seeds()
+        self._reset_options()
+        return b.obs.copy()
+
+    def step_async(self, actions):
+        self._buffers.acciones[:] = actions
+        self._ordenar(_CMD_STEP)
+
+    def step_wait(self):
+        self._esperar(range(len(self._procesos)))
+        b = self._buffers
+        infos = [{"TimeLimit.truncated": False} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(b.dones):
+            info = infos[i]
+            info["TimeLimit.truncated"] = bool(b.truncados[i])
+            info["terminal_observation"] = b.obs_final[i].copy()
+            if not np.isnan(b.resultados[i]):
+                info["resultado"] = float(b.resultados[i])
+        return b.obs.copy(), b.recompensas.copy(), b.dones.copy(), infos
+
+    def _llamar(self, tipo, nombre, indices, args=(), kwargs=None):
+        por_worker = {}
+        for i in self._get_indices(indices):
+            w, local = self._worker_de[i]
+            por_worker.setdefault(w, []).append((i, local))
+        resultados = {}
+        for w, pares in por_worker.items():
+            self._vivo(w)
+            self._conns[w].send((tipo, [local for _, local in pares], nombre, args, kwargs or {}))
+        self._ordenar(_CMD_RPC, list(por_worker))
+        errores = []
+        for w, pares in por_worker.items():
+            ok, valores = self._recibir(w)
+            if not ok:
+                errores.append(f"worker {w}:\n{valores}")
+                continue
+            for (i, _), valor in zip(pares, valores):
+                resultados[i] = valor
+        self._esperar(list(por_worker))
+        if errores:
+            raise RuntimeError(f"ShmVecEnv: error en {tipo} {nombre}\n" + "\n".join(errores))
+        return [resultados[i] for i in self._get_indices(indices)]
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        if method_name == "action_masks":
+            # Las mascaras ya estan en memoria compartida (se publican en cada step/reset)
+            return list(self._buffers.mascaras[list(self._get_indices(indices))].copy())
+        return self._llamar("env_method", method_name, indices, method_args, method_kwargs)
+
+    def get_attr(self, attr_name, indices=None):
+        return self._llamar("get_attr", attr_name, indices)
+
+    def has_attr(self, attr_name):
+        return all(self._llamar("has_attr", attr_name, None))
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._llamar("set_attr", attr_name, indices, (value,))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def close(self):
+        if self.closed:
+            return
+        vivos = [w for w, proceso in enumerate(self._procesos) if proceso.is_alive()]
+        try:
+            self._esperar(self._ordenar(_CMD_CLOSE, vivos))
+        except RuntimeError:
+            # Un worker murio durante el cierre: igual se juntan todos
+            pass
+        for proceso in self._procesos:
+            proceso.join()
+        for conn in self._conns:
+            conn.close()
+        self.closed = True
@@ -1,7 +1,10 @@
 import argparse
+import io
 import os
 import sys
+import time
 from collections import deque
+from functools import partial
 
 import gymnasium as gym
 import numpy as np
@@ -11,19 +14,59 @@ GAME_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if GAME_DIR not in sys.path:
     sys.path.insert(0, GAME_DIR)
 
+import checkpoints
+import evaluacion
+from instrumentacion import agregar_argumentos, desde_args
+from sb3.sb3_agent import SB3ResidenteAgent
 from sb3.sb3_env import TrucoSB3Env
+from sb3.sb3_pool import PFSP_MODOS, PoliticaResidente, PoolOponentes, PoolSelfPlayCallback, TrucoPoolVecEnv
+from sb3.sb3_shm import ShmVecEnv
+from truco_env import OBS_BASICA, OBS_MODES, TrucoEnv
 
+VEC_BACKENDS = ("dummy", "subproc", "shm")
 
-def make_env(opponent):
+
+def make_vec_env(opponent, n_envs=1, vec_backend="dummy", instrumentacion=None, obs_mode=OBS_BASICA):
+    """
+    n_envs entornos TrucoSB3Env en el backend elegido, con VecMonitor encima.
+    dummy: todos en el proceso principal. subproc: SubprocVecEnv de SB3 (pipes).
+    shm: ShmVecEnv (buffers compartidos, ver sb3_shm.py).
+    """
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecMonitor
+
+    if vec_backend not in VEC_BACKENDS:
+        raise ValueError(f"Backend desconocido: {vec_backend}. Opciones: {VEC_BACKENDS}")
     initial_opponent = "random" if opponent == "selfplay" else opponent
-    env = TrucoSB3Env(opponent=initial_opponent)
-    try:
-        from stable_baselines3.common.monitor import Monitor
+    if vec_backend != "dummy":
+        # Los contadores de instrumentacion viven en el proceso principal
+        instrumentacion = None
+    env_fns = [
+        partial(TrucoSB3Env, opponent=initial_opponent, instrumentacion=instrumentacion, obs_mode=obs_mode)
+        for _ in range(n_envs)
+    ]
+    if vec_backend == "dummy":
+        venv = DummyVecEnv(env_fns)
+    elif vec_backend == "subproc":
+        venv = SubprocVecEnv(env_fns)
+    else:
+        venv = ShmVecEnv(env_fns)
+    return VecMonitor(venv)
+
+
+def make_pool_env(pool, n_envs, instrumentacion=None, obs_mode=OBS_BASICA):
+    from stable_baselines3.common.vec_env import VecMonitor
 
-        env = Monitor(env)
-    except Exception:
-        pass
-    return env
+    return VecMonitor(TrucoPoolVecEnv(pool, n_envs=n_envs, instrumentacion=instrumentacion, obs_mode=obs_mode))
+
+
+def _make_pool(pool_dir, pool_size, pool_scripted, pfsp, pfsp_exponente, seed, obs_mode):
+    pool = PoolOponentes(max_checkpoints=pool_size, pfsp=pfsp, exponente=pfsp_exponente, seed=seed)
+    for nombre in pool_scripted:
+        pool.agregar_script(nombre)
+    if pool_dir and os.path.isdir(pool_dir):
+        obs_dim = TrucoEnv(obs_mode=obs_mode).observation_space.shape[0]
+        pool.cargar_directorio(pool_dir, obs_dim)
+    return pool
 
 
 def _resolve_model_path(path: str) -> str:
@@ -34,31 +77,12 @@ def _resolve_model_path(path: str) -> str:
     return path
 
 
-def _load_selfplay_opponent(snapshot_path: str):
-    from agents.random_agent import RandomAgent
-    from sb3.sb3_agent import SB3Agent
-
-    resolved_path = _resolve_model_path(snapshot_path)
-    if os.path.isfile(resolved_path):
-        return SB3Agent(resolved_path)
-    return RandomAgent()
-
-
-def _get_base_env(env):
-    return env.unwrapped if hasattr(env, "unwrapped") else env
-
-
-def _get_match_result(env):
-    base_env = _get_base_env(env)
-    estado = base_env._env.logic.estado
-    if estado.puntos_jugador > estado.puntos_oponente:
-        return 1.0
-    if estado.puntos_jugador < estado.puntos_oponente:
-        return 0.0
-    return 0.5
-
-
 class SelfPlayWinrateCallback(BaseCallback):
+    """
+    Cuando el winrate de las ultimas partidas (de todos los entornos) llega al
+    objetivo, guarda un snapshot y lo pone de oponente en todos los entornos.
+    """
+
     def __init__(self, env, snapshot_path: str, window_size: int, target_winrate: float, verbose: int = 0):
         super().__init__(verbose)
         self.env = env
@@ -71,16 +95,16 @@ class SelfPlayWinrateCallback(BaseCallback):
         dones = self.locals.get("dones")
         if dones is None or not any(dones):
             return True
-        result = _get_match_result(self.env)
-        self.results.append(result)
+        for done, info in zip(dones, self.locals.get("infos", ())):
+            if done and "resultado" in info:
+                self.results.append(info["resultado"])
         if len(self.results) < self.window_size:
             return True
         winrate = float(np.mean(self.results))
         if winrate >= self.target_winrate:
             os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
             self.model.save(self.snapshot_path)
-            base_env = _get_base_env(self.env)
-            base_env.set_opponent(_load_selfplay_opponent(self.snapshot_path))
+            self.env.env_method("set_opponent_snapshot", self.snapshot_path)
             print(
                 "Self-play: dificultad aumentada "
                 f"(winrate={winrate:.2f}, ventana={self.window_size})."
@@ -88,6 +112,100 @@ class SelfPlayWinrateCallback(BaseCallback):
             self.results.clear()
         return True
 
+
+class InstrumentacionCallback(BaseCallback):
+    """Cuenta steps y mide el tiempo del update de PPO (entre fin e inicio de rollout)."""
+
+    def __init__(self, instrumentacion, verbose: int = 0):
+        super().__init__(verbose)
+        self.inst = instrumentacion
+        self._t_update = None
+
+    def _cerrar_update(self) -> None:
+        if self._t_update is not None and self.inst.enabled:
+            self.inst.totales["learner_update"] += time.perf_counter() - self._t_update
+            self.inst.llamadas["learner_update"] += 1
+        self._t_update = None
+
+    def _on_rollout_start(self) -> None:
+        self._cerrar_update()
+
+    def _on_training_end(self) -> None:
+        self._cerrar_update()
+
+    def _on_rollout_end(self) -> None:
+        self._t_update = time.perf_counter()
+
+    def _on_step(self) -> bool:
+        self.inst.paso()
+        return True
+
+
+class ReanudacionCallback(BaseCallback):
+    """
+    Checkpoints de reanudacion (checkpoints.CheckpointManager, en pasos). Se
+    guardan al empezar cada rollout, con el update anterior ya aplicado: el
+    zip de model.save (en memoria) y el total de pasos a alcanzar. El pool y
+    el snapshot de self-play ya viven en disco.
+    """
+
+    def __init__(self, checkpoint, objetivo, seed, opponent, verbose: int = 0):
+        super().__init__(verbose)
+        self.checkpoint = checkpoint
+        self.objetivo = objetivo
+        self.seed = seed
+        self.opponent = opponent
+
+    def _on_rollout_start(self) -> None:
+        if not self.checkpoint.toca(self.num_timesteps):
+            return
+        buffer = io.BytesIO()
+        self.model.save(buffer)
+        self.checkpoint.guardar(
+            {"modelo": buffer.getvalue(), "objetivo": self.objetivo, "rng": checkpoints.estado_rng()},
+            self.num_timesteps,
+            seed=self.seed,
+            opponent=self.opponent,
+        )
+
+    def _on_training_end(self) -> None:
+        self.checkpoint.cerrar()
+
+    def _on_step(self) -> bool:
+        return True
+
+
+class EvaluacionCallback(BaseCallback):
+    """
+    Evaluacion en segundo plano (evaluacion.EvaluacionIncremental, en pasos)
+    al empezar cada rollout, con una copia en numpy del actor.
+    """
+
+    def __init__(self, evaluador, verbose: int = 0):
+        super().__init__(verbose)
+        self.evaluador = evaluador
+
+    def _on_rollout_start(self) -> None:
+        if self.evaluador.toca(self.num_timesteps):
+            politica = PoliticaResidente.desde_policy(self.model.policy)
+            self.evaluador.lanzar(SB3ResidenteAgent(politica), self.num_timesteps)
+
+    def _on_training_end(self) -> None:
+        self.evaluador.cerrar()
+
+    def _on_step(self) -> bool:
+        return True
+
+
+def _save_model(model, path, inst):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if inst is None:
+        model.save(path)
+        return
+    with inst.seccion("checkpoint_io"):
+        model.save(path)
+
+
 def train(
     total_timesteps: int,
     opponent: str,
@@ -99,18 +217,44 @@ def train(
     selfplay_winrate: float,
     learning_rate: float | None,
     force_learning_rate: bool,
+    instrumentacion=None,
+    obs_mode: str = OBS_BASICA,
+    n_envs: int = 1,
+    pool_dir: str = "game/sb3/models/pool",
+    pool_size: int = 8,
+    pool_scripted: tuple = ("random", "rational"),
+    pfsp: str = "hard",
+    pfsp_exponente: float = 2.0,
+    vec_backend: str = "dummy",
+    checkpoint=None,
+    evaluador=None,
 ):
-    env = make_env(opponent)
+    pool = None
+    if opponent == "pool":
+        if vec_backend != "dummy":
+            # El pool decide las jugadas del oponente por lotes en el proceso principal
+            raise ValueError("--opponent pool solo soporta --vec-backend dummy.")
+        pool = _make_pool(pool_dir, pool_size, pool_scripted, pfsp, pfsp_exponente, seed, obs_mode)
+        env = make_pool_env(pool, n_envs, instrumentacion, obs_mode)
+    else:
+        env = make_vec_env(opponent, n_envs, vec_backend, instrumentacion, obs_mode)
+    callbacks = [InstrumentacionCallback(instrumentacion)] if instrumentacion is not None else []
     from sb3_contrib import MaskablePPO
 
+    previo = checkpoint.reanudar() if checkpoint is not None else None
     load_path = _resolve_model_path(output_path)
-    if not fresh and os.path.isfile(load_path):
+    if previo is not None:
+        model = MaskablePPO.load(io.BytesIO(previo["modelo"]), env=env)
+        checkpoints.restaurar_rng(previo["rng"])
+    elif not fresh and os.path.isfile(load_path):
         model = MaskablePPO.load(load_path, env=env)
         if force_learning_rate and learning_rate is not None:
             model.learning_rate = learning_rate
             model.lr_schedule = lambda _: learning_rate
             if hasattr(model, "_setup_lr_schedule"):
                 model._setup_lr_schedule()
+        if seed is not None:
+            model.set_random_seed(seed)
     else:
         if learning_rate is None:
             learning_rate = 3e-4
@@ -122,15 +266,48 @@ def train(
             learning_rate=learning_rate,
         )
 
+    # Sin pool ni self-play, learn() arranca la cuenta de pasos en 0 (salvo al reanudar)
+    reiniciar = opponent not in ("selfplay", "pool") and previo is None
+    hechos = 0 if reiniciar else model.num_timesteps
+    objetivo = previo["objetivo"] if previo is not None else hechos + total_timesteps
+    restantes = max(0, objetivo - hechos)
+    if checkpoint is not None:
+        checkpoint.iniciar(hechos)
+        callbacks.append(ReanudacionCallback(checkpoint, objetivo, seed, opponent))
+    if evaluador is not None:
+        callbacks.append(EvaluacionCallback(evaluador))
+
+    if pool is not None:
+        if not pool.entradas:
+            # Pool vacio: arranca contra una copia del propio aprendiz
+            pool.agregar_checkpoint("inicial", PoliticaResidente.desde_policy(model.policy))
+        callback = PoolSelfPlayCallback(
+            pool=pool,
+            directorio=pool_dir,
+            window_size=selfplay_window,
+            target_winrate=selfplay_winrate,
+        )
+        model.learn(
+            total_timesteps=restantes,
+            reset_num_timesteps=False,
+            callback=[callback] + callbacks,
+        )
+        print(f"Pool: {pool.resumen()}")
+        _save_model(model, output_path, instrumentacion)
+        env.close()
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
+        return
+
     if opponent != "selfplay":
-        model.learn(total_timesteps=total_timesteps)
-        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-        model.save(output_path)
+        model.learn(total_timesteps=restantes, reset_num_timesteps=reiniciar, callback=callbacks or None)
+        _save_model(model, output_path, instrumentacion)
+        env.close()
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
         return
 
-    base_env = _get_base_env(env)
-    opponent_agent = _load_selfplay_opponent(selfplay_snapshot)
-    base_env.set_opponent(opponent_agent)
+    env.env_method("set_opponent_snapshot", selfplay_snapshot)
 
     callback = SelfPlayWinrateCallback(
         env=env,
@@ -138,16 +315,22 @@ def train(
         window_size=selfplay_window,
         target_winrate=selfplay_winrate,
     )
-    model.learn(total_timesteps=total_timesteps, reset_num_timesteps=False, callback=callback)
+    model.learn(
+        total_timesteps=restantes,
+        reset_num_timesteps=False,
+        callback=[callback] + callbacks,
+    )
 
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    model.save(output_path)
+    _save_model(model, output_path, instrumentacion)
+    env.close()
+    if instrumentacion is not None:
+        instrumentacion.cerrar()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Train PPO with action masking on Truco.")
     parser.add_argument("--timesteps", type=int, default=200_000)
-    parser.add_argument("--opponent", choices=["random", "rational", "selfplay"], default="random")
+    parser.add_argument("--opponent", choices=["random", "rational", "selfplay", "pool"], default="random")
     parser.add_argument("--output", type=str, default="game/sb3/models/ppo_truco")
     parser.add_argument("--seed", type=int, default=None)
     parser.add_argument("--learning-rate", type=float, default=3e-4)
@@ -179,6 +362,47 @@ if __name__ == "__main__":
         default="game/sb3/models/ppo_truco_opponent",
         help="Ruta del snapshot del oponente en self-play.",
     )
+    parser.add_argument(
+        "--obs-mode",
+        choices=OBS_MODES,
+        default=OBS_BASICA,
+        help="Observacion del entorno: basic (13 floats) o rich (one-hot, ver observaciones.py).",
+    )
+    parser.add_argument(
+        "--n-envs",
+        type=int,
+        default=1,
+        help="Entornos en paralelo (con --opponent pool las jugadas del oponente se deciden por lotes).",
+    )
+    parser.add_argument(
+        "--vec-backend",
+        choices=VEC_BACKENDS,
+        default="dummy",
+        help="dummy: un proceso. subproc: SubprocVecEnv (pipes). shm: workers con buffers compartidos.",
+    )
+    parser.add_argument(
+        "--pool-dir",
+        type=str,
+        default="game/sb3/models/pool",
+        help="Directorio de checkpoints del pool (se cargan al arrancar y se guardan los nuevos).",
+    )
+    parser.add_argument("--pool-size", type=int, default=8, help="Maximo de checkpoints en el pool.")
+    parser.add_argument(
+        "--pool-scripted",
+        nargs="*",
+        default=["random", "rational"],
+        help="Agentes del registry que siempre estan en el pool.",
+    )
+    parser.add_argument(
+        "--pfsp",
+        choices=PFSP_MODOS,
+        default="hard",
+        help="Ponderacion PFSP: hard prioriza a los que le ganan al aprendiz, variance a los parejos.",
+    )
+    parser.add_argument("--pfsp-exponente", type=float, default=2.0, help="Exponente de la ponderacion hard.")
+    checkpoints.agregar_argumentos(parser)
+    evaluacion.agregar_argumentos(parser)
+    agregar_argumentos(parser)
     args = parser.parse_args()
 
     train(
@@ -192,4 +416,15 @@ if __name__ == "__main__":
         args.selfplay_winrate,
         args.learning_rate,
         args.force_learning_rate,
+        desde_args(args),
+        args.obs_mode,
+        args.n_envs,
+        args.pool_dir,
+        args.pool_size,
+        tuple(args.pool_scripted),
+        args.pfsp,
+        args.pfsp_exponente,
+        args.vec_backend,
+        checkpoints.desde_args(args, "sb3_ppo", unidad="pasos"),
+        evaluacion.desde_args(args, unidad="pasos"),
     )
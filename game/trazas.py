@@ -0,0 +1,376 @@
+import argparse
+import json
+import os
+import struct
+from itertools import chain
+
+import numpy as np
+
+from constantes import Acciones, CARTAS, CARTA_A_ID
+from truco_logic import TrucoGameLogic
+
+
+# =============================================================================
+# FORMATO BINARIO DE TRAZAS
+# Archivo = MAGIC (8 bytes) + largo del header (uint32) + header JSON + registros.
+# Cada registro es de ancho fijo (TRACE_DTYPE, 23 bytes) y describe una decision:
+#   game:   id de partida (creciente dentro del archivo)
+#   hand:   numero de mano dentro de la partida
+#   step:   numero de decision dentro de la partida
+#   player: jugador que actua (0/1)
+#   action: indice de Acciones
+#   mask:   mascara de acciones validas como bits (bit i = accion i)
+#   reward: recompensa devuelta por el motor (perspectiva J0)
+#   flags:  ver FLAG_*
+#   deal:   ids (0-39) de las 3 cartas de J0 y las 3 de J1 al repartir la mano
+# =============================================================================
+
+MAGIC = b"TRTRACE1"
+
+TRACE_DTYPE = np.dtype(
+    [
+        ("game", "<u4"),
+        ("hand", "<u2"),
+        ("step", "<u2"),
+        ("player", "u1"),
+        ("action", "u1"),
+        ("mask", "<u2"),
+        ("reward", "<f4"),
+        ("flags", "u1"),
+        ("deal", "u1", (6,)),
+    ]
+)
+
+FLAG_RESPONDER_TRUCO = 1
+FLAG_RESPONDER_ENVIDO = 2
+FLAG_TERMINADO = 4
+FLAG_J0_ES_MANO = 8
+
+
+# Campos de cada decision dentro de un registro de TRACE_DTYPE (player, action,
+# mask, reward, flags); los bytes de game/hand/step y deal se saltean ("x") y
+# se completan vectorizados al volcar
+_PASO = struct.Struct("<8xBBHfB6x")
+_ANCHO = _PASO.size
+assert _ANCHO == TRACE_DTYPE.itemsize
+_CAMPOS_MANO = 6
+_CARTA_A_ID = CARTA_A_ID.__getitem__
+
+
+def mask_to_bits(mask):
+    bits = 0
+    for i, valid in enumerate(mask):
+        if valid:
+            bits |= 1 << i
+    return bits
+
+
+def bits_to_mask(bits):
+    return [bool((bits >> i) & 1) for i in range(len(Acciones))]
+
+
+def _read_header(f):
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("Archivo de traza invalido (magic incorrecto).")
+    (header_len,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(header_len).decode("utf-8"))
+    return header, len(MAGIC) + 4 + header_len
+
+
+class TraceRecorder:
+    """
+    Registra decisiones en un stream binario de registros de ancho fijo.
+    Se engancha en TrucoEnv (reset -> start_game, cada accion -> aplicar).
+    Los registros van por indice a un array TRACE_DTYPE preasignado que se
+    vuelca en bloques de `buffer_size` registros. Por decision solo se
+    escriben, con un struct.pack_into sobre la memoria del array, los campos
+    que cambian en cada paso (player, action, mask, reward, flags); partida,
+    mano, reparto y J0 es mano se anotan una vez por mano y se completan
+    vectorizados con NumPy al volcar, junto con el numero de paso.
+    """
+
+    def __init__(self, path, metadata=None, buffer_size=65536):
+        self.path = path
+        self.buffer_size = max(1, int(buffer_size))
+        self._registros = np.zeros(self.buffer_size, dtype=TRACE_DTYPE)
+        self._memoria = memoryview(self._registros).cast("B")
+        self._limite = self.buffer_size * _ANCHO
+        self._offset = 0
+        self._pack = _PASO.pack_into
+        self._game_id = 0
+        # Offset del buffer donde empezo la partida en curso (negativo si empezo antes del ultimo volcado)
+        self._inicio_partida = 0
+        # Por mano en el buffer, en una lista plana: offset, game, hand, inicio de su partida, J0 es mano, reparto
+        self._manos = []
+        # Mano en curso (cuando cambia logic.numero_mano se anota una entrada en _manos)
+        self.mano = None
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                _, data_offset = _read_header(f)
+            n_records = (os.path.getsize(path) - data_offset) // TRACE_DTYPE.itemsize
+            if n_records > 0:
+                last = np.fromfile(
+                    path,
+                    dtype=TRACE_DTYPE,
+                    count=1,
+                    offset=data_offset + (n_records - 1) * TRACE_DTYPE.itemsize,
+                )
+                self._game_id = int(last["game"][0])
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            header = dict(metadata or {})
+            header["dtype"] = TRACE_DTYPE.descr
+            payload = json.dumps(header).encode("utf-8")
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<I", len(payload)))
+                f.write(payload)
+
+    def start_game(self):
+        self._game_id += 1
+        self._inicio_partida = self._offset
+        self.mano = None
+
+    def aplicar(self, logic, action, player_id):
+        """
+        Aplica la accion en `logic` y registra la decision (mascara, flags y
+        mano se toman antes de aplicar: la accion puede repartir otra mano).
+        Devuelve lo mismo que logic.aplicar_accion.
+        """
+        estado = logic.estado
+        if logic.numero_mano != self.mano:
+            self.mano = logic.numero_mano
+            self._manos.extend(
+                (self._offset, self._game_id, self.mano, self._inicio_partida, estado.es_mano, logic.reparto)
+            )
+        mask = logic.get_action_bits(player_id)
+        # Bits de FLAG_RESPONDER_TRUCO (1) y FLAG_RESPONDER_ENVIDO (2)
+        flags = estado.turno_responder_truco | estado.turno_responder_envido << 1
+        resultado = logic.aplicar_accion(action, player_id)
+        offset = self._offset
+        # FLAG_TERMINADO (4)
+        self._pack(self._memoria, offset, player_id, action, mask, resultado[0], flags | resultado[1] << 2)
+        self._offset = offset = offset + _ANCHO
+        if offset >= self._limite:
+            self.flush()
+        return resultado
+
+    def flush(self):
+        n = self._offset // _ANCHO
+        if not n:
+            return
+        data = self._registros[:n]
+        manos = self._manos
+        offsets, games, hands, partidas, es_mano, repartos = (manos[i::_CAMPOS_MANO] for i in range(_CAMPOS_MANO))
+        inicios = np.array(offsets, dtype=np.int64) // _ANCHO
+        # Registro (relativo al buffer) donde empezo la partida de cada mano
+        partidas = np.array(partidas, dtype=np.int64) // _ANCHO
+        largos = np.diff(np.append(inicios, n))
+
+        data["flags"] |= np.repeat(np.array(es_mano, dtype=np.uint8) * FLAG_J0_ES_MANO, largos)
+        data["game"] = np.repeat(games, largos)
+        data["hand"] = np.repeat(hands, largos)
+        data["step"] = np.arange(n) - np.repeat(partidas, largos)
+        deals = bytes(map(_CARTA_A_ID, chain.from_iterable(chain.from_iterable(repartos))))
+        data["deal"] = np.repeat(np.frombuffer(deals, dtype=np.uint8).reshape(-1, 6), largos, axis=0)
+        with open(self.path, "ab") as f:
+            data.tofile(f)
+
+        # La mano en curso sigue en el proximo bloque
+        self._inicio_partida -= self._offset
+        _, game, hand, _, j0_es_mano, reparto = manos[-_CAMPOS_MANO:]
+        self._manos = [0, game, hand, self._inicio_partida, j0_es_mano, reparto]
+        self._offset = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_trace(path):
+    """Devuelve (header, registros) con los registros mapeados en memoria."""
+    with open(path, "rb") as f:
+        header, data_offset = _read_header(f)
+    n_records = (os.path.getsize(path) - data_offset) // TRACE_DTYPE.itemsize
+    if n_records == 0:
+        return header, np.zeros(0, dtype=TRACE_DTYPE)
+    records = np.memmap(path, dtype=TRACE_DTYPE, mode="r", offset=data_offset, shape=(n_records,))
+    return header, records
+
+
+def split_games(records):
+    """Itera (game_id, registros) asumiendo registros agrupados por partida."""
+    if len(records) == 0:
+        return
+    games = records["game"]
+    cortes = np.flatnonzero(games[1:] != games[:-1]) + 1
+    inicio = 0
+    for fin in list(cortes) + [len(records)]:
+        yield int(games[inicio]), records[inicio:fin]
+        inicio = fin
+
+
+def _forzar_reparto(logic, rec):
+    deal = [CARTAS[int(c)] for c in rec["deal"]]
+    estado = logic.estado
+    estado.mano_jugador = deal[:3]
+    estado.mano_oponente = deal[3:]
+    estado.es_mano = bool(rec["flags"] & FLAG_J0_ES_MANO)
+    estado.turno_actual = 0 if estado.es_mano else 1
+    logic.reparto = (tuple(estado.mano_jugador), tuple(estado.mano_oponente))
+    logic.numero_mano = int(rec["hand"])
+    logic.actualizar_mascara()
+
+
+def iter_replay(game_records, logic=None, check=True):
+    """
+    Reconstruye una partida con TrucoGameLogic.
+    Antes de aplicar cada decision produce (registro, logic) con el estado previo,
+    de modo que el consumidor puede calcular observaciones o features.
+    """
+    if logic is None:
+        logic = TrucoGameLogic()
+    logic.reset_partida()
+    current_hand = None
+    for rec in game_records:
+        hand = int(rec["hand"])
+        if hand != current_hand:
+            _forzar_reparto(logic, rec)
+            current_hand = hand
+        player_id = int(rec["player"])
+        action = int(rec["action"])
+        if check:
+            if logic.get_action_bits(player_id) != int(rec["mask"]):
+                raise ValueError(
+                    f"Mascara distinta en partida {int(rec['game'])}, paso {int(rec['step'])}."
+                )
+        yield rec, logic
+        reward, _, _ = logic.aplicar_accion(action, player_id)
+        if check and not np.isclose(reward, float(rec["reward"])):
+            raise ValueError(
+                f"Recompensa distinta en partida {int(rec['game'])}, paso {int(rec['step'])}."
+            )
+
+
+def replay_game(game_records, check=True):
+    logic = TrucoGameLogic()
+    for _ in iter_replay(game_records, logic=logic, check=check):
+        pass
+    return logic
+
+
+def query(records, header=None, action=None, player=None, agent=None, responding=None, game=None):
+    """Filtra registros de forma vectorizada. Devuelve una mascara booleana."""
+    sel = np.ones(len(records), dtype=bool)
+    if action is not None:
+        sel &= records["action"] == action
+    if player is not None:
+        sel &= records["player"] == player
+    if agent is not None:
+        header = header or {}
+        seats = [seat for seat in (0, 1) if header.get(f"agent_{seat}") == agent]
+        if not seats:
+            sel[:] = False
+        elif len(seats) == 1:
+            sel &= records["player"] == seats[0]
+    if responding == "truco":
+        sel &= (records["flags"] & FLAG_RESPONDER_TRUCO) != 0
+    elif responding == "envido":
+        sel &= (records["flags"] & FLAG_RESPONDER_ENVIDO) != 0
+    if game is not None:
+        sel &= records["game"] == game
+    return sel
+
+
+def _parse_action(value):
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    return Acciones[value.upper()].value
+
+
+def _format_record(rec):
+    valid = [Acciones(i).name for i, ok in enumerate(bits_to_mask(int(rec["mask"]))) if ok]
+    return (
+        f"game={int(rec['game'])} hand={int(rec['hand'])} step={int(rec['step'])} "
+        f"J{int(rec['player'])} {Acciones(int(rec['action'])).name} "
+        f"reward={float(rec['reward'])} validas={valid}"
+    )
+
+
+def _cmd_info(args):
+    header, records = load_trace(args.trace)
+    print(f"Header: {header}")
+    print(f"Registros: {len(records)} ({TRACE_DTYPE.itemsize} bytes c/u)")
+    if len(records):
+        print(f"Partidas: {len(np.unique(records['game']))}")
+
+
+def _cmd_replay(args):
+    _, records = load_trace(args.trace)
+    for game_id, game_records in split_games(records):
+        if args.game is not None and game_id != args.game:
+            continue
+        logic = TrucoGameLogic()
+        for rec, _ in iter_replay(game_records, logic=logic):
+            if args.verbose:
+                print(_format_record(rec))
+        estado = logic.estado
+        print(f"Partida {game_id}: J0 {estado.puntos_jugador} | J1 {estado.puntos_oponente} (replay OK)")
+
+
+def _cmd_query(args):
+    header, records = load_trace(args.trace)
+    sel = query(
+        records,
+        header=header,
+        action=_parse_action(args.action),
+        player=args.player,
+        agent=args.agent,
+        responding=args.responding,
+        game=args.game,
+    )
+    idx = np.flatnonzero(sel)
+    print(f"Coincidencias: {idx.size} de {len(records)}")
+    for i in idx[: args.limit]:
+        print(_format_record(records[i]))
+    if args.output:
+        np.save(args.output, np.asarray(records[idx]))
+        print(f"Registros guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspecciona, reproduce y consulta trazas de partidas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_info = sub.add_parser("info", help="Resumen del archivo de traza.")
+    p_info.add_argument("trace")
+    p_info.set_defaults(func=_cmd_info)
+
+    p_replay = sub.add_parser("replay", help="Reconstruye partidas con TrucoGameLogic y verifica la traza.")
+    p_replay.add_argument("trace")
+    p_replay.add_argument("--game", type=int, default=None, help="Id de partida a reproducir.")
+    p_replay.add_argument("--verbose", action="store_true", help="Imprime cada decision.")
+    p_replay.set_defaults(func=_cmd_replay)
+
+    p_query = sub.add_parser("query", help="Filtra decisiones de la traza.")
+    p_query.add_argument("trace")
+    p_query.add_argument("--action", default=None, help="Nombre o indice de la accion (ej: RETRUCO).")
+    p_query.add_argument("--player", type=int, choices=[0, 1], default=None)
+    p_query.add_argument("--agent", default=None, help="Nombre del agente (segun el header de la traza).")
+    p_query.add_argument("--responding", choices=["truco", "envido"], default=None, help="Solo respuestas a un canto.")
+    p_query.add_argument("--game", type=int, default=None)
+    p_query.add_argument("--limit", type=int, default=20, help="Cantidad de registros a imprimir.")
+    p_query.add_argument("--output", default=None, help="Guarda los registros filtrados en .npy.")
+    p_query.set_defaults(func=_cmd_query)
+
+    args = parser.parse_args()
+    args.func(args)
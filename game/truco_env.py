@@ -8,7 +8,12 @@ from constantes import (
     ESTADO_REAL_ENVIDO,
     ESTADO_FALTA_ENVIDO,
 )
-from truco_logic import TrucoGameLogic
+from truco_logic import MODO_NORMAL, TrucoGameLogic
+
+
+OBS_BASICA = "basic"
+OBS_RICA = "rich"
+OBS_MODES = (OBS_BASICA, OBS_RICA)
 
 
 class TrucoEnv(gym.Env):
@@ -18,8 +23,11 @@ class TrucoEnv(gym.Env):
 
     metadata = {"render_modes": ["human", "ansi"], "render_fps": 1}
 
-    def __init__(self):
+    def __init__(self, recorder=None, instrumentacion=None, modo=MODO_NORMAL, obs_mode=OBS_BASICA):
         super(TrucoEnv, self).__init__()
+        if obs_mode not in OBS_MODES:
+            raise ValueError(f"obs_mode desconocido: {obs_mode}. Opciones: {OBS_MODES}")
+        self.obs_mode = obs_mode
 
         # ---------------------------------------------------------------------
         # 1. ACTION SPACE (Espacio de Accion)
@@ -77,13 +85,40 @@ class TrucoEnv(gym.Env):
             dtype=np.float32,
         )
 
+        # Modo "rich": vector binario/one-hot de observaciones.OBS_RICA_DIM
+        # elementos (cartas vistas, vueltas, historial de cantos, zonas de puntaje)
+        self._codificador = None
+        if obs_mode == OBS_RICA:
+            from observaciones import CodificadorRico, observation_space_rico
+
+            self._codificador = CodificadorRico()
+            self.observation_space = observation_space_rico()
+
         # Estado interno y motor de reglas
         self.state = None
-        self.logic = TrucoGameLogic()
+        # modo: "normal" (-5 ante acciones ilegales), "trusted" (sin validar) o "strict" (excepcion)
+        self.logic = TrucoGameLogic(modo=modo)
+
+        # Grabador de trazas opcional (ver trazas.TraceRecorder)
+        self.recorder = recorder
+
+        # Contadores de tiempo opcionales (ver instrumentacion.Instrumentacion)
+        self.instrumentacion = instrumentacion
+
+    def set_recorder(self, recorder):
+        self.recorder = recorder
+
+    def set_instrumentacion(self, instrumentacion):
+        self.instrumentacion = instrumentacion
 
     def reset(self, seed=None, options=None, player_id=None):
         super().reset(seed=seed)
+        if seed is not None:
+            # Partida reproducible: RNG propio, mazo y mano como en un motor nuevo
+            self.logic.sembrar(seed)
         self.logic.reset_partida()
+        if self.recorder is not None:
+            self.recorder.start_game()
         if player_id is None:
             player_id = self.get_current_player()
         self.state = self._estado_a_observacion(player_id)
@@ -101,13 +136,38 @@ class TrucoEnv(gym.Env):
         # 3. Obtener nuevo estado, recompensa y flags del Motor
         if player_id is None:
             player_id = self.get_current_player()
-        reward, terminated, _ = self.logic.aplicar_accion(action, player_id)
-        self.state = self._estado_a_observacion(player_id)
+        inst = self.instrumentacion
+        if inst is not None:
+            with inst.seccion("aplicar_accion"):
+                reward, terminated = self._aplicar(action, player_id)
+            with inst.seccion("_estado_a_observacion"):
+                self.state = self._estado_a_observacion(player_id)
+        else:
+            reward, terminated = self._aplicar(action, player_id)
+            self.state = self._estado_a_observacion(player_id)
         truncated = False
 
         info = {}
         return self.state, reward, terminated, truncated, info
 
+    def aplicar(self, action, player_id):
+        """
+        Aplica la accion sin armar ninguna observacion.
+        Retorna (reward desde la perspectiva de J0, terminado).
+        """
+        inst = self.instrumentacion
+        if inst is not None:
+            with inst.seccion("aplicar_accion"):
+                return self._aplicar(action, player_id)
+        return self._aplicar(action, player_id)
+
+    def _aplicar(self, action, player_id):
+        if self.recorder is not None:
+            reward, terminated, _ = self.recorder.aplicar(self.logic, action, player_id)
+        else:
+            reward, terminated, _ = self.logic.aplicar_accion(action, player_id)
+        return reward, terminated
+
     def render(self, mode="human", player_id=0):
         """
         Renderiza el estado en texto.
@@ -164,9 +224,14 @@ class TrucoEnv(gym.Env):
         return estado.turno_actual
 
     def get_observation(self, player_id=0):
+        if self.instrumentacion is not None:
+            with self.instrumentacion.seccion("_estado_a_observacion"):
+                return self._estado_a_observacion(player_id)
         return self._estado_a_observacion(player_id)
 
     def _estado_a_observacion(self, player_id=0):
+        if self._codificador is not None:
+            return self._codificador.codificar(self.logic, player_id, self.get_current_player())
         estado = self.logic.estado
         obs = np.zeros(13, dtype=np.float32)
 
@@ -210,4 +275,15 @@ class TrucoEnv(gym.Env):
     def get_action_mask(self, player_id=None):
         if player_id is None:
             player_id = self.logic.estado.turno_actual
-        return self.logic.get_action_mask(player_id)
+        if self.instrumentacion is not None:
+            with self.instrumentacion.seccion("get_action_mask"):
+                mask = self.logic.get_action_mask(player_id)
+        else:
+            mask = self.logic.get_action_mask(player_id)
+        return mask
+
+    def get_action_bits(self, player_id=None):
+        """Mascara de acciones validas como entero (bit i = accion i)."""
+        if player_id is None:
+            player_id = self.logic.estado.turno_actual
+        return self.logic.get_action_bits(player_id)
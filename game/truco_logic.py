@@ -19,6 +19,76 @@ from constantes import (
     ESTADO_TRUCO_CERRADO,
 )
 
+
+# =============================================================================
+# MASCARA DE ACCIONES COMO BITS
+# Bit i = accion i del Enum Acciones. La mascara del jugador que debe actuar se
+# recalcula una sola vez por cambio de estado (fin de aplicar_accion y de
+# nueva_mano); get_action_bits/get_action_mask solo la leen.
+# =============================================================================
+
+_B_CARTA_1 = 1 << Acciones.JUGAR_CARTA_1.value
+_B_CARTA_2 = 1 << Acciones.JUGAR_CARTA_2.value
+_B_CARTA_3 = 1 << Acciones.JUGAR_CARTA_3.value
+_B_ENVIDO = 1 << Acciones.ENVIDO.value
+_B_ENVIDO_ENVIDO = 1 << Acciones.ENVIDO_ENVIDO.value
+_B_REAL_ENVIDO = 1 << Acciones.REAL_ENVIDO.value
+_B_FALTA_ENVIDO = 1 << Acciones.FALTA_ENVIDO.value
+_B_TRUCO = 1 << Acciones.TRUCO.value
+_B_RETRUCO = 1 << Acciones.RETRUCO.value
+_B_VALE_CUATRO = 1 << Acciones.VALE_CUATRO.value
+_B_QUIERO = 1 << Acciones.QUIERO.value
+_B_NO_QUIERO = 1 << Acciones.NO_QUIERO.value
+_B_IR_AL_MAZO = 1 << Acciones.IR_AL_MAZO.value
+_B_RESPUESTA = _B_QUIERO | _B_NO_QUIERO
+
+# Indices de accion usados en el despacho de aplicar_accion
+_A_JUGAR_CARTA_3 = Acciones.JUGAR_CARTA_3.value
+_A_FALTA_ENVIDO = Acciones.FALTA_ENVIDO.value
+_A_VALE_CUATRO = Acciones.VALE_CUATRO.value
+_A_QUIERO = Acciones.QUIERO.value
+_A_NO_QUIERO = Acciones.NO_QUIERO.value
+_A_IR_AL_MAZO = Acciones.IR_AL_MAZO.value
+
+# Cartas jugables segun el tamano de la mano (0..3)
+_BITS_CARTAS = (0, _B_CARTA_1, _B_CARTA_1 | _B_CARTA_2, _B_CARTA_1 | _B_CARTA_2 | _B_CARTA_3)
+
+# Respuestas posibles a un envido pendiente segun lo cantado
+_BITS_RESPUESTA_ENVIDO = {
+    ESTADO_ENVIDO: _B_ENVIDO_ENVIDO | _B_REAL_ENVIDO | _B_FALTA_ENVIDO | _B_RESPUESTA,
+    ESTADO_ENVIDO_ENVIDO: _B_REAL_ENVIDO | _B_FALTA_ENVIDO | _B_RESPUESTA,
+    ESTADO_REAL_ENVIDO: _B_FALTA_ENVIDO | _B_RESPUESTA,
+    ESTADO_FALTA_ENVIDO: _B_RESPUESTA,
+}
+
+# Mascara en formato lista para cada combinacion de bits
+_MASCARAS = tuple(
+    tuple(bool((bits >> i) & 1) for i in range(len(Acciones))) for bits in range(1 << len(Acciones))
+)
+
+
+# Modos del motor ante acciones ilegales (ver TrucoGameLogic.aplicar_accion)
+MODO_NORMAL = "normal"
+MODO_TRUSTED = "trusted"
+MODO_STRICT = "strict"
+MODOS = (MODO_NORMAL, MODO_TRUSTED, MODO_STRICT)
+
+
+class AccionIlegalError(ValueError):
+    """Accion fuera de la mascara de acciones validas (modo strict)."""
+
+    def __init__(self, accion_idx, player_id, mask_bits):
+        self.accion_idx = accion_idx
+        self.player_id = player_id
+        self.mask_bits = mask_bits
+        try:
+            nombre = Acciones(accion_idx).name
+        except ValueError:
+            nombre = str(accion_idx)
+        validas = [a.name for a in Acciones if (mask_bits >> a.value) & 1]
+        super().__init__(f"Accion ilegal {nombre} para J{player_id}. Validas: {validas}")
+
+
 class EstadoTruco:
     """
     Clase que define el estado del juego de Truco.
@@ -55,15 +125,37 @@ class EstadoTruco:
         self.resultados_ronda = []
 class TrucoGameLogic:
 
-    def __init__(self):
+    def __init__(self, rng=None, modo=MODO_NORMAL):
+        if modo not in MODOS:
+            raise ValueError(f"Modo desconocido: {modo}. Opciones: {MODOS}")
+        self.modo = modo
         self.estado = EstadoTruco()
+        # Fuente de aleatoriedad para repartir (por defecto el modulo random global)
+        self.rng = rng if rng is not None else random
         # Generar el mazo base desde constantes (keys del dict)
         self.mazo_base = list(MAZO_DATOS.keys())
+        # Numero de mano dentro de la partida y reparto original (para trazas/replay)
+        self.numero_mano = 0
+        self.reparto = ((), ())
+        # Mascara cacheada: jugador que debe actuar y sus acciones validas
+        self._jugador_esperado = 0
+        self._mask_bits = 0
+        self.actualizar_mascara()
+
+    def sembrar(self, seed):
+        """
+        Deja el motor como recien creado con un RNG sembrado, para que la proxima
+        reset_partida no dependa de partidas anteriores (orden del mazo y mano).
+        """
+        self.rng = random.Random(seed)
+        self.mazo_base = list(MAZO_DATOS.keys())
+        self.estado.es_mano = True
 
     def reset_partida(self):
         """Reinicia los puntos a 0."""
         self.estado.puntos_jugador = 0
         self.estado.puntos_oponente = 0
+        self.numero_mano = 0
         self.nueva_mano()
 
     def nueva_mano(self):
@@ -71,11 +163,13 @@ class TrucoGameLogic:
         Reparte cartas y reinicia variables de la ronda.
         Simula la distribución hipergeométrica
         """
-        random.shuffle(self.mazo_base)
+        self.rng.shuffle(self.mazo_base)
         
         # Repartir 3 a cada uno
         self.estado.mano_jugador = self.mazo_base[:3]
         self.estado.mano_oponente = self.mazo_base[3:6]
+        self.reparto = (tuple(self.estado.mano_jugador), tuple(self.estado.mano_oponente))
+        self.numero_mano += 1
         
         # Resetear flags de ronda
         self.estado.cartas_jugadas = [] # Limpiar mesa
@@ -101,6 +195,7 @@ class TrucoGameLogic:
         self.estado.es_mano = not self.estado.es_mano
         # Si soy mano, turno = 0 (mío), sino 1 (oponente)
         self.estado.turno_actual = 0 if self.estado.es_mano else 1
+        self.actualizar_mascara()
 
     def calcular_puntos_envido(self, mano):
         """
@@ -222,135 +317,127 @@ class TrucoGameLogic:
         """
         Procesa la acción recibida desde el entorno.
         Retorna: (reward, terminado, info)
+        Ante una accion fuera de la mascara, segun self.modo: "normal" devuelve
+        -5 sin tocar el estado, "strict" lanza AccionIlegalError y "trusted" no
+        valida nada (el llamador garantiza acciones de get_action_mask).
         """
+        modo = self.modo
+        if modo != MODO_TRUSTED:
+            if player_id != self._jugador_esperado or not (self._mask_bits >> accion_idx) & 1:
+                if modo == MODO_STRICT:
+                    raise AccionIlegalError(accion_idx, player_id, self.get_action_bits(player_id))
+                return self._rechazar_accion(accion_idx, player_id)
+        return self._ejecutar_accion(accion_idx, player_id)
+
+    def _rechazar_accion(self, accion_idx, player_id):
+        """Respuesta del modo normal ante una accion ilegal (no modifica el estado)."""
+        if player_id != self._jugador_esperado:
+            return -5, False, {"error": "No es el turno del jugador."}
+        if accion_idx == _A_QUIERO or accion_idx == _A_NO_QUIERO:
+            # Sin canto pendiente, quiero / no quiero no tienen efecto
+            return 0, False, {}
+        hay_desafio_pendiente = self.estado.turno_responder_envido or self.estado.turno_responder_truco
+        if hay_desafio_pendiente and (accion_idx <= _A_JUGAR_CARTA_3 or accion_idx == _A_IR_AL_MAZO):
+            return -5, False, {"error": "Hay un canto pendiente de respuesta."}
+        return -5, False, {}
+
+    def _ejecutar_accion(self, accion_idx, player_id):
+        """Aplica una accion que ya se sabe legal."""
+        estado = self.estado
         reward = 0
         terminado = False
         info = {}
         mano_terminada = False
 
-        # Mapeo inverso para legibilidad
-        accion = Acciones(accion_idx)
-        if self.estado.turno_responder_envido:
-            jugador_esperado = 1 - self.estado.jugador_que_canto_envido
-        elif self.estado.turno_responder_truco:
-            jugador_esperado = 1 - self.estado.jugador_que_canto_truco
-        else:
-            jugador_esperado = self.estado.turno_actual
-        if player_id != jugador_esperado:
-            return -5, False, {"error": "No es el turno del jugador."}
-
         # ---------------------------------------------------------
         # LÓGICA DE JUGAR CARTAS (Nivel Operativo: check)
         # ---------------------------------------------------------
-        if accion in [Acciones.JUGAR_CARTA_1, Acciones.JUGAR_CARTA_2, Acciones.JUGAR_CARTA_3]:
-            idx = accion.value # 0, 1 o 2
-            if self.estado.turno_responder_envido or self.estado.turno_responder_truco:
-                return -5, False, {"error": "Hay un canto pendiente de respuesta."}
-
-            # Verificar si la carta existe (no se jugó ya)
-            mano = self.estado.mano_jugador if player_id == 0 else self.estado.mano_oponente
-            if idx < len(mano):
-                carta_jugada = mano.pop(idx)
-                
-                # Agregar a mesa
-                self.estado.cartas_jugadas.append((carta_jugada, player_id))
-                
-                # Cambia turno al otro jugador
-                self.estado.turno_actual = 1 - player_id
-
-                # Resolver la vuelta cuando ambos jugaron una carta
-                if len(self.estado.cartas_jugadas) % 2 == 0:
-                    carta_j, jugador_j = self.estado.cartas_jugadas[-2]
-                    carta_op, jugador_op = self.estado.cartas_jugadas[-1]
-                    resultado = self.determinar_ganador_mano(carta_j, carta_op)
-                    if resultado == 0:
-                        ganador = jugador_j
-                    elif resultado == 1:
-                        ganador = jugador_op
+        if accion_idx <= _A_JUGAR_CARTA_3:
+            mano = estado.mano_jugador if player_id == 0 else estado.mano_oponente
+            carta_jugada = mano.pop(accion_idx)
+
+            # Agregar a mesa
+            estado.cartas_jugadas.append((carta_jugada, player_id))
+
+            # Cambia turno al otro jugador
+            estado.turno_actual = 1 - player_id
+
+            # Resolver la vuelta cuando ambos jugaron una carta
+            if len(estado.cartas_jugadas) % 2 == 0:
+                carta_j, jugador_j = estado.cartas_jugadas[-2]
+                carta_op, jugador_op = estado.cartas_jugadas[-1]
+                resultado = self.determinar_ganador_mano(carta_j, carta_op)
+                if resultado == 0:
+                    ganador = jugador_j
+                elif resultado == 1:
+                    ganador = jugador_op
+                else:
+                    ganador = 2
+
+                self._registrar_resultado_ronda(ganador)
+                if ganador == 0:
+                    reward = 0.5
+                elif ganador == 1:
+                    reward = -0.5
+
+                if ganador == 2:
+                    estado.turno_actual = 0 if estado.es_mano else 1
+                else:
+                    estado.turno_actual = ganador
+                estado.numero_ronda += 1
+
+                ganador_mano = self._ganador_mano_completa()
+                if ganador_mano is not None:
+                    puntos_truco = self._valor_truco_puntaje()
+                    if ganador_mano == 0:
+                        delta = self._sumar_puntos(0, puntos_truco)
+                        reward += delta
                     else:
-                        ganador = 2
-
-                    self._registrar_resultado_ronda(ganador)
-                    if ganador == 0:
-                        reward = 0.5
-                    elif ganador == 1:
-                        reward = -0.5
-
-                    if ganador == 2:
-                        self.estado.turno_actual = 0 if self.estado.es_mano else 1
-                    else:
-                        self.estado.turno_actual = ganador
-                    self.estado.numero_ronda += 1
-
-                    ganador_mano = self._ganador_mano_completa()
-                    if ganador_mano is not None:
-                        puntos_truco = self._valor_truco_puntaje()
-                        if ganador_mano == 0:
-                            delta = self._sumar_puntos(0, puntos_truco)
-                            reward += delta
-                        else:
-                            delta = self._sumar_puntos(1, puntos_truco)
-                            reward -= delta
-                        mano_terminada = True
-            else:
-                # Castigo por intentar jugar carta inexistente
-                reward = -5 
+                        delta = self._sumar_puntos(1, puntos_truco)
+                        reward -= delta
+                    mano_terminada = True
 
         # ---------------------------------------------------------
         # LÓGICA DE CANTOS (Envido / Truco)
         # ---------------------------------------------------------
-        elif accion in [Acciones.ENVIDO, Acciones.ENVIDO_ENVIDO, Acciones.REAL_ENVIDO, Acciones.FALTA_ENVIDO]:
-            if not self._puede_cantar_envido():
-                reward = -5
-            elif not self._validar_canto_envido(accion):
-                reward = -5
-            else:
-                if (
-                    self.estado.numero_ronda == 1
-                    and self.estado.estado_canto_envido == ESTADO_NO_CANTADO
-                    and self.estado.turno_responder_truco
-                ):
-                    self.estado.turno_responder_truco = False
-                    self.estado.estado_canto_truco = ESTADO_TRUCO_NO_CANTADO
-                    self.estado.jugador_que_canto_truco = None
-                    self.estado.jugador_que_acepto_truco = None
-                        
-                self._aplicar_canto_envido(accion, player_id)
-                reward = 0
-
-        elif accion in [Acciones.TRUCO, Acciones.RETRUCO, Acciones.VALE_CUATRO]:
-            if not self._puede_cantar_truco():
-                reward = -5
-            elif not self._validar_canto_truco(accion, player_id):
-                reward = -5
-            else:
-                self._aplicar_canto_truco(accion, player_id)
-                reward = 0
-
-        elif accion == Acciones.QUIERO:
-            if self.estado.turno_responder_envido:
+        elif accion_idx <= _A_FALTA_ENVIDO:
+            if (
+                estado.numero_ronda == 1
+                and estado.estado_canto_envido == ESTADO_NO_CANTADO
+                and estado.turno_responder_truco
+            ):
+                # El envido interrumpe un truco sin responder
+                estado.turno_responder_truco = False
+                estado.estado_canto_truco = ESTADO_TRUCO_NO_CANTADO
+                estado.jugador_que_canto_truco = None
+                estado.jugador_que_acepto_truco = None
+
+            self._aplicar_canto_envido(Acciones(accion_idx), player_id)
+
+        elif accion_idx <= _A_VALE_CUATRO:
+            self._aplicar_canto_truco(Acciones(accion_idx), player_id)
+
+        elif accion_idx == _A_QUIERO:
+            if estado.turno_responder_envido:
                 reward += self._resolver_envido(acepta=True, player_id=player_id)
-            elif self.estado.turno_responder_truco:
+            elif estado.turno_responder_truco:
                 reward += self._resolver_truco(acepta=True, player_id=player_id)
 
-        elif accion == Acciones.NO_QUIERO:
-            if self.estado.turno_responder_envido:
+        elif accion_idx == _A_NO_QUIERO:
+            if estado.turno_responder_envido:
                 reward += self._resolver_envido(acepta=False, player_id=player_id)
-            elif self.estado.turno_responder_truco:
+            elif estado.turno_responder_truco:
                 reward += self._resolver_truco(acepta=False, player_id=player_id)
                 mano_terminada = True
 
-        elif accion == Acciones.IR_AL_MAZO:
-            if self.estado.turno_responder_envido or self.estado.turno_responder_truco:
-                return -5, False, {"error": "Hay un canto pendiente de respuesta."}
-
-            if self.estado.nivel_truco > 0:
+        else:  # IR_AL_MAZO
+            if estado.nivel_truco > 0:
                 puntos = self._valor_truco_puntaje()
             else:
-                jugador_mano = 0 if self.estado.es_mano else 1
+                jugador_mano = 0 if estado.es_mano else 1
                 envido_paso = (
-                    self.estado.envido_finalizado
-                    or self.estado.cartas_jugadas
+                    estado.envido_finalizado
+                    or estado.cartas_jugadas
                     or player_id != jugador_mano
                 )
                 puntos = 1 if envido_paso else 2
@@ -363,15 +450,17 @@ class TrucoGameLogic:
             mano_terminada = True
 
         # Verificar fin de partida (15 o 30 puntos)
-        if self.estado.puntos_jugador >= 30:
+        if estado.puntos_jugador >= 30:
             reward += 100
             terminado = True
-        elif self.estado.puntos_oponente >= 30:
+        elif estado.puntos_oponente >= 30:
             reward -= 100
             terminado = True
 
         if mano_terminada and not terminado:
             self.nueva_mano()
+        else:
+            self.actualizar_mascara()
 
         return reward, terminado, info
 
@@ -540,12 +629,76 @@ class TrucoGameLogic:
     def validar_canto_truco(self, player_id):
         return self._validar_canto_truco(Acciones.TRUCO, player_id)
 
+    def actualizar_mascara(self):
+        """
+        Recalcula la mascara cacheada. aplicar_accion y nueva_mano la llaman solas;
+        solo hace falta llamarla a mano si se modifica `self.estado` desde afuera.
+        """
+        e = self.estado
+        responder_envido = e.turno_responder_envido
+        responder_truco = e.turno_responder_truco
+        if responder_envido:
+            jugador = 1 - e.jugador_que_canto_envido
+        elif responder_truco:
+            jugador = 1 - e.jugador_que_canto_truco
+        else:
+            jugador = e.turno_actual
+
+        bits = 0
+        if responder_truco:
+            if e.estado_canto_truco == ESTADO_TRUCO:
+                bits = _B_RETRUCO | _B_RESPUESTA
+            elif e.estado_canto_truco == ESTADO_RETRUCO:
+                bits = _B_VALE_CUATRO | _B_RESPUESTA
+            else:
+                bits = _B_RESPUESTA
+        elif not responder_envido:
+            mano = e.mano_jugador if jugador == 0 else e.mano_oponente
+            bits = _BITS_CARTAS[min(len(mano), 3)] | _B_IR_AL_MAZO
+            nivel = e.nivel_truco
+            if nivel == 0:
+                if e.estado_canto_truco == ESTADO_TRUCO_NO_CANTADO:
+                    bits |= _B_TRUCO
+            elif e.jugador_que_acepto_truco == jugador:
+                if nivel == 1:
+                    bits |= _B_RETRUCO
+                elif nivel == 2:
+                    bits |= _B_VALE_CUATRO
+
+        if responder_envido:
+            bits |= _BITS_RESPUESTA_ENVIDO.get(e.estado_canto_envido, 0)
+        elif (
+            e.numero_ronda == 1
+            and not e.envido_finalizado
+            and e.nivel_truco == 0
+            and e.estado_canto_envido == ESTADO_NO_CANTADO
+        ):
+            bits |= _B_ENVIDO | _B_REAL_ENVIDO | _B_FALTA_ENVIDO
+
+        self._jugador_esperado = jugador
+        self._mask_bits = bits
+
+    def get_action_bits(self, player_id):
+        """Mascara de acciones validas como entero de 13 bits (bit i = accion i)."""
+        if player_id != self._jugador_esperado:
+            return 0
+        return self._mask_bits
+
     def get_action_mask(self, player_id):
         """
         Devuelve una lista de booleanos indicando que acciones son validas
         en el estado actual.
         Orden del array corresponde a los indices de Acciones(Enum).
         """
+        if player_id != self._jugador_esperado:
+            return list(_MASCARAS[0])
+        return list(_MASCARAS[self._mask_bits])
+
+    def _get_action_mask_referencia(self, player_id):
+        """
+        Version original de get_action_mask, calculada desde cero en cada llamada.
+        Se mantiene como referencia para benchmarks/paridad_mascara.py.
+        """
         # Inicializamos todo en False (nada permitido por defecto)
         mask = [False] * len(Acciones)
         if self.estado.turno_responder_envido:
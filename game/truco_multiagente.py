@@ -0,0 +1,153 @@
+import numpy as np
+
+from truco_env import OBS_BASICA, TrucoEnv
+from truco_logic import MODO_NORMAL, MODO_TRUSTED
+
+
+# =============================================================================
+# INTERFAZ DE DOS JUGADORES (estilo AEC de PettingZoo, sin depender de el)
+# Un solo TrucoEnv por debajo; los agentes son los player_id 0 y 1.
+# - Las recompensas salen para los dos asientos (J1 recibe -reward de J0), asi
+#   que los trainers ya no tienen que darlas vuelta a mano.
+# - La observacion y la mascara de cada asiento se cachean por version del
+#   estado: solo se recalculan despues de una accion que lo modifico.
+#
+# Bucle tipico:
+#     env = TrucoAECEnv()
+#     env.reset(seed=0)
+#     for agente in env.agent_iter():
+#         obs, reward, terminado, truncado, info = env.last()
+#         accion = None if terminado or truncado else politica(obs, env.action_mask(agente))
+#         env.step(accion)
+# Al terminar la partida cada asiento pasa una vez mas por agent_iter (con
+# terminado=True y su recompensa final en last()) y se da de baja con step(None).
+# =============================================================================
+
+
+class TrucoAECEnv:
+    metadata = {"name": "truco_aec_v0", "is_parallelizable": False}
+    possible_agents = (0, 1)
+
+    def __init__(self, recorder=None, instrumentacion=None, modo=MODO_NORMAL, obs_mode=OBS_BASICA):
+        self.env = TrucoEnv(recorder=recorder, instrumentacion=instrumentacion, modo=modo, obs_mode=obs_mode)
+        self.logic = self.env.logic
+        self.observation_spaces = {a: self.env.observation_space for a in self.possible_agents}
+        self.action_spaces = {a: self.env.action_space for a in self.possible_agents}
+
+        # Se incrementa cada vez que cambia el estado del motor
+        self.version = 0
+        self._obs = [None, None]
+        self._obs_version = [-1, -1]
+        self._mask = [None, None]
+        self._mask_version = [-1, -1]
+
+        self.agents = []
+        self.agent_selection = None
+        self.rewards = {a: 0.0 for a in self.possible_agents}
+        self._cumulative_rewards = {a: 0.0 for a in self.possible_agents}
+        self.terminations = {a: False for a in self.possible_agents}
+        self.truncations = {a: False for a in self.possible_agents}
+        self.infos = {a: {} for a in self.possible_agents}
+
+    def observation_space(self, agent):
+        return self.observation_spaces[agent]
+
+    def action_space(self, agent):
+        return self.action_spaces[agent]
+
+    def reset(self, seed=None, options=None):
+        obs, _ = self.env.reset(seed=seed, options=options)
+        self.version += 1
+        actual = self.env.get_current_player()
+        # TrucoEnv.reset ya armo la vista del que arranca: queda en cache
+        self._obs[actual] = obs
+        self._obs_version[actual] = self.version
+
+        self.agents = list(self.possible_agents)
+        self.agent_selection = actual
+        for a in self.possible_agents:
+            self.rewards[a] = 0.0
+            self._cumulative_rewards[a] = 0.0
+            self.terminations[a] = False
+            self.truncations[a] = False
+            self.infos[a] = {}
+
+    def observe(self, agent):
+        """Observacion de `agent` (cacheada; no modificar el array devuelto)."""
+        if self._obs_version[agent] != self.version:
+            self._obs[agent] = self.env.get_observation(agent)
+            self._obs_version[agent] = self.version
+        return self._obs[agent]
+
+    def action_mask(self, agent):
+        """Mascara booleana de `agent` (todo False si no le toca actuar)."""
+        if self._mask_version[agent] != self.version:
+            self._mask[agent] = np.array(self.logic.get_action_mask(agent), dtype=bool)
+            self._mask_version[agent] = self.version
+        return self._mask[agent]
+
+    def observaciones(self):
+        return {a: self.observe(a) for a in self.possible_agents}
+
+    def mascaras(self):
+        return {a: self.action_mask(a) for a in self.possible_agents}
+
+    def last(self, observe=True):
+        """(obs, recompensa acumulada desde su ultima accion, terminado, truncado, info) del agente actual."""
+        agente = self.agent_selection
+        return (
+            self.observe(agente) if observe else None,
+            self._cumulative_rewards[agente],
+            self.terminations[agente],
+            self.truncations[agente],
+            self.infos[agente],
+        )
+
+    def agent_iter(self, max_iter=2**63):
+        n = 0
+        while self.agents and n < max_iter:
+            yield self.agent_selection
+            n += 1
+
+    def step(self, action):
+        agente = self.agent_selection
+        if self.terminations[agente] or self.truncations[agente]:
+            self._baja(agente)
+            return
+
+        # Lo acumulado hasta ahora ya lo vio en last()
+        self._cumulative_rewards[agente] = 0.0
+        rival = 1 - agente
+        legal = self.logic.modo == MODO_TRUSTED or (self.logic.get_action_bits(agente) >> action) & 1
+        reward, terminado = self.env.aplicar(action, agente)
+
+        if legal:
+            self.version += 1
+            # El motor devuelve la recompensa desde la perspectiva de J0
+            self.rewards[0] = reward
+            self.rewards[1] = -reward
+        else:
+            # Accion rechazada (modo normal): la penalizacion es solo para quien actuo
+            self.rewards[agente] = reward
+            self.rewards[rival] = 0.0
+        self._cumulative_rewards[0] += self.rewards[0]
+        self._cumulative_rewards[1] += self.rewards[1]
+
+        if terminado:
+            self.terminations[0] = self.terminations[1] = True
+            # Primero el rival ve el resultado final, despues quien cerro la partida
+            self.agent_selection = rival
+        else:
+            self.agent_selection = self.env.get_current_player()
+
+    def _baja(self, agente):
+        self.agents.remove(agente)
+        self._cumulative_rewards[agente] = 0.0
+        if self.agents:
+            self.agent_selection = self.agents[0]
+
+    def render(self, mode="human", player_id=0):
+        return self.env.render(mode=mode, player_id=player_id)
+
+    def close(self):
+        self.env.close()